@@ -0,0 +1,266 @@
+"""
+Achievements: badges awarded by declarative rules.
+
+Each rule compares one metric of a user (lessons completed, streak, XP,
+leaderboard rank, ...) with a threshold and names the one event that can
+newly satisfy it: lesson completion can only raise the completed count, an
+XP change of this user can only move their XP and rank, and so on. Rules are
+indexed by event (RULES_BY_EVENT), so ``record(db, user_id, XP_CHANGED)``
+evaluates the XP rules and nothing else, reading only the metrics those
+rules use (the caller passes the ones it already has). A user's own history
+is never rescanned.
+
+Awarding is an INSERT ... ON CONFLICT DO NOTHING into user_badges in the
+caller's transaction: a badge already held is skipped by its key, so
+evaluating a rule again, or concurrently, never awards it twice. Writers on
+the request path use ``enqueue`` instead, which evaluates the rules in a
+background job (app/jobs.py) committed with their write. Existing
+users get their badges from ``backfill`` (backfill_achievements.py), one
+batched pass over the users table per database.
+"""
+
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import completion, jobs, models
+from .database import use_primary
+from .sharding import shards_of, use_shard
+
+LESSON_COMPLETED = "lesson_completed"
+QUIZ_GRADED = "quiz_graded"
+STREAK_EXTENDED = "streak_extended"
+XP_CHANGED = "xp_changed"
+
+RANK_SCAN_LIMIT = 100  # ranks are counted up to here; rank rules must not go beyond it
+
+users_table = models.User.__table__
+badges_table = models.UserBadge.__table__
+attempts_table = models.QuizAttempt.__table__
+
+
+class Rule(NamedTuple):
+    badge: str  # stored in user_badges; never rename
+    title: str
+    description: str
+    event: str  # the event that can newly satisfy the rule
+    metric: str
+    threshold: int
+    at_most: bool = False  # metric <= threshold (a rank) instead of >=
+
+    def passes(self, value: Optional[int]) -> bool:
+        if value is None:
+            return False
+        return value <= self.threshold if self.at_most else value >= self.threshold
+
+
+RULES: Tuple[Rule, ...] = (
+    Rule("first_lesson", "First steps", "Complete your first lesson", LESSON_COMPLETED, "lessons_completed", 1),
+    Rule("lessons_5", "Getting serious", "Complete 5 lessons", LESSON_COMPLETED, "lessons_completed", 5),
+    Rule("lessons_10", "Bookworm", "Complete 10 lessons", LESSON_COMPLETED, "lessons_completed", 10),
+    Rule("lessons_25", "Scholar", "Complete 25 lessons", LESSON_COMPLETED, "lessons_completed", 25),
+    Rule("perfect_quiz", "Flawless", "Answer every question of a quiz correctly", QUIZ_GRADED, "quiz_perfect", 1),
+    Rule("streak_3", "On a roll", "Keep a 3-day streak", STREAK_EXTENDED, "streak_days", 3),
+    Rule("streak_7", "Week warrior", "Keep a 7-day streak", STREAK_EXTENDED, "streak_days", 7),
+    Rule("streak_30", "Unstoppable", "Keep a 30-day streak", STREAK_EXTENDED, "streak_days", 30),
+    Rule("xp_1000", "Rising investor", "Earn 1,000 XP", XP_CHANGED, "xp_points", 1000),
+    Rule("xp_10000", "Market maven", "Earn 10,000 XP", XP_CHANGED, "xp_points", 10000),
+    Rule("top_10", "Top 10", "Reach the top 10 of the leaderboard", XP_CHANGED, "rank", 10, at_most=True),
+)
+
+RULES_BY_BADGE: Dict[str, Rule] = {rule.badge: rule for rule in RULES}
+RULES_BY_EVENT: Dict[str, Tuple[Rule, ...]] = {}
+for _rule in RULES:
+    RULES_BY_EVENT[_rule.event] = RULES_BY_EVENT.get(_rule.event, ()) + (_rule,)
+
+
+def _user_value(column) -> Callable[[Session, int, dict], Optional[int]]:
+    def read(db: Session, user_id: int, facts: dict) -> Optional[int]:
+        return db.execute(select(column).where(users_table.c.id == user_id)).scalar()
+    return read
+
+
+def _lessons_completed(db: Session, user_id: int, facts: dict) -> int:
+    bitmap = db.execute(select(users_table.c.completed_lessons).where(users_table.c.id == user_id)).scalar()
+    return completion.completed_count(bitmap)
+
+
+def _rank(db: Session, user_id: int, facts: dict) -> Optional[int]:
+    """1 + users with more XP, counted (through ix_users_xp_points) up to RANK_SCAN_LIMIT on each database."""
+    xp = metric(db, user_id, "xp_points", facts)
+    if not xp:
+        return None  # no rank without XP, however few users there are
+    ahead = select(func.count()).select_from(
+        select(users_table.c.id).where(users_table.c.xp_points > xp, users_table.c.id != user_id)
+        .limit(RANK_SCAN_LIMIT).subquery())
+    shards = shards_of(db)
+    if not shards:
+        return 1 + db.execute(ahead).scalar()
+
+    def count(shard) -> int:
+        with Session(bind=shard.reader) as session:
+            return session.execute(ahead).scalar()
+
+    return 1 + sum(shards.scatter(count))
+
+
+# How to read each metric when the caller hasn't passed it
+METRICS: Dict[str, Callable[[Session, int, dict], Optional[int]]] = {
+    "lessons_completed": _lessons_completed,
+    "streak_days": _user_value(users_table.c.streak_days),
+    "xp_points": _user_value(users_table.c.xp_points),
+    "rank": _rank,
+    "quiz_perfect": lambda db, user_id, facts: None,  # only the grader knows
+}
+
+
+def metric(db: Session, user_id: int, name: str, facts: dict) -> Optional[int]:
+    if name not in facts:
+        facts[name] = METRICS[name](db, user_id, facts)
+    return facts[name]
+
+
+def _insert_ignore(dialect: str):
+    insert = postgres_insert if dialect == "postgresql" else sqlite_insert
+    return insert(badges_table).on_conflict_do_nothing(index_elements=[badges_table.c.user_id, badges_table.c.badge])
+
+
+def record(db: Session, user_id: int, *events: str, **facts) -> List[str]:
+    """
+    Evaluate the rules of ``events`` for the user in the caller's transaction
+    (pinned to the user's shard and the primary, after the write that caused
+    them) and award the badges they earn. ``facts`` are metric values the
+    caller already has; the rest are read as needed. Returns the badges
+    newly awarded.
+    """
+    rules = [rule for event in dict.fromkeys(events) for rule in RULES_BY_EVENT.get(event, ())]
+    earned = [rule.badge for rule in rules if rule.passes(metric(db, user_id, rule.metric, facts))]
+    if not earned:
+        return []
+    dialect = db.get_bind(models.UserBadge.__mapper__).dialect.name
+    now = datetime.utcnow()
+    return list(db.execute(_insert_ignore(dialect).values(
+        [{"user_id": user_id, "badge": badge, "awarded_at": now} for badge in earned]
+    ).returning(badges_table.c.badge)).scalars())
+
+
+def enqueue(db: Session, user_id: int, *events: str, **facts):
+    """``record`` in a background job that commits (or rolls back) with the caller's transaction."""
+    jobs.enqueue(db, "achievements.record", {"user_id": user_id, "events": list(events), "facts": facts})
+
+
+@jobs.handler("achievements.record", concurrency=4)
+def _record_job(db: Session, payload: dict):
+    # Safe to run twice: a badge already held is skipped
+    user_id = payload["user_id"]
+    use_primary(use_shard(db, user_id))
+    record(db, user_id, *payload["events"], **payload["facts"])
+    db.commit()
+
+
+def user_badges(db: Session, user_id: int) -> List[dict]:
+    """The user's badges, oldest first, with their rule's title and description."""
+    use_shard(db, user_id)
+    rows = db.execute(select(badges_table.c.badge, badges_table.c.awarded_at)
+                      .where(badges_table.c.user_id == user_id)
+                      .order_by(badges_table.c.awarded_at, badges_table.c.badge)).all()
+    return [dict(catalog_entry(RULES_BY_BADGE[row.badge]), awarded_at=row.awarded_at)
+            for row in rows if row.badge in RULES_BY_BADGE]
+
+
+def catalog_entry(rule: Rule) -> dict:
+    return {"badge": rule.badge, "title": rule.title, "description": rule.description}
+
+
+def _questions_per_lesson(catalog) -> Dict[int, int]:
+    with catalog.connect() as conn:
+        return dict(conn.execute(
+            select(models.LessonContent.lesson_id, func.count(models.QuizQuestion.id))
+            .join(models.QuizQuestion, models.QuizQuestion.lesson_content_id == models.LessonContent.id)
+            .group_by(models.LessonContent.lesson_id)).all())
+
+
+def _top_xp(databases: Sequence[Tuple[object, object]]) -> np.ndarray:
+    """The RANK_SCAN_LIMIT highest XP totals over every database, highest first."""
+    values: List[int] = []
+    # Ordered by the coalesced value: Postgres sorts NULLs first in a plain DESC
+    xp = func.coalesce(users_table.c.xp_points, 0)
+    for _, reader in databases:
+        with reader.connect() as conn:
+            values.extend(conn.execute(select(xp).order_by(xp.desc()).limit(RANK_SCAN_LIMIT)).scalars())
+    return np.sort(np.array(values, dtype=np.int64))[::-1][:RANK_SCAN_LIMIT]
+
+
+def _perfect_users(conn, first_id: int, last_id: int, questions: Dict[int, int]) -> set:
+    """
+    Users in [first_id, last_id] who have answered every question of some
+    lesson's quiz correctly and none of them wrong. Attempts aren't grouped by
+    submission, so this is how a past perfect quiz shows in them.
+    """
+    rows = conn.execute(
+        select(attempts_table.c.user_id, attempts_table.c.lesson_id,
+               func.count(func.distinct(case((attempts_table.c.is_correct, attempts_table.c.question_id)))),
+               func.sum(case((attempts_table.c.is_correct, 0), else_=1)))
+        .where(attempts_table.c.user_id.between(first_id, last_id))
+        .group_by(attempts_table.c.user_id, attempts_table.c.lesson_id))
+    return {user_id for user_id, lesson_id, correct, wrong in rows
+            if not wrong and questions.get(lesson_id) and correct >= questions[lesson_id]}
+
+
+def backfill(databases: Sequence[Tuple[object, object]], catalog, chunk_size: int = 10000,
+             report: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Evaluate every rule for every existing user and award what they have
+    earned, in one pass over each database's users (read in id-ordered
+    chunks: the metric columns go into a NumPy array and each rule is one
+    vectorized comparison per chunk). Safe to re-run: held badges are
+    skipped. Streak rules see the current streak, not past ones.
+    """
+    questions = _questions_per_lesson(catalog)
+    top = _top_xp(databases)
+    stats = {"users": 0, "awarded": Counter()}
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    for writer, reader in databases:
+        query = (select(users_table.c.id, func.coalesce(users_table.c.xp_points, 0),
+                        func.coalesce(users_table.c.streak_days, 0), users_table.c.completed_lessons)
+                 .order_by(users_table.c.id))
+        with reader.connect() as conn:
+            for rows in conn.execution_options(yield_per=chunk_size).execute(query).partitions():
+                ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+                xp = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+                values = {
+                    "xp_points": xp,
+                    "streak_days": np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows)),
+                    "lessons_completed": np.fromiter((completion.completed_count(row[3]) for row in rows),
+                                                     dtype=np.int64, count=len(rows)),
+                    # 1 + how many of the top totals are higher (past the list it only has to be out of
+                    # range); no rank without XP, as in _rank
+                    "rank": np.where(xp > 0, 1 + np.searchsorted(-top, -xp, side="left"), RANK_SCAN_LIMIT + 1),
+                }
+                perfect = _perfect_users(conn, int(ids[0]), int(ids[-1]), questions)
+                values["quiz_perfect"] = np.isin(ids, np.fromiter(perfect, dtype=np.int64, count=len(perfect)))
+                awards = []
+                for rule in RULES:
+                    column = values[rule.metric]
+                    passed = column <= rule.threshold if rule.at_most else column >= rule.threshold
+                    awards.extend({"user_id": user_id, "badge": rule.badge, "awarded_at": now}
+                                  for user_id in ids[passed].tolist())
+                if awards:
+                    with writer.begin() as write:
+                        inserted = write.execute(_insert_ignore(writer.dialect.name).returning(
+                            badges_table.c.badge), awards).scalars().all()
+                    stats["awarded"].update(inserted)
+                stats["users"] += len(rows)
+                if report:
+                    report(f"{stats['users']:,} users checked, {sum(stats['awarded'].values()):,} badges awarded")
+    stats["awarded"] = dict(stats["awarded"])
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
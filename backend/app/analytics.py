@@ -0,0 +1,244 @@
+"""
+Lesson funnel analytics over user_progress.
+
+``Funnel.report`` answers, per lesson: how many learners started it, how many
+completed it, how far the others got (progress_percentage in 10-point buckets,
+100 on its own) and the median time from started_at to completed_at.
+
+A worker keeps a compact copy of user_progress in NumPy arrays indexed by row
+id (lesson, percentage, completed, seconds to complete), one copy per user
+database, plus running per-lesson counts. The first report streams the whole
+table through a server-side cursor (yield_per, ANALYTICS_CHUNK_SIZE rows at a
+time). Later ones read only rows with updated_at at or after the previous
+watermark, less ANALYTICS_WATERMARK_LAG seconds for transactions that
+committed late: each such row's old contribution is subtracted from the
+counts and its new one added, and only the lessons they touch get their
+median recomputed. Reports are cached per watermark (the MAX(updated_at) of
+every database), so polling an idle database costs one index lookup each.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, select
+
+from . import models
+from .config import settings
+from .database import user_databases
+
+progress_table = models.UserProgress.__table__
+
+HISTOGRAM_BUCKETS = 11  # 0-9, 10-19, ..., 90-99, 100
+COLUMNS = 5  # id, lesson_id, progress_percentage, is_completed, seconds to complete
+
+
+def _row_query(dialect: str):
+    p = progress_table.c
+    if dialect == "postgresql":
+        seconds = func.extract("epoch", p.completed_at - p.started_at)
+    else:
+        seconds = (func.julianday(p.completed_at) - func.julianday(p.started_at)) * 86400.0
+    # Plain numbers only (-1 for NULL), so chunks go straight into one float array.
+    return select(p.id, func.coalesce(p.lesson_id, -1), func.coalesce(p.progress_percentage, 0),
+                  func.coalesce(p.is_completed, False), func.coalesce(seconds, -1.0))
+
+
+def _buckets(percentage: np.ndarray) -> np.ndarray:
+    return np.clip(percentage, 0, 100) // 10
+
+
+class _ProgressCopy:
+    """One database's user_progress rows, by row id (ids are per shard)."""
+
+    def __init__(self):
+        self.lesson = np.full(0, -1, dtype=np.int32)  # -1: no row with this id
+        self.percentage = np.zeros(0, dtype=np.int16)
+        self.completed = np.zeros(0, dtype=bool)
+        self.seconds = np.zeros(0, dtype=np.float32)  # to complete; NaN if unknown
+        self.watermark: Optional[datetime] = None  # MAX(updated_at) when last read
+
+    def reserve(self, max_id: int):
+        size = len(self.lesson)
+        if max_id < size:
+            return
+        grown = max(max_id + 1, size * 3 // 2, 1024)
+        for name, fill in (("lesson", -1), ("percentage", 0), ("completed", False), ("seconds", np.nan)):
+            old = getattr(self, name)
+            new = np.full(grown, fill, dtype=old.dtype)
+            new[:size] = old
+            setattr(self, name, new)
+
+
+class Funnel:
+    """Running funnel aggregates over a set of (writer, reader) user databases."""
+
+    def __init__(self, databases: Sequence[Tuple[object, object]], chunk_size: int = 50000,
+                 watermark_lag: float = 60.0):
+        self.databases = list(databases)
+        self.chunk_size = chunk_size
+        self.watermark_lag = timedelta(seconds=watermark_lag)
+        self.copies = [_ProgressCopy() for _ in self.databases]
+        self.started = np.zeros(0, dtype=np.int64)  # by lesson id
+        self.completed = np.zeros(0, dtype=np.int64)
+        self.histogram = np.zeros((0, HISTOGRAM_BUCKETS), dtype=np.int64)
+        self.medians: Dict[int, Optional[float]] = {}
+        self.stats = {"full_scans": 0, "incremental_refreshes": 0, "rows_read": 0, "cache_hits": 0}
+        self._report: Optional[dict] = None
+        self._report_key = None
+        self._lock = threading.Lock()
+
+    def report(self) -> dict:
+        """Per-lesson funnel as of now (cached until some database's MAX(updated_at) moves)."""
+        with self._lock:
+            key = tuple(self._max_updated_at(reader) for _, reader in self.databases)
+            if self._report is not None and key == self._report_key:
+                self.stats["cache_hits"] += 1
+                return self._report
+            started = time.perf_counter()
+            dirty = set()
+            for (_, reader), copy, watermark in zip(self.databases, self.copies, key):
+                dirty |= self._refresh(reader, copy, watermark)
+            self._update_medians(dirty)
+            self._report = self._build(key, time.perf_counter() - started)
+            self._report_key = key
+            return self._report
+
+    @staticmethod
+    def _max_updated_at(reader) -> Optional[datetime]:
+        with reader.connect() as conn:
+            return conn.execute(select(func.max(progress_table.c.updated_at))).scalar()
+
+    def _refresh(self, reader, copy: _ProgressCopy, watermark: Optional[datetime]) -> set:
+        """Read rows changed since ``copy`` was last refreshed; returns the lesson ids they touch."""
+        query = _row_query(reader.dialect.name)
+        params = {}
+        if copy.watermark is None:
+            self.stats["full_scans"] += 1
+        else:
+            query = query.where(progress_table.c.updated_at >= bindparam("since"))
+            params["since"] = copy.watermark - self.watermark_lag
+            self.stats["incremental_refreshes"] += 1
+        dirty = set()
+        with reader.connect() as conn:
+            result = conn.execution_options(yield_per=self.chunk_size).execute(query, params)
+            for rows in result.partitions():
+                values = np.fromiter(chain.from_iterable(rows), dtype=np.float64,
+                                     count=COLUMNS * len(rows)).reshape(-1, COLUMNS)
+                dirty |= self._apply(copy, values)
+                self.stats["rows_read"] += len(rows)
+        # None (no rows, or only rows from a bulk load without updated_at) keeps
+        # the next refresh a full scan.
+        copy.watermark = watermark
+        return dirty
+
+    def _apply(self, copy: _ProgressCopy, values: np.ndarray) -> set:
+        ids = values[:, 0].astype(np.int64)
+        copy.reserve(int(ids.max()))
+        lesson = values[:, 1].astype(np.int32)
+        percentage = values[:, 2].astype(np.int16)
+        completed = values[:, 3] != 0
+        seconds = np.where(completed & (values[:, 4] >= 0), values[:, 4], np.nan).astype(np.float32)
+        self._reserve_lessons(int(lesson.max()))
+
+        old_lesson = copy.lesson[ids]
+        was = old_lesson >= 0
+        self._count(old_lesson[was], copy.percentage[ids][was], copy.completed[ids][was], -1)
+        now = lesson >= 0
+        self._count(lesson[now], percentage[now], completed[now], 1)
+
+        dirty = set(np.unique(old_lesson[was][copy.completed[ids][was]]).tolist())
+        dirty |= set(np.unique(lesson[now & completed]).tolist())
+        copy.lesson[ids] = lesson
+        copy.percentage[ids] = percentage
+        copy.completed[ids] = completed
+        copy.seconds[ids] = seconds
+        return dirty
+
+    def _reserve_lessons(self, max_lesson: int):
+        size = len(self.started)
+        if max_lesson < size:
+            return
+        grown = max_lesson + 1
+        self.started = np.concatenate([self.started, np.zeros(grown - size, dtype=np.int64)])
+        self.completed = np.concatenate([self.completed, np.zeros(grown - size, dtype=np.int64)])
+        self.histogram = np.vstack([self.histogram, np.zeros((grown - size, HISTOGRAM_BUCKETS), dtype=np.int64)])
+
+    def _count(self, lesson: np.ndarray, percentage: np.ndarray, completed: np.ndarray, sign: int):
+        if not len(lesson):
+            return
+        size = len(self.started)
+        self.started += sign * np.bincount(lesson, minlength=size)
+        self.completed += sign * np.bincount(lesson[completed], minlength=size)
+        cells = lesson.astype(np.int64) * HISTOGRAM_BUCKETS + _buckets(percentage)
+        self.histogram += sign * np.bincount(cells, minlength=size * HISTOGRAM_BUCKETS).reshape(size, -1)
+
+    def _update_medians(self, lessons: Iterable[int]):
+        lessons = np.array(sorted(lessons), dtype=np.int32)
+        if not len(lessons):
+            return
+        lesson_parts, second_parts = [], []
+        for copy in self.copies:
+            timed = ~np.isnan(copy.seconds) & np.isin(copy.lesson, lessons)
+            lesson_parts.append(copy.lesson[timed])
+            second_parts.append(copy.seconds[timed])
+        lesson, seconds = np.concatenate(lesson_parts), np.concatenate(second_parts)
+        # Group by lesson with one stable sort, then a linear-time median per group.
+        order = np.argsort(lesson, kind="stable")
+        lesson, seconds = lesson[order], seconds[order]
+        bounds = np.searchsorted(lesson, np.append(lessons, lessons[-1] + 1))
+        for i, lesson_id in enumerate(lessons.tolist()):
+            group = seconds[bounds[i]:bounds[i + 1]]
+            self.medians[lesson_id] = float(np.median(group)) if len(group) else None
+
+    def _build(self, key, refresh_seconds: float) -> dict:
+        lessons = []
+        for lesson_id in np.flatnonzero(self.started).tolist():
+            started, completed = int(self.started[lesson_id]), int(self.completed[lesson_id])
+            lessons.append({
+                "lesson_id": lesson_id,
+                "started": started,
+                "completed": completed,
+                "completion_rate": round(completed / started, 4),
+                "median_seconds_to_complete": self.medians.get(lesson_id),
+                "progress_histogram": self.histogram[lesson_id].tolist(),
+            })
+        watermarks = [w for w in key if w is not None]
+        return {"lessons": lessons, "watermark": max(watermarks) if watermarks else None,
+                "refresh_ms": round(refresh_seconds * 1000.0, 1)}
+
+
+_funnel: Optional[Funnel] = None
+_funnel_lock = threading.Lock()
+
+
+def get_funnel() -> Funnel:
+    """This worker's Funnel over every user database."""
+    global _funnel
+    with _funnel_lock:
+        if _funnel is None:
+            _funnel = Funnel(user_databases(), chunk_size=settings.ANALYTICS_CHUNK_SIZE,
+                             watermark_lag=settings.ANALYTICS_WATERMARK_LAG)
+        return _funnel
+
+
+def lesson_funnel(report: dict, lessons: List[models.Lesson]) -> dict:
+    """``report`` in course order (``lessons`` sorted by order_index), with the drop-off between consecutive lessons."""
+    by_id = {row["lesson_id"]: row for row in report["lessons"]}
+    steps, previous_completed = [], None
+    for lesson in lessons:
+        row = dict(by_id.get(lesson.id) or {
+            "lesson_id": lesson.id, "started": 0, "completed": 0, "completion_rate": None,
+            "median_seconds_to_complete": None, "progress_histogram": [0] * HISTOGRAM_BUCKETS})
+        row["title"] = lesson.title
+        row["abandoned"] = row["started"] - row["completed"]
+        # Learners who finished the previous lesson but never started this one
+        row["not_continued"] = None if previous_completed is None else max(previous_completed - row["started"], 0)
+        previous_completed = row["completed"]
+        steps.append(row)
+    return {"watermark": report["watermark"], "refresh_ms": report["refresh_ms"],
+            "histogram_buckets": [f"{10 * i}-{10 * i + 9}" for i in range(HISTOGRAM_BUCKETS - 1)] + ["100"],
+            "lessons": steps}
@@ -0,0 +1,362 @@
+"""
+Cross-worker cache invalidation.
+
+Writers call ``publish(namespace, key)`` after committing; every worker's
+caches subscribed to that namespace drop the affected entries. Each message
+carries a version drawn from a counter shared by all workers, and caches only
+ever raise their per-key "floor" version, so a message that arrives late (or
+twice) can never make stale data valid again.
+
+Backends (CACHE_BUS_BACKEND):
+    memory    in-process only; for tests and single-worker dev
+    local     Unix datagram fan-out between workers on one host, shared-memory version counter
+    postgres  LISTEN/NOTIFY on the main database, versions from a sequence
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from . import lifecycle
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "finesse_invalidate"
+
+Callback = Callable[[str, Optional[str], int], None]
+
+
+class InvalidationBus:
+    """Base bus: local dispatch plus a monotonic version source; subclasses add transport."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callback]] = {}
+        self._lock = threading.Lock()
+        self._listener_pid = None
+
+    def subscribe(self, namespace: str, callback: Callback):
+        with self._lock:
+            self._subscribers.setdefault(namespace, []).append(callback)
+        self.start()
+
+    def publish(self, namespace: str, key: Any = None) -> int:
+        """Invalidate ``key`` (or the whole namespace when None) on every worker; returns the version."""
+        key = None if key is None else str(key)
+        version = self.next_version()
+        self.dispatch(namespace, key, version)
+        self.broadcast(namespace, key, version)
+        return version
+
+    def dispatch(self, namespace: str, key: Optional[str], version: int):
+        with self._lock:
+            callbacks = list(self._subscribers.get(namespace, ()))
+        for callback in callbacks:
+            try:
+                callback(namespace, key, version)
+            except Exception:
+                logger.exception("Invalidation callback failed for %s:%s", namespace, key)
+
+    def dispatch_all(self, version: int):
+        """Invalidate every namespace, e.g. after reconnecting when messages may have been missed."""
+        with self._lock:
+            namespaces = list(self._subscribers)
+        for namespace in namespaces:
+            self.dispatch(namespace, None, version)
+
+    def next_version(self) -> int:
+        raise NotImplementedError
+
+    def broadcast(self, namespace: str, key: Optional[str], version: int):
+        pass
+
+    def start(self):
+        """Start receiving messages; safe to call repeatedly and again in a forked worker."""
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        self._start_listener()
+
+    def _start_listener(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class InProcessBus(InvalidationBus):
+    def __init__(self):
+        super().__init__()
+        self._version = 0
+        self._version_lock = threading.Lock()
+
+    def next_version(self) -> int:
+        with self._version_lock:
+            self._version += 1
+            return self._version
+
+
+class LocalSocketBus(InvalidationBus):
+    """
+    Single-host fan-out: every worker binds a Unix datagram socket in a shared
+    directory and publishers send each message to all of them. Versions come
+    from a flock-protected 64-bit counter in an mmap'd file in that directory.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        counter_path = os.path.join(directory, "version")
+        self._counter_fd = os.open(counter_path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._counter_fd).st_size < 8:
+            os.ftruncate(self._counter_fd, 8)
+        self._counter = mmap.mmap(self._counter_fd, 8)
+        self._sock = None
+        self._path = None
+
+    def next_version(self) -> int:
+        fcntl.flock(self._counter_fd, fcntl.LOCK_EX)
+        try:
+            version = struct.unpack("<Q", self._counter[:8])[0] + 1
+            self._counter[:8] = struct.pack("<Q", version)
+            return version
+        finally:
+            fcntl.flock(self._counter_fd, fcntl.LOCK_UN)
+
+    def _start_listener(self):
+        self._path = os.path.join(self.directory, f"worker-{os.getpid()}.sock")
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self._path)
+        threading.Thread(target=self._listen, args=(self._sock,), name="cache-bus-listener", daemon=True).start()
+
+    def _listen(self, sock):
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                return
+            try:
+                message = json.loads(data)
+                self.dispatch(message["ns"], message["key"], message["v"])
+            except (ValueError, KeyError):
+                logger.warning("Dropping malformed invalidation message %r", data[:200])
+
+    def broadcast(self, namespace: str, key: Optional[str], version: int):
+        payload = json.dumps({"ns": namespace, "key": key, "v": version}).encode()
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for name in os.listdir(self.directory):
+                if not name.endswith(".sock"):
+                    continue
+                path = os.path.join(self.directory, name)
+                if path == self._path:
+                    continue
+                try:
+                    sender.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Worker is gone; clean up its socket file.
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                except OSError:
+                    logger.warning("Could not deliver invalidation to %s", path)
+        finally:
+            sender.close()
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+            try:
+                os.unlink(self._path)
+            except OSError:
+                pass
+
+
+class PostgresBus(InvalidationBus):
+    """LISTEN/NOTIFY on the application database; versions come from a sequence."""
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self._stop = threading.Event()
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE SEQUENCE IF NOT EXISTS cache_invalidation_version")
+
+    def next_version(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("SELECT nextval('cache_invalidation_version')").scalar()
+
+    def broadcast(self, namespace: str, key: Optional[str], version: int):
+        payload = json.dumps({"ns": namespace, "key": key, "v": version})
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("SELECT pg_notify(%(channel)s, %(payload)s)",
+                                 {"channel": CHANNEL, "payload": payload})
+
+    def _start_listener(self):
+        threading.Thread(target=self._listen, name="cache-bus-listener", daemon=True).start()
+
+    def _listen(self):
+        first = True
+        while not self._stop.is_set():
+            try:
+                raw = self.engine.raw_connection()
+                try:
+                    dbapi_conn = raw.driver_connection
+                    dbapi_conn.autocommit = True
+                    cur = dbapi_conn.cursor()
+                    cur.execute(f"LISTEN {CHANNEL}")
+                    if not first:
+                        # Messages may have been missed while disconnected.
+                        self.dispatch_all(self.next_version())
+                    first = False
+                    while not self._stop.is_set():
+                        if select.select([dbapi_conn], [], [], 5.0) == ([], [], []):
+                            continue
+                        dbapi_conn.poll()
+                        while dbapi_conn.notifies:
+                            note = dbapi_conn.notifies.pop(0)
+                            message = json.loads(note.payload)
+                            self.dispatch(message["ns"], message["key"], message["v"])
+                finally:
+                    raw.invalidate()
+            except Exception:
+                logger.exception("Invalidation listener lost its connection; reconnecting")
+                time.sleep(1.0)
+
+    def close(self):
+        self._stop.set()
+
+
+class VersionedCache:
+    """
+    In-process cache for one namespace, kept coherent through the bus.
+
+    Every entry is stamped with the newest version this worker had seen when
+    its load started. An entry is served only while its stamp is at least the
+    invalidation floor of both its key and the namespace, and floors only move
+    up, so late or duplicate messages are harmless and a load that raced a
+    write is thrown away instead of being cached.
+    """
+
+    def __init__(self, namespace: str, bus: Optional[InvalidationBus] = None, maxsize: int = 1024):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._floors: Dict[Optional[str], int] = {None: 0}
+        self._seen = 0
+        self._lock = threading.Lock()
+        self._bus = bus
+        self._subscribed: Optional[InvalidationBus] = None
+
+    def _subscribe(self):
+        # Deferred to first use so importing a module that defines a cache stays free of I/O.
+        # A replacement process-wide bus (close_bus, then a restart in the same process) may
+        # restart its versions and missed whatever was published in between: start over.
+        bus = self._bus or get_bus()
+        with self._lock:
+            if self._subscribed is bus:
+                return
+            self._subscribed = bus
+            self._entries.clear()
+            self._floors = {None: 0}
+            self._seen = 0
+        bus.subscribe(self.namespace, self._on_invalidate)
+
+    def _on_invalidate(self, namespace: str, key: Optional[str], version: int):
+        with self._lock:
+            self._seen = max(self._seen, version)
+            if version <= self._floors.get(key, 0):
+                return  # late or duplicate message
+            self._floors[key] = version
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _floor(self, key: str) -> int:
+        return max(self._floors[None], self._floors.get(key, 0))
+
+    def get(self, key: Any, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, calling ``loader()`` on a miss."""
+        if self._subscribed is not active_bus(self._bus):
+            self._subscribe()
+        key = str(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= self._floor(key):
+                self._entries.move_to_end(key)
+                return entry[1]
+            stamp = self._seen
+        value = loader()
+        with self._lock:
+            if stamp >= self._floor(key):
+                self._entries[key] = (stamp, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_bus: Optional[InvalidationBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_bus() -> InvalidationBus:
+    """Return the process-wide bus configured by CACHE_BUS_BACKEND."""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            backend = settings.CACHE_BUS_BACKEND
+            if backend is None:
+                backend = "postgres" if settings.DATABASE_URL.startswith("postgres") else "local"
+            if backend == "postgres":
+                from .database import engine
+
+                _bus = PostgresBus(engine)
+            elif backend == "local":
+                _bus = LocalSocketBus(settings.CACHE_BUS_SOCKET_DIR)
+            elif backend == "memory":
+                _bus = InProcessBus()
+            else:
+                raise ValueError(f"Unknown CACHE_BUS_BACKEND {backend!r}")
+        return _bus
+
+
+def active_bus(bus: Optional[InvalidationBus] = None) -> Optional[InvalidationBus]:
+    """``bus``, else the process-wide bus if there is one; no lock, so cheap enough for every cache read."""
+    return bus or _bus
+
+
+def publish(namespace: str, key: Any = None) -> int:
+    return get_bus().publish(namespace, key)
+
+
+def close_bus():
+    """Stop the listener and release the bus (registered as a shutdown hook)."""
+    global _bus
+    with _bus_lock:
+        if _bus is not None:
+            _bus.close()
+            _bus = None
+
+
+lifecycle.register_shutdown_hook(close_bus)
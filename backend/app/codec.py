@@ -0,0 +1,53 @@
+"""
+JSON codec for stored documents: orjson when it's installed (several times
+faster than the stdlib on both ends), stdlib json otherwise. Engines are
+created with these as their json_serializer/json_deserializer, so every JSON
+column (see models.JSONDocument) goes through them.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(value) -> str:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(value) -> str:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+    loads = json.loads
+
+
+ENGINE_KWARGS = {"json_serializer": dumps, "json_deserializer": loads}
+
+
+def repair(raw):
+    """
+    Canonical JSON text for a value written by the old VARCHAR column, or None
+    if ``raw`` is already a single-encoded JSON document. Bare text (stored
+    unencoded) becomes a JSON string; a JSON string that itself holds an
+    object or array (double-encoded, e.g. json.dumps before assignment) is
+    unwrapped.
+    """
+    if raw is None:
+        return None
+    try:
+        value = loads(raw)
+    except (TypeError, ValueError):
+        return dumps(raw)
+    candidate = value
+    while isinstance(candidate, str):
+        try:
+            candidate = loads(candidate)
+        except ValueError:
+            break
+    if isinstance(candidate, (dict, list)) and candidate is not value:
+        return dumps(candidate)
+    return None
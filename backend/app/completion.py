@@ -0,0 +1,193 @@
+"""
+Per-user lesson completion bitmaps.
+
+users.completed_lessons packs "has completed lesson L" into bit L of a byte
+string (lesson ids are small and never reused, so the id is the ordinal):
+byte L // 8, bit L % 8, least significant first, trailing zero bytes
+dropped; NULL means nothing completed. update_user_progress keeps it in step
+with user_progress.is_completed, so "has the user completed X" and "how many
+lessons done" are one column read instead of a user_progress scan.
+
+For analytics across all users, ``get_matrix`` loads every non-empty bitmap
+into one packed uint8 NumPy matrix (a row per user, a byte column per 8
+lessons: a million users with 80 lessons is 10 MB) and keeps it for
+COMPLETION_MATRIX_TTL seconds; ``lesson_counts`` and ``matching_users`` then
+answer per-lesson completion counts and "completed A but not B" with a few
+vectorized passes.
+"""
+
+import threading
+import time
+from itertools import chain
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, select, update
+
+from . import models
+from .config import settings
+from .database import user_databases
+
+users_table = models.User.__table__
+progress_table = models.UserProgress.__table__
+
+
+def with_lesson(bitmap: Optional[bytes], lesson_id: int, completed: bool = True) -> Optional[bytes]:
+    """``bitmap`` with lesson ``lesson_id``'s bit set (or cleared)."""
+    value = int.from_bytes(bitmap or b"", "little")
+    value = value | (1 << lesson_id) if completed else value & ~(1 << lesson_id)
+    return value.to_bytes((value.bit_length() + 7) // 8, "little") or None
+
+
+def has_lesson(bitmap: Optional[bytes], lesson_id: int) -> bool:
+    return bool(bitmap) and lesson_id // 8 < len(bitmap) and bool(bitmap[lesson_id // 8] >> (lesson_id % 8) & 1)
+
+
+def lesson_ids(bitmap: Optional[bytes]) -> List[int]:
+    if not bitmap:
+        return []
+    return np.flatnonzero(np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8), bitorder="little")).tolist()
+
+
+def completed_count(bitmap: Optional[bytes]) -> int:
+    return bin(int.from_bytes(bitmap or b"", "little")).count("1")  # int.bit_count() needs Python 3.10
+
+
+def set_completed(db, user_id: int, lesson_id: int, completed: bool):
+    """Flip one lesson's bit in the caller's transaction (pinned to the user's shard and the primary)."""
+    # Locks the row on Postgres; SQLite's writer already holds the write lock (BEGIN IMMEDIATE).
+    bitmap = db.execute(select(models.User.completed_lessons).where(models.User.id == user_id)
+                        .with_for_update()).scalar()
+    updated = with_lesson(bitmap, lesson_id, completed)
+    if updated != bitmap:
+        db.execute(update(models.User).where(models.User.id == user_id).values(completed_lessons=updated)
+                   .execution_options(synchronize_session=False))
+
+
+def rebuild_all(engine, after_id: int = 0, batch_size: int = 10000,
+                on_batch: Optional[Callable] = None) -> int:
+    """
+    Recompute every user's bitmap from user_progress, for users with id >
+    ``after_id``, in committed batches of ``batch_size`` users.
+    ``on_batch(conn, last_user_id)`` runs inside each batch's transaction.
+    """
+    next_ids = (select(users_table.c.id).where(users_table.c.id > bindparam("after"))
+                .order_by(users_table.c.id).limit(batch_size))
+    completed = (select(progress_table.c.user_id, progress_table.c.lesson_id)
+                 .where(progress_table.c.user_id > bindparam("lo"), progress_table.c.user_id <= bindparam("hi"),
+                        progress_table.c.is_completed == True)
+                 .order_by(progress_table.c.user_id))
+    clear = (users_table.update()
+             .where(users_table.c.id > bindparam("lo"), users_table.c.id <= bindparam("hi"),
+                    users_table.c.completed_lessons.isnot(None))
+             .values(completed_lessons=None))
+    fill = users_table.update().where(users_table.c.id == bindparam("b_id")).values(
+        completed_lessons=bindparam("b_bitmap"))
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(next_ids, {"after": after_id}).scalars().all()
+            if not ids:
+                return total
+            lo, hi = after_id, ids[-1]
+            rows = conn.execute(completed, {"lo": lo, "hi": hi}).all()
+            conn.execute(clear, {"lo": lo, "hi": hi})
+            if rows:
+                pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+                owners = np.unique(pairs[:, 0])
+                bits = np.zeros((len(owners), int(pairs[:, 1].max()) + 1), dtype=bool)
+                bits[np.searchsorted(owners, pairs[:, 0]), pairs[:, 1]] = True
+                packed = np.packbits(bits, axis=1, bitorder="little")
+                conn.execute(fill, [{"b_id": user_id, "b_bitmap": row.tobytes().rstrip(b"\0")}
+                                    for user_id, row in zip(owners.tolist(), packed)])
+            after_id = hi
+            total += len(ids)
+            if on_batch:
+                on_batch(conn, after_id)
+
+
+class CompletionMatrix(NamedTuple):
+    user_ids: np.ndarray  # int64, ascending
+    bits: np.ndarray  # uint8, one row per user, byte column c holds lessons 8c..8c+7
+    users_total: int  # including users with nothing completed (not in the matrix)
+    loaded_at: float
+
+
+def load_matrix(databases: Iterable[Tuple[object, object]], chunk_size: int = 100000) -> CompletionMatrix:
+    """Read every non-empty bitmap from each database's reader into one packed matrix."""
+    query = (select(users_table.c.id, users_table.c.completed_lessons)
+             .where(users_table.c.completed_lessons.isnot(None), users_table.c.id > bindparam("after"))
+             .order_by(users_table.c.id).limit(chunk_size))
+    ids, blobs, users_total = [], [], 0
+    for _, reader in databases:
+        with reader.connect() as conn:
+            users_total += conn.execute(select(func.count()).select_from(users_table)).scalar()
+            after = 0
+            while True:
+                rows = conn.execute(query, {"after": after}).all()
+                if not rows:
+                    break
+                chunk_ids, chunk_blobs = zip(*rows)
+                ids.extend(chunk_ids)
+                blobs.extend(chunk_blobs)
+                after = chunk_ids[-1]
+    lengths = np.fromiter((len(b) for b in blobs), dtype=np.int64, count=len(blobs))
+    width = int(lengths.max()) if len(lengths) else 0
+    bits = np.zeros((len(blobs), width), dtype=np.uint8)
+    if len(blobs):
+        # Scatter the concatenated bytes into their (row, column) cells in one go.
+        flat = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+        rows = np.repeat(np.arange(len(blobs)), lengths)
+        columns = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        bits[rows, columns] = flat
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) and (np.diff(ids) < 0).any():  # several shards: put users in id order
+        order = np.argsort(ids, kind="stable")
+        ids, bits = ids[order], bits[order]
+    return CompletionMatrix(ids, bits, users_total, time.time())
+
+
+_matrix: Optional[CompletionMatrix] = None
+_matrix_lock = threading.Lock()
+
+
+def get_matrix() -> CompletionMatrix:
+    """The all-users matrix, reloaded when older than COMPLETION_MATRIX_TTL."""
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None or time.time() - _matrix.loaded_at > settings.COMPLETION_MATRIX_TTL:
+            _matrix = load_matrix(user_databases())
+        return _matrix
+
+
+# BIT_TABLE[v, b] == 1 if byte value v has bit b set
+BIT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little").astype(np.int64)
+
+
+def lesson_counts(matrix: CompletionMatrix) -> dict:
+    """Users who completed each lesson: {lesson_id: count} for lessons anyone completed."""
+    counts = {}
+    for column in range(matrix.bits.shape[1]):
+        # Histogram the byte values once, then fan out to its 8 lessons.
+        per_bit = np.bincount(matrix.bits[:, column], minlength=256) @ BIT_TABLE
+        for bit in np.flatnonzero(per_bit):
+            counts[column * 8 + int(bit)] = int(per_bit[bit])
+    return counts
+
+
+def lesson_mask(matrix: CompletionMatrix, lesson_id: int) -> np.ndarray:
+    column, bit = divmod(lesson_id, 8)
+    if column >= matrix.bits.shape[1]:
+        return np.zeros(len(matrix.user_ids), dtype=bool)
+    return (matrix.bits[:, column] & (1 << bit)) != 0
+
+
+def matching_users(matrix: CompletionMatrix, completed: Iterable[int] = (),
+                   not_completed: Iterable[int] = ()) -> np.ndarray:
+    """Ids of users who completed every lesson in ``completed`` and none in ``not_completed``."""
+    mask = np.ones(len(matrix.user_ids), dtype=bool)
+    for lesson_id in completed:
+        mask &= lesson_mask(matrix, lesson_id)
+    for lesson_id in not_completed:
+        mask &= ~lesson_mask(matrix, lesson_id)
+    return matrix.user_ids[mask]
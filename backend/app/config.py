@@ -10,10 +10,106 @@ class Settings(BaseSettings):
     # Database
     # Read from env var DATABASE_URL when provided; default to local SQLite for dev
     DATABASE_URL: str = "sqlite:///./finesse.db"
+    # Apply pending migrations at startup instead of refusing to start (handy for local dev)
+    AUTO_MIGRATE: bool = False
+    # SQLite tuning for file databases (see app/database.py): WAL, pragmas,
+    # one writer connection and a pool of readers. Set False for the plain engine.
+    SQLITE_TUNED: bool = True
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_READER_POOL_SIZE: int = 8
+    SQLITE_WRITER_TIMEOUT: int = 30  # seconds a request may wait for the writer connection
+    # Read replicas (comma-separated URLs). Reads are balanced across them by
+    # "round_robin" or "least_connections"; a replica lagging more than
+    # REPLICA_MAX_LAG_SECONDS (or failing its health check) is skipped.
+    DATABASE_REPLICA_URLS: Optional[str] = None
+    REPLICA_BALANCE: str = "round_robin"
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_CHECK_INTERVAL: float = 2.0
+    # User sharding (see app/sharding.py): comma-separated URLs, one per shard,
+    # holding the per-user tables (SHARDED_TABLES); lessons stay in DATABASE_URL.
+    # On Postgres "<url>#<schema>" uses a schema of that database as the shard.
+    # Change the shard count offline with reshard.py.
+    USER_SHARD_URLS: Optional[str] = None
     
+    # Password hashing for bulk provisioning: >1 hashes large batches in that
+    # many processes (only worth it for a slow hash); 0 or 1 hashes inline.
+    PASSWORD_HASH_WORKERS: int = 0
+    USER_IMPORT_BATCH_SIZE: int = 1000
+
+    # Background jobs (see app/jobs.py): each worker polls the outbox this
+    # often (and right after enqueueing), holding a claimed job for at most
+    # JOB_LEASE_SECONDS before another worker may retry it.
+    JOBS_ENABLED: bool = True
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_BATCH_SIZE: int = 50
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 2.0
+    JOB_RETRY_MAX_SECONDS: float = 600.0
+    JOB_RETENTION_HOURS: int = 72  # finished jobs (and their idempotency keys) are kept this long
+    JOB_DRAIN_SECONDS: float = 10.0  # how long shutdown waits for running jobs
+
+    # Streaks (see app/streaks.py): broken streaks are reset this many minutes
+    # after UTC midnight, reading users in chunks of STREAK_BATCH_SIZE.
+    STREAK_BATCH_MINUTE: int = 5
+    STREAK_BATCH_SIZE: int = 10000
+
+    # Seconds a worker reuses its all-users completion matrix (app/completion.py)
+    COMPLETION_MATRIX_TTL: float = 300.0
+
+    # Funnel analytics (see app/analytics.py): user_progress is read in chunks of
+    # ANALYTICS_CHUNK_SIZE rows; incremental refreshes re-read rows updated up to
+    # ANALYTICS_WATERMARK_LAG seconds before the last watermark (late commits).
+    ANALYTICS_CHUNK_SIZE: int = 50000
+    ANALYTICS_WATERMARK_LAG: float = 60.0
+
+    # Cohort and friends leaderboards (see app/leaderboards.py): each worker keeps
+    # up to LEADERBOARD_BOARDS boards, reloading one after LEADERBOARD_BOARD_TTL
+    # seconds in case an XP message was lost.
+    LEADERBOARD_BOARDS: int = 2000
+    LEADERBOARD_BOARD_TTL: float = 600.0
+
+    # Rows per chunk (CSV piece / Parquet row group) in data exports (see app/export.py)
+    EXPORT_CHUNK_SIZE: int = 50000
+
+    # Interactive market simulations (see app/simulation.py): request limits, and
+    # how many results each worker keeps by parameter hash
+    SIMULATION_MAX_PATHS: int = 10000
+    SIMULATION_MAX_DAYS: int = 2520
+    SIMULATION_MAX_ASSETS: int = 20
+    SIMULATION_CACHE_SIZE: int = 256
+
+    # Per-question answer stats (see app/question_stats.py): each worker adds its
+    # in-memory counts to the question_stats table this often
+    QUESTION_STATS_FLUSH_SECONDS: float = 10.0
+
+    # Price history store (see app/prices.py): memory-mapped OHLCV columns per
+    # symbol, filled by import_prices.py
+    PRICE_STORE_DIR: str = "./price_store"
+
     # AI
     GEMINI_API_KEY: Optional[str] = None
     GEMINI_MODEL: Optional[str] = "gemini-1.5-flash"
+    # Tutor context is retrieved from the catalog (see app/retrieval.py):
+    # at most this many chunks, within this many (estimated) prompt tokens.
+    TUTOR_CONTEXT_CHUNKS: int = 4
+    TUTOR_CONTEXT_TOKENS: int = 600
+
+    # Cache invalidation bus: "memory", "local" (Unix sockets, one host) or "postgres" (LISTEN/NOTIFY).
+    # Defaults to postgres on a Postgres DATABASE_URL, otherwise local.
+    CACHE_BUS_BACKEND: Optional[str] = None
+    CACHE_BUS_SOCKET_DIR: str = "/tmp/finesse-cache-bus"
+
+    # Server (see start_server.py --profile)
+    SERVER_PROFILE: str = "dev"
+    WEB_CONCURRENCY: Optional[int] = None  # defaults to the number of usable CPUs
+    SERVER_KEEPALIVE: int = 5
+    SERVER_BACKLOG: int = 2048
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_WORKER_TIMEOUT: int = 60
 
     model_config = SettingsConfigDict(env_file=".env", extra='ignore')
 
@@ -1,37 +1,75 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, joinedload, load_only, undefer
+from sqlalchemy import and_, or_, select, update
 from datetime import datetime
 import json
 from typing import Dict, Any, List, Optional
-from . import models, schemas, security
+from . import achievements, completion, jobs, leaderboards, models, schemas, search, security, streaks
+from .cache_bus import publish
+from .database import use_primary
+from .grading import questions_from_content
+from .sharding import gather, shards_of, use_shard
 
 
 def get_user(db: Session, user_id: int):
     """
     Retrieves a single user from the database by their ID.
     """
+    use_shard(db, user_id)
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+def _get_sharded_user(db: Session, condition):
+    # Sharded: the catalog's directory maps a username/email to the id (and so the shard).
+    user_id = db.execute(select(models.UserDirectory.id).where(condition)).scalar()
+    return get_user(db, user_id) if user_id is not None else None
+
 def get_user_by_username(db: Session, username: str):
+    if shards_of(db):
+        return _get_sharded_user(db, models.UserDirectory.username == username)
     return db.query(models.User).filter(models.User.username == username).first()
 
+def get_user_by_login(db: Session, login: str):
+    """Find a user by username or email (the login form accepts either)."""
+    if shards_of(db):
+        return _get_sharded_user(db, or_(models.UserDirectory.username == login, models.UserDirectory.email == login))
+    return db.query(models.User).filter(or_(models.User.username == login, models.User.email == login)).first()
+
 def get_users(db: Session, skip: int = 0, limit: int = 100):
+    if shards_of(db):
+        return gather(db, lambda s: s.query(models.User).order_by(models.User.id).limit(skip + limit).all(),
+                      key=lambda u: u.id, limit=limit, skip=skip)
     return db.query(models.User).offset(skip).limit(limit).all()
 
 def create_user(db: Session, username: str, email: str, password: str):
+    use_primary(db)
     hashed_password = security.get_password_hash(password)
     db_user = models.User(username=username, email=email, hashed_password=hashed_password)
+    if shards_of(db):
+        # The directory allocates the id and rejects a username/email taken on any shard.
+        entry = models.UserDirectory(username=username, email=email)
+        db.add(entry)
+        db.flush()
+        db_user.id = entry.id
+        use_shard(db, entry.id)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    publish("leaderboard")
     return db_user
 
 # Additional user helpers
 def get_user_by_email(db: Session, email: str):
+    if shards_of(db):
+        return _get_sharded_user(db, models.UserDirectory.email == email)
     return db.query(models.User).filter(models.User.email == email).first()
 
 def get_leaderboard(db: Session, limit: int = 10):
     """Return top users ordered by xp_points descending."""
+    if shards_of(db):
+        # Each shard's top ``limit`` (index scan), k-way merged.
+        return gather(db, lambda s: (s.query(models.User)
+                                     .order_by(models.User.xp_points.desc(), models.User.id)
+                                     .limit(limit).all()),
+                      key=lambda u: (-(u.xp_points or 0), u.id), limit=limit)
     return (db.query(models.User)
             .order_by(models.User.xp_points.desc())
             .limit(limit)
@@ -39,26 +77,34 @@ def get_leaderboard(db: Session, limit: int = 10):
 
 def set_user_xp(db: Session, user_id: int, xp_points: int):
     """Set a user's total XP points to the given value and return the user."""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+    # One UPDATE ... RETURNING instead of select, flush and refresh after commit
+    use_primary(use_shard(db, user_id))
+    user = db.execute(update(models.User).where(models.User.id == user_id).values(xp_points=xp_points)
+                      .returning(models.User)).scalar()
+    if user is None:
         return None
-    user.xp_points = xp_points
+    # Side effects run as background jobs, committed with the new total
+    achievements.enqueue(db, user_id, achievements.XP_CHANGED, xp_points=xp_points)
+    leaderboards.enqueue_xp_changed(db, user_id)
+    jobs.enqueue_publish(db, "leaderboard")
+    db.expunge(user)  # keeps its loaded values past the commit
     db.commit()
-    db.refresh(user)
     return user
 
-def set_user_streak(db: Session, user_id: int, streak_days: int):
-    """Set a user's current streak days and return the user."""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        return None
-    user.streak_days = streak_days
+def record_user_activity(db: Session, user_id: int):
+    """Count client-side activity (the daily challenge) toward the user's streak and return the user."""
+    use_primary(use_shard(db, user_id))
+    advanced = streaks.record_activity(db, user_id)
+    if advanced:
+        achievements.record(db, user_id, achievements.STREAK_EXTENDED)
     db.commit()
-    db.refresh(user)
-    return user
+    if advanced:
+        publish("leaderboard")
+    return get_user(db, user_id)
 
 # Content CRUD operations
 def create_lesson_content(db: Session, content, lesson_id: int):
+    use_primary(db)
     db_content = models.LessonContent(
         lesson_id=lesson_id,
         content_type=content.content_type,
@@ -72,6 +118,7 @@ def create_lesson_content(db: Session, content, lesson_id: int):
     return db_content
 
 def create_quiz_question(db: Session, question, lesson_content_id: int):
+    use_primary(db)
     db_question = models.QuizQuestion(
         lesson_content_id=lesson_content_id,
         question=question.question,
@@ -87,14 +134,22 @@ def create_quiz_question(db: Session, question, lesson_content_id: int):
 
 # Lesson CRUD operations
 def get_lessons(db: Session, skip: int = 0, limit: int = 100):
-    # Eager-load related content to avoid lazy-load access during response serialization
+    # Eager-load related content (and quiz question ids) to avoid lazy loads during serialization
     return (db.query(models.Lesson)
-            .options(joinedload(models.Lesson.content_items))
+            .options(joinedload(models.Lesson.content_items)
+                     .joinedload(models.LessonContent.quiz_questions))
             .filter(models.Lesson.is_active == True)
             .order_by(models.Lesson.order_index)
             .offset(skip).limit(limit)
             .all())
 
+def get_lesson_outline(db: Session):
+    """Every lesson's id and title in course order (no content), for analytics."""
+    return (db.query(models.Lesson)
+            .options(load_only(models.Lesson.id, models.Lesson.title, models.Lesson.order_index))
+            .order_by(models.Lesson.order_index, models.Lesson.id)
+            .all())
+
 def get_lesson(db: Session, lesson_id: int):
     return (db.query(models.Lesson)
             .options(
@@ -105,6 +160,7 @@ def get_lesson(db: Session, lesson_id: int):
             .first())
 
 def create_lesson(db: Session, lesson):
+    use_primary(db)
     db_lesson = models.Lesson(
         title=lesson.title,
         description=lesson.description,
@@ -122,26 +178,39 @@ def create_lesson(db: Session, lesson):
     for content_item in lesson.content_items:
         db_content = create_lesson_content(db, content_item, db_lesson.id)
         
-        # If it's a quiz, add questions
-        if content_item.content_type == 'quiz' and 'questions' in content_item.content:
-            for question in content_item.content['questions']:
-                create_quiz_question(db, question, db_content.id)
+        # If it's a quiz, add its question(s) to the answer key
+        if content_item.content_type == 'quiz':
+            for index, question in enumerate(questions_from_content(content_item.content)):
+                create_quiz_question(db, schemas.QuizQuestionCreate(order_index=index, **question), db_content.id)
     
+    search.index_lessons(db, [db_lesson.id])
+    db.commit()
     db.refresh(db_lesson)
+    publish("catalog")
     return db_lesson
 
 # User Progress CRUD operations
 def get_user_progress(db: Session, user_id: int):
+    use_shard(db, user_id)
     return db.query(models.UserProgress).filter(models.UserProgress.user_id == user_id).all()
 
 def get_user_lesson_progress(db: Session, user_id: int, lesson_id: int):
+    use_shard(db, user_id)
     return db.query(models.UserProgress).filter(
         and_(models.UserProgress.user_id == user_id, models.UserProgress.lesson_id == lesson_id)
     ).first()
 
+def get_user_with_completions(db: Session, user_id: int):
+    """get_user, with the (deferred) completed_lessons bitmap loaded in the same query."""
+    use_shard(db, user_id)
+    return (db.query(models.User).options(undefer(models.User.completed_lessons))
+            .filter(models.User.id == user_id).first())
+
 def update_user_progress(db: Session, user_id: int, lesson_id: int, progress_percentage: int):
+    use_primary(use_shard(db, user_id))
     # Check if progress record exists
     progress = get_user_lesson_progress(db, user_id, lesson_id)
+    was_completed = bool(progress and progress.is_completed)
     
     if not progress:
         # Create new progress record
@@ -158,7 +227,16 @@ def update_user_progress(db: Session, user_id: int, lesson_id: int, progress_per
         progress.is_completed = progress_percentage >= 100
         if progress_percentage >= 100 and not progress.completed_at:
             progress.completed_at = datetime.utcnow()
+    if (progress_percentage >= 100) != was_completed:
+        completion.set_completed(db, user_id, lesson_id, progress_percentage >= 100)
+    advanced = streaks.record_activity(db, user_id)
+    events = [achievements.LESSON_COMPLETED] if progress_percentage >= 100 and not was_completed else []
+    if advanced:
+        events.append(achievements.STREAK_EXTENDED)
+    achievements.record(db, user_id, *events)
     
     db.commit()
     db.refresh(progress)
+    if advanced:
+        publish("leaderboard")
     return progress
\ No newline at end of file
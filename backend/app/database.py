@@ -1,21 +1,228 @@
-from sqlalchemy import create_engine
+"""
+Engines and sessions.
+
+On a file-backed SQLite database (the docker-compose default) the tuned
+profile applies WAL and the pragmas below on every connection, and splits the
+database into two engines:
+
+- a writer engine with exactly one connection, opened with BEGIN IMMEDIATE.
+  Its pool is the write queue: requests wait for the connection in order
+  instead of racing for the file lock and failing with "database is locked".
+  Across worker processes, BEGIN IMMEDIATE plus busy_timeout makes writers
+  wait for each other rather than deadlock on a lock upgrade.
+- a reader engine with a connection pool; under WAL readers never block on
+  (or block) the writer.
+
+With DATABASE_REPLICA_URLS set, reads go to those replicas instead (see
+app/replicas.py for balancing and lag ejection). RoutingSession picks the
+engine per statement: reads go to one replica per session, flushes/DML go to
+the primary. Once a session has written (or called use_primary) it stays on
+the primary, so a request reads its own writes; crud write helpers pin the
+session up front so their read-modify-write never starts from a stale replica.
+Without replicas the readers open the primary's own database and see a commit
+at once, so the pin ends with the commit: reads afterwards (refreshing what
+was written, building the response) don't hold the writer, which on SQLite
+would keep every other request's write waiting until the session closed.
+
+With USER_SHARD_URLS set, statements on the per-user tables go to the shard
+the session was pinned to with sharding.use_shard (see app/sharding.py),
+using that shard's writer or reader by the same rules.
+"""
+
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from . import codec
 from .config import settings
+from .replicas import ReplicaSet
+from .sharding import NO_SHARDS, Shard, ShardKeyRequired, ShardSet, touches_sharded_table
 
-# SQLite specific configuration
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
-if SQLALCHEMY_DATABASE_URL.startswith('sqlite'):
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def is_sqlite_file(url: str) -> bool:
+    """True for SQLite URLs backed by a file (in-memory databases can't be shared between engines)."""
+    parsed = make_url(url)
+    return (parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+            and "mode=memory" not in url)
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _disable_pysqlite_begin(dbapi_connection, connection_record):
+    # Let SQLAlchemy emit BEGIN itself (see _begin_immediate).
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(conn):
+    # Take the write lock up front; a deferred BEGIN that later upgrades to a
+    # write lock fails immediately with SQLITE_BUSY instead of waiting.
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_engines(url: str, tuned: bool = True):
+    """Return ``(writer, reader)`` engines; the same engine twice when no split applies."""
+    if not url.startswith("sqlite"):
+        engine = create_engine(url, **codec.ENGINE_KWARGS)
+        return engine, engine
+    connect_args = {"check_same_thread": False}
+    if not tuned or not is_sqlite_file(url):
+        engine = create_engine(url, connect_args=connect_args, **codec.ENGINE_KWARGS)
+        return engine, engine
+
+    connect_args["timeout"] = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    writer = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0,
+                           pool_timeout=settings.SQLITE_WRITER_TIMEOUT, **codec.ENGINE_KWARGS)
+    event.listen(writer, "connect", apply_sqlite_pragmas)
+    event.listen(writer, "connect", _disable_pysqlite_begin)
+    event.listen(writer, "begin", _begin_immediate)
+
+    reader = create_engine(url, connect_args=connect_args, pool_size=settings.SQLITE_READER_POOL_SIZE,
+                           max_overflow=settings.SQLITE_READER_POOL_SIZE, **codec.ENGINE_KWARGS)
+    event.listen(reader, "connect", apply_sqlite_pragmas)
+    return writer, reader
+
+
+def _is_write(clause) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(("SELECT", "WITH", "PRAGMA"))
+    return False
+
+
+def create_replica_engine(url: str):
+    if url.startswith("sqlite"):
+        _, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+        return reader
+    connect_args = {"connect_timeout": 3} if url.startswith("postgresql") else {}
+    return create_engine(url, connect_args=connect_args, pool_pre_ping=True, **codec.ENGINE_KWARGS)
+
+
+def replica_urls_from_settings():
+    return [u.strip() for u in (settings.DATABASE_REPLICA_URLS or "").split(",") if u.strip()]
+
+
+def replica_set_from_settings(primary, local_reader) -> ReplicaSet:
+    urls = replica_urls_from_settings()
+    if urls:
+        engines = [create_replica_engine(url) for url in urls]
+    else:
+        engines = [] if local_reader is primary else [local_reader]
+    return ReplicaSet(engines, mode=settings.REPLICA_BALANCE, max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+                      check_interval=settings.REPLICA_CHECK_INTERVAL)
+
+
+def create_shard(index: int, spec: str) -> Shard:
+    """``spec`` is a URL; on Postgres, ``<url>#<schema>`` puts the shard in that schema of the database."""
+    url, _, schema = spec.partition("#")
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    if schema:
+        def set_search_path(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET search_path TO "{schema}"')
+            cursor.close()
+        # Every connection, so raw SQL in migrations lands in the schema too.
+        event.listen(writer, "connect", set_search_path)
+    return Shard(index, writer, reader, schema or None)
+
+
+def shard_set_from_urls(urls) -> ShardSet:
+    return ShardSet([create_shard(i, url) for i, url in enumerate(urls)])
+
+
+def shard_urls_from_settings():
+    return [u.strip() for u in (settings.USER_SHARD_URLS or "").split(",") if u.strip()]
+
+
+def use_primary(db: Session) -> Session:
+    """Pin a session to the primary, e.g. before a read that must see a just-committed write."""
+    db.info["use_primary"] = True
+    return db
+
+
+def make_session_factory(writer, readers, shards: ShardSet = NO_SHARDS, release_on_commit: Optional[bool] = None):
+    """
+    ``readers`` is a ReplicaSet, or a single engine (the writer itself when
+    there's no split). ``shards`` holds the per-user tables, if sharded.
+    ``release_on_commit`` says the readers see commits immediately (they read
+    the primary's own database), so a commit ends the session's pin to the
+    primary; it defaults to True for a single reader engine.
+    """
+    if release_on_commit is None:
+        release_on_commit = not isinstance(readers, ReplicaSet)
+    if not isinstance(readers, ReplicaSet):
+        readers = ReplicaSet([] if readers is writer else [readers])
+
+    class RoutingSession(Session):
+        def get_bind(self, mapper=None, clause=None, **kw):
+            if self.shards and touches_sharded_table(mapper, clause, pinned="shard" in self.info):
+                shard = self.info.get("shard")
+                if shard is None:
+                    raise ShardKeyRequired("Pin the session with sharding.use_shard() before touching user tables")
+                if self.info.get("use_primary") or self._flushing or _is_write(clause):
+                    self.info["use_primary"] = True
+                    return shard.writer
+                return shard.reader
+            if self.info.get("use_primary") or self._flushing or _is_write(clause):
+                self.info["use_primary"] = True
+                return writer
+            replica = self.info.get("replica")
+            if replica is None:
+                # One replica per session keeps a request's reads consistent.
+                replica = readers.pick()
+                if replica is None:
+                    return writer
+                self.info["replica"] = replica
+            return replica
+
+        def commit(self):
+            super().commit()
+            if release_on_commit:
+                self.info.pop("use_primary", None)
+
+    RoutingSession.shards = shards
+    return sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+
+# ``engine`` is the primary (on SQLite, the writer): schema setup, migrations
+# and scripts use it directly.
+engine, read_engine = create_engines(SQLALCHEMY_DATABASE_URL, tuned=settings.SQLITE_TUNED)
+replicas = replica_set_from_settings(engine, read_engine)
+shards = shard_set_from_urls(shard_urls_from_settings())
+
+SessionLocal = make_session_factory(engine, replicas, shards, release_on_commit=not replica_urls_from_settings())
 
 Base = declarative_base()
 
+
+def user_databases():
+    """(writer, reader) for every database holding user rows: each shard, or the primary when unsharded."""
+    return [(s.writer, s.reader) for s in shards] or [(engine, read_engine)]
+
+
+def dispose_engines(close: bool = True):
+    """Drop pooled connections (on shutdown, or with close=False in a forked worker)."""
+    engine.dispose(close=close)
+    read_engine.dispose(close=close)
+    replicas.dispose(close=close)
+    shards.dispose(close=close)
+
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -26,6 +233,6 @@ def get_db():
 
 def init_db():
     """Initialize the database by creating all tables"""
-    from . import models  # Import models to ensure tables are registered with SQLAlchemy
-    Base.metadata.create_all(bind=engine)
+    from . import schema
+    schema.ensure_schema(engine)
     print("Database tables created successfully")
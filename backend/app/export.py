@@ -0,0 +1,240 @@
+"""
+Streaming exports of user data for BI: CSV or Parquet, optionally compressed.
+
+Rows are read through a server-side cursor (yield_per) per user database and
+written a chunk at a time, so memory stays flat however large the table is.
+Rows come out in (user_id, id) order, merged across shards (a user's rows all
+live on one shard). That key is in every row, so an interrupted export
+resumes after the last row received: ``after=(user_id, id)``.
+
+Each CSV chunk is compressed on its own (a gzip member or zstd frame);
+concatenated members are one valid stream, so a resumed export can be
+appended to a partial file at a chunk boundary (see export_data.py). Parquet
+gets a row group per chunk.
+
+pyarrow is needed for Parquet and zstd; CSV with gzip or no compression works
+without it. It is imported by the first export that uses it, not when
+workers start.
+"""
+
+import csv
+import gzip
+import heapq
+import io
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, String, and_, cast, not_, select
+
+from . import models
+
+FORMATS = ("csv", "parquet")
+COMPRESSIONS = ("none", "gzip", "zstd")
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "gzip": ".gz", "zstd": ".zst"}
+
+
+class ExportError(ValueError):
+    pass
+
+
+class ExportTable(NamedTuple):
+    table: object
+    columns: Tuple[str, ...]
+    user_key: str  # the column holding the user id
+    date_column: str  # what since/until filter on
+
+
+users_table = models.User.__table__
+progress_table = models.UserProgress.__table__
+
+TABLES = {
+    # No password hashes or completion bitmaps
+    "users": ExportTable(users_table, ("id", "username", "email", "is_active", "xp_points", "streak_days",
+                                       "last_active_date", "created_at"), "id", "created_at"),
+    "user_progress": ExportTable(progress_table, ("id", "user_id", "lesson_id", "progress_percentage",
+                                                  "is_completed", "started_at", "completed_at", "updated_at"),
+                                 "user_id", "updated_at"),
+}
+
+
+def check_options(table: str, fmt: str, compression: str) -> ExportTable:
+    if table not in TABLES:
+        raise ExportError(f"Unknown table {table!r}; exportable: {', '.join(TABLES)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt!r}; use {' or '.join(FORMATS)}")
+    if compression not in COMPRESSIONS:
+        raise ExportError(f"Unknown compression {compression!r}; use {', '.join(COMPRESSIONS)}")
+    if fmt == "parquet" or compression == "zstd":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:  # pragma: no cover - pyarrow is in requirements.txt
+            raise ExportError("Parquet and zstd exports need pyarrow installed") from None
+    return TABLES[table]
+
+
+def file_name(table: str, fmt: str, compression: str) -> str:
+    if fmt == "parquet":
+        return table + EXTENSIONS["parquet"]
+    return table + EXTENSIONS["csv"] + EXTENSIONS.get(compression, "")
+
+
+def _query(spec: ExportTable, since: Optional[datetime], until: Optional[datetime], active: Optional[bool],
+           after: Optional[Tuple[int, int]]):
+    c = spec.table.c
+    user, row_id = c[spec.user_key], c.id
+    # Dates and timestamps come back as the database's text ("2024-01-01 09:30:00"): CSV
+    # writes them as they are and Parquet casts them in one pass, instead of building
+    # and re-formatting a datetime object per value.
+    columns = [cast(c[name], String).label(name) if isinstance(c[name].type, (Date, DateTime)) else c[name]
+               for name in spec.columns]
+    query = select(*columns).order_by(user, row_id)
+    if since is not None:
+        query = query.where(c[spec.date_column] >= since)
+    if until is not None:
+        query = query.where(c[spec.date_column] < until)
+    if active is not None:
+        if spec.table is users_table:
+            query = query.where(c.is_active == active)
+        else:
+            query = query.where(user.in_(select(users_table.c.id).where(users_table.c.is_active == active)))
+    if after is not None:
+        # user >= u (an index range), then skip u's rows up to id; an OR here would defeat the index
+        query = query.where(user >= after[0], not_(and_(user == after[0], row_id <= after[1])))
+    return query
+
+
+def iter_chunks(databases: Sequence[Tuple[object, object]], table: str, chunk_size: int = 50000,
+                since: Optional[datetime] = None, until: Optional[datetime] = None, active: Optional[bool] = None,
+                after: Optional[Tuple[int, int]] = None) -> Iterator[List[tuple]]:
+    """Lists of up to ``chunk_size`` row tuples (TABLES[table].columns), in (user_id, id) order across ``databases``."""
+    spec = TABLES[table]
+    query = _query(spec, since, until, active, after)
+
+    def stream(reader):
+        with reader.connect() as conn:
+            result = conn.execution_options(yield_per=chunk_size).execute(query)
+            yield from result.partitions()
+
+    streams = [stream(reader) for _, reader in databases]
+    if len(streams) == 1:
+        yield from streams[0]
+        return
+    user_index, id_index = spec.columns.index(spec.user_key), spec.columns.index("id")
+    merged = heapq.merge(*((row for rows in s for row in rows) for s in streams),
+                         key=lambda row: (row[user_index], row[id_index]))
+    while True:
+        rows = list(islice(merged, chunk_size))
+        if not rows:
+            return
+        yield rows
+
+
+def cursor_of(table: str, row: tuple) -> Tuple[int, int]:
+    """The (user_id, id) to resume after ``row``."""
+    spec = TABLES[table]
+    return row[spec.columns.index(spec.user_key)], row[spec.columns.index("id")]
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    """``data`` as one self-contained gzip member / zstd frame."""
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        import pyarrow
+
+        return pyarrow.Codec("zstd").compress(data, asbytes=True)
+    return data
+
+
+def csv_bytes(rows: List[tuple], header: Optional[Sequence[str]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def csv_stream(chunks, table: str, compression: str = "none", header: bool = True) -> Iterator[bytes]:
+    """Encoded (and compressed) CSV, one piece per chunk."""
+    if header:
+        yield compress(csv_bytes([], TABLES[table].columns), compression)
+    for rows in chunks:
+        yield compress(csv_bytes(rows), compression)
+
+
+_ARROW_TYPES = [(Boolean, "bool_"), (Integer, "int64"), (DateTime, "timestamp"), (Date, "date32")]
+
+
+def arrow_schema(table: str):
+    import pyarrow
+
+    spec = TABLES[table]
+    fields = []
+    for name in spec.columns:
+        column_type = spec.table.c[name].type
+        arrow_type = pyarrow.string()
+        for sql_type, arrow_name in _ARROW_TYPES:
+            if isinstance(column_type, sql_type):
+                arrow_type = pyarrow.timestamp("us") if arrow_name == "timestamp" else getattr(pyarrow, arrow_name)()
+                break
+        fields.append(pyarrow.field(name, arrow_type))
+    return pyarrow.schema(fields)
+
+
+def record_batch(rows: List[tuple], schema):
+    import pyarrow
+
+    columns = zip(*rows) if rows else [[] for _ in schema]
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pyarrow.types.is_timestamp(field.type) or pyarrow.types.is_date(field.type):
+            arrays.append(pyarrow.array(values, type=pyarrow.string()).cast(field.type))  # from text, see _query
+        else:
+            arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.record_batch(arrays, schema=schema)
+
+
+class _Drain:
+    """A write-only file for ParquetWriter whose contents are taken out piece by piece."""
+
+    closed = False
+
+    def __init__(self):
+        self.pieces: List[bytes] = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.pieces.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.pieces = b"".join(self.pieces), []
+        return data
+
+
+def parquet_stream(chunks, table: str, compression: str = "none") -> Iterator[bytes]:
+    """A Parquet file, written a row group per chunk and yielded as it grows."""
+    import pyarrow.parquet
+
+    schema = arrow_schema(table)
+    sink = _Drain()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression=None if compression == "none" else compression)
+    try:
+        for rows in chunks:
+            writer.write_batch(record_batch(rows, schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
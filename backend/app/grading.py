@@ -0,0 +1,210 @@
+"""
+Server-side quiz grading.
+
+The answer key (question id -> lesson, correct index, option count,
+explanation) is compiled from quiz_questions in one query and cached per
+catalog version, so grading a submission never touches the catalog tables.
+Attempts are written in one executemany, and XP for questions answered
+correctly for the first time is added with a single relative UPDATE in the
+same transaction, with the user's row locked on Postgres so concurrent
+submissions can't award the same question twice. The answers also schedule
+the questions for spaced-repetition review (app/reviews.py) and, once
+committed, are counted in the per-question stats (app/question_stats.py).
+Badges, leaderboard moves and cache invalidation are background jobs
+(app/jobs.py) enqueued in the same transaction.
+"""
+
+import json
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import achievements, jobs, leaderboards, models, question_stats, reviews, streaks
+from .cache_bus import VersionedCache
+from .database import use_primary
+from .sharding import use_shard
+
+# Keys that give the answer away; stripped from lesson payloads.
+ANSWER_FIELDS = ("correctAnswer", "correct_answer", "explanation")
+
+
+class KeyEntry(NamedTuple):
+    lesson_id: int
+    correct_index: int
+    option_count: int
+    explanation: Optional[str]
+    xp: int = 0  # for a first correct answer
+
+
+class AnswerKey(NamedTuple):
+    questions: Dict[int, KeyEntry]
+    question_counts: Dict[int, int]  # lesson id -> questions in its quiz
+
+
+answer_key_cache = VersionedCache("catalog", maxsize=1)
+
+
+def decode_json(value):
+    """Decode a JSON string column, tolerating values that were encoded more than once."""
+    while isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def questions_from_content(content) -> List[dict]:
+    """Quiz questions in a content item: either a single question or a ``questions`` list."""
+    content = decode_json(content)
+    if not isinstance(content, dict):
+        return []
+    items = content.get("questions") if isinstance(content.get("questions"), list) else [content]
+    questions = []
+    for item in items:
+        if not isinstance(item, dict) or "question" not in item or "options" not in item:
+            continue
+        correct = item.get("correct_answer", item.get("correctAnswer"))
+        questions.append({
+            "question": item["question"],
+            "options": list(decode_json(item["options"]) or []),
+            "correct_answer": int(correct) if correct is not None else 0,
+            "explanation": item.get("explanation") or "",
+        })
+    return questions
+
+
+def strip_answers(content):
+    """A copy of quiz content without answer keys or explanations."""
+    content = decode_json(content)
+    if not isinstance(content, dict):
+        return content
+    cleaned = {k: v for k, v in content.items() if k not in ANSWER_FIELDS}
+    if isinstance(cleaned.get("questions"), list):
+        cleaned["questions"] = [
+            {k: v for k, v in q.items() if k not in ANSWER_FIELDS} if isinstance(q, dict) else q
+            for q in cleaned["questions"]
+        ]
+    return cleaned
+
+
+def compile_answer_key(db: Session) -> AnswerKey:
+    rows = db.execute(
+        select(models.QuizQuestion.id, models.QuizQuestion.options, models.QuizQuestion.correct_answer,
+               models.QuizQuestion.explanation, models.LessonContent.lesson_id, models.Lesson.xp_reward)
+        .join(models.LessonContent, models.QuizQuestion.lesson_content_id == models.LessonContent.id)
+        .join(models.Lesson, models.LessonContent.lesson_id == models.Lesson.id)
+        .order_by(models.LessonContent.lesson_id, models.LessonContent.order_index,
+                  models.QuizQuestion.order_index, models.QuizQuestion.id)
+    ).all()
+    counts = {}
+    for row in rows:
+        counts[row.lesson_id] = counts.get(row.lesson_id, 0) + 1
+    # The lesson's reward split over its questions; the first takes the remainder so a full quiz pays it all.
+    questions, seen = {}, set()
+    for question_id, options, correct, explanation, lesson_id, xp_reward in rows:
+        share, remainder = divmod(xp_reward or 0, counts[lesson_id])
+        xp = share if lesson_id in seen else share + remainder
+        seen.add(lesson_id)
+        questions[question_id] = KeyEntry(lesson_id, correct, len(decode_json(options) or []), explanation, xp)
+    return AnswerKey(questions, counts)
+
+
+def get_answer_key(db: Session) -> AnswerKey:
+    return answer_key_cache.get("answer_key", lambda: compile_answer_key(db))
+
+
+class GradingError(ValueError):
+    pass
+
+
+def grade_submission(db: Session, lesson_id: int, user_id: Optional[int], answers: List[dict]) -> dict:
+    """
+    Grade ``answers`` ([{question_id, selected_index}]) for one lesson. With a
+    user_id the attempts are recorded and XP awarded; without one the answers
+    are only graded.
+    """
+    key = get_answer_key(db)
+    if lesson_id not in key.question_counts:
+        raise LookupError(f"Lesson {lesson_id} has no quiz questions")
+    results = []
+    for answer in answers:
+        entry = key.questions.get(answer["question_id"])
+        if entry is None or entry.lesson_id != lesson_id:
+            raise GradingError(f"Question {answer['question_id']} is not part of lesson {lesson_id}")
+        if not 0 <= answer["selected_index"] < max(entry.option_count, 1):
+            raise GradingError(f"Answer index out of range for question {answer['question_id']}")
+        results.append({
+            "question_id": answer["question_id"],
+            "selected_index": answer["selected_index"],
+            "is_correct": answer["selected_index"] == entry.correct_index,
+            "correct_index": entry.correct_index,
+            "explanation": entry.explanation,
+            "xp_awarded": 0,
+        })
+    summary = {
+        "lesson_id": lesson_id,
+        "correct": sum(r["is_correct"] for r in results),
+        "total": len(results),
+        "xp_awarded": 0,
+        "xp_points": None,
+        "results": results,
+    }
+    if user_id is None or not results:
+        return summary
+
+    use_primary(use_shard(db, user_id))
+    # Lock the user's row (Postgres; SQLite's writer already holds the write lock)
+    user = db.execute(select(models.User.id, models.User.xp_points).where(models.User.id == user_id)
+                      .with_for_update()).first()
+    if user is None:
+        raise LookupError(f"User {user_id} not found")
+    xp_points = user.xp_points or 0
+    answered = {r["question_id"] for r in results}
+    # question id -> answered correctly before; the ones missing are first tries
+    answered_before = dict(db.execute(
+        select(models.QuizAttempt.question_id, func.max(case((models.QuizAttempt.is_correct, 1), else_=0)))
+        .where(models.QuizAttempt.user_id == user_id, models.QuizAttempt.question_id.in_(answered))
+        .group_by(models.QuizAttempt.question_id)
+    ).all())
+    already_correct = {question_id for question_id, correct in answered_before.items() if correct}
+    first_tries = answered - answered_before.keys()
+    for r in results:
+        if r["is_correct"] and r["question_id"] not in already_correct:
+            r["xp_awarded"] = key.questions[r["question_id"]].xp
+            already_correct.add(r["question_id"])  # a repeated question in one batch counts once
+    awarded = sum(r["xp_awarded"] for r in results)
+
+    db.execute(insert(models.QuizAttempt), [{
+        "user_id": user_id, "lesson_id": lesson_id, "question_id": r["question_id"],
+        "selected_index": r["selected_index"], "is_correct": r["is_correct"], "xp_awarded": r["xp_awarded"],
+    } for r in results])
+    # Every answered question goes into (or moves along) the user's review queue
+    reviews.record_reviews(db, user_id, [(r["question_id"], reviews.quality_for(r["is_correct"])) for r in results])
+    if awarded:
+        xp_points = db.execute(
+            update(models.User).where(models.User.id == user_id)
+            .values(xp_points=func.coalesce(models.User.xp_points, 0) + awarded)
+            .returning(models.User.xp_points)
+        ).scalar()
+    advanced = streaks.record_activity(db, user_id)
+    # Perfect: the whole quiz, every answer right
+    correct = {r["question_id"] for r in results if r["is_correct"]}
+    perfect = summary["correct"] == summary["total"] and len(correct) == key.question_counts.get(lesson_id)
+    events = [achievements.QUIZ_GRADED]
+    if awarded:
+        events.append(achievements.XP_CHANGED)
+    if advanced:
+        events.append(achievements.STREAK_EXTENDED)
+    achievements.enqueue(db, user_id, *events, quiz_perfect=int(perfect), xp_points=xp_points)
+    if awarded:
+        leaderboards.enqueue_xp_changed(db, user_id)
+    if awarded or advanced:
+        jobs.enqueue_publish(db, "leaderboard")
+    db.commit()
+    question_stats.record(question_stats.submission_answers(
+        results, first_tries, {a["question_id"]: a.get("time_ms") for a in answers}))
+    summary["xp_awarded"] = awarded
+    summary["xp_points"] = xp_points
+    return summary
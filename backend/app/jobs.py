@@ -0,0 +1,368 @@
+"""
+Durable background jobs: a transactional outbox plus an in-process runner.
+
+``enqueue(db, job_type, payload, key=...)`` inserts a job_outbox row in the
+caller's transaction, so the job exists exactly when the write that caused
+it commits (and vanishes with it on rollback). ``key`` is an idempotency
+key: enqueueing the same key again is a no-op until the finished job is
+pruned after JOB_RETENTION_HOURS.
+
+Every app worker runs a JobRunner on its event loop. It polls the outbox
+every JOB_POLL_INTERVAL (and right after a commit that enqueued something in
+this process), claims due jobs with a conditional UPDATE that takes a lease
+of JOB_LEASE_SECONDS, and runs each handler in a thread with its own
+session. Delivery is at-least-once: if a worker dies mid-job its lease runs
+out and another worker claims the job again, so handlers must be
+idempotent. A handler that raises is retried with exponential backoff and
+jitter up to its max_attempts, then the job is marked failed and kept for
+inspection (see GET /api/admin/jobs/metrics).
+
+Handlers register with ``@handler("type", concurrency=N)``: a worker runs at
+most N jobs of that type at once and only claims types it has handlers for.
+The side effects of an XP change (achievements, leaderboard moves, cache
+invalidation) are jobs like this, so grading commits without waiting on them.
+
+With sharded user data (app/sharding.py) the catalog and every shard have a
+job_outbox; a session pinned to a shard enqueues into that shard's, and the
+runner polls all of them.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import and_, case, delete, event, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache_bus import publish
+from .config import settings
+from .database import SessionLocal, engine, read_engine, shards
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+PRUNE_INTERVAL = 600.0  # seconds between deletes of old finished jobs
+PRUNE_BATCH = 5000
+
+jobs_table = models.Job.__table__
+
+
+class JobType(NamedTuple):
+    name: str
+    func: Callable[[Session, dict], None]
+    concurrency: int
+    max_attempts: int
+
+
+class Outbox(NamedTuple):
+    """One database's job_outbox: the catalog's, or a shard's."""
+    name: str
+    writer: object
+    reader: object
+
+
+_handlers: Dict[str, JobType] = {}
+
+
+def handler(name: str, concurrency: int = 1, max_attempts: Optional[int] = None):
+    """Register ``func(db, payload)`` for jobs of type ``name``. Use as a decorator."""
+    def register(func):
+        _handlers[name] = JobType(name, func, concurrency, max_attempts or settings.JOB_MAX_ATTEMPTS)
+        return func
+    return register
+
+
+# A duplicate idempotency key is skipped. SQLAlchemy doesn't cache the compiled
+# ON CONFLICT form, so SQLite gets the equivalent (and cacheable) OR IGNORE.
+_inserts = {
+    "postgresql": postgres_insert(jobs_table).on_conflict_do_nothing(),
+    "sqlite": insert(jobs_table).prefix_with("OR IGNORE"),
+}
+
+
+def enqueue(db: Session, job_type: str, payload: Optional[dict] = None, key: Optional[str] = None,
+            delay: float = 0.0):
+    """Add a job to the caller's transaction; it is committed (or rolled back) with it."""
+    dialect = db.get_bind(models.Job.__mapper__).dialect.name
+    now = datetime.utcnow()
+    db.execute(_inserts[dialect], {
+        "job_type": job_type, "payload": payload or {}, "idempotency_key": key, "status": PENDING,
+        "attempts": 0, "run_after": now + timedelta(seconds=delay), "created_at": now,
+    })
+    db.info["jobs_enqueued"] = True
+
+
+def enqueue_publish(db: Session, namespace: str, key: Optional[str] = None):
+    """Publish a cache invalidation (app/cache_bus.py) once the caller's transaction commits."""
+    enqueue(db, "cache.publish", {"namespace": namespace, "key": key})
+
+
+@handler("cache.publish", concurrency=4)
+def _publish(db: Session, payload: dict):
+    publish(payload["namespace"], payload.get("key"))
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("jobs_enqueued", False):
+        runner.wake()
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Exponential in the attempt number, capped, with jitter so failures don't retry in lockstep."""
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _claimable(types, now):
+    t = jobs_table
+    return and_(t.c.job_type.in_(types), t.c.run_after <= now,
+                or_(t.c.status == PENDING, and_(t.c.status == RUNNING, t.c.locked_until < now)))
+
+
+class JobRunner:
+    def __init__(self, outboxes: List[Outbox], session_factory, poll_interval: float = 1.0,
+                 batch_size: int = 50, lease_seconds: int = 300):
+        self.outboxes = outboxes
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.in_flight = Counter()
+        self.done = Counter()
+        self.retried = Counter()
+        self.failed = Counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()
+        self._stopping = False
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start polling on the running event loop (app startup)."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = self._loop.create_task(self._poll_loop())
+
+    def wake(self):
+        """Poll now instead of at the next interval; callable from any thread."""
+        if self._loop is None or self._stopping:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:  # loop already closed
+            pass
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop claiming, then wait up to ``timeout`` for running jobs (unfinished ones are retried later)."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        if self._running:
+            _, pending = await asyncio.wait(self._running, timeout=timeout)
+            if pending:
+                logger.warning("%d background jobs still running at shutdown; they will be retried "
+                               "when their lease expires", len(pending))
+
+    def free_slots(self) -> Dict[str, int]:
+        return {name: jt.concurrency - self.in_flight[name] for name, jt in _handlers.items()
+                if jt.concurrency > self.in_flight[name]}
+
+    def run_due(self) -> int:
+        """Claim and run due jobs in this thread until none are left (scripts and tests); returns how many ran."""
+        ran = 0
+        while True:
+            claimed = self.claim(self.free_slots())
+            if not claimed:
+                return ran
+            for outbox, job in claimed:
+                job_type = _handlers[job.job_type]
+                try:
+                    self._call(job_type, job.payload)
+                except Exception as e:
+                    self._record_failure(outbox, job, job_type, e)
+                else:
+                    self._record_done(outbox, job)
+                ran += 1
+
+    async def _poll_loop(self):
+        last_prune = 0.0
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                claimed = await asyncio.to_thread(self.claim, self.free_slots())
+            except Exception:
+                logger.exception("Polling the job outbox failed")
+                claimed = []
+            for outbox, job in claimed:
+                self.in_flight[job.job_type] += 1
+                task = self._loop.create_task(self._execute(outbox, job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                last_prune = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.prune)
+                except Exception:
+                    logger.exception("Pruning finished jobs failed")
+            if len(claimed) == self.batch_size and self.free_slots():
+                continue  # more may be due right now
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def claim(self, free: Dict[str, int]) -> list:
+        """Claim due jobs across all outboxes, at most ``free[type]`` of each type."""
+        claimed = []
+        for outbox in self.outboxes:
+            if not free:
+                break
+            for job in self._claim_from(outbox, free):
+                claimed.append((outbox, job))
+                free[job.job_type] -= 1
+                if not free[job.job_type]:
+                    del free[job.job_type]
+        return claimed
+
+    def _claim_from(self, outbox: Outbox, free: Dict[str, int]) -> list:
+        t = jobs_table
+        now = datetime.utcnow()
+        claimable = _claimable(list(free), now)
+        # Idle check on the reader, so an empty outbox never takes SQLite's write lock.
+        with outbox.reader.connect() as conn:
+            if conn.execute(select(t.c.id).where(claimable).limit(1)).first() is None:
+                return []
+        with outbox.writer.begin() as conn:
+            budget, ids = dict(free), []
+            for job_id, job_type in conn.execute(select(t.c.id, t.c.job_type).where(claimable)
+                                                 .order_by(t.c.run_after).limit(self.batch_size)):
+                if budget.get(job_type, 0) > 0:
+                    budget[job_type] -= 1
+                    ids.append(job_id)
+            if not ids:
+                return []
+            # Re-checked per row: a job another worker claimed meanwhile is skipped.
+            return conn.execute(
+                update(t).where(t.c.id.in_(ids), claimable)
+                .values(status=RUNNING, attempts=t.c.attempts + 1,
+                        locked_until=now + timedelta(seconds=self.lease_seconds))
+                .returning(t.c.id, t.c.job_type, t.c.payload, t.c.attempts)
+            ).all()
+
+    async def _execute(self, outbox: Outbox, job):
+        job_type = _handlers[job.job_type]
+        try:
+            await asyncio.to_thread(self._call, job_type, job.payload)
+        except Exception as e:
+            await asyncio.to_thread(self._record_failure, outbox, job, job_type, e)
+        else:
+            await asyncio.to_thread(self._record_done, outbox, job)
+        finally:
+            self.in_flight[job.job_type] -= 1
+            self._wake.set()  # a slot is free
+
+    def _call(self, job_type: JobType, payload: dict):
+        db = self.session_factory()
+        try:
+            job_type.func(db, payload)
+        finally:
+            db.close()
+
+    def _record_done(self, outbox: Outbox, job):
+        with outbox.writer.begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job.id)
+                         .values(status=DONE, locked_until=None, finished_at=datetime.utcnow()))
+        self.done[job.job_type] += 1
+
+    def _record_failure(self, outbox: Outbox, job, job_type: JobType, error: Exception):
+        message = f"{error.__class__.__name__}: {error}"[:2000]
+        now = datetime.utcnow()
+        if job.attempts >= job_type.max_attempts:
+            logger.error("Job %s %s failed for good after %d attempts: %s", job.job_type, job.id, job.attempts,
+                         message)
+            values = {"status": FAILED, "finished_at": now}
+            self.failed[job.job_type] += 1
+        else:
+            delay = backoff_seconds(job.attempts)
+            logger.warning("Job %s %s failed (attempt %d/%d), retrying in %.1fs: %s", job.job_type, job.id,
+                           job.attempts, job_type.max_attempts, delay, message)
+            values = {"status": PENDING, "run_after": now + timedelta(seconds=delay)}
+            self.retried[job.job_type] += 1
+        with outbox.writer.begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job.id)
+                         .values(locked_until=None, last_error=message, **values))
+
+    def prune(self):
+        """Delete finished jobs older than JOB_RETENTION_HOURS (failed ones are kept)."""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        t = jobs_table
+        for outbox in self.outboxes:
+            with outbox.writer.begin() as conn:
+                old = select(t.c.id).where(t.c.status == DONE, t.c.finished_at < cutoff).limit(PRUNE_BATCH)
+                conn.execute(delete(t).where(t.c.id.in_(old.scalar_subquery())))
+
+    def metrics(self) -> dict:
+        """Queue depth and lag per outbox and job type, plus this worker's counters."""
+        t = jobs_table
+        now = datetime.utcnow()
+        due = and_(t.c.status == PENDING, t.c.run_after <= now)
+        queues, totals = [], Counter()
+        max_lag = 0.0
+        for outbox in self.outboxes:
+            with outbox.reader.connect() as conn:
+                rows = conn.execute(
+                    select(t.c.job_type,
+                           func.sum(case((t.c.status == PENDING, 1), else_=0)),
+                           func.sum(case((due, 1), else_=0)),
+                           func.sum(case((t.c.status == RUNNING, 1), else_=0)),
+                           func.sum(case((t.c.status == FAILED, 1), else_=0)),
+                           func.min(case((due, t.c.run_after))))
+                    .where(t.c.status.in_([PENDING, RUNNING, FAILED]))
+                    .group_by(t.c.job_type)
+                ).all()
+            for job_type, pending, due_now, running, failed, oldest_due in rows:
+                lag = max((now - oldest_due).total_seconds(), 0.0) if oldest_due else 0.0
+                max_lag = max(max_lag, lag)
+                counts = {"pending": int(pending or 0), "due": int(due_now or 0), "running": int(running or 0),
+                          "failed": int(failed or 0)}
+                totals.update(counts)
+                queues.append({"outbox": outbox.name, "job_type": job_type, **counts,
+                               "lag_seconds": round(lag, 3)})
+        return {
+            "totals": {**{k: totals[k] for k in ("pending", "due", "running", "failed")},
+                       "max_lag_seconds": round(max_lag, 3)},
+            "queues": queues,
+            "worker": {
+                "running": self.started,
+                "handlers": {name: jt.concurrency for name, jt in sorted(_handlers.items())},
+                "in_flight": {k: v for k, v in self.in_flight.items() if v},
+                "done": dict(self.done),
+                "retried": dict(self.retried),
+                "failed": dict(self.failed),
+            },
+        }
+
+
+def outboxes_from(catalog_writer, catalog_reader, shard_set) -> List[Outbox]:
+    return [Outbox("catalog", catalog_writer, catalog_reader)] + [
+        Outbox(f"shard {s.index}", s.writer, s.reader) for s in shard_set]
+
+
+runner = JobRunner(outboxes_from(engine, read_engine, shards), SessionLocal,
+                   poll_interval=settings.JOB_POLL_INTERVAL, batch_size=settings.JOB_BATCH_SIZE,
+                   lease_seconds=settings.JOB_LEASE_SECONDS)
@@ -0,0 +1,405 @@
+"""
+Cohort and friends leaderboards.
+
+A board ranks a group of users by XP: a cohort's members, or a user and
+everyone they follow. Each worker keeps recently used boards in memory as a
+sorted list of (-xp_points, user_id) keys, so a page of the board is a slice
+and a user's rank a bisect, instead of ``WHERE id IN (...) ORDER BY
+xp_points`` for every group on every poll.
+
+Loading a board reads the members' scores as sorted runs (per shard, per
+chunk of ids) and k-way merges them. After that a board follows XP changes
+instead of being reloaded: writers publish the user's new total on the cache
+bus (``xp_changed``), and every worker moves that user within each cached
+board they are on: one bisect to find the old key, one to insert the new.
+Messages carry the bus version, so a late or duplicate one can't roll a
+score back. Membership changes publish the board's key and the board is
+reloaded on next use. If messages may have been lost (the bus reconnected)
+every board is dropped; boards are also reloaded after
+LEADERBOARD_BOARD_TTL in any case.
+
+The cohort and follow tables stay in the catalog: they link users who may
+live on different shards.
+"""
+
+import bisect
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import jobs, models
+from .cache_bus import InvalidationBus, active_bus, get_bus, publish
+from .config import settings
+from .database import use_primary
+from .sharding import shards_of, use_shard
+
+XP_NAMESPACE = "user_xp"  # key "<user_id>:<xp_points>"
+MEMBERS_NAMESPACE = "board_members"  # key: the board's key
+ID_CHUNK = 5000  # ids per IN (...) list
+
+users = models.User.__table__
+members_table = models.CohortMember.__table__
+follows_table = models.Follow.__table__
+
+
+def cohort_key(cohort_id: int) -> str:
+    return f"cohort:{cohort_id}"
+
+
+def friends_key(user_id: int) -> str:
+    return f"friends:{user_id}"
+
+
+def xp_changed(user_id: int, xp_points: int):
+    """Move ``user_id`` on every cached board; call after committing their new total."""
+    publish(XP_NAMESPACE, f"{user_id}:{xp_points or 0}")
+
+
+def enqueue_xp_changed(db: Session, user_id: int):
+    """``xp_changed`` in a background job that runs once the caller's transaction commits."""
+    jobs.enqueue(db, "leaderboards.xp_changed", {"user_id": user_id})
+
+
+@jobs.handler("leaderboards.xp_changed", concurrency=4)
+def _xp_changed_job(db: Session, payload: dict):
+    # The total is read when the job runs, so a late or repeated job publishes the current one, never an old one
+    user_id = payload["user_id"]
+    use_primary(use_shard(db, user_id))
+    xp_points = db.execute(select(models.User.xp_points).where(models.User.id == user_id)).scalar()
+    db.rollback()
+    xp_changed(user_id, xp_points)
+
+
+class Board:
+    """One group's ranking; ``order`` holds (-xp_points, user_id) ascending, first place first."""
+
+    __slots__ = ("key", "title", "order", "members", "loaded_at")
+
+    def __init__(self, key: str, title: Optional[str], rows: Iterable[tuple], version: int):
+        # rows: (user_id, username, xp_points) in rank order
+        self.key = key
+        self.title = title
+        self.order: List[Tuple[int, int]] = []
+        self.members: Dict[int, list] = {}  # user_id -> [xp_points, username, version of xp_points]
+        for user_id, username, xp in rows:
+            self.order.append((-xp, user_id))
+            self.members[user_id] = [xp, username, version]
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.order)
+
+    def move(self, user_id: int, xp: int, version: int):
+        member = self.members.get(user_id)
+        if member is None or version <= member[2]:
+            return
+        member[2] = version
+        if member[0] != xp:
+            del self.order[bisect.bisect_left(self.order, (-member[0], user_id))]
+            bisect.insort(self.order, (-xp, user_id))
+            member[0] = xp
+
+    def rank(self, user_id: int) -> Optional[int]:
+        member = self.members.get(user_id)
+        if member is None:
+            return None
+        return bisect.bisect_left(self.order, (-member[0], user_id)) + 1
+
+    def entries(self, limit: int, offset: int = 0) -> List[dict]:
+        return [{"rank": offset + i + 1, "user_id": user_id, "username": self.members[user_id][1], "xp_points": -key}
+                for i, (key, user_id) in enumerate(self.order[offset:offset + limit])]
+
+
+class Boards:
+    """
+    A worker's cached boards, LRU-bounded. Reads run under the lock so a page
+    never sees a move half done. Loads run outside it; XP messages arriving
+    meanwhile are queued for the new board, and a membership change during
+    the load keeps it from being cached (the same floors as VersionedCache).
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None,
+                 bus: Optional[InvalidationBus] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._bus = bus
+        self._boards: "OrderedDict[str, Board]" = OrderedDict()
+        self._user_boards: Dict[int, Set[str]] = {}
+        self._floors: Dict[Optional[str], int] = {None: 0}
+        self._pending: Dict[int, list] = {}  # XP messages for each load in flight
+        self._seen = 0
+        self._lock = threading.Lock()
+        self._subscribed: Optional[InvalidationBus] = None
+
+    def _subscribe(self):
+        bus = self._bus or get_bus()
+        with self._lock:
+            if self._subscribed is bus:
+                return
+            self._subscribed = bus  # a replacement bus starts over, as in VersionedCache._subscribe
+            for key in list(self._boards):
+                self._evict(key)
+            self._floors = {None: 0}
+            self._seen = 0
+        bus.subscribe(XP_NAMESPACE, self._on_xp)
+        bus.subscribe(MEMBERS_NAMESPACE, self._on_members)
+
+    def _on_xp(self, namespace: str, key: Optional[str], version: int):
+        with self._lock:
+            self._seen = max(self._seen, version)
+            if key is None:
+                self._drop(None, version)
+                return
+            user_id, xp = (int(part) for part in key.split(":"))
+            for pending in self._pending.values():
+                pending.append((version, user_id, xp))
+            for board_key in self._user_boards.get(user_id, ()):
+                self._boards[board_key].move(user_id, xp, version)
+
+    def _on_members(self, namespace: str, key: Optional[str], version: int):
+        with self._lock:
+            self._seen = max(self._seen, version)
+            self._drop(key, version)
+
+    def _drop(self, key: Optional[str], version: int):
+        if version <= self._floors.get(key, 0):
+            return  # late or duplicate message
+        self._floors[key] = version
+        for board_key in (list(self._boards) if key is None else [key]):
+            self._evict(board_key)
+
+    def _evict(self, key: str):
+        board = self._boards.pop(key, None)
+        if board is None:
+            return
+        for user_id in board.members:
+            keys = self._user_boards[user_id]
+            keys.discard(key)
+            if not keys:
+                del self._user_boards[user_id]
+
+    def _install(self, board: Board):
+        self._evict(board.key)
+        self._boards[board.key] = board
+        for user_id in board.members:
+            self._user_boards.setdefault(user_id, set()).add(board.key)
+        maxsize = self.maxsize or settings.LEADERBOARD_BOARDS
+        while len(self._boards) > maxsize:
+            self._evict(next(iter(self._boards)))
+
+    def view(self, key: str, loader: Callable[[], Optional[Tuple[Optional[str], list]]],
+             read: Callable[[Board], dict]) -> Optional[dict]:
+        """
+        ``read(board)`` for the cached board ``key``, loading it on a miss with
+        ``loader()`` -> (title, rows in rank order), or None if the group doesn't exist.
+        """
+        if self._subscribed is not active_bus(self._bus):
+            self._subscribe()
+        ttl = self.ttl if self.ttl is not None else settings.LEADERBOARD_BOARD_TTL
+        with self._lock:
+            board = self._boards.get(key)
+            if board is not None and time.time() - board.loaded_at <= ttl:
+                self._boards.move_to_end(key)
+                return read(board)
+            stamp = self._seen
+            pending = []
+            self._pending[id(pending)] = pending
+        try:
+            loaded = loader()
+            board = Board(key, *loaded, stamp) if loaded is not None else None
+        except BaseException:
+            with self._lock:
+                del self._pending[id(pending)]
+            raise
+        with self._lock:
+            del self._pending[id(pending)]
+            if board is None:
+                return None
+            # The load may have read scores from before these; they are absolute totals, so replaying is safe
+            for version, user_id, xp in sorted(pending):
+                board.move(user_id, xp, version)
+            if stamp >= max(self._floors[None], self._floors.get(key, 0)):
+                self._install(board)
+            return read(board)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._boards):
+                self._evict(key)
+
+
+boards = Boards()
+
+
+def _chunks(ids: Sequence[int], size: int = ID_CHUNK):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _rank_key(row) -> Tuple[int, int]:
+    return -row[2], row[0]
+
+
+def scores(db: Session, user_ids: Sequence[int]) -> List[tuple]:
+    """(user_id, username, xp_points) for ``user_ids`` in rank order: sorted runs per shard and chunk, k-way merged."""
+    xp = func.coalesce(users.c.xp_points, 0)
+
+    def run(session: Session, ids: Sequence[int]) -> list:
+        return session.execute(select(users.c.id, users.c.username, xp).where(users.c.id.in_(ids))
+                               .order_by(xp.desc(), users.c.id)).all()
+
+    shards = shards_of(db)
+    if not shards:
+        runs = [run(db, ids) for ids in _chunks(list(user_ids))]
+    else:
+        groups: Dict[object, List[int]] = {}
+        for user_id in user_ids:
+            groups.setdefault(shards.for_user(user_id), []).append(user_id)
+        use_writer = bool(db.info.get("use_primary"))
+
+        def shard_runs(shard) -> list:
+            if shard not in groups:
+                return []
+            with Session(bind=shard.writer if use_writer else shard.reader) as session:
+                return [run(session, ids) for ids in _chunks(groups[shard])]
+
+        runs = [r for shard_result in shards.scatter(shard_runs) for r in shard_result]
+    if len(runs) == 1:
+        return runs[0]
+    return list(heapq.merge(*runs, key=_rank_key))
+
+
+def existing_users(db: Session, user_ids: Iterable[int]) -> Set[int]:
+    """Which of ``user_ids`` exist (sharded, per the catalog's directory, which has every id)."""
+    table = models.UserDirectory.__table__ if shards_of(db) else users
+    found: Set[int] = set()
+    for ids in _chunks(sorted(set(user_ids))):
+        found.update(db.execute(select(table.c.id).where(table.c.id.in_(ids))).scalars())
+    return found
+
+
+def _check_users(db: Session, user_ids: Iterable[int]):
+    missing = sorted(set(user_ids) - existing_users(db, user_ids))
+    if missing:
+        shown = ", ".join(map(str, missing[:10])) + (", ..." if len(missing) > 10 else "")
+        raise LookupError(f"Users not found: {shown}")
+
+
+def _insert_ignore(db: Session, table):
+    insert = postgres_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    return insert(table).on_conflict_do_nothing()
+
+
+def _cohort_response(db: Session, cohort: models.Cohort) -> dict:
+    count = db.execute(select(func.count()).select_from(members_table)
+                       .where(members_table.c.cohort_id == cohort.id)).scalar()
+    return {"id": cohort.id, "name": cohort.name, "members": count, "created_at": cohort.created_at}
+
+
+def get_cohort(db: Session, cohort_id: int) -> Optional[dict]:
+    cohort = db.get(models.Cohort, cohort_id)
+    return _cohort_response(db, cohort) if cohort is not None else None
+
+
+def create_cohort(db: Session, name: str, user_ids: Sequence[int] = ()) -> dict:
+    use_primary(db)
+    _check_users(db, user_ids)
+    cohort = models.Cohort(name=name)
+    db.add(cohort)
+    db.flush()
+    if user_ids:
+        db.execute(members_table.insert(), [{"cohort_id": cohort.id, "user_id": u} for u in sorted(set(user_ids))])
+    db.commit()
+    return _cohort_response(db, cohort)
+
+
+def add_members(db: Session, cohort_id: int, user_ids: Sequence[int]) -> int:
+    """Add ``user_ids`` to the cohort; returns how many weren't members already."""
+    use_primary(db)
+    if db.get(models.Cohort, cohort_id) is None:
+        raise LookupError(f"Cohort {cohort_id} not found")
+    _check_users(db, user_ids)
+    added = 0
+    statement = _insert_ignore(db, members_table)
+    for ids in _chunks(sorted(set(user_ids))):
+        added += db.execute(statement, [{"cohort_id": cohort_id, "user_id": u} for u in ids]).rowcount
+    db.commit()
+    publish(MEMBERS_NAMESPACE, cohort_key(cohort_id))
+    return added
+
+
+def remove_member(db: Session, cohort_id: int, user_id: int) -> bool:
+    use_primary(db)
+    removed = db.execute(delete(members_table).where(members_table.c.cohort_id == cohort_id,
+                                                     members_table.c.user_id == user_id)).rowcount
+    db.commit()
+    if removed:
+        publish(MEMBERS_NAMESPACE, cohort_key(cohort_id))
+    return bool(removed)
+
+
+def follow(db: Session, follower_id: int, followee_id: int) -> bool:
+    """``follower_id`` follows ``followee_id``; False if they already did."""
+    if follower_id == followee_id:
+        raise ValueError("Users can't follow themselves")
+    use_primary(db)
+    _check_users(db, (follower_id, followee_id))
+    created = db.execute(_insert_ignore(db, follows_table),
+                         {"follower_id": follower_id, "followee_id": followee_id}).rowcount
+    db.commit()
+    if created:
+        publish(MEMBERS_NAMESPACE, friends_key(follower_id))
+    return bool(created)
+
+
+def unfollow(db: Session, follower_id: int, followee_id: int) -> bool:
+    use_primary(db)
+    removed = db.execute(delete(follows_table).where(follows_table.c.follower_id == follower_id,
+                                                     follows_table.c.followee_id == followee_id)).rowcount
+    db.commit()
+    if removed:
+        publish(MEMBERS_NAMESPACE, friends_key(follower_id))
+    return bool(removed)
+
+
+def _read(limit: int, offset: int, user_id: Optional[int]) -> Callable[[Board], dict]:
+    def read(board: Board) -> dict:
+        return {"members": len(board), "entries": board.entries(limit, offset),
+                "user_rank": board.rank(user_id) if user_id is not None else None}
+    return read
+
+
+def cohort_leaderboard(db: Session, cohort_id: int, limit: int = 10, offset: int = 0,
+                       user_id: Optional[int] = None) -> Optional[dict]:
+    """A page of the cohort's board (and ``user_id``'s rank on it), or None if there's no such cohort."""
+    def load():
+        cohort = db.get(models.Cohort, cohort_id)
+        if cohort is None:
+            return None
+        member_ids = db.execute(select(members_table.c.user_id)
+                                .where(members_table.c.cohort_id == cohort_id)).scalars().all()
+        return cohort.name, scores(db, member_ids)
+
+    page = _read(limit, offset, user_id)
+    return boards.view(cohort_key(cohort_id), load,
+                       lambda board: dict(page(board), cohort_id=cohort_id, name=board.title))
+
+
+def friends_leaderboard(db: Session, user_id: int, limit: int = 10, offset: int = 0) -> Optional[dict]:
+    """A page of the board of ``user_id`` and everyone they follow, or None if there's no such user."""
+    def load():
+        if not existing_users(db, [user_id]):
+            return None
+        followees = db.execute(select(follows_table.c.followee_id)
+                               .where(follows_table.c.follower_id == user_id)).scalars().all()
+        return None, scores(db, [user_id, *followees])
+
+    page = _read(limit, offset, user_id)
+    return boards.view(friends_key(user_id), load, lambda board: dict(page(board), user_id=user_id))
@@ -0,0 +1,29 @@
+"""
+Process lifecycle hooks.
+
+Modules that buffer state in memory (counters, queues, caches) register a
+shutdown hook here so it is flushed when a worker drains on SIGTERM.
+"""
+
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+_shutdown_hooks: List[Callable[[], None]] = []
+
+
+def register_shutdown_hook(hook: Callable[[], None]) -> Callable[[], None]:
+    """Register a callable to run when the app shuts down. Usable as a decorator."""
+    if hook not in _shutdown_hooks:
+        _shutdown_hooks.append(hook)
+    return hook
+
+
+def run_shutdown_hooks():
+    """Run registered hooks in reverse registration order; one failing hook doesn't stop the rest."""
+    for hook in reversed(_shutdown_hooks):
+        try:
+            hook()
+        except Exception:
+            logger.exception("Shutdown hook %r failed", hook)
@@ -1,16 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from . import models
-from .database import engine
-from .routers import users, lessons
+from . import jobs, lifecycle, schema, streaks
+from .config import settings
+from .database import SessionLocal, dispose_engines, engine, replicas, shards
+from .routers import achievements, admin, cohorts, interactive, prices, reviews, users, lessons
+from .routers import search as search_router
 from .routers import tutor as tutor_router
 from .routers.auth import router as auth_router
 
-# This line creates the database tables if they don't exist.
-# For production, a migration tool like Alembic is recommended.
-models.Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="Finesse API", description="Gamified Educational Platform for Retail Investors")
 
 # Add CORS middleware to allow frontend connections
@@ -26,7 +24,37 @@ app.add_middleware(
 app.include_router(auth_router, prefix="/api")
 app.include_router(users.router, prefix="/api", tags=["users"])
 app.include_router(lessons.router, prefix="/api", tags=["lessons"])
+app.include_router(search_router.router, prefix="/api", tags=["search"])
 app.include_router(tutor_router.router, prefix="/api", tags=["tutor"])
+app.include_router(reviews.router, prefix="/api")
+app.include_router(cohorts.router, prefix="/api")
+app.include_router(achievements.router, prefix="/api")
+app.include_router(interactive.router, prefix="/api")
+app.include_router(prices.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+
+@app.on_event("startup")
+def prepare_database():
+    # One-row version check on every start; tables are only created when the
+    # database is new or behind (see app/schema.py).
+    schema.ensure_schema(engine)
+    schema.ensure_shards(shards)
+    if settings.JOBS_ENABLED:
+        # Idempotent: one nightly streak job no matter how many workers start
+        with SessionLocal() as db:
+            streaks.schedule_nightly(db)
+
+@app.on_event("startup")
+async def start_job_runner():
+    if settings.JOBS_ENABLED:
+        jobs.runner.start()
+
+@app.on_event("shutdown")
+async def flush_on_shutdown():
+    # Let running jobs finish first; their side effects may still need the engines.
+    await jobs.runner.stop(timeout=settings.JOB_DRAIN_SECONDS)
+    lifecycle.run_shutdown_hooks()
+    dispose_engines()
 
 @app.get("/")
 def read_root():
@@ -38,4 +66,5 @@ def read_root():
 
 @app.get("/api/health")
 def health_check():
-    return {"status": "healthy", "service": "finesse-backend"}
+    return {"status": "healthy", "service": "finesse-backend", "replicas": replicas.status(),
+            "shards": shards.status()}
@@ -0,0 +1,219 @@
+"""
+Versioned, online schema migrations.
+
+Migrations live in ``app/migrations/versions/mNNNN_<name>.py`` and define
+``VERSION``, ``DESCRIPTION`` and a list of ``STEPS`` (see ops.py). Progress
+is recorded per step in ``schema_migrations`` and backfill positions in
+``migration_checkpoints``, so an interrupted upgrade resumes where it stopped.
+The app refuses to start until the database is at the head version (see
+app/schema.py); run ``python migrate.py upgrade`` while the previous release
+is still serving traffic, then deploy.
+
+With sharded user data (app/sharding.py) every shard is versioned too, but
+runs a migration's ``SHARD_STEPS`` (default: none) instead of its STEPS:
+shards hold only the per-user tables.
+"""
+
+import importlib
+import logging
+import pkgutil
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, inspect, select, text)
+
+from .ops import retry_on_lock_timeout
+from . import versions as _versions_pkg
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping tables live outside the models' metadata.
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations", metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("steps_done", Integer, nullable=False, default=0),
+    Column("started_at", DateTime),
+    Column("completed_at", DateTime),
+)
+
+migration_checkpoints = Table(
+    "migration_checkpoints", metadata,
+    Column("version", Integer, primary_key=True),
+    Column("step", Integer, primary_key=True),
+    Column("position", Integer),
+    Column("updated_at", DateTime),
+)
+
+
+class Migration:
+    def __init__(self, module):
+        self.version = module.VERSION
+        self.description = module.DESCRIPTION
+        self.steps = list(module.STEPS)
+        self.shard_steps = list(getattr(module, "SHARD_STEPS", []))
+
+    def steps_for(self, shard: bool = False):
+        return self.shard_steps if shard else self.steps
+
+
+def load_migrations() -> List[Migration]:
+    migrations = []
+    for info in pkgutil.iter_modules(_versions_pkg.__path__):
+        if info.name.startswith("m"):
+            migrations.append(Migration(importlib.import_module(f"{_versions_pkg.__name__}.{info.name}")))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if versions != list(range(1, len(versions) + 1)):
+        raise RuntimeError(f"Migration versions must be contiguous from 1, got {versions}")
+    return migrations
+
+
+MIGRATIONS = load_migrations()
+HEAD = MIGRATIONS[-1].version
+
+
+class MigrationContext:
+    """Passed to every step: the engine, dialect helpers and checkpoint access."""
+
+    def __init__(self, engine, version: int, step: int, batch_size: Optional[int] = None,
+                 pause_seconds: Optional[float] = None, lock_timeout: str = "2s", reporter=print):
+        self.engine = engine
+        self.version = version
+        self.step = step
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.lock_timeout = lock_timeout
+        self.reporter = reporter
+        self.is_postgres = engine.dialect.name == "postgresql"
+        self.is_sqlite = engine.dialect.name == "sqlite"
+
+    def set_lock_timeout(self, conn):
+        if self.is_postgres:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{self.lock_timeout}'"))
+
+    def ddl(self, statement: str):
+        def run():
+            with self.engine.begin() as conn:
+                self.set_lock_timeout(conn)
+                conn.execute(text(statement))
+        retry_on_lock_timeout(run)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in {c["name"] for c in inspect(self.engine).get_columns(table)}
+
+    def checkpoint(self) -> Optional[int]:
+        with self.engine.connect() as conn:
+            return conn.execute(select(migration_checkpoints.c.position).where(
+                migration_checkpoints.c.version == self.version,
+                migration_checkpoints.c.step == self.step)).scalar()
+
+    def save_checkpoint(self, conn, position: int):
+        """Record progress inside the caller's transaction so work and checkpoint commit together."""
+        t = migration_checkpoints
+        updated = conn.execute(t.update().where(t.c.version == self.version, t.c.step == self.step)
+                               .values(position=position, updated_at=datetime.utcnow())).rowcount
+        if not updated:
+            conn.execute(t.insert().values(version=self.version, step=self.step, position=position,
+                                           updated_at=datetime.utcnow()))
+
+    def report(self, message: str):
+        if self.reporter:
+            self.reporter(f"  [{self.version}.{self.step}] {message}")
+
+
+def ensure_bookkeeping(engine):
+    from .. import models
+
+    metadata.create_all(bind=engine)
+    models.SchemaVersion.__table__.create(bind=engine, checkfirst=True)
+
+
+def applied_versions(engine) -> dict:
+    ensure_bookkeeping(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(select(schema_migrations)).mappings().all()
+    return {row["version"]: dict(row) for row in rows}
+
+
+def stamp(engine, version: int, shard: bool = False):
+    """Mark every migration up to ``version`` as applied without running it."""
+    from .. import models
+
+    ensure_bookkeeping(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for migration in MIGRATIONS:
+            if migration.version > version:
+                break
+            conn.execute(schema_migrations.delete().where(schema_migrations.c.version == migration.version))
+            conn.execute(schema_migrations.insert().values(
+                version=migration.version, description=migration.description,
+                steps_done=len(migration.steps_for(shard)), started_at=now, completed_at=now))
+        _record_schema_version(conn, models, version)
+
+
+def _record_schema_version(conn, models, version: int):
+    table = models.SchemaVersion.__table__
+    if not conn.execute(table.update().where(table.c.id == 1).values(version=version)).rowcount:
+        conn.execute(table.insert().values(id=1, version=version))
+
+
+def upgrade(engine, target: Optional[int] = None, batch_size: Optional[int] = None,
+            pause_seconds: Optional[float] = None, reporter=print, shard: bool = False):
+    """Apply pending migrations (or resume a partially applied one) up to ``target``; ``shard`` runs SHARD_STEPS."""
+    from .. import models
+
+    target = HEAD if target is None else target
+    applied = applied_versions(engine)
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+        state = applied.get(migration.version)
+        if state and state["completed_at"]:
+            continue
+        steps_done = state["steps_done"] if state else 0
+        if reporter:
+            reporter(f"Applying {migration.version}: {migration.description}"
+                     + (f" (resuming at step {steps_done + 1})" if steps_done else ""))
+        if not state:
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.insert().values(
+                    version=migration.version, description=migration.description, steps_done=0,
+                    started_at=datetime.utcnow()))
+        steps = migration.steps_for(shard)
+        for index, step in enumerate(steps):
+            if index < steps_done:
+                continue
+            if reporter:
+                reporter(f"  step {index + 1}/{len(steps)}: {step.describe()}")
+            ctx = MigrationContext(engine, migration.version, index, batch_size=batch_size,
+                                   pause_seconds=pause_seconds, reporter=reporter)
+            step.run(ctx)
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.update().where(schema_migrations.c.version == migration.version)
+                             .values(steps_done=index + 1))
+        with engine.begin() as conn:
+            conn.execute(schema_migrations.update().where(schema_migrations.c.version == migration.version)
+                         .values(completed_at=datetime.utcnow()))
+            conn.execute(migration_checkpoints.delete().where(
+                migration_checkpoints.c.version == migration.version))
+            _record_schema_version(conn, models, migration.version)
+    return target
+
+
+def status(engine, shard: bool = False) -> List[dict]:
+    applied = applied_versions(engine)
+    rows = []
+    for migration in MIGRATIONS:
+        state = applied.get(migration.version) or {}
+        if state.get("completed_at"):
+            label = "applied"
+        elif state:
+            label = f"in progress ({state['steps_done']}/{len(migration.steps_for(shard))} steps)"
+        else:
+            label = "pending"
+        rows.append({"version": migration.version, "description": migration.description, "status": label})
+    return rows
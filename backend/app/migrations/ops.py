@@ -0,0 +1,259 @@
+"""
+Migration steps.
+
+Every step is idempotent, so re-running a migration after a crash (or on a
+database that already has part of it) is safe. Long-running work is split
+into small committed batches with a checkpoint, and DDL that needs a lock is
+retried with a short lock_timeout on Postgres instead of queueing behind (and
+blocking) live XP/progress writes.
+"""
+
+import logging
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import Column, Table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn
+
+logger = logging.getLogger(__name__)
+
+
+class Step:
+    """Base class; ``run(ctx)`` must be idempotent."""
+
+    def describe(self) -> str:
+        return self.__class__.__name__
+
+    def run(self, ctx):
+        raise NotImplementedError
+
+
+class Sql(Step):
+    """Arbitrary short DDL/DML, run with lock_timeout and retries."""
+
+    def __init__(self, statement: str, postgres_only: bool = False, sqlite_only: bool = False):
+        self.statement = statement
+        self.postgres_only = postgres_only
+        self.sqlite_only = sqlite_only
+
+    def describe(self):
+        return f"sql: {self.statement.splitlines()[0][:60]}"
+
+    def run(self, ctx):
+        if (self.postgres_only and not ctx.is_postgres) or (self.sqlite_only and not ctx.is_sqlite):
+            return
+        ctx.ddl(self.statement)
+
+
+class CreateTable(Step):
+    def __init__(self, table: Table):
+        self.table = table
+
+    def describe(self):
+        return f"create table {self.table.name}"
+
+    def run(self, ctx):
+        with ctx.engine.begin() as conn:
+            ctx.set_lock_timeout(conn)
+            self.table.create(conn, checkfirst=True)
+
+
+class AddColumn(Step):
+    """
+    Add a column. It must be nullable or have a constant server default; on
+    Postgres 11+ and SQLite both are metadata-only changes that don't rewrite
+    the table. Use Backfill and SetNotNull afterwards for computed values.
+    """
+
+    def __init__(self, table: str, column: Column):
+        self.table = table
+        self.column = column
+
+    def describe(self):
+        return f"add column {self.table}.{self.column.name}"
+
+    def run(self, ctx):
+        if ctx.has_column(self.table, self.column.name):
+            return
+        ddl = CreateColumn(self.column).compile(dialect=ctx.engine.dialect)
+        ctx.ddl(f"ALTER TABLE {self.table} ADD COLUMN {ddl}")
+
+
+class CreateIndex(Step):
+    """
+    Build an index without blocking writes: CREATE INDEX CONCURRENTLY on
+    Postgres (rebuilding a leftover INVALID index from an interrupted run),
+    plain CREATE INDEX IF NOT EXISTS on SQLite.
+    """
+
+    def __init__(self, name: str, table: str, columns: List[str], unique: bool = False):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.unique = unique
+
+    def describe(self):
+        return f"create index {self.name}"
+
+    def run(self, ctx):
+        columns = ", ".join(self.columns)
+        unique = "UNIQUE " if self.unique else ""
+        if ctx.is_postgres:
+            with ctx.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                valid = conn.execute(text(
+                    "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                    "WHERE c.relname = :name"), {"name": self.name}).scalar()
+                if valid:
+                    return
+                if valid is False:
+                    logger.info("Dropping invalid index %s left by an interrupted build", self.name)
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.name}"))
+                conn.execute(text(f"CREATE {unique}INDEX CONCURRENTLY {self.name} ON {self.table} ({columns})"))
+        else:
+            ctx.ddl(f"CREATE {unique}INDEX IF NOT EXISTS {self.name} ON {self.table} ({columns})")
+
+
+class Backfill(Step):
+    """
+    Chunked UPDATE over primary-key ranges. Each batch commits together with
+    its checkpoint, so an interrupted backfill resumes where it stopped. The
+    batch size adapts to keep each transaction near ``target_batch_seconds``
+    (short row locks), and ``pause_seconds`` throttles between batches.
+    """
+
+    def __init__(self, table: str, set_clause: str, where: Optional[str] = None, key: str = "id",
+                 batch_size: int = 5000, target_batch_seconds: float = 0.2, pause_seconds: float = 0.05):
+        self.table = table
+        self.set_clause = set_clause
+        self.where = where
+        self.key = key
+        self.batch_size = batch_size
+        self.target_batch_seconds = target_batch_seconds
+        self.pause_seconds = pause_seconds
+
+    def describe(self):
+        return f"backfill {self.table}: SET {self.set_clause}"
+
+    def run(self, ctx):
+        with ctx.engine.connect() as conn:
+            max_key = conn.execute(text(f"SELECT MAX({self.key}) FROM {self.table}")).scalar()
+        if max_key is None:
+            return
+        position = ctx.checkpoint()
+        if position is None:
+            with ctx.engine.connect() as conn:
+                position = conn.execute(text(f"SELECT MIN({self.key}) FROM {self.table}")).scalar() - 1
+        batch = ctx.batch_size or self.batch_size
+        pause = self.pause_seconds if ctx.pause_seconds is None else ctx.pause_seconds
+        extra = f" AND ({self.where})" if self.where else ""
+        sql = text(f"UPDATE {self.table} SET {self.set_clause} "
+                   f"WHERE {self.key} > :lo AND {self.key} <= :hi{extra}")
+        done = 0
+        last_report = 0.0
+        while position < max_key:
+            hi = min(position + batch, max_key)
+            started = time.perf_counter()
+            with ctx.engine.begin() as conn:
+                ctx.set_lock_timeout(conn)
+                done += conn.execute(sql, {"lo": position, "hi": hi}).rowcount or 0
+                ctx.save_checkpoint(conn, hi)
+            position = hi
+            elapsed = time.perf_counter() - started
+            if elapsed > 2 * self.target_batch_seconds and batch > 100:
+                batch //= 2
+            elif elapsed < self.target_batch_seconds / 2:
+                batch = min(batch * 2, 100000)
+            if position >= max_key or started - last_report > 5.0:
+                last_report = started
+                ctx.report(f"{self.table}: {position}/{max_key} ({done} rows updated, batch {batch})")
+            if pause:
+                time.sleep(pause)
+
+
+class SetNotNull(Step):
+    """
+    Enforce NOT NULL once a backfill is complete. On Postgres a NOT VALID check
+    constraint is added and validated first (which doesn't block writes), so
+    SET NOT NULL can skip its own full-table scan. SQLite can't add constraints
+    to existing columns without a table rebuild, so it's skipped there.
+    """
+
+    def __init__(self, table: str, column: str):
+        self.table = table
+        self.column = column
+
+    def describe(self):
+        return f"set not null {self.table}.{self.column}"
+
+    def run(self, ctx):
+        if not ctx.is_postgres:
+            logger.info("SQLite: leaving %s.%s nullable (constraint enforced by the models)", self.table, self.column)
+            return
+        name = f"{self.table}_{self.column}_not_null"
+        with ctx.engine.connect() as conn:
+            exists = conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = :n"), {"n": name}).scalar()
+        if not exists:
+            ctx.ddl(f"ALTER TABLE {self.table} ADD CONSTRAINT {name} CHECK ({self.column} IS NOT NULL) NOT VALID")
+        ctx.ddl(f"ALTER TABLE {self.table} VALIDATE CONSTRAINT {name}")
+        ctx.ddl(f"ALTER TABLE {self.table} ALTER COLUMN {self.column} SET NOT NULL")
+        ctx.ddl(f"ALTER TABLE {self.table} DROP CONSTRAINT IF EXISTS {name}")
+
+
+class AlterColumnType(Step):
+    """
+    Change a column's type on Postgres (ALTER COLUMN ... TYPE ... USING),
+    skipped when it already has that type. This rewrites the table under an
+    ACCESS EXCLUSIVE lock, so keep it to small tables such as the lesson
+    catalog. SQLite doesn't enforce declared types, so it's a no-op there.
+    """
+
+    def __init__(self, table: str, column: str, type_name: str, using: Optional[str] = None):
+        self.table = table
+        self.column = column
+        self.type_name = type_name
+        self.using = using
+
+    def describe(self):
+        return f"alter column {self.table}.{self.column} type {self.type_name}"
+
+    def run(self, ctx):
+        if not ctx.is_postgres:
+            return
+        with ctx.engine.connect() as conn:
+            current = conn.execute(text(
+                "SELECT data_type FROM information_schema.columns WHERE table_name = :t AND column_name = :c"
+            ), {"t": self.table, "c": self.column}).scalar()
+        if current == self.type_name.lower():
+            return
+        using = f" USING {self.using}" if self.using else ""
+        ctx.ddl(f"ALTER TABLE {self.table} ALTER COLUMN {self.column} TYPE {self.type_name}{using}")
+
+
+class Python(Step):
+    """Custom step: ``func(ctx)``; use ctx.checkpoint()/ctx.save_checkpoint() to make it resumable."""
+
+    def __init__(self, func: Callable, description: Optional[str] = None):
+        self.func = func
+        self.description = description or func.__name__
+
+    def describe(self):
+        return self.description
+
+    def run(self, ctx):
+        self.func(ctx)
+
+
+def retry_on_lock_timeout(fn, attempts: int = 10, delay: float = 1.0):
+    """Call ``fn`` again when Postgres gives up waiting for a lock (SQLSTATE 55P03)."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except OperationalError as e:
+            code = getattr(getattr(e, "orig", None), "pgcode", None)
+            if code != "55P03" or attempt == attempts - 1:
+                raise
+            logger.info("Lock not available, retrying in %.1fs", delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
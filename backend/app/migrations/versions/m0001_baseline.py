@@ -0,0 +1,7 @@
+"""Baseline: the schema as created by create_all before migrations existed."""
+
+VERSION = 1
+DESCRIPTION = "baseline schema"
+
+# Databases at this version were created by create_all (or are stamped as such).
+STEPS = []
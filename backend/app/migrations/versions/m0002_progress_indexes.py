@@ -0,0 +1,11 @@
+"""Index the hot lookups: progress by (user, lesson) and the XP leaderboard."""
+
+from ..ops import CreateIndex
+
+VERSION = 2
+DESCRIPTION = "index user_progress(user_id, lesson_id) and users(xp_points)"
+
+STEPS = [
+    CreateIndex("ix_user_progress_user_lesson", "user_progress", ["user_id", "lesson_id"]),
+    CreateIndex("ix_users_xp_points", "users", ["xp_points"]),
+]
@@ -0,0 +1,39 @@
+"""Server-side quiz grading: quiz_attempts, plus answer-key rows for quiz content that lacks them."""
+
+import json
+
+from sqlalchemy import text
+
+from ... import models
+from ...grading import questions_from_content
+from ..ops import CreateIndex, CreateTable, Python
+
+VERSION = 3
+DESCRIPTION = "quiz_attempts table; quiz_questions for every quiz content item"
+
+
+def backfill_quiz_questions(ctx):
+    # Lessons created through the API only got quiz_questions rows for the
+    # multi-question format; the catalog is small, so one transaction is fine.
+    with ctx.engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT c.id, c.content FROM lesson_content c WHERE c.content_type = 'quiz' "
+            "AND NOT EXISTS (SELECT 1 FROM quiz_questions q WHERE q.lesson_content_id = c.id)"
+        )).all()
+        created = 0
+        for content_id, content in rows:
+            for index, question in enumerate(questions_from_content(content)):
+                conn.execute(text(
+                    "INSERT INTO quiz_questions (lesson_content_id, question, options, correct_answer, "
+                    "explanation, order_index) VALUES (:cid, :question, :options, :correct, :explanation, :idx)"
+                ), {"cid": content_id, "question": question["question"], "options": json.dumps(question["options"]),
+                    "correct": question["correct_answer"], "explanation": question["explanation"], "idx": index})
+                created += 1
+    ctx.report(f"created {created} quiz_questions rows")
+
+
+STEPS = [
+    CreateTable(models.QuizAttempt.__table__),
+    CreateIndex("ix_quiz_attempts_user_question", "quiz_attempts", ["user_id", "question_id"]),
+    Python(backfill_quiz_questions, "quiz_questions for quiz content without any"),
+]
@@ -0,0 +1,68 @@
+"""
+Native JSON for lesson_content.content and quiz_questions.options.
+
+The old VARCHAR column stored whatever it was given: JSON text, bare text
+(plain string content from the API) and, from seed scripts that called
+json.dumps first, JSON strings wrapping a whole document. Each table is
+streamed in id order in small committed batches (resumable from the
+checkpoint) and every value is rewritten as a single-encoded document; on
+SQLite, JSON1 narrows the scan to rows that aren't a JSON object/array. Then
+Postgres converts the columns to JSONB.
+"""
+
+from sqlalchemy import text
+
+from ... import codec
+from ..ops import AlterColumnType, Python
+
+VERSION = 4
+DESCRIPTION = "repair double-encoded JSON; JSONB for lesson content and quiz options"
+
+
+def repair_column(table: str, column: str, batch_size: int = 1000):
+    def run(ctx):
+        position = ctx.checkpoint() or 0
+        batch = ctx.batch_size or batch_size
+        if ctx.is_sqlite:
+            value = column
+            candidates = f"AND CASE WHEN json_valid({column}) THEN json_type({column}) = 'text' ELSE 1 END"
+        else:
+            value = f"{column}::text"
+            candidates = ""
+        update_value = ":value"
+        if ctx.is_postgres:
+            with ctx.engine.connect() as conn:
+                data_type = conn.execute(text(
+                    "SELECT data_type FROM information_schema.columns WHERE table_name = :t AND column_name = :c"
+                ), {"t": table, "c": column}).scalar()
+            if data_type in ("json", "jsonb"):
+                update_value = f"CAST(:value AS {data_type.upper()})"
+        select_batch = text(f"SELECT id, {value} FROM {table} WHERE id > :pos AND {column} IS NOT NULL "
+                            f"{candidates} ORDER BY id LIMIT :n")
+        update_row = text(f"UPDATE {table} SET {column} = {update_value} WHERE id = :id")
+        scanned = repaired = 0
+        while True:
+            with ctx.engine.begin() as conn:
+                ctx.set_lock_timeout(conn)
+                rows = conn.execute(select_batch, {"pos": position, "n": batch}).all()
+                if not rows:
+                    break
+                fixes = [{"id": row_id, "value": fixed} for row_id, raw in rows
+                         if (fixed := codec.repair(raw)) is not None]
+                if fixes:
+                    conn.execute(update_row, fixes)
+                position = rows[-1][0]
+                ctx.save_checkpoint(conn, position)
+            scanned += len(rows)
+            repaired += len(fixes)
+        ctx.report(f"{table}.{column}: scanned {scanned}, repaired {repaired}")
+
+    return Python(run, f"repair JSON in {table}.{column}")
+
+
+STEPS = [
+    repair_column("lesson_content", "content"),
+    repair_column("quiz_questions", "options"),
+    AlterColumnType("lesson_content", "content", "JSONB", using="content::jsonb"),
+    AlterColumnType("quiz_questions", "options", "JSONB", using="options::jsonb"),
+]
@@ -0,0 +1,32 @@
+"""Full-text search: search_documents plus its FTS5 (SQLite) or tsvector/GIN (Postgres) index."""
+
+from ... import models, search
+from ..ops import CreateIndex, CreateTable, Python
+
+VERSION = 5
+DESCRIPTION = "search_documents table and full-text index, built from the existing catalog; catalog FK indexes"
+
+
+def install_index(ctx):
+    # search_documents was just created and is empty, so the generated column
+    # and GIN build are instant.
+    with ctx.engine.begin() as conn:
+        ctx.set_lock_timeout(conn)
+        search.install(conn)
+
+
+def index_catalog(ctx):
+    after_id = ctx.checkpoint() or 0
+    indexed = search.reindex_all(ctx.engine, after_id=after_id, batch_size=ctx.batch_size or 200,
+                                 on_batch=ctx.save_checkpoint)
+    ctx.report(f"indexed {indexed} documents")
+
+
+STEPS = [
+    # Lesson -> items -> questions lookups (indexing, get_lesson) scanned whole tables.
+    CreateIndex("ix_lesson_content_lesson_id", "lesson_content", ["lesson_id", "order_index"]),
+    CreateIndex("ix_quiz_questions_lesson_content_id", "quiz_questions", ["lesson_content_id"]),
+    CreateTable(models.SearchDocument.__table__),
+    Python(install_index, "full-text index over search_documents"),
+    Python(index_catalog, "index existing lessons"),
+]
@@ -0,0 +1,15 @@
+"""User sharding: the catalog's user_directory (id allocation and global username/email uniqueness)."""
+
+from ... import models
+from ..ops import CreateTable
+
+VERSION = 6
+DESCRIPTION = "user_directory table for sharded user data"
+
+# Empty until reshard.py moves users onto shards; an unsharded database never uses it.
+STEPS = [
+    CreateTable(models.UserDirectory.__table__),
+]
+
+# Steps run on each user shard (see app/sharding.py); shards have no catalog tables.
+SHARD_STEPS = []
@@ -0,0 +1,18 @@
+"""Background jobs: the job_outbox table, on the catalog and on every user shard."""
+
+from ... import models
+from ..ops import CreateTable
+
+VERSION = 7
+DESCRIPTION = "job_outbox table for durable background jobs"
+
+# CreateTable brings the table's indexes (status/run_after, idempotency key) with it.
+STEPS = [
+    CreateTable(models.Job.__table__),
+]
+
+# Jobs are enqueued in the same transaction as the write that causes them, so a
+# sharded user write needs an outbox on its shard.
+SHARD_STEPS = [
+    CreateTable(models.Job.__table__),
+]
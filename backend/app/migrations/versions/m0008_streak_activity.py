@@ -0,0 +1,18 @@
+"""Server-side streaks: users.last_active_date (see app/streaks.py)."""
+
+from sqlalchemy import Column, Date
+
+from ..ops import AddColumn, Backfill
+
+VERSION = 8
+DESCRIPTION = "users.last_active_date for server-computed streaks"
+
+# Streaks so far were computed in the browser with no date on the server; count
+# existing ones as active today so the first nightly reset doesn't wipe them.
+STEPS = [
+    AddColumn("users", Column("last_active_date", Date)),
+    Backfill("users", "last_active_date = CURRENT_DATE", where="streak_days > 0 AND last_active_date IS NULL"),
+]
+
+# users lives on the shards too.
+SHARD_STEPS = STEPS
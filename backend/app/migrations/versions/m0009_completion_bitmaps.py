@@ -0,0 +1,25 @@
+"""Per-user lesson completion bitmaps: users.completed_lessons, built from user_progress (see app/completion.py)."""
+
+from sqlalchemy import Column, LargeBinary
+
+from ... import completion
+from ..ops import AddColumn, Python
+
+VERSION = 9
+DESCRIPTION = "users.completed_lessons bitmap, built from user_progress"
+
+
+def build_bitmaps(ctx):
+    after_id = ctx.checkpoint() or 0
+    users = completion.rebuild_all(ctx.engine, after_id=after_id, batch_size=ctx.batch_size or 10000,
+                                   on_batch=ctx.save_checkpoint)
+    ctx.report(f"built bitmaps for {users} users")
+
+
+STEPS = [
+    AddColumn("users", Column("completed_lessons", LargeBinary)),
+    Python(build_bitmaps, "build completion bitmaps from user_progress"),
+]
+
+# users and user_progress live on the shards too.
+SHARD_STEPS = STEPS
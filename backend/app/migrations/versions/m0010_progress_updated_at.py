@@ -0,0 +1,17 @@
+"""user_progress.updated_at, the watermark for incremental funnel analytics (see app/analytics.py)."""
+
+from sqlalchemy import Column, DateTime
+
+from ..ops import AddColumn, Backfill, CreateIndex
+
+VERSION = 10
+DESCRIPTION = "user_progress.updated_at (indexed) for incremental analytics"
+
+STEPS = [
+    AddColumn("user_progress", Column("updated_at", DateTime)),
+    Backfill("user_progress", "updated_at = COALESCE(completed_at, started_at)", where="updated_at IS NULL"),
+    CreateIndex("ix_user_progress_updated_at", "user_progress", ["updated_at"]),
+]
+
+# user_progress lives on the shards too.
+SHARD_STEPS = STEPS
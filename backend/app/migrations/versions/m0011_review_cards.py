@@ -0,0 +1,18 @@
+"""Spaced-repetition review queue: the review_cards table (see app/reviews.py)."""
+
+from ... import models
+from ...sharding import shard_metadata
+from ..ops import CreateTable
+
+VERSION = 11
+DESCRIPTION = "review_cards table for spaced-repetition reviews"
+
+# CreateTable brings ix_review_cards_user_due (user_id, due_at) with it.
+STEPS = [
+    CreateTable(models.ReviewCard.__table__),
+]
+
+# Per-user rows, so they live on the shards; without the foreign key into the catalog.
+SHARD_STEPS = [
+    CreateTable(shard_metadata(models.Base.metadata).tables["review_cards"]),
+]
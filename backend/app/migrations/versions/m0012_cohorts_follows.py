@@ -0,0 +1,17 @@
+"""Cohort and friends leaderboards: the cohorts, cohort_members and follows tables (see app/leaderboards.py)."""
+
+from ... import models
+from ..ops import CreateTable
+
+VERSION = 12
+DESCRIPTION = "cohorts, cohort_members and follows tables for group leaderboards"
+
+# CreateTable brings ix_cohort_members_user and ix_follows_followee with it.
+STEPS = [
+    CreateTable(models.Cohort.__table__),
+    CreateTable(models.CohortMember.__table__),
+    CreateTable(models.Follow.__table__),
+]
+
+# Catalog only: the graph links users on different shards.
+SHARD_STEPS = []
@@ -0,0 +1,17 @@
+"""Achievements: the user_badges table (see app/achievements.py); backfill_achievements.py awards existing users."""
+
+from ... import models
+from ...sharding import shard_metadata
+from ..ops import CreateTable
+
+VERSION = 13
+DESCRIPTION = "user_badges table for achievements"
+
+STEPS = [
+    CreateTable(models.UserBadge.__table__),
+]
+
+# Per-user rows, so they live on the shards; without the foreign key into the catalog.
+SHARD_STEPS = [
+    CreateTable(shard_metadata(models.Base.metadata).tables["user_badges"]),
+]
@@ -0,0 +1,14 @@
+"""Per-question answer statistics: the question_stats table (see app/question_stats.py)."""
+
+from ... import models
+from ..ops import CreateTable
+
+VERSION = 14
+DESCRIPTION = "question_stats table for quiz item analysis"
+
+STEPS = [
+    CreateTable(models.QuestionStat.__table__),
+]
+
+# Catalog only: keyed by question, not by user.
+SHARD_STEPS = []
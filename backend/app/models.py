@@ -1,8 +1,19 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import (Boolean, Column, Float, Integer, String, Text, Date, DateTime, ForeignKey, JSON, Index,
+                        LargeBinary)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from .database import Base
 
+class SchemaVersion(Base):
+    """Single-row table recording which schema version the database is at."""
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -13,11 +24,63 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     xp_points = Column(Integer, default=0)
     streak_days = Column(Integer, default=0)
+    last_active_date = Column(Date)  # UTC day of the latest activity; see app/streaks.py
+    # Bit per completed lesson id (app/completion.py); deferred so user listings don't load it
+    completed_lessons = deferred(Column(LargeBinary))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     progress = relationship("UserProgress", back_populates="user")
 
+    __table_args__ = (
+        Index("ix_users_xp_points", "xp_points"),
+    )
+
+class UserDirectory(Base):
+    """
+    Catalog-side entry per user when user data is sharded (app/sharding.py):
+    allocates user ids and keeps usernames and emails unique across shards.
+    """
+    __tablename__ = "user_directory"
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String, unique=True, nullable=False)
+    email = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# The social graph links users that may live on different shards, so it stays
+# in the catalog and has no foreign keys into users (see app/leaderboards.py).
+class Cohort(Base):
+    """A group with its own leaderboard, e.g. a classroom."""
+    __tablename__ = "cohorts"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class CohortMember(Base):
+    __tablename__ = "cohort_members"
+
+    cohort_id = Column(Integer, ForeignKey("cohorts.id"), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    joined_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_cohort_members_user", "user_id"),
+    )
+
+class Follow(Base):
+    """``follower_id`` follows ``followee_id``; a user's friends leaderboard is who they follow."""
+    __tablename__ = "follows"
+
+    follower_id = Column(Integer, primary_key=True)
+    followee_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_follows_followee", "followee_id"),
+    )
+
 class Lesson(Base):
     __tablename__ = "lessons"
 
@@ -37,30 +100,21 @@ class Lesson(Base):
     progress = relationship("UserProgress", back_populates="lesson")
 
 
-from sqlalchemy.types import TypeDecorator, VARCHAR
-import json
+class JSONDocument(TypeDecorator):
+    """
+    A JSON document: JSONB on Postgres, JSON (JSON1 text) on SQLite. Values are
+    stored as given (dict, list or str) and decoded by the engine's codec
+    (orjson, see app/codec.py); never json.dumps before assigning.
+    """
 
-class JSONEncodedDict(TypeDecorator):
-    """Represents an immutable structure as a json-encoded string."""
-    
-    impl = VARCHAR
+    impl = JSON
     cache_ok = True
 
-    def process_bind_param(self, value, dialect):
-        if value is not None:
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            elif not isinstance(value, str):
-                value = str(value)
-        return value
-
-    def process_result_value(self, value, dialect):
-        if value is not None:
-            try:
-                return json.loads(value)
-            except (ValueError, TypeError):
-                return value
-        return value
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB(none_as_null=True))
+        return dialect.type_descriptor(JSON(none_as_null=True))
+
 
 class LessonContent(Base):
     __tablename__ = "lesson_content"
@@ -69,7 +123,7 @@ class LessonContent(Base):
     lesson_id = Column(Integer, ForeignKey("lessons.id"))
     content_type = Column(String)  # 'text', 'quiz', 'video', 'interactive'
     title = Column(String)
-    content = Column(JSONEncodedDict)  # Handles both string and dict content
+    content = Column(JSONDocument)  # dict for structured content, str for plain text
     order_index = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -77,6 +131,17 @@ class LessonContent(Base):
     lesson = relationship("Lesson", back_populates="content_items")
     quiz_questions = relationship("QuizQuestion", back_populates="lesson_content", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_lesson_content_lesson_id", "lesson_id", "order_index"),
+    )
+
+    @property
+    def questions(self):
+        """Quiz questions in display order (the public part is serialized by schemas.QuizQuestionPublic)."""
+        if self.content_type != 'quiz':
+            return []
+        return sorted(self.quiz_questions, key=lambda q: (q.order_index or 0, q.id))
+
 
 class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
@@ -84,7 +149,7 @@ class QuizQuestion(Base):
     id = Column(Integer, primary_key=True, index=True)
     lesson_content_id = Column(Integer, ForeignKey("lesson_content.id"))
     question = Column(Text)
-    options = Column(Text)  # JSON array of options
+    options = Column(JSONDocument)  # list of option strings
     correct_answer = Column(Integer)  # index of correct answer
     explanation = Column(Text)
     order_index = Column(Integer, default=0)
@@ -92,6 +157,89 @@ class QuizQuestion(Base):
     # Relationships
     lesson_content = relationship("LessonContent", back_populates="quiz_questions")
 
+    __table_args__ = (
+        Index("ix_quiz_questions_lesson_content_id", "lesson_content_id"),
+    )
+
+class QuestionStat(Base):
+    """
+    Answer counts per quiz question, added to in batches by each worker's
+    flusher (see app/question_stats.py); the pb_* sums give the
+    discrimination (point-biserial correlation) over first tries.
+    """
+    __tablename__ = "question_stats"
+
+    question_id = Column(Integer, ForeignKey("quiz_questions.id"), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    first_attempts = Column(Integer, nullable=False, default=0)
+    first_correct = Column(Integer, nullable=False, default=0)
+    option_counts = Column(JSONDocument, nullable=False)  # selections per option index
+    time_buckets = Column(JSONDocument, nullable=False)  # time-to-answer histogram (question_stats.TIME_EDGES_MS)
+    pb_n = Column(Integer, nullable=False, default=0)
+    pb_x = Column(Float, nullable=False, default=0.0)
+    pb_y = Column(Float, nullable=False, default=0.0)
+    pb_xy = Column(Float, nullable=False, default=0.0)
+    pb_yy = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SearchDocument(Base):
+    """
+    Searchable text of the catalog, one row per lesson and per content item;
+    maintained by app/search.py, which also creates the FTS5 / tsvector index.
+    """
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True)
+    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False, index=True)
+    content_id = Column(Integer, ForeignKey("lesson_content.id"), nullable=True)
+    kind = Column(String, nullable=False)  # 'lesson' or the content item's content_type
+    title = Column(String)
+    body = Column(Text)
+
+class QuizAttempt(Base):
+    """One graded answer; written in bulk by POST /lessons/{id}/quiz/submit."""
+    __tablename__ = "quiz_attempts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("quiz_questions.id"), nullable=False)
+    selected_index = Column(Integer, nullable=False)
+    is_correct = Column(Boolean, nullable=False)
+    xp_awarded = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_quiz_attempts_user_question", "user_id", "question_id"),
+    )
+
+class ReviewCard(Base):
+    """Spaced-repetition state of one quiz question for one user (see app/reviews.py)."""
+    __tablename__ = "review_cards"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    question_id = Column(Integer, ForeignKey("quiz_questions.id"), primary_key=True)
+    ease = Column(Float, nullable=False, default=2.5)
+    interval_days = Column(Integer, nullable=False, default=0)
+    repetitions = Column(Integer, nullable=False, default=0)  # correct answers in a row
+    lapses = Column(Integer, nullable=False, default=0)
+    reviews = Column(Integer, nullable=False, default=0)
+    due_at = Column(Integer, nullable=False)  # Unix seconds, so the rescheduling upsert can do date math in SQL
+    last_reviewed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_review_cards_user_due", "user_id", "due_at"),
+    )
+
+class UserBadge(Base):
+    """An achievement awarded to a user (see app/achievements.py); the key makes awarding idempotent."""
+    __tablename__ = "user_badges"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    badge = Column(String, primary_key=True)  # achievements.RULES[...].badge
+    awarded_at = Column(DateTime, default=datetime.utcnow)
+
 class UserProgress(Base):
     __tablename__ = "user_progress"
 
@@ -102,7 +250,33 @@ class UserProgress(Base):
     is_completed = Column(Boolean, default=False)
     started_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
+    # Watermark for incremental analytics (app/analytics.py); bulk loaders must set it too
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="progress")
-    lesson = relationship("Lesson", back_populates="progress")
\ No newline at end of file
+    lesson = relationship("Lesson", back_populates="progress")
+
+    __table_args__ = (
+        Index("ix_user_progress_user_lesson", "user_id", "lesson_id"),
+        Index("ix_user_progress_updated_at", "updated_at"),
+    )
+class Job(Base):
+    """Transactional outbox for background jobs (see app/jobs.py)."""
+    __tablename__ = "job_outbox"
+
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String, nullable=False)
+    payload = Column(JSONDocument, nullable=False)
+    idempotency_key = Column(String, unique=True, nullable=True)  # NULLs never conflict
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime, nullable=True)  # lease of the worker running it
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_job_outbox_status_run_after", "status", "run_after"),
+    )
@@ -0,0 +1,235 @@
+"""
+Price history store: per-symbol OHLCV columns in memory-mapped files.
+
+Each symbol is a directory of .npy column files (``timestamp`` as
+datetime64[s], then ``open``, ``high``, ``low``, ``close``, ``volume`` as
+float64), sorted by timestamp and opened with ``mmap_mode="r"``: the OS pages
+in only what is read and shares the pages between workers, and a date range
+is a binary search on the timestamps plus a slice, i.e. views of the mapping,
+never copies. ``index.json`` at the root lists each symbol's row count, first
+and last timestamp and version.
+
+Imports (import_prices.py) write a new version directory per symbol and then
+swap the index atomically, so readers see either the old series or the new
+one. A worker holding the old mapping keeps reading it until it notices the
+new index (one stat per lookup); unlinked files stay valid while mapped. Run
+one importer at a time.
+
+Lesson exercises reference series by symbol and date range (see the
+bootstrap model in app/simulation.py); GET /api/prices/{symbol} serves them,
+resampled on the fly to weekly or monthly bars.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .config import settings
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+INTERVALS = ("daily", "weekly", "monthly")
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9._-]{0,31}$")
+INDEX_FILE = "index.json"
+
+
+class Series(NamedTuple):
+    """One symbol's bars; slices of the store are read-only views of its files."""
+    symbol: str
+    timestamp: np.ndarray  # datetime64[s]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+
+def normalize_symbol(symbol: str) -> str:
+    symbol = str(symbol).strip().upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        raise ValueError(f"Invalid symbol {symbol!r}")
+    return symbol
+
+
+def _lower(value) -> np.datetime64:
+    return np.datetime64(value).astype("datetime64[s]")
+
+
+def _upper(value) -> np.datetime64:
+    """Exclusive upper bound for an inclusive ``end``: a date includes its whole day."""
+    value = np.datetime64(value)
+    if value.dtype == np.dtype("datetime64[D]"):
+        return (value + 1).astype("datetime64[s]")
+    return value.astype("datetime64[s]") + 1
+
+
+class PriceStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._index: Dict[str, dict] = {}
+        self._index_stamp: Optional[tuple] = None
+        self._mapped: Dict[str, tuple] = {}  # symbol -> (version, Series over the mappings)
+        self._lock = threading.Lock()
+
+    # Reading
+
+    def index(self) -> Dict[str, dict]:
+        """Symbol -> {rows, first, last, version}, reloaded when an import has replaced it."""
+        path = os.path.join(self.root, INDEX_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        # os.replace gives every new index a new inode, so two imports within one mtime tick still differ
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if stamp != self._index_stamp:
+                with open(path) as f:
+                    self._index = json.load(f)["symbols"]
+                self._index_stamp = stamp
+                self._mapped = {s: m for s, m in self._mapped.items()
+                                if s in self._index and self._index[s]["version"] == m[0]}
+            return self._index
+
+    def symbols(self) -> List[str]:
+        return sorted(self.index())
+
+    def info(self, symbol: str) -> dict:
+        symbol = normalize_symbol(symbol)
+        entry = self.index().get(symbol)
+        if entry is None:
+            raise LookupError(f"No price history for {symbol}")
+        return dict(entry, symbol=symbol)
+
+    def _open(self, symbol: str) -> Series:
+        entry = self.info(symbol)
+        symbol = entry["symbol"]
+        with self._lock:
+            mapped = self._mapped.get(symbol)
+            if mapped is not None and mapped[0] == entry["version"]:
+                return mapped[1]
+        directory = os.path.join(self.root, symbol, str(entry["version"]))
+        series = Series(symbol, *(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                                  for name in COLUMNS))
+        with self._lock:
+            self._mapped[symbol] = (entry["version"], series)
+        return series
+
+    def series(self, symbol: str, start=None, end=None) -> Series:
+        """Bars of ``symbol`` from ``start`` through ``end`` (inclusive; a date means its whole day), zero-copy."""
+        series = self._open(symbol)
+        first = 0 if start is None else int(np.searchsorted(series.timestamp, _lower(start), side="left"))
+        last = len(series) if end is None else int(np.searchsorted(series.timestamp, _upper(end), side="left"))
+        if first == 0 and last == len(series):
+            return series
+        return Series(series.symbol, *(column[first:last] for column in series[1:]))
+
+    def aligned_closes(self, symbols: Sequence[str], start=None, end=None) -> np.ndarray:
+        """(timestamps, symbols) closes on the timestamps every symbol has bars for."""
+        ranges = [self.series(symbol, start, end) for symbol in symbols]
+        common = ranges[0].timestamp
+        for series in ranges[1:]:
+            common = np.intersect1d(common, series.timestamp, assume_unique=True)
+        return np.column_stack([series.close[np.searchsorted(series.timestamp, common)] for series in ranges]) \
+            if len(common) else np.empty((0, len(ranges)))
+
+    # Writing
+
+    def write(self, symbol: str, columns: Dict[str, Sequence]) -> dict:
+        """Replace one symbol's history (see write_many); returns its index entry."""
+        return self.write_many({symbol: columns})[0]
+
+    def write_many(self, histories: Dict[str, Dict[str, Sequence]]) -> List[dict]:
+        """
+        Replace the history of each symbol in ``histories``, given as one
+        sequence per name in COLUMNS (bars in any order; a repeated timestamp
+        keeps its last bar), with a single index swap for all of them.
+        Returns their index entries.
+        """
+        written = {}
+        for symbol, columns in histories.items():
+            symbol = normalize_symbol(symbol)
+            missing = [name for name in COLUMNS if name not in columns]
+            if missing:
+                raise ValueError(f"{symbol}: missing columns {missing}")
+            timestamp = np.asarray(columns["timestamp"]).astype("datetime64[s]")
+            values = [np.asarray(columns[name], dtype=np.float64) for name in COLUMNS[1:]]
+            if any(len(column) != len(timestamp) for column in values) or not len(timestamp):
+                raise ValueError(f"{symbol}: columns must be non-empty and the same length")
+            if np.isnat(timestamp).any():
+                raise ValueError(f"{symbol}: missing timestamps")
+            # Stable sort, then keep the last bar of each timestamp
+            order = np.argsort(timestamp, kind="stable")
+            timestamp = timestamp[order]
+            keep = np.append(timestamp[1:] != timestamp[:-1], True)
+            arrays = [timestamp[keep]] + [column[order][keep] for column in values]
+
+            version = time.time_ns()
+            directory = os.path.join(self.root, symbol, str(version))
+            os.makedirs(directory)
+            for name, column in zip(COLUMNS, arrays):
+                np.save(os.path.join(directory, f"{name}.npy"), column)
+            written[symbol] = {"rows": int(len(arrays[0])), "first": str(arrays[0][0]),
+                               "last": str(arrays[0][-1]), "version": version}
+
+        self._write_index({**self.index(), **written})
+        for symbol, entry in written.items():
+            for old in os.listdir(os.path.join(self.root, symbol)):
+                if old != str(entry["version"]):
+                    shutil.rmtree(os.path.join(self.root, symbol, old), ignore_errors=True)
+        return [dict(entry, symbol=symbol) for symbol, entry in written.items()]
+
+    def _write_index(self, index: Dict[str, dict]):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, INDEX_FILE)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump({"symbols": index}, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+
+def resample(series: Series, interval: str) -> Series:
+    """
+    Bars of ``series`` aggregated per day, week (from Monday) or month: first
+    open, highest high, lowest low, last close, summed volume, labelled with
+    the period's start.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {list(INTERVALS)}")
+    if not len(series):
+        return series
+    days = series.timestamp.astype("datetime64[D]")
+    if interval == "daily":
+        periods = days
+    elif interval == "weekly":
+        periods = (days.view(np.int64) + 3) // 7 * 7 - 3  # 1970-01-01 was a Thursday
+        periods = periods.astype("datetime64[D]")
+    else:
+        periods = days.astype("datetime64[M]")
+    starts = np.flatnonzero(np.append(True, periods[1:] != periods[:-1]))
+    labels = periods[starts].astype("datetime64[s]")
+    if len(starts) == len(series) and (labels == series.timestamp).all():
+        return series  # e.g. daily bars asked for daily: still the store's views
+    ends = np.append(starts[1:], len(series)) - 1
+    return Series(
+        series.symbol,
+        labels,
+        series.open[starts],
+        np.maximum.reduceat(series.high, starts),
+        np.minimum.reduceat(series.low, starts),
+        series.close[ends],
+        np.add.reduceat(series.volume, starts),
+    )
+
+
+store = PriceStore(settings.PRICE_STORE_DIR)
@@ -0,0 +1,106 @@
+"""
+Bulk account provisioning (a classroom at a time).
+
+Rows are validated and de-duplicated in memory, passwords are hashed up
+front (optionally across processes, see security.hash_passwords), and users
+are inserted in batches with INSERT ... ON CONFLICT DO NOTHING RETURNING:
+the unique username/email indexes decide what already exists, with no
+per-row lookups. Each batch commits on its own, so a large import makes
+steady progress and a failure loses at most one batch. With sharded user
+data the conflict check runs against the catalog's user_directory instead.
+"""
+
+from typing import List
+
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models, schemas, security
+from .cache_bus import publish
+from .database import use_primary
+from .sharding import shards_of, use_shard
+
+
+def _result(index: int, row, status: str, detail=None, user_id=None) -> dict:
+    username = row.get("username") if isinstance(row, dict) else None
+    return {"index": index, "username": username, "status": status, "id": user_id, "detail": detail}
+
+
+def _conflict_detail(taken_usernames, taken_emails, row) -> str:
+    if row.username in taken_usernames:
+        return "Username already registered"
+    if row.email in taken_emails:
+        return "Email already registered"
+    return "Already registered"
+
+
+def provision_users(db: Session, rows: List[dict], batch_size: int = 1000, hash_workers: int = 0) -> List[dict]:
+    """
+    Create accounts for ``rows`` ({username, email, password}). Returns one
+    result per row, in order: created (with id), exists, duplicate (repeats
+    an earlier row of the same request) or invalid.
+    """
+    results = [None] * len(rows)
+    valid, seen_usernames, seen_emails = [], set(), set()
+    for index, row in enumerate(rows):
+        try:
+            user = schemas.UserCreate.model_validate(row)
+        except ValidationError as e:
+            results[index] = _result(index, row, "invalid", "; ".join(err["msg"] for err in e.errors()))
+            continue
+        user.username, user.email = user.username.strip(), user.email.strip()
+        if not user.username or "@" not in user.email or not user.password:
+            results[index] = _result(index, row, "invalid", "username, email and password are required")
+        elif user.username in seen_usernames or user.email in seen_emails:
+            results[index] = _result(index, row, "duplicate", "Repeats an earlier row")
+        else:
+            seen_usernames.add(user.username)
+            seen_emails.add(user.email)
+            valid.append((index, user))
+
+    hashes = security.hash_passwords([user.password for _, user in valid], workers=hash_workers)
+    use_primary(db)
+    shards = shards_of(db)
+    # Sharded, the catalog's user directory allocates ids and owns uniqueness;
+    # created rows are then written to each user's shard.
+    accounts = models.UserDirectory if shards else models.User
+    insert = postgres_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    created = 0
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        values = [{"username": user.username, "email": user.email, "hashed_password": hashed,
+                   "is_active": True, "xp_points": 0, "streak_days": 0}
+                  for (_, user), hashed in zip(batch, hashes[start:start + batch_size])]
+        inserted = {
+            username: user_id for user_id, username in db.execute(
+                insert(accounts).on_conflict_do_nothing()
+                .returning(accounts.id, accounts.username),
+                [{"username": v["username"], "email": v["email"]} for v in values] if shards else values)
+        }
+        if shards:
+            created_rows = [dict(v, id=inserted[v["username"]]) for v in values if v["username"] in inserted]
+            for rows in shards.group(created_rows).values():
+                use_shard(db, rows[0]["id"])
+                db.execute(models.User.__table__.insert(), rows)
+        conflicts = [user for _, user in batch if user.username not in inserted]
+        taken_usernames, taken_emails = set(), set()
+        if conflicts:
+            for username, email in db.execute(select(accounts.username, accounts.email).where(or_(
+                    accounts.username.in_([u.username for u in conflicts]),
+                    accounts.email.in_([u.email for u in conflicts])))):
+                taken_usernames.add(username)
+                taken_emails.add(email)
+        db.commit()
+        for index, user in batch:
+            row = {"username": user.username}
+            if user.username in inserted:
+                results[index] = _result(index, row, "created", user_id=inserted[user.username])
+            else:
+                results[index] = _result(index, row, "exists", _conflict_detail(taken_usernames, taken_emails, user))
+        created += len(inserted)
+    if created:
+        publish("leaderboard")
+    return results
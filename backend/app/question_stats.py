@@ -0,0 +1,349 @@
+"""
+Per-question answer statistics for quiz authors.
+
+Every recorded answer (quiz submissions with a user_id, and reviews) is
+counted in this worker's memory once its transaction has committed: attempts, selections per
+option, first-try correctness, a log-bucketed time-to-answer histogram and
+the running sums of a point-biserial correlation. Counting is a few integer
+additions under a lock, so the answer path gets no extra database work; a
+background thread adds the accumulated deltas to question_stats every
+QUESTION_STATS_FLUSH_SECONDS in one transaction (and at shutdown). A worker
+that dies loses at most one interval of counts.
+
+Item analysis uses first tries only, since a learner who has seen the
+answer explanation is no longer measured by the question:
+
+- difficulty: the share of first tries that were correct (lower is harder)
+- discrimination: the correlation between getting the question right and
+  the share of the *other* questions in the same submission answered right.
+  A good question is answered correctly by learners who do well overall;
+  near zero or negative means it doesn't separate them (ambiguous, or keyed
+  wrong).
+"""
+
+import bisect
+import logging
+import math
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import database, lifecycle, models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Time-to-answer bucket edges: 250 ms doubling every two buckets, up to ~17 minutes;
+# a quantile read as a bucket's geometric middle is within about 19% of the truth
+TIME_EDGES_MS = tuple(round(250 * 2 ** (k / 2)) for k in range(25))
+TIME_BUCKETS = len(TIME_EDGES_MS) + 1
+FLUSH_CHUNK = 500  # question ids per IN list
+
+stats_table = models.QuestionStat.__table__
+questions_table = models.QuizQuestion.__table__
+
+
+class Answer(NamedTuple):
+    question_id: int
+    selected_index: int
+    is_correct: bool
+    first_try: bool
+    time_ms: Optional[int] = None
+    rest_score: Optional[float] = None  # share of the submission's other answers that were correct
+
+
+class Counter:
+    """Counts for one question; the same fields as a question_stats row."""
+    __slots__ = ("attempts", "correct", "first_attempts", "first_correct", "option_counts", "time_buckets",
+                 "pb_n", "pb_x", "pb_y", "pb_xy", "pb_yy")
+
+    def __init__(self):
+        self.attempts = self.correct = self.first_attempts = self.first_correct = 0
+        self.option_counts: List[int] = []
+        self.time_buckets: List[int] = [0] * TIME_BUCKETS
+        self.pb_n = 0
+        self.pb_x = self.pb_y = self.pb_xy = self.pb_yy = 0.0
+
+    def add(self, answer: Answer):
+        self.attempts += 1
+        self.correct += answer.is_correct
+        if len(self.option_counts) <= answer.selected_index:
+            self.option_counts.extend([0] * (answer.selected_index + 1 - len(self.option_counts)))
+        self.option_counts[answer.selected_index] += 1
+        if answer.time_ms is not None:
+            self.time_buckets[bisect.bisect_right(TIME_EDGES_MS, answer.time_ms)] += 1
+        if answer.first_try:
+            self.first_attempts += 1
+            self.first_correct += answer.is_correct
+            if answer.rest_score is not None:
+                x, y = float(answer.is_correct), answer.rest_score
+                self.pb_n += 1
+                self.pb_x += x
+                self.pb_y += y
+                self.pb_xy += x * y
+                self.pb_yy += y * y
+
+    def merge(self, other: "Counter"):
+        for name in ("attempts", "correct", "first_attempts", "first_correct", "pb_n", "pb_x", "pb_y", "pb_xy",
+                     "pb_yy"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.option_counts = _add_lists(self.option_counts, other.option_counts)
+        self.time_buckets = _add_lists(self.time_buckets, other.time_buckets)
+
+    def row(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_row(cls, row) -> "Counter":
+        counter = cls()
+        for name in cls.__slots__:
+            value = row[name]
+            if value is not None:
+                setattr(counter, name, list(value) if isinstance(value, list) else value)
+        if len(counter.time_buckets) < TIME_BUCKETS:
+            counter.time_buckets = _add_lists(counter.time_buckets, [0] * TIME_BUCKETS)
+        return counter
+
+
+def _add_lists(a: List[int], b: List[int]) -> List[int]:
+    if len(a) < len(b):
+        a, b = b, a
+    return [x + (b[i] if i < len(b) else 0) for i, x in enumerate(a)]
+
+
+class Buffer:
+    """This worker's counts not yet flushed, by question id."""
+
+    def __init__(self):
+        self._counters: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+
+    def record(self, answers: Iterable[Answer]):
+        with self._lock:
+            for answer in answers:
+                counter = self._counters.get(answer.question_id)
+                if counter is None:
+                    counter = self._counters[answer.question_id] = Counter()
+                counter.add(answer)
+
+    def drain(self) -> Dict[int, Counter]:
+        with self._lock:
+            counters, self._counters = self._counters, {}
+        return counters
+
+    def restore(self, counters: Dict[int, Counter]):
+        """Put drained counts back (their flush failed), merged with whatever arrived since."""
+        with self._lock:
+            for question_id, counter in counters.items():
+                if question_id in self._counters:
+                    counter.merge(self._counters[question_id])
+                self._counters[question_id] = counter
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+buffer = Buffer()
+
+
+def record(answers: Iterable[Answer]):
+    """Count committed answers; the flusher writes them out in the background."""
+    buffer.record(answers)
+    flusher.ensure_started()
+
+
+def submission_answers(results: List[dict], first_tries: set, times: Dict[int, Optional[int]]) -> List[Answer]:
+    """
+    Answer events for one graded submission (grading.grade_submission's
+    results): ``first_tries`` are the question ids the user had never
+    answered before, ``times`` the time_ms sent with each.
+    """
+    total = sum(r["is_correct"] for r in results)
+    answers, seen = [], set()
+    for r in results:
+        question_id = r["question_id"]
+        first_try = question_id in first_tries and question_id not in seen
+        seen.add(question_id)
+        rest = (total - r["is_correct"]) / (len(results) - 1) if len(results) > 1 else None
+        answers.append(Answer(question_id, r["selected_index"], r["is_correct"], first_try, times.get(question_id),
+                              rest))
+    return answers
+
+
+def _insert_ignore(dialect: str):
+    insert = postgres_insert if dialect == "postgresql" else sqlite_insert
+    return insert(stats_table).on_conflict_do_nothing(index_elements=[stats_table.c.question_id])
+
+
+def apply(conn, counters: Dict[int, Counter]) -> int:
+    """
+    Add ``counters`` to question_stats in the caller's transaction (rows are
+    created as needed, then read locked, merged and written back; counts for
+    questions no longer in the catalog are dropped). Returns rows written.
+    """
+    now = datetime.utcnow()
+    written = 0
+    ids = sorted(counters)
+    for start in range(0, len(ids), FLUSH_CHUNK):
+        chunk = ids[start:start + FLUSH_CHUNK]
+        existing = conn.execute(select(questions_table.c.id).where(questions_table.c.id.in_(chunk))).scalars().all()
+        if not existing:
+            continue
+        conn.execute(_insert_ignore(conn.dialect.name), [
+            dict(Counter().row(), question_id=question_id, updated_at=now) for question_id in existing])
+        rows = conn.execute(select(stats_table).where(stats_table.c.question_id.in_(existing))
+                            .with_for_update()).mappings().all()
+        merged = []
+        for row in rows:
+            counter = Counter.from_row(row)
+            counter.merge(counters[row["question_id"]])
+            merged.append({f"new_{name}": value for name, value in counter.row().items()}
+                          | {"qid": row["question_id"], "new_updated_at": now})
+        conn.execute(update(stats_table).where(stats_table.c.question_id == bindparam("qid"))
+                     .values({name: bindparam(f"new_{name}") for name in (*Counter.__slots__, "updated_at")}), merged)
+        written += len(merged)
+    return written
+
+
+def flush(engine=None) -> int:
+    """Write this worker's buffered counts; on failure they go back to the buffer."""
+    counters = buffer.drain()
+    if not counters:
+        return 0
+    try:
+        with (engine or database.engine).begin() as conn:
+            return apply(conn, counters)
+    except Exception:
+        buffer.restore(counters)
+        raise
+
+
+class Flusher:
+    """Background thread flushing the buffer every QUESTION_STATS_FLUSH_SECONDS; started on first use."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="question-stats-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                flush()
+            except Exception:
+                logger.exception("Flushing question stats failed; retrying in %.0fs", self.interval)
+
+    def stop(self):
+        """Stop the thread and flush what's left."""
+        self._stop.set()
+        with self._lock:
+            if self._thread is not None:
+                self._thread.join(timeout=self.interval)
+            self._thread = None
+            self._stop.clear()  # a later record() starts it again
+        flush()
+
+
+flusher = Flusher(settings.QUESTION_STATS_FLUSH_SECONDS)
+lifecycle.register_shutdown_hook(flusher.stop)
+
+
+def _quantile(buckets: List[int], q: float) -> Optional[int]:
+    """Time (ms) at quantile ``q``: the geometric middle of the bucket holding it."""
+    total = sum(buckets)
+    if not total:
+        return None
+    rank, seen = q * total, 0
+    for i, count in enumerate(buckets):
+        seen += count
+        if seen >= rank and count:
+            low = TIME_EDGES_MS[i - 1] if i > 0 else TIME_EDGES_MS[0] / 2
+            high = TIME_EDGES_MS[i] if i < len(TIME_EDGES_MS) else TIME_EDGES_MS[-1] * 2
+            return round(math.sqrt(low * high))
+    return None
+
+
+def point_biserial(counter: Counter) -> Optional[float]:
+    n = counter.pb_n
+    if n < 2:
+        return None
+    var_x = n * counter.pb_x - counter.pb_x ** 2  # x is 0/1, so the sum of x^2 is the sum of x
+    var_y = n * counter.pb_yy - counter.pb_y ** 2
+    if var_x <= 0 or var_y <= 1e-12:
+        return None
+    return (n * counter.pb_xy - counter.pb_x * counter.pb_y) / math.sqrt(var_x * var_y)
+
+
+def summarize(question_id: int, lesson_id: int, question: str, correct_index: int, counter: Counter) -> dict:
+    options = counter.option_counts
+    chosen = sum(options)
+    difficulty = counter.first_correct / counter.first_attempts if counter.first_attempts else None
+    discrimination = point_biserial(counter)
+    shares = [round(n / chosen, 4) for n in options] if chosen else []
+    flags = []
+    if difficulty is not None and difficulty > 0.9:
+        flags.append("too_easy")
+    if difficulty is not None and difficulty < 0.3:
+        flags.append("too_hard")
+    if discrimination is not None and discrimination < 0.2:
+        flags.append("low_discrimination")
+    correct_share = shares[correct_index] if correct_index < len(shares) else 0.0
+    if any(share > correct_share for i, share in enumerate(shares) if i != correct_index):
+        flags.append("distractor_beats_answer")
+    return {
+        "question_id": question_id,
+        "lesson_id": lesson_id,
+        "question": question,
+        "correct_index": correct_index,
+        "attempts": counter.attempts,
+        "correct_rate": round(counter.correct / counter.attempts, 4) if counter.attempts else None,
+        "first_attempts": counter.first_attempts,
+        "difficulty": round(difficulty, 4) if difficulty is not None else None,
+        "discrimination": round(discrimination, 4) if discrimination is not None else None,
+        "option_shares": shares,
+        "median_time_ms": _quantile(counter.time_buckets, 0.5),
+        "p90_time_ms": _quantile(counter.time_buckets, 0.9),
+        "flags": flags,
+    }
+
+
+SORTS = ("difficulty", "discrimination", "attempts")
+
+
+def ranking(db, lesson_id: Optional[int] = None, sort: str = "difficulty", min_attempts: int = 0,
+            limit: int = 100) -> List[dict]:
+    """
+    Question stats as flushed to the table, hardest (difficulty), least
+    discriminating (discrimination) or most answered (attempts) first.
+    Questions with fewer than ``min_attempts`` first tries are left out;
+    those without a value to sort by come last.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {list(SORTS)}")
+    query = (select(stats_table, questions_table.c.question, questions_table.c.correct_answer,
+                    models.LessonContent.lesson_id)
+             .join(questions_table, questions_table.c.id == stats_table.c.question_id)
+             .join(models.LessonContent, models.LessonContent.id == questions_table.c.lesson_content_id)
+             .where(stats_table.c.first_attempts >= min_attempts))
+    if lesson_id is not None:
+        query = query.where(models.LessonContent.lesson_id == lesson_id)
+    rows = [summarize(row["question_id"], row["lesson_id"], row["question"], row["correct_answer"] or 0,
+                      Counter.from_row(row)) for row in db.execute(query).mappings()]
+    if sort == "attempts":
+        rows.sort(key=lambda r: (-r["attempts"], r["question_id"]))
+    else:
+        rows.sort(key=lambda r: (r[sort] is None, r[sort] if r[sort] is not None else 0.0, r["question_id"]))
+    return rows[:limit]
@@ -0,0 +1,147 @@
+"""
+Read replicas: balancing and lag-based ejection.
+
+A ReplicaSet holds the engines reads may go to (Postgres streaming replicas,
+or on SQLite the tuned reader pool / stand-in copies). ``pick()`` returns a
+healthy engine by round robin or least connections (connections currently
+checked out of that engine's pool), or None when every replica is ejected and
+reads must fall back to the primary.
+
+Health is checked lazily on the request path: at most once per
+``check_interval`` per replica, by whichever thread gets there first, so no
+background thread is needed in each worker. A replica whose lag exceeds
+``max_lag`` seconds, whose probe fails, or whose connection drops mid-query
+is ejected until a later check passes.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction, but 0 when the replica has
+# replayed everything it received (an idle primary isn't lag).
+POSTGRES_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def measure_lag(engine) -> float:
+    """Replication lag in seconds; other dialects only prove the replica answers."""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            return float(conn.execute(text(POSTGRES_LAG_SQL)).scalar() or 0.0)
+        conn.execute(text("SELECT 1"))
+        return 0.0
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.lag = 0.0
+        self.error: Optional[str] = None
+        self.checked_at = 0.0
+        self.in_use = 0
+        self.lock = threading.Lock()
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "handle_error", self._on_error)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.in_use += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.in_use = max(self.in_use - 1, 0)
+
+    def _on_error(self, context):
+        if context.is_disconnect:
+            self.eject(f"disconnect: {context.original_exception}")
+
+    def eject(self, reason: str):
+        if self.healthy:
+            logger.warning("Ejecting replica %s: %s", self.engine.url.render_as_string(hide_password=True), reason)
+        self.healthy = False
+        self.error = reason
+        self.checked_at = time.monotonic()
+
+
+class ReplicaSet:
+    def __init__(self, engines: List, mode: str = "round_robin", max_lag: float = 5.0,
+                 check_interval: float = 2.0, lag_probe: Callable = measure_lag):
+        if mode not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica balancing mode: {mode}")
+        self.replicas = [Replica(e) for e in engines]
+        self.mode = mode
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag_probe = lag_probe
+        self._counter = itertools.count()
+
+    @property
+    def engines(self):
+        return [r.engine for r in self.replicas]
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def check(self, replica: Replica, force: bool = False):
+        # Non-blocking: if another thread is already probing, use the last result.
+        if not replica.lock.acquire(blocking=False):
+            return
+        try:
+            if not force and time.monotonic() - replica.checked_at < self.check_interval:
+                return
+            try:
+                lag = self.lag_probe(replica.engine)
+            except Exception as e:
+                replica.eject(f"health check failed: {e.__class__.__name__}: {e}")
+                return
+            replica.lag = lag
+            if lag > self.max_lag:
+                replica.eject(f"lag {lag:.1f}s > {self.max_lag:.1f}s")
+                return
+            if not replica.healthy:
+                logger.info("Replica %s is back (lag %.1fs)",
+                            replica.engine.url.render_as_string(hide_password=True), lag)
+            replica.healthy = True
+            replica.error = None
+            replica.checked_at = time.monotonic()
+        finally:
+            replica.lock.release()
+
+    def pick(self):
+        """A healthy replica engine, or None to read from the primary."""
+        now = time.monotonic()
+        for replica in self.replicas:
+            if now - replica.checked_at >= self.check_interval:
+                self.check(replica)
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        if self.mode == "least_connections":
+            return min(healthy, key=lambda r: r.in_use).engine
+        return healthy[next(self._counter) % len(healthy)].engine
+
+    def status(self) -> List[dict]:
+        return [{
+            "url": r.engine.url.render_as_string(hide_password=True),
+            "healthy": r.healthy,
+            "lag_seconds": round(r.lag, 3),
+            "in_use": r.in_use,
+            "error": r.error,
+        } for r in self.replicas]
+
+    def dispose(self, close: bool = True):
+        for r in self.replicas:
+            r.engine.dispose(close=close)
+            r.in_use = 0
@@ -0,0 +1,184 @@
+"""
+Local retrieval for tutor prompts.
+
+The catalog's flattened text (search_documents: lesson descriptions, content
+items, quiz questions and explanations) is split into chunks of about
+CHUNK_WORDS words and indexed as a BM25-weighted sparse matrix: the weight of
+every (chunk, term) pair is computed once at build time, stored column-major
+(CSC), so scoring a question is just summing the columns of its terms. The
+index is built in-process with NumPy/SciPy, cached per catalog version and
+rebuilt lazily after a catalog change, so nothing leaves the server. SciPy is
+imported by the first build, not when workers start.
+
+``build_context`` picks the best chunks that fit the token budget; the
+prompt then carries a few hundred tokens instead of a whole lesson.
+"""
+
+import re
+from collections import Counter
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from . import models
+from .cache_bus import VersionedCache
+
+CHUNK_WORDS = 120
+K1, B = 1.2, 0.75
+# Chunks from the lesson the learner is on score this much higher.
+LESSON_BOOST = 1.5
+# Terms in at least this fraction of chunks are also kept as dense columns
+# (adding a dense vector beats scattering a long sparse column), within a
+# memory cap.
+DENSE_FRACTION = 0.05
+DENSE_MAX_BYTES = 64 * 1024 * 1024
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its of on or so "
+    "than that the their then there these they this to was what when where which who why will with you "
+    "your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TERM_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; good enough for a budget.
+    return len(text) // 4 + 1
+
+
+class Chunk(NamedTuple):
+    lesson_id: int
+    content_id: Optional[int]
+    title: str
+    text: str
+    tokens: int
+
+
+def split_text(text: str, words: int = CHUNK_WORDS) -> List[str]:
+    """Pack paragraphs into chunks of at most ``words`` words, splitting longer paragraphs."""
+    chunks, current, size = [], [], 0
+    for paragraph in (p.split() for p in re.split(r"\n\s*\n|\n", text or "")):
+        while len(paragraph) > words:
+            if current:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+            chunks.append(" ".join(paragraph[:words]))
+            paragraph = paragraph[words:]
+        if size + len(paragraph) > words and current:
+            chunks.append(" ".join(current))
+            current, size = [], 0
+        current.extend(paragraph)
+        size += len(paragraph)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class RetrievalIndex:
+    def __init__(self, chunks: List[Chunk]):
+        from scipy import sparse
+
+        # Grouped by lesson so a lesson's chunks are one slice (see _lesson_slice).
+        self.chunks = chunks = sorted(chunks, key=lambda c: c.lesson_id)
+        self.lesson_ids = np.array([c.lesson_id for c in chunks], dtype=np.int64)
+        self.vocabulary = {}
+        indptr, indices, counts = [0], [], []
+        for chunk in chunks:
+            tf = Counter(tokenize(f"{chunk.title} {chunk.text}"))
+            indices.extend(self.vocabulary.setdefault(term, len(self.vocabulary)) for term in tf)
+            counts.extend(tf.values())
+            indptr.append(len(indices))
+        n, v = len(chunks), len(self.vocabulary)
+        tf = sparse.csr_matrix((np.array(counts, dtype=np.float32), np.array(indices, dtype=np.int32),
+                                np.array(indptr, dtype=np.int64)), shape=(n, v))
+        lengths = np.asarray(tf.sum(axis=1)).ravel()
+        norm = K1 * (1 - B + B * lengths / max(lengths.mean() if n else 0.0, 1.0))
+        df = np.bincount(tf.indices, minlength=v)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        rows = np.repeat(np.arange(n), np.diff(tf.indptr))
+        tf.data = (idf[tf.indices] * tf.data * (K1 + 1) / (tf.data + norm[rows])).astype(np.float32)
+        self.weights = tf.tocsc()
+
+        common = np.flatnonzero(df >= max(n * DENSE_FRACTION, 1))
+        common = common[np.argsort(-df[common], kind="stable")][:DENSE_MAX_BYTES // (4 * max(n, 1))]
+        self.dense_rows = {int(term): row for row, term in enumerate(common)}
+        self.dense = self.weights[:, common].T.toarray() if len(common) else np.zeros((0, n), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def _lesson_slice(self, lesson_id: int) -> slice:
+        return slice(np.searchsorted(self.lesson_ids, lesson_id, "left"),
+                     np.searchsorted(self.lesson_ids, lesson_id, "right"))
+
+    def scores(self, question: str, lesson_id: Optional[int] = None) -> np.ndarray:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        w = self.weights
+        for term in {self.vocabulary[t] for t in tokenize(question) if t in self.vocabulary}:
+            row = self.dense_rows.get(term)
+            if row is not None:
+                scores += self.dense[row]
+            else:
+                # A column's row indices are unique, so a fancy-index add is safe.
+                start, end = w.indptr[term], w.indptr[term + 1]
+                scores[w.indices[start:end]] += w.data[start:end]
+        if lesson_id is not None:
+            scores[self._lesson_slice(lesson_id)] *= LESSON_BOOST
+        return scores
+
+    def top(self, question: str, k: int, token_budget: int, lesson_id: Optional[int] = None) -> List[Chunk]:
+        """The best-scoring chunks, at most ``k`` and ``token_budget`` tokens in total, best first."""
+        scores = self.scores(question, lesson_id)
+        n = len(scores)
+        # Look a little past k so chunks too large for the remaining budget can be skipped.
+        shortlist = min(n, 4 * k)
+        if not shortlist:
+            return []
+        best = np.argpartition(scores, n - shortlist)[n - shortlist:]
+        best = best[scores[best] > 0]
+        picked, used = [], 0
+        for i in best[np.argsort(-scores[best], kind="stable")]:
+            chunk = self.chunks[i]
+            if used + chunk.tokens > token_budget:
+                continue
+            picked.append(chunk)
+            used += chunk.tokens
+            if len(picked) == k:
+                break
+        return picked
+
+
+def load_chunks(db) -> List[Chunk]:
+    chunks = []
+    rows = db.execute(select(models.SearchDocument.lesson_id, models.SearchDocument.content_id,
+                             models.SearchDocument.title, models.SearchDocument.body)
+                      .order_by(models.SearchDocument.id))
+    for lesson_id, content_id, title, body in rows:
+        for text in split_text(body):
+            chunks.append(Chunk(lesson_id, content_id, title or "", text, estimate_tokens(f"{title}: {text}")))
+    return chunks
+
+
+index_cache = VersionedCache("catalog", maxsize=1)
+
+
+def get_index(db) -> RetrievalIndex:
+    return index_cache.get("index", lambda: RetrievalIndex(load_chunks(db)))
+
+
+def build_context(db, question: str, lesson_id: Optional[int], k: int, token_budget: int):
+    """``(context, chunks)`` for a tutor question; context is None when nothing relevant is found."""
+    chunks = get_index(db).top(question, k, token_budget, lesson_id)
+    if not chunks:
+        return None, []
+    return "\n\n".join(f"{c.title}: {c.text}" for c in chunks), chunks
+
+
+def truncate_to_budget(text: str, token_budget: int) -> str:
+    limit = token_budget * 4
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + "..."
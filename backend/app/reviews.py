@@ -0,0 +1,175 @@
+"""
+Spaced-repetition review of quiz questions (SM-2).
+
+Every quiz question a user answers becomes a review card (review_cards): an
+ease factor, the current interval, how many correct answers in a row and
+when the card is next due. Each answer, in a lesson quiz or in review, is
+graded 0-5 (3-5 correct, 0-2 wrong) and reschedules the card with the SM-2
+step: a wrong answer restarts the card at one day; a correct one goes 1 day,
+6 days, then the previous interval times the ease, and adjusts the ease by
+the grade (never below 1.3).
+
+The step runs in SQL as one INSERT ... ON CONFLICT DO UPDATE against the
+stored row, so answering needs no read first; due_at is Unix seconds so the
+date math is the same on SQLite and Postgres. The due queue is a range scan
+of ix_review_cards_user_due (user_id, due_at): O(log n + limit) however many
+cards a user has.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, case, cast, func, select
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import achievements, grading, models, question_stats, streaks
+from .cache_bus import publish
+from .database import use_primary
+from .sharding import use_shard
+
+cards = models.ReviewCard.__table__
+
+DAY = 86400
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+CORRECT_QUALITY = 4  # "correct, after some hesitation" when the client doesn't grade itself
+WRONG_QUALITY = 1
+
+
+def quality_for(correct: bool, quality: Optional[int] = None) -> int:
+    """The SM-2 grade of an answer: ``quality`` clamped to the side of 3 that ``correct`` puts it on."""
+    if correct:
+        return CORRECT_QUALITY if quality is None else min(max(quality, 3), 5)
+    return WRONG_QUALITY if quality is None else min(max(quality, 0), 2)
+
+
+def ease_change(quality: int) -> float:
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+
+def _epoch(now: datetime) -> int:
+    return int((now - datetime(1970, 1, 1)).total_seconds())
+
+
+def _upsert(dialect: str, returning: bool):
+    insert = postgres_insert if dialect == "postgresql" else sqlite_insert
+    greatest = func.greatest if dialect == "postgresql" else func.max  # two-argument max() is scalar in SQLite
+    stmt = insert(cards)
+    old, new = cards.c, stmt.excluded
+    passed = new.repetitions > 0
+    interval = case((~passed, 1), (old.repetitions == 0, 1), (old.repetitions == 1, 6),
+                    else_=cast(func.round(old.interval_days * old.ease), Integer))
+    stmt = stmt.on_conflict_do_update(index_elements=[old.user_id, old.question_id], set_={
+        "repetitions": case((passed, old.repetitions + 1), else_=0),
+        "interval_days": interval,
+        # SM-2 leaves the ease alone on a lapse
+        "ease": case((passed, greatest(MIN_EASE, old.ease + new.ease - INITIAL_EASE)), else_=old.ease),
+        "lapses": old.lapses + new.lapses,
+        "reviews": old.reviews + 1,
+        "due_at": new.due_at - DAY + interval * DAY,
+        "last_reviewed_at": new.last_reviewed_at,
+    })
+    return stmt.returning(*cards.c) if returning else stmt
+
+
+_upserts = {(dialect, returning): _upsert(dialect, returning)
+            for dialect in ("sqlite", "postgresql") for returning in (False, True)}
+
+
+def _first_review(user_id: int, question_id: int, quality: int, now: datetime) -> dict:
+    """
+    The row for a card answered for the first time. On a conflict the same
+    values carry the answer into the update: repetitions > 0 means it passed,
+    ease - INITIAL_EASE is the ease change, lapses the lapse increment and
+    due_at - DAY the time of the answer.
+    """
+    passed = quality >= 3
+    return {
+        "user_id": user_id,
+        "question_id": question_id,
+        "ease": max(MIN_EASE, INITIAL_EASE + ease_change(quality)) if passed else INITIAL_EASE,
+        "interval_days": 1,
+        "repetitions": 1 if passed else 0,
+        "lapses": 0 if passed else 1,
+        "reviews": 1,
+        "due_at": _epoch(now) + DAY,
+        "last_reviewed_at": now,
+    }
+
+
+def record_reviews(db: Session, user_id: int, graded: Iterable[Tuple[int, int]], now: Optional[datetime] = None):
+    """
+    Reschedule the user's cards for ``graded`` (question id, quality) pairs in
+    the caller's transaction (already pinned to the user's shard and the
+    primary); a question answered twice in one batch counts once, last answer.
+    """
+    now = now or datetime.utcnow()
+    latest: Dict[int, int] = dict(graded)
+    if not latest:
+        return
+    dialect = db.get_bind(models.ReviewCard.__mapper__).dialect.name
+    db.execute(_upserts[dialect, False],
+               [_first_review(user_id, question_id, quality, now) for question_id, quality in latest.items()])
+
+
+def answer(db: Session, user_id: int, question_id: int, selected_index: int,
+           quality: Optional[int] = None, time_ms: Optional[int] = None) -> dict:
+    """Grade one review answer, reschedule its card and count it toward the streak."""
+    entry = grading.get_answer_key(db).questions.get(question_id)
+    if entry is None:
+        raise LookupError(f"Question {question_id} not found")
+    if not 0 <= selected_index < max(entry.option_count, 1):
+        raise grading.GradingError(f"Answer index out of range for question {question_id}")
+    correct = selected_index == entry.correct_index
+    grade = quality_for(correct, quality)
+
+    use_primary(use_shard(db, user_id))
+    if db.get(models.User, user_id) is None:
+        raise LookupError(f"User {user_id} not found")
+    dialect = db.get_bind(models.ReviewCard.__mapper__).dialect.name
+    now = datetime.utcnow()
+    card = db.execute(_upserts[dialect, True], _first_review(user_id, question_id, grade, now)).mappings().one()
+    advanced = streaks.record_activity(db, user_id)
+    if advanced:
+        achievements.record(db, user_id, achievements.STREAK_EXTENDED)
+    db.commit()
+    # A review is never a first try: the card came from an earlier answer
+    question_stats.record([question_stats.Answer(question_id, selected_index, correct, False, time_ms)])
+    if advanced:
+        publish("leaderboard")
+    return {"question_id": question_id, "is_correct": correct, "correct_index": entry.correct_index,
+            "explanation": entry.explanation, "quality": grade, "card": card_response(card)}
+
+
+def card_response(card) -> dict:
+    return {"question_id": card["question_id"], "ease": round(card["ease"], 3),
+            "interval_days": card["interval_days"], "repetitions": card["repetitions"], "lapses": card["lapses"],
+            "reviews": card["reviews"], "due_at": datetime.utcfromtimestamp(card["due_at"])}
+
+
+def due_cards(db: Session, user_id: int, limit: int = 20, now: Optional[datetime] = None) -> dict:
+    """The user's most overdue cards (at most ``limit``) with their questions, and when the next card not yet due is."""
+    now_s = _epoch(now or datetime.utcnow())
+    use_shard(db, user_id)
+    rows = db.execute(select(cards).where(cards.c.user_id == user_id, cards.c.due_at <= now_s)
+                      .order_by(cards.c.due_at).limit(limit)).mappings().all()
+    next_due = db.execute(select(func.min(cards.c.due_at))
+                          .where(cards.c.user_id == user_id, cards.c.due_at > now_s)).scalar()
+    questions = {}
+    if rows:
+        questions = {q.id: q for q in db.execute(
+            select(models.QuizQuestion.id, models.QuizQuestion.question, models.QuizQuestion.options,
+                   models.LessonContent.lesson_id)
+            .join(models.LessonContent, models.QuizQuestion.lesson_content_id == models.LessonContent.id)
+            .where(models.QuizQuestion.id.in_([r["question_id"] for r in rows])))}
+    due: List[dict] = []
+    for row in rows:
+        question = questions.get(row["question_id"])
+        if question is None:  # removed from the catalog since
+            continue
+        due.append(dict(card_response(row), lesson_id=question.lesson_id, question=question.question,
+                        options=grading.decode_json(question.options) or []))
+    return {"user_id": user_id, "due": due,
+            "next_due_at": datetime.utcfromtimestamp(next_due) if next_due is not None else None}
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+
+from .. import achievements, schemas
+
+router = APIRouter(
+    prefix="/achievements",
+    tags=["achievements"],
+)
+
+@router.get("", response_model=list[schemas.Achievement])
+def list_achievements():
+    """Every badge that can be earned; a user's are at GET /users/{id}/badges"""
+    return [achievements.catalog_entry(rule) for rule in achievements.RULES]
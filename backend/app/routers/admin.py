@@ -0,0 +1,95 @@
+from datetime import date, datetime, time
+from typing import List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from .. import analytics, completion, crud, export, jobs, question_stats, schemas
+from ..config import settings
+from ..database import user_databases
+from ..dependencies import get_db
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+@router.get("/jobs/metrics")
+def job_metrics():
+    """Background job queue depth and lag per database and job type, and this worker's counters"""
+    return jobs.runner.metrics()
+
+@router.get("/completions/lessons")
+def lesson_completion_counts():
+    """Users who completed each lesson, from the completion matrix (up to COMPLETION_MATRIX_TTL old)"""
+    matrix = completion.get_matrix()
+    counts = completion.lesson_counts(matrix)
+    return {"users": matrix.users_total, "as_of": matrix.loaded_at,
+            "lessons": [{"lesson_id": lesson_id, "completed": n} for lesson_id, n in sorted(counts.items())]}
+
+@router.get("/completions/users")
+def users_by_completion(
+    completed: List[int] = Query([], description="lesson ids the users must all have completed"),
+    not_completed: List[int] = Query([], description="lesson ids the users must not have completed"),
+    limit: int = Query(100, ge=0, le=10000),
+):
+    """Users who completed every lesson in ``completed`` and none in ``not_completed``: the count and the first ``limit`` ids"""
+    if not completed:
+        raise HTTPException(status_code=400, detail="Give at least one completed lesson id")
+    if any(lesson_id < 0 for lesson_id in completed + not_completed):
+        raise HTTPException(status_code=400, detail="Lesson ids must be non-negative")
+    matrix = completion.get_matrix()
+    user_ids = completion.matching_users(matrix, completed, not_completed)
+    return {"count": len(user_ids), "as_of": matrix.loaded_at, "user_ids": user_ids[:limit].tolist()}
+
+@router.get("/analytics/funnel")
+def lesson_funnel(db: Session = Depends(get_db)):
+    """Per-lesson starts, completions, progress histogram and median time to complete, in course order"""
+    report = analytics.get_funnel().report()
+    return analytics.lesson_funnel(report, crud.get_lesson_outline(db))
+
+@router.get("/questions/stats", response_model=List[schemas.QuestionStats])
+def question_rankings(
+    lesson_id: Optional[int] = None,
+    sort: str = Query("difficulty", pattern="^(difficulty|discrimination|attempts)$"),
+    min_attempts: int = Query(20, ge=0, description="first tries a question needs to be ranked"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Quiz questions by difficulty (hardest first), discrimination (weakest first) or attempts, with flags for authors"""
+    question_stats.flush()  # this worker's counts; other workers' arrive within QUESTION_STATS_FLUSH_SECONDS
+    return question_stats.ranking(db, lesson_id=lesson_id, sort=sort, min_attempts=min_attempts, limit=limit)
+
+@router.get("/export/{table}")
+def export_table(
+    table: str,
+    format: str = Query("csv", description="csv or parquet"),
+    compression: str = Query("none", description="none, gzip or zstd"),
+    since: Optional[Union[datetime, date]] = Query(None, description="created_at (users) / updated_at (user_progress) from"),
+    until: Optional[Union[datetime, date]] = Query(None, description="... and before"),
+    active: Optional[bool] = Query(None, description="only active (true) or inactive (false) users' rows"),
+    after_user_id: Optional[int] = Query(None, description="resume after the row (after_user_id, after_id)"),
+    after_id: int = Query(0),
+):
+    """
+    Stream users or user_progress as CSV or Parquet, ordered by (user_id, id).
+    To resume an interrupted download, pass the user id and id of the last row received.
+    """
+    try:
+        export.check_options(table, format, compression)
+    except export.ExportError as exc:
+        raise HTTPException(status_code=404 if table not in export.TABLES else 400, detail=str(exc))
+    since, until = (datetime.combine(d, time()) if type(d) is date else d for d in (since, until))
+    after = None if after_user_id is None else (after_user_id, after_id)
+    chunks = export.iter_chunks(user_databases(), table, chunk_size=settings.EXPORT_CHUNK_SIZE,
+                                since=since, until=until, active=active, after=after)
+    if format == "parquet":
+        body, media_type = export.parquet_stream(chunks, table, compression), "application/vnd.apache.parquet"
+    else:
+        # A resumed download continues the previous one's file, so no second header
+        body = export.csv_stream(chunks, table, compression, header=after is None)
+        media_type = "text/csv" if compression == "none" else f"application/{compression}"
+    filename = export.file_name(table, format, compression)
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
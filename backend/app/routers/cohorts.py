@@ -0,0 +1,53 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from .. import leaderboards, schemas
+from ..dependencies import get_db
+
+router = APIRouter(
+    prefix="/cohorts",
+    tags=["cohorts"],
+)
+
+@router.post("", response_model=schemas.Cohort)
+def create_cohort(cohort: schemas.CohortCreate, db: Session = Depends(get_db)):
+    try:
+        return leaderboards.create_cohort(db, cohort.name, cohort.user_ids)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{cohort_id}", response_model=schemas.Cohort)
+def read_cohort(cohort_id: int, db: Session = Depends(get_db)):
+    cohort = leaderboards.get_cohort(db, cohort_id)
+    if cohort is None:
+        raise HTTPException(status_code=404, detail="Cohort not found")
+    return cohort
+
+@router.post("/{cohort_id}/members", response_model=schemas.MembersAdded)
+def add_members(cohort_id: int, payload: schemas.CohortMembers, db: Session = Depends(get_db)):
+    try:
+        added = leaderboards.add_members(db, cohort_id, payload.user_ids)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"cohort_id": cohort_id, "added": added}
+
+@router.delete("/{cohort_id}/members/{user_id}", status_code=204)
+def remove_member(cohort_id: int, user_id: int, db: Session = Depends(get_db)):
+    if not leaderboards.remove_member(db, cohort_id, user_id):
+        raise HTTPException(status_code=404, detail="Not a member of this cohort")
+
+# Served from the worker's cached board (see app/leaderboards.py); user_id adds that member's rank
+@router.get("/{cohort_id}/leaderboard", response_model=schemas.CohortLeaderboard)
+def cohort_leaderboard(
+    cohort_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    board = leaderboards.cohort_leaderboard(db, cohort_id, limit=limit, offset=offset, user_id=user_id)
+    if board is None:
+        raise HTTPException(status_code=404, detail="Cohort not found")
+    return board
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from .. import schemas, simulation
+from ..dependencies import get_db
+
+router = APIRouter(
+    prefix="/interactive",
+    tags=["interactive"],
+)
+
+@router.post("/{content_id}/simulate", response_model=schemas.SimulationResult)
+def simulate(content_id: int, request: schemas.SimulationRequest, db: Session = Depends(get_db)):
+    """Simulate the content's market and compare portfolios across the paths (cached by parameters)"""
+    try:
+        return simulation.run(db, content_id, request.model_dump())
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
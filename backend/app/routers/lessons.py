@@ -2,17 +2,23 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
-from .. import models, schemas, crud
+from .. import models, schemas, crud, grading
+from ..cache_bus import VersionedCache
 from ..dependencies import get_db
 
 router = APIRouter()
 
+# Lesson list responses, invalidated on every worker when the catalog changes
+catalog_cache = VersionedCache("catalog")
+
 @router.get("/lessons", response_model=List[schemas.LessonResponse])
 def get_lessons(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Get all available lessons"""
-    lessons = crud.get_lessons(db, skip=skip, limit=limit)
-    # Explicitly convert to Pydantic models to avoid any lazy-load issues during serialization
-    return [schemas.LessonResponse.model_validate(l, from_attributes=True) for l in lessons]
+    def load():
+        lessons = crud.get_lessons(db, skip=skip, limit=limit)
+        # Explicitly convert to Pydantic models to avoid any lazy-load issues during serialization
+        return [schemas.LessonResponse.model_validate(l, from_attributes=True) for l in lessons]
+    return catalog_cache.get(f"lessons:{skip}:{limit}", load)
 
 @router.get("/lessons/{lesson_id}", response_model=schemas.LessonResponse)
 def get_lesson(lesson_id: int, db: Session = Depends(get_db)):
@@ -27,6 +33,18 @@ def create_lesson(lesson: schemas.LessonCreate, db: Session = Depends(get_db)):
     """Create a new lesson"""
     return crud.create_lesson(db=db, lesson=lesson)
 
+@router.post("/lessons/{lesson_id}/quiz/submit", response_model=schemas.QuizSubmissionResult)
+def submit_quiz(lesson_id: int, submission: schemas.QuizSubmission, db: Session = Depends(get_db)):
+    """Grade a batch of quiz answers; with a user_id, record the attempts and award XP"""
+    try:
+        return grading.grade_submission(
+            db, lesson_id, submission.user_id, [answer.model_dump() for answer in submission.answers]
+        )
+    except grading.GradingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.get("/users/{user_id}/progress", response_model=List[schemas.UserProgressResponse])
 def get_user_progress(user_id: int, db: Session = Depends(get_db)):
     """Get user's progress for all lessons"""
@@ -0,0 +1,41 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from .. import prices, schemas
+
+router = APIRouter(
+    prefix="/prices",
+    tags=["prices"],
+)
+
+@router.get("", response_model=list[schemas.PriceSymbol])
+def list_symbols():
+    """Symbols in the price store with their row counts and date ranges"""
+    return [prices.store.info(symbol) for symbol in prices.store.symbols()]
+
+@router.get("/{symbol}", response_model=schemas.PriceSeries)
+def read_prices(
+    symbol: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: str = Query("daily", pattern="^(daily|weekly|monthly)$"),
+):
+    """Bars of one symbol from start through end (inclusive), resampled to the interval"""
+    try:
+        series = prices.resample(prices.store.series(symbol, start, end), interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {
+        "symbol": series.symbol,
+        "interval": interval,
+        "timestamps": series.timestamp.astype(str).tolist(),
+        "open": series.open.tolist(),
+        "high": series.high.tolist(),
+        "low": series.low.tolist(),
+        "close": series.close.tolist(),
+        "volume": series.volume.tolist(),
+    }
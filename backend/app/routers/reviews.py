@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from .. import grading, reviews, schemas
+from ..dependencies import get_db
+
+router = APIRouter(
+    prefix="/reviews",
+    tags=["reviews"],
+)
+
+@router.get("/due", response_model=schemas.DueReviews)
+def due_reviews(
+    user_id: int = Query(...),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Quiz questions due for review, most overdue first (answers are not included)"""
+    return reviews.due_cards(db, user_id, limit=limit)
+
+@router.post("/answer", response_model=schemas.ReviewAnswerResult)
+def answer_review(answer: schemas.ReviewAnswer, db: Session = Depends(get_db)):
+    """Grade a review answer and reschedule the question (SM-2)"""
+    try:
+        return reviews.answer(db, answer.user_id, answer.question_id, answer.selected_index, answer.quality,
+                              answer.time_ms)
+    except grading.GradingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from .. import schemas, search
+from ..cache_bus import VersionedCache
+from ..dependencies import get_db
+
+router = APIRouter()
+
+# Result pages, dropped on every worker when the catalog changes
+search_cache = VersionedCache("catalog", maxsize=2048)
+
+@router.get("/search", response_model=schemas.SearchResponse)
+def search_lessons(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Search lesson titles, descriptions, content and quiz explanations, best match first"""
+    terms = " ".join(search.query_terms(q))
+    results = search_cache.get(f"{terms}:{skip}:{limit}", lambda: search.search(db, terms, limit=limit, skip=skip))
+    return {"query": q, "results": results}
@@ -1,20 +1,31 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional
-import google.generativeai as genai
+from sqlalchemy.orm import Session
+from typing import List, Optional
 
+from .. import retrieval
 from ..config import settings
+from ..dependencies import get_db
 
 router = APIRouter(tags=["tutor"]) 
 
 class AskRequest(BaseModel):
     question: str
-    context: Optional[str] = None
+    lesson_id: Optional[int] = None  # favour chunks from the lesson the learner is on
+    context: Optional[str] = None  # only used (trimmed) when nothing relevant is retrieved
+
+class TutorSource(BaseModel):
+    lesson_id: int
+    content_id: Optional[int] = None
+    title: str
 
 class AskResponse(BaseModel):
     answer: str
+    sources: List[TutorSource] = []
 
-# Initialize Gemini client lazily
+# Initialize Gemini client lazily. The SDK (and its grpc/protobuf tree) is only
+# imported on the first tutor call so workers, tests and scripts start fast.
 _model = None
 
 def get_model():
@@ -22,6 +33,7 @@ def get_model():
     if _model is None:
         if not settings.GEMINI_API_KEY:
             raise HTTPException(status_code=500, detail="Gemini API key is not configured on the server")
+        import google.generativeai as genai
         genai.configure(api_key=settings.GEMINI_API_KEY)
         # Use configured Gemini model (default: gemini-1.5-flash)
         model_name = settings.GEMINI_MODEL or "gemini-1.5-flash"
@@ -29,11 +41,17 @@ def get_model():
     return _model
 
 @router.post("/tutor/ask", response_model=AskResponse)
-async def ask_tutor(req: AskRequest) -> AskResponse:
+async def ask_tutor(req: AskRequest, db: Session = Depends(get_db)) -> AskResponse:
     """Ask the AI tutor a concise question. Returns a short, focused answer."""
     try:
         model = get_model()
-        prompt = req.question if not req.context else f"Context: {req.context}\n\nQuestion: {req.question}\n\nAnswer concisely:"
+        context, chunks = await run_in_threadpool(
+            retrieval.build_context, db, req.question, req.lesson_id,
+            settings.TUTOR_CONTEXT_CHUNKS, settings.TUTOR_CONTEXT_TOKENS,
+        )
+        if context is None and req.context:
+            context = retrieval.truncate_to_budget(req.context, settings.TUTOR_CONTEXT_TOKENS)
+        prompt = req.question if not context else f"Context: {context}\n\nQuestion: {req.question}\n\nAnswer concisely:"
         result = await model.generate_content_async(prompt)
         # Extract text; fall back to empty string
         text = getattr(result, "text", None)
@@ -43,7 +61,8 @@ async def ask_tutor(req: AskRequest) -> AskResponse:
         trimmed = text.strip()
         if len(trimmed) > 1200:
             trimmed = trimmed[:1200].rstrip() + "..."
-        return AskResponse(answer=trimmed)
+        sources = [TutorSource(lesson_id=c.lesson_id, content_id=c.content_id, title=c.title) for c in chunks]
+        return AskResponse(answer=trimmed, sources=sources)
     except HTTPException:
         raise
     except Exception as e:
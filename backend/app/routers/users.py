@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+from collections import Counter
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
+from .. import achievements, completion, crud, leaderboards, provisioning, schemas
+from ..cache_bus import VersionedCache
+from ..config import settings
 from ..dependencies import get_db
 
 router = APIRouter(
@@ -9,15 +15,26 @@ router = APIRouter(
     tags=["users"],
 )
 
+# Leaderboard responses (polled every 5s by every open client), invalidated on XP/streak changes
+leaderboard_cache = VersionedCache("leaderboard")
+
 @router.post("/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    db_user_by_username = crud.get_user_by_username(db, username=user.username)
-    if db_user_by_username:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    # The unique username/email indexes reject duplicates; no lookups first
+    try:
+        return crud.create_user(db=db, username=user.username, email=user.email, password=user.password)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email or username already registered")
+
+# Create a class of accounts at once; one result per row
+@router.post(":bulk", response_model=schemas.BulkUserResponse)
+def create_users_bulk(payload: schemas.BulkUserCreate, db: Session = Depends(get_db)):
+    results = provisioning.provision_users(db, payload.users, batch_size=settings.USER_IMPORT_BATCH_SIZE,
+                                           hash_workers=settings.PASSWORD_HASH_WORKERS)
+    counts = Counter(r["status"] for r in results)
+    return {"created": counts["created"], "existing": counts["exists"], "duplicates": counts["duplicate"],
+            "invalid": counts["invalid"], "results": results}
 
 @router.get("/", response_model=list[schemas.User])
 def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -27,31 +44,72 @@ def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
 # Leaderboard: Top users by XP
 @router.get("/leaderboard", response_model=list[schemas.User])
 def get_leaderboard(limit: int = 10, db: Session = Depends(get_db)):
-    users = crud.get_leaderboard(db, limit=limit)
-    return users
+    def load():
+        return [schemas.User.model_validate(u, from_attributes=True) for u in crud.get_leaderboard(db, limit=limit)]
+    return leaderboard_cache.get(limit, load)
 
-# Set a user's total XP (used to sync XP to DB)
-@router.post("/{user_id}/xp", response_model=schemas.User)
-def set_user_xp(user_id: int, payload: dict, db: Session = Depends(get_db)):
-    xp_points = payload.get("xp_points")
-    if not isinstance(xp_points, int) or xp_points < 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="xp_points must be a non-negative integer")
-    user = crud.set_user_xp(db, user_id=user_id, xp_points=xp_points)
+# Record client-side activity (the daily challenge) toward the streak
+@router.post("/{user_id}/activity", response_model=schemas.User)
+def record_activity(user_id: int, db: Session = Depends(get_db)):
+    user = crud.record_user_activity(db, user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-# Set a user's current streak days
-@router.post("/{user_id}/streak", response_model=schemas.User)
-def set_user_streak(user_id: int, payload: dict, db: Session = Depends(get_db)):
-    streak_days = payload.get("streak_days")
-    if not isinstance(streak_days, int) or streak_days < 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="streak_days must be a non-negative integer")
-    user = crud.set_user_streak(db, user_id=user_id, streak_days=streak_days)
+# Streaks are computed by the server now (app/streaks.py); older clients still
+# push theirs here, so this returns the user without writing anything.
+@router.post("/{user_id}/streak", response_model=schemas.User, deprecated=True)
+def set_user_streak(user_id: int, db: Session = Depends(get_db)):
+    user = crud.get_user(db, user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+# Completed lessons as a packed bitmap (see app/completion.py)
+@router.get("/{user_id}/completions", response_model=schemas.CompletionBitmap)
+def read_completions(user_id: int, db: Session = Depends(get_db)):
+    user = crud.get_user_with_completions(db, user_id=user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    bitmap = user.completed_lessons
+    return {"user_id": user_id, "bitmap": base64.b64encode(bitmap or b"").decode("ascii"),
+            "lesson_ids": completion.lesson_ids(bitmap), "completed": completion.completed_count(bitmap)}
+
+# Badges the user has earned (see app/achievements.py)
+@router.get("/{user_id}/badges", response_model=list[schemas.UserBadge])
+def read_badges(user_id: int, db: Session = Depends(get_db)):
+    if crud.get_user(db, user_id=user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return achievements.user_badges(db, user_id)
+
+# Follow another user; their score shows up on this user's friends leaderboard
+@router.put("/{user_id}/following/{followee_id}", status_code=204)
+def follow_user(user_id: int, followee_id: int, db: Session = Depends(get_db)):
+    try:
+        leaderboards.follow(db, user_id, followee_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/{user_id}/following/{followee_id}", status_code=204)
+def unfollow_user(user_id: int, followee_id: int, db: Session = Depends(get_db)):
+    if not leaderboards.unfollow(db, user_id, followee_id):
+        raise HTTPException(status_code=404, detail="Not following this user")
+
+# The user and everyone they follow, from the worker's cached board (see app/leaderboards.py)
+@router.get("/{user_id}/friends/leaderboard", response_model=schemas.FriendsLeaderboard)
+def friends_leaderboard(
+    user_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    board = leaderboards.friends_leaderboard(db, user_id, limit=limit, offset=offset)
+    if board is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return board
+
 @router.get("/{user_id}", response_model=schemas.User)
 def read_user(user_id: int, db: Session = Depends(get_db)):
     db_user = crud.get_user(db, user_id=user_id)
@@ -0,0 +1,86 @@
+"""
+Explicit schema setup, run at app startup and by scripts instead of at import.
+
+The common case (database already at SCHEMA_VERSION) costs a single one-row
+query. A new database gets the current models via create_all and is stamped
+at the head migration; an existing database that is behind must be upgraded
+with ``python migrate.py upgrade`` (see app/migrations) before the app starts.
+User shards (app/sharding.py) go through the same checks with ``shard=True``:
+a new shard gets just the per-user tables.
+"""
+
+import logging
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+from . import migrations, models, search, sharding
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# The head migration; bump by adding a migration in app/migrations/versions.
+SCHEMA_VERSION = migrations.HEAD
+
+
+def current_version(engine):
+    """Return the recorded schema version, or None if the database has none yet."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(models.SchemaVersion.version).where(models.SchemaVersion.id == 1)).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def ensure_schema(engine, shard: bool = False):
+    """Make sure the database (or user shard) is at SCHEMA_VERSION; create it from scratch if it's new."""
+    version = current_version(engine)
+    if version == SCHEMA_VERSION:
+        return
+    if version is not None and version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this code ({SCHEMA_VERSION}); refusing to start"
+        )
+
+    if version is None and not inspect(engine).has_table("users"):
+        logger.info("New %s: creating schema at version %s", "shard" if shard else "database", SCHEMA_VERSION)
+        try:
+            if shard:
+                sharding.shard_metadata(models.Base.metadata).create_all(bind=engine)
+            else:
+                models.Base.metadata.create_all(bind=engine)
+                with engine.begin() as conn:
+                    search.install(conn)
+            migrations.stamp(engine, SCHEMA_VERSION, shard=shard)
+        except (OperationalError, ProgrammingError, IntegrityError):
+            # Another worker starting at the same time may have won the race.
+            if current_version(engine) != SCHEMA_VERSION:
+                raise
+        return
+
+    if version is None:
+        # Tables created by create_all before versioning existed.
+        migrations.stamp(engine, 1, shard=shard)
+        version = 1
+    if settings.AUTO_MIGRATE:
+        logger.info("Upgrading schema %s -> %s (AUTO_MIGRATE)", version, SCHEMA_VERSION)
+        migrations.upgrade(engine, reporter=logger.info, shard=shard)
+        return
+    raise RuntimeError(
+        f"Database schema is at version {version} but this code needs {SCHEMA_VERSION}; "
+        f"run `python migrate.py upgrade` first"
+    )
+
+
+def create_shard_schema(shard):
+    """A Postgres shard lives in its own schema, which has to exist before anything else runs there."""
+    if shard.schema and shard.writer.dialect.name == "postgresql":
+        with shard.writer.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{shard.schema}"'))
+
+
+def ensure_shards(shards):
+    """ensure_schema for every user shard."""
+    for shard in shards:
+        create_shard_schema(shard)
+        ensure_schema(shard.writer, shard=True)
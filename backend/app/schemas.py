@@ -1,6 +1,8 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import date, datetime
+from typing import Optional, List, Union
+
+from .grading import decode_json, strip_answers
 
 class UserBase(BaseModel):
     username: str
@@ -9,17 +11,77 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class BulkUserCreate(BaseModel):
+    # Rows are validated one by one so a bad row is reported instead of failing the request
+    users: list[dict] = Field(min_length=1, max_length=10000)
+
+class BulkUserResult(BaseModel):
+    index: int
+    username: Optional[str] = None
+    status: str  # created, exists, duplicate or invalid
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkUserResponse(BaseModel):
+    created: int
+    existing: int
+    duplicates: int
+    invalid: int
+    results: list[BulkUserResult]
+
 class User(UserBase):
     id: int
     is_active: bool
     xp_points: int
     streak_days: int
+    last_active_date: Optional[date] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
-from typing import Union
+class CohortCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    user_ids: list[int] = Field(default_factory=list, max_length=100000)
+
+class CohortMembers(BaseModel):
+    user_ids: list[int] = Field(min_length=1, max_length=100000)
+
+class Cohort(BaseModel):
+    id: int
+    name: str
+    members: int
+    created_at: datetime
+
+class MembersAdded(BaseModel):
+    cohort_id: int
+    added: int  # members already in the cohort are skipped
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: Optional[str] = None
+    xp_points: int
+
+class GroupLeaderboard(BaseModel):
+    members: int
+    user_rank: Optional[int] = None  # rank of the user asked about, if a member
+    entries: list[LeaderboardEntry]
+
+class CohortLeaderboard(GroupLeaderboard):
+    cohort_id: int
+    name: str
+
+class FriendsLeaderboard(GroupLeaderboard):
+    user_id: int
+
+class Achievement(BaseModel):
+    badge: str
+    title: str
+    description: str
+
+class UserBadge(Achievement):
+    awarded_at: datetime
 
 class ContentBase(BaseModel):
     content_type: str  # 'text', 'quiz', 'video', 'interactive'
@@ -30,14 +92,37 @@ class ContentBase(BaseModel):
 class ContentCreate(ContentBase):
     pass
 
+class QuizQuestionPublic(BaseModel):
+    """A quiz question without its answer; grade with POST /lessons/{id}/quiz/submit."""
+    id: int
+    question: str
+    options: list[str]
+    order_index: Optional[int] = 0
+
+    class Config:
+        from_attributes = True
+
+    @field_validator("options", mode="before")
+    @classmethod
+    def decode_options(cls, value):
+        return decode_json(value) or []
+
 class ContentResponse(ContentBase):
     id: int
     lesson_id: int
     created_at: datetime
+    questions: list[QuizQuestionPublic] = []
 
     class Config:
         from_attributes = True
 
+    @model_validator(mode="after")
+    def hide_answer_key(self):
+        # Quizzes are graded server-side; never ship answers or explanations
+        if self.content_type == 'quiz':
+            self.content = strip_answers(self.content)
+        return self
+
 class QuizQuestionBase(BaseModel):
     question: str
     options: list[str]
@@ -55,6 +140,137 @@ class QuizQuestionResponse(QuizQuestionBase):
     class Config:
         from_attributes = True
 
+class QuizAnswer(BaseModel):
+    question_id: int
+    selected_index: int
+
+class SubmittedAnswer(QuizAnswer):
+    time_ms: Optional[int] = Field(None, ge=0)  # time the learner took, for the question stats
+
+class QuizSubmission(BaseModel):
+    user_id: Optional[int] = None  # omit to grade without recording an attempt
+    answers: list[SubmittedAnswer] = Field(min_length=1, max_length=200)
+
+class QuizAnswerResult(QuizAnswer):
+    is_correct: bool
+    correct_index: int
+    explanation: Optional[str] = None
+    xp_awarded: int = 0
+
+class QuizSubmissionResult(BaseModel):
+    lesson_id: int
+    correct: int
+    total: int
+    xp_awarded: int
+    xp_points: Optional[int] = None
+    results: list[QuizAnswerResult]
+
+class ReviewCard(BaseModel):
+    question_id: int
+    ease: float
+    interval_days: int
+    repetitions: int
+    lapses: int
+    reviews: int
+    due_at: datetime
+
+class DueReview(ReviewCard):
+    lesson_id: int
+    question: str
+    options: list[str]
+
+class DueReviews(BaseModel):
+    user_id: int
+    due: list[DueReview]
+    next_due_at: Optional[datetime] = None  # the earliest card not due yet
+
+class ReviewAnswer(BaseModel):
+    user_id: int
+    question_id: int
+    selected_index: int
+    quality: Optional[int] = Field(None, ge=0, le=5)  # SM-2 grade; 3-5 if correct, 0-2 if not (default 4 / 1)
+    time_ms: Optional[int] = Field(None, ge=0)  # time the learner took, for the question stats
+
+class ReviewAnswerResult(BaseModel):
+    question_id: int
+    is_correct: bool
+    correct_index: int
+    explanation: Optional[str] = None
+    quality: int
+    card: ReviewCard
+
+class SimulationRequest(BaseModel):
+    """Overrides of the content's simulation settings (see app/simulation.py); omitted ones keep its defaults."""
+    weights: Optional[dict[str, float]] = None  # the learner's portfolio, symbol -> weight
+    model: Optional[str] = None  # 'gbm' or 'bootstrap'
+    paths: Optional[int] = None
+    horizon_days: Optional[int] = None
+    rebalance_every: Optional[int] = None  # trading days; 0 = buy and hold
+    initial_amount: Optional[float] = None
+    seed: Optional[int] = None
+    block_size: Optional[int] = None  # bootstrap block length in days
+
+class FanPoint(BaseModel):
+    day: int
+    p5: float
+    p50: float
+    p95: float
+
+class PortfolioOutcome(BaseModel):
+    name: str
+    weights: dict[str, float]
+    final_value: dict[str, float]  # percentiles across paths: p5, p25, p50, p75, p95
+    mean_final_value: float
+    probability_of_loss: float
+    median_annual_return: float
+    median_max_drawdown: float
+    fan: list[FanPoint]
+
+class SimulationResult(BaseModel):
+    content_id: int
+    params_hash: str  # equal hashes, equal results
+    model: str
+    symbols: list[str]
+    paths: int
+    horizon_days: int
+    rebalance_every: int
+    seed: int
+    initial_amount: float
+    portfolios: list[PortfolioOutcome]
+    elapsed_ms: float  # time the simulation took when it ran (not this request's, if cached)
+
+class PriceSymbol(BaseModel):
+    symbol: str
+    rows: int
+    first: str
+    last: str
+
+class PriceSeries(BaseModel):
+    """Columns of bars, oldest first; timestamps are ISO 8601 (UTC), a period's start when resampled."""
+    symbol: str
+    interval: str
+    timestamps: list[str]
+    open: list[float]
+    high: list[float]
+    low: list[float]
+    close: list[float]
+    volume: list[float]
+
+class QuestionStats(BaseModel):
+    question_id: int
+    lesson_id: int
+    question: str
+    correct_index: int
+    attempts: int
+    correct_rate: Optional[float] = None
+    first_attempts: int
+    difficulty: Optional[float] = None  # share of first tries answered correctly; lower is harder
+    discrimination: Optional[float] = None  # point-biserial vs the rest of the submission; low is bad
+    option_shares: list[float]  # share of answers choosing each option
+    median_time_ms: Optional[int] = None
+    p90_time_ms: Optional[int] = None
+    flags: list[str]  # too_easy, too_hard, low_discrimination, distractor_beats_answer
+
 class LessonBase(BaseModel):
     title: str
     description: str
@@ -94,8 +310,27 @@ class UserProgressResponse(UserProgressBase):
 class ProgressUpdate(BaseModel):
     progress_percentage: int
 
+class CompletionBitmap(BaseModel):
+    user_id: int
+    bitmap: str  # base64; bit L (byte L // 8, least significant bit first) = completed lesson id L
+    lesson_ids: list[int]
+    completed: int
+
 class UserStats(BaseModel):
     xp_points: int
     streak_days: int
     lessons_completed: int
-    total_lessons: int
\ No newline at end of file
+    total_lessons: int
+
+class SearchHit(BaseModel):
+    lesson_id: int
+    lesson_title: str
+    content_id: Optional[int] = None  # None when the lesson's title/description matched
+    kind: str
+    title: str
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+    score: float
+
+class SearchResponse(BaseModel):
+    query: str
+    results: list[SearchHit]
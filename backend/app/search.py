@@ -0,0 +1,200 @@
+"""
+Full-text search over the lesson catalog.
+
+Each active lesson is flattened into rows of ``search_documents``: one for
+the lesson itself (title + description) and one per content item (its text,
+or for quizzes the questions, options and explanations). The table is the
+same on every dialect; the index over it is not:
+
+- SQLite: an external-content FTS5 table (porter stemming) kept in sync by
+  triggers, ranked with bm25() and highlighted with snippet().
+- Postgres: a generated, weighted tsvector column with a GIN index, ranked
+  with ts_rank_cd() (Postgres has no BM25) and highlighted with ts_headline()
+  for the returned page only.
+
+Lesson writes call ``index_lessons`` in the same transaction, which replaces
+that lesson's rows, so the index never needs a full rebuild after a write.
+"""
+
+import html
+import re
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select, text
+
+from . import models
+
+# Title hits count this much more than body hits.
+TITLE_WEIGHT = 10.0
+MAX_TERMS = 8
+SNIPPET_WORDS = 16
+
+# Highlight markers; control characters can't occur in indexed text, so the
+# snippet can be HTML-escaped first and the markers swapped for <mark> after.
+_START, _STOP = "\x02", "\x03"
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+_NOT_INDEXED = ("correctAnswer", "correct_answer")
+_HEADLINE_OPTIONS = f"StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_WORDS}, MinWords=6, MaxFragments=2"
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(title, body, content='search_documents', "
+    "content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+
+POSTGRES_DDL = [
+    "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)",
+]
+
+# CROSS JOIN pins the join order: rank the matches first, then look up the
+# page's rows (otherwise SQLite may probe the FTS index once per document).
+SQLITE_SEARCH_SQL = f"""
+SELECT d.lesson_id, l.title AS lesson_title, d.content_id, d.kind, d.title, hits.snippet, hits.score
+FROM (
+    SELECT rowid AS id, -bm25(search_fts, {TITLE_WEIGHT}, 1.0) AS score,
+           snippet(search_fts, 1, char(2), char(3), '…', {SNIPPET_WORDS}) AS snippet
+    FROM search_fts
+    WHERE search_fts MATCH :query
+    ORDER BY score DESC LIMIT :limit OFFSET :skip
+) AS hits
+CROSS JOIN search_documents d ON d.id = hits.id
+CROSS JOIN lessons l ON l.id = d.lesson_id
+ORDER BY hits.score DESC
+"""
+
+POSTGRES_SEARCH_SQL = """
+SELECT d.lesson_id, l.title AS lesson_title, d.content_id, d.kind, d.title,
+       ts_headline('english', coalesce(d.body, ''), to_tsquery('english', :query), :headline) AS snippet,
+       hits.score
+FROM (
+    SELECT id, ts_rank_cd(tsv, to_tsquery('english', :query), 1) AS score
+    FROM search_documents
+    WHERE tsv @@ to_tsquery('english', :query)
+    ORDER BY score DESC, id LIMIT :limit OFFSET :skip
+) AS hits
+JOIN search_documents d ON d.id = hits.id
+JOIN lessons l ON l.id = d.lesson_id
+ORDER BY hits.score DESC, d.id
+"""
+
+
+def install(conn):
+    """Create the dialect's index structures over search_documents (idempotent)."""
+    for statement in POSTGRES_DDL if conn.dialect.name == "postgresql" else SQLITE_DDL:
+        conn.execute(text(statement))
+
+
+def query_terms(q: str) -> List[str]:
+    return _TERM_RE.findall(q.lower())[:MAX_TERMS]
+
+
+def _match_expression(terms: List[str], dialect: str) -> str:
+    # Every term must match; the last one is a prefix so results update as the user types.
+    if dialect == "postgresql":
+        return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+    return " ".join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def render_snippet(raw: Optional[str]) -> str:
+    return html.escape(raw or "").replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _plain_text(value) -> str:
+    """All the words in a JSON content value, answer keys excluded."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "\n".join(_plain_text(v) for k, v in value.items() if k not in _NOT_INDEXED)
+    if isinstance(value, list):
+        return "\n".join(_plain_text(v) for v in value)
+    return ""
+
+
+def build_documents(conn, lesson_ids: List[int]) -> List[dict]:
+    """search_documents rows for the given lessons; inactive lessons get none."""
+    lessons = conn.execute(
+        select(models.Lesson.id, models.Lesson.title, models.Lesson.description)
+        .where(models.Lesson.id.in_(lesson_ids), models.Lesson.is_active == True)
+    ).all()
+    if not lessons:
+        return []
+    active = [lesson.id for lesson in lessons]
+    contents = conn.execute(
+        select(models.LessonContent.id, models.LessonContent.lesson_id, models.LessonContent.content_type,
+               models.LessonContent.title, models.LessonContent.content)
+        .where(models.LessonContent.lesson_id.in_(active))
+        .order_by(models.LessonContent.lesson_id, models.LessonContent.order_index)
+    ).all()
+    questions = {}
+    for content_id, question, options, explanation in conn.execute(
+        select(models.QuizQuestion.lesson_content_id, models.QuizQuestion.question, models.QuizQuestion.options,
+               models.QuizQuestion.explanation)
+        .join(models.LessonContent, models.QuizQuestion.lesson_content_id == models.LessonContent.id)
+        .where(models.LessonContent.lesson_id.in_(active))
+        .order_by(models.QuizQuestion.lesson_content_id, models.QuizQuestion.order_index)
+    ):
+        questions.setdefault(content_id, []).append(_plain_text([question, options, explanation]))
+
+    documents = [{"lesson_id": lesson.id, "content_id": None, "kind": "lesson", "title": lesson.title,
+                  "body": lesson.description or ""} for lesson in lessons]
+    for content in contents:
+        # Quiz text lives in quiz_questions; the content JSON may repeat it or be empty.
+        body = "\n".join(questions[content.id]) if content.id in questions else _plain_text(content.content)
+        documents.append({"lesson_id": content.lesson_id, "content_id": content.id, "kind": content.content_type,
+                          "title": content.title or "", "body": body})
+    return documents
+
+
+def index_lessons(conn, lesson_ids: Iterable[int]) -> int:
+    """Replace the search rows of these lessons; pass a Session or Connection inside the write's transaction."""
+    lesson_ids = list(lesson_ids)
+    if not lesson_ids:
+        return 0
+    conn.execute(delete(models.SearchDocument).where(models.SearchDocument.lesson_id.in_(lesson_ids)))
+    documents = build_documents(conn, lesson_ids)
+    if documents:
+        conn.execute(insert(models.SearchDocument), documents)
+    return len(documents)
+
+
+def reindex_all(engine, after_id: int = 0, batch_size: int = 200,
+                on_batch: Optional[Callable] = None) -> int:
+    """
+    Index every lesson with id > ``after_id`` in committed batches.
+    ``on_batch(conn, last_lesson_id)`` runs inside each batch's transaction.
+    """
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(select(models.Lesson.id).where(models.Lesson.id > after_id)
+                               .order_by(models.Lesson.id).limit(batch_size)).scalars().all()
+            if not ids:
+                return total
+            total += index_lessons(conn, ids)
+            after_id = ids[-1]
+            if on_batch:
+                on_batch(conn, after_id)
+
+
+def search(db, q: str, limit: int = 20, skip: int = 0) -> List[dict]:
+    """Ranked hits for ``q`` (best first), with HTML-safe snippets highlighted by <mark>."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    dialect = db.get_bind(clause=select(models.SearchDocument.id)).dialect.name
+    sql = POSTGRES_SEARCH_SQL if dialect == "postgresql" else SQLITE_SEARCH_SQL
+    params = {"query": _match_expression(terms, dialect), "limit": limit, "skip": skip}
+    if dialect == "postgresql":
+        params["headline"] = _HEADLINE_OPTIONS
+    rows = db.execute(text(sql), params)
+    return [{**row._asdict(), "snippet": render_snippet(row.snippet), "score": float(row.score or 0.0)}
+            for row in rows]
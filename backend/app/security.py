@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import hashlib
 import os
 from jose import JWTError, jwt
@@ -34,6 +34,14 @@ def get_password_hash(password: str) -> str:
     # Return salt + hash
     return salt + hashed_password
 
+def hash_passwords(passwords: List[str], workers: int = 0) -> List[str]:
+    """Hash many passwords, in ``workers`` processes for large batches when workers > 1."""
+    if workers <= 1 or len(passwords) < 256:
+        return [get_password_hash(p) for p in passwords]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(get_password_hash, passwords, chunksize=max(len(passwords) // (workers * 4), 64)))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
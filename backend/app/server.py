@@ -0,0 +1,99 @@
+"""
+Server launch profiles.
+
+``dev`` runs a single auto-reloading uvicorn process. ``prod`` runs gunicorn
+with preloaded app and uvicorn workers on uvloop/httptools; gunicorn turns
+SIGTERM into a graceful drain (stop accepting, finish in-flight requests up to
+SERVER_GRACEFUL_TIMEOUT, then run the app's shutdown hooks in every worker).
+"""
+
+import os
+from typing import Optional
+
+from .config import settings
+
+
+def default_worker_count() -> int:
+    """WEB_CONCURRENCY if set, otherwise the CPUs this process may run on."""
+    if settings.WEB_CONCURRENCY:
+        return settings.WEB_CONCURRENCY
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+try:
+    from uvicorn.workers import UvicornWorker
+except ImportError:  # gunicorn isn't available (e.g. on Windows)
+    UvicornWorker = None
+
+if UvicornWorker is not None:
+    class ProdUvicornWorker(UvicornWorker):
+        CONFIG_KWARGS = {
+            "loop": "uvloop",
+            "http": "httptools",
+            "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_TIMEOUT,
+        }
+
+
+def run_dev(host: str, port: int):
+    import uvicorn
+
+    uvicorn.run("app.main:app", host=host, port=port, reload=True, log_level="info")
+
+
+def run_prod(host: str, port: int, workers: Optional[int] = None):
+    workers = workers or default_worker_count()
+    if UvicornWorker is None:
+        # No gunicorn: uvicorn's own supervisor spawns the workers, without preloading.
+        import uvicorn
+
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=port,
+            workers=workers,
+            loop="uvloop",
+            http="httptools",
+            backlog=settings.SERVER_BACKLOG,
+            timeout_keep_alive=settings.SERVER_KEEPALIVE,
+            timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+            log_level="info",
+        )
+        return
+
+    from gunicorn.app.base import BaseApplication
+
+    class FinesseApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                "worker_class": "app.server.ProdUvicornWorker",
+                "preload_app": True,
+                "keepalive": settings.SERVER_KEEPALIVE,
+                "backlog": settings.SERVER_BACKLOG,
+                "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+                "timeout": settings.SERVER_WORKER_TIMEOUT,
+                "post_fork": post_fork,
+                "accesslog": None,
+                "errorlog": "-",
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from .main import app
+
+            return app
+
+    FinesseApplication().run()
+
+
+def post_fork(server, worker):
+    # The preloaded app may have opened pooled connections in the master;
+    # drop them in the child without closing the parent's sockets.
+    from .database import dispose_engines
+
+    dispose_engines(close=False)
@@ -0,0 +1,164 @@
+"""
+Hash-sharded user data.
+
+With USER_SHARD_URLS set, the per-user tables (SHARDED_TABLES) live on N
+shard databases (SQLite files, or schemas of one Postgres database) while
+the catalog (lessons, content, search) stays in DATABASE_URL. A user's shard
+is a stable hash of their id. Ids are allocated centrally by the catalog's
+user_directory table, which also keeps usernames and emails unique across
+shards and resolves a login to an id.
+
+RoutingSession (app/database.py) picks the engine per statement: anything
+touching a sharded table goes to the shard pinned with ``use_shard(db,
+user_id)``, so crud helpers pin before touching a user's rows. Cross-user
+reads (leaderboard, user listing) run on every shard in parallel and are
+k-way merged with ``gather``.
+
+Without USER_SHARD_URLS the ShardSet is empty: ``use_shard`` is a no-op and
+the user tables are read and written in DATABASE_URL as before.
+
+Changing the number of shards is an offline job: see reshard.py.
+"""
+
+import heapq
+import itertools
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import MetaData
+from sqlalchemy.orm import Session
+
+SHARDED_TABLES = ("users", "user_progress", "quiz_attempts", "review_cards", "user_badges")
+# On the catalog and on every shard: a session pinned to a shard uses that
+# shard's copy (so a job commits with the user's rows), any other the catalog's.
+SHARD_LOCAL_TABLES = ("job_outbox",)
+
+
+class ShardKeyRequired(RuntimeError):
+    """A statement touched a sharded table on a session that isn't pinned to a shard."""
+
+
+def shard_index(user_id: int, count: int) -> int:
+    """Stable across processes and releases (unlike hash() on str); ids spread evenly even in runs."""
+    return zlib.crc32(int(user_id).to_bytes(8, "little", signed=True)) % count
+
+
+class Shard:
+    def __init__(self, index: int, writer, reader, schema: Optional[str] = None):
+        self.index = index
+        self.writer = writer
+        self.reader = reader
+        self.schema = schema
+
+    def __repr__(self):
+        return f"<Shard {self.index} {self.writer.url.render_as_string(hide_password=True)}>"
+
+
+class ShardSet:
+    def __init__(self, shards: List[Shard]):
+        self.shards = shards
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __len__(self):
+        return len(self.shards)
+
+    def __bool__(self):
+        return bool(self.shards)
+
+    def __iter__(self):
+        return iter(self.shards)
+
+    def for_user(self, user_id: int) -> Shard:
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def group(self, rows: Iterable[dict], key: str = "id") -> Dict[Shard, List[dict]]:
+        """Split rows by the shard of ``row[key]`` (a user id)."""
+        groups: Dict[Shard, List[dict]] = {}
+        for row in rows:
+            groups.setdefault(self.for_user(row[key]), []).append(row)
+        return groups
+
+    def scatter(self, fn: Callable[[Shard], object]) -> list:
+        """Run ``fn(shard)`` on every shard concurrently; results in shard order."""
+        if len(self.shards) == 1:
+            return [fn(self.shards[0])]
+        if self._executor is None:
+            # Created lazily so a pre-fork master never owns the threads.
+            self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        return list(self._executor.map(fn, self.shards))
+
+    def status(self) -> List[dict]:
+        return [{"index": s.index, "url": s.writer.url.render_as_string(hide_password=True), "schema": s.schema}
+                for s in self.shards]
+
+    def dispose(self, close: bool = True):
+        for shard in self.shards:
+            shard.writer.dispose(close=close)
+            if shard.reader is not shard.writer:
+                shard.reader.dispose(close=close)
+        if self._executor is not None and close:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+NO_SHARDS = ShardSet([])
+
+
+def shards_of(db: Session) -> ShardSet:
+    return getattr(db, "shards", None) or NO_SHARDS
+
+
+def use_shard(db: Session, user_id: int) -> Session:
+    """Pin a session to ``user_id``'s shard for the sharded tables (no-op when unsharded)."""
+    shards = shards_of(db)
+    if shards:
+        db.info["shard"] = shards.for_user(user_id)
+    return db
+
+
+def touches_sharded_table(mapper, clause, pinned: bool = False) -> bool:
+    names = SHARDED_TABLES + SHARD_LOCAL_TABLES if pinned else SHARDED_TABLES
+    if mapper is not None:
+        return mapper.local_table.name in names
+    table = getattr(clause, "table", None)  # INSERT/UPDATE/DELETE
+    if table is not None:
+        return getattr(table, "name", None) in names
+    froms = clause.get_final_froms() if hasattr(clause, "get_final_froms") else ()
+    return any(getattr(f, "name", None) in names for f in froms)
+
+
+def gather(db: Session, query: Callable[[Session], list], key: Callable, limit: int, skip: int = 0) -> list:
+    """
+    Cross-shard read: ``query(session)`` runs on every shard and must return
+    its first ``skip + limit`` rows ordered by ``key``; the sorted runs are
+    k-way merged and sliced. Loaded ORM objects come back detached.
+    """
+    use_writer = bool(db.info.get("use_primary"))
+
+    def run(shard: Shard):
+        with Session(bind=shard.writer if use_writer else shard.reader) as session:
+            return query(session)
+
+    merged = heapq.merge(*shards_of(db).scatter(run), key=key)
+    return list(itertools.islice(merged, skip, skip + limit))
+
+
+def shard_metadata(metadata: MetaData) -> MetaData:
+    """
+    The tables created on a shard (sharded plus shard-local): foreign keys into the
+    catalog (lessons, quiz_questions) are dropped since those rows live in
+    another database; keys between sharded tables stay.
+    """
+    shard = MetaData()
+    for name in SHARDED_TABLES + SHARD_LOCAL_TABLES:
+        table = metadata.tables[name].to_metadata(shard)
+        for constraint in list(table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split(".")[0] in SHARDED_TABLES:
+                continue
+            table.constraints.discard(constraint)
+            for element in constraint.elements:
+                element.parent.foreign_keys.discard(element)
+                table.foreign_keys.discard(element)
+    return shard
+
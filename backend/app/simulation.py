@@ -0,0 +1,351 @@
+"""
+Market simulations behind 'interactive' lesson content.
+
+An interactive content item whose ``content`` is ``{"component":
+"portfolio_simulator", "data": {...}}`` describes a market and the portfolios
+to compare in it; ``data`` may hold:
+
+- ``model``: "gbm" (default) or "bootstrap"
+- ``assets``: [{"symbol", "mu", "sigma"}], annual drift and volatility for
+  GBM, with an optional ``correlation`` matrix (identity by default)
+- ``history``: {symbol: [daily closes]}, aligned series for "bootstrap",
+  which resamples blocks of ``block_size`` days of historical returns (whole
+  days across all symbols, so their co-movement is kept); or instead
+  ``prices``: {"symbols", "start", "end"}, closes read from the price store
+  (app/prices.py) on the days all the symbols traded
+- ``portfolios``: [{"name", "weights": {symbol: weight}}] shown next to the
+  learner's own
+- defaults for ``paths``, ``horizon_days``, ``initial_amount``,
+  ``rebalance_every`` (trading days; 0 = buy and hold) and ``seed``.
+
+A request may override the run settings and add the learner's weights. Paths
+are generated offline from a seeded generator and never leave NumPy: all
+paths of a block are one (paths, days, assets) array of log returns, every
+portfolio's value path is one matrix product against the weights, and the
+summaries are percentiles over the path axis. Blocks are sized to bound
+memory and seeded from the run's seed, so a run is reproducible.
+
+Results are cached per worker by a hash of everything that determines them
+(the resolved parameters, including the market itself), so repeated lesson
+views are served without simulating; concurrent requests for the same
+parameters wait for one run instead of each starting their own.
+"""
+
+import hashlib
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models, prices
+from .cache_bus import VersionedCache
+from .config import settings
+from .grading import decode_json
+
+COMPONENT = "portfolio_simulator"
+MODELS = ("gbm", "bootstrap")
+TRADING_DAYS = 252
+BLOCK_CELLS = 2_000_000  # (paths x days x assets) per block, ~16 MB of float64
+FAN_POINTS = 41  # days sampled for the percentile fan chart
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Used when the content doesn't describe a market of its own
+DEFAULT_ASSETS = (
+    {"symbol": "STOCKS", "mu": 0.07, "sigma": 0.18},
+    {"symbol": "BONDS", "mu": 0.03, "sigma": 0.06},
+    {"symbol": "CASH", "mu": 0.02, "sigma": 0.005},
+)
+DEFAULT_PORTFOLIOS = (
+    {"name": "All stocks", "weights": {"STOCKS": 1.0}},
+    {"name": "60/40", "weights": {"STOCKS": 0.6, "BONDS": 0.4}},
+)
+
+# Keyed by parameter hash; the "catalog" namespace drops results when lessons change
+results_cache = VersionedCache("catalog", maxsize=settings.SIMULATION_CACHE_SIZE)
+_inflight: Dict[str, threading.Event] = {}
+_inflight_lock = threading.Lock()
+
+
+def _content_data(content: models.LessonContent) -> dict:
+    document = decode_json(content.content)
+    if content.content_type != "interactive" or not isinstance(document, dict) \
+            or document.get("component", COMPONENT) != COMPONENT:
+        raise LookupError(f"Content {content.id} is not a portfolio simulation")
+    data = decode_json(document.get("data")) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"Content {content.id} has malformed simulation data")
+    return data
+
+
+def _bounded(name: str, value, low: int, high: int) -> int:
+    # isfinite first: int() raises OverflowError on infinity (and ValueError on NaN)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) \
+            or int(value) != value or not low <= value <= high:
+        raise ValueError(f"{name} must be an integer from {low} to {high}")
+    return int(value)
+
+
+def _weights(weights: dict, symbols: List[str]) -> List[float]:
+    if not isinstance(weights, dict):
+        raise ValueError("weights must map symbols to numbers")
+    unknown = sorted(set(weights) - set(symbols))
+    if unknown:
+        raise ValueError(f"Unknown symbols {unknown}; this market has {symbols}")
+    vector = [float(weights.get(symbol, 0.0)) for symbol in symbols]
+    if any(w < 0 or not np.isfinite(w) for w in vector) or sum(vector) <= 0:
+        raise ValueError("weights must be non-negative and not all zero")
+    total = sum(vector)
+    return [w / total for w in vector]
+
+
+def resolve(data: dict, overrides: dict) -> dict:
+    """
+    The full parameters of a run: the content's market and portfolios with
+    the request's settings applied, validated and normalized (weights sum
+    to 1), so equal runs resolve to equal parameters.
+    """
+    merged = {**data, **{k: v for k, v in overrides.items() if v is not None and k != "weights"}}
+    model = merged.get("model", "gbm")
+    if model not in MODELS:
+        raise ValueError(f"model must be one of {list(MODELS)}")
+    params = {
+        "model": model,
+        "paths": _bounded("paths", merged.get("paths", 1000), 1, settings.SIMULATION_MAX_PATHS),
+        "horizon_days": _bounded("horizon_days", merged.get("horizon_days", TRADING_DAYS), 1,
+                                 settings.SIMULATION_MAX_DAYS),
+        "rebalance_every": _bounded("rebalance_every", merged.get("rebalance_every", 0), 0,
+                                    settings.SIMULATION_MAX_DAYS),
+        "seed": _bounded("seed", merged.get("seed", 0), 0, 2 ** 32 - 1),
+    }
+    initial = merged.get("initial_amount", 10000)
+    if isinstance(initial, bool) or not isinstance(initial, (int, float)) or not 0 < initial < 1e12:
+        raise ValueError("initial_amount must be a positive number")
+    params["initial_amount"] = float(initial)
+
+    if model == "gbm":
+        assets = merged.get("assets") or list(DEFAULT_ASSETS)
+        try:
+            symbols = [str(a["symbol"]) for a in assets]
+            params["mu"] = [float(a["mu"]) for a in assets]
+            params["sigma"] = [float(a["sigma"]) for a in assets]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("assets must be a list of {symbol, mu, sigma}")
+        if not all(np.isfinite(params["mu"] + params["sigma"])) or any(s < 0 for s in params["sigma"]):
+            raise ValueError("mu must be finite and sigma finite and non-negative")
+        correlation = merged.get("correlation")
+        try:
+            params["correlation"] = np.eye(len(symbols)).tolist() if correlation is None else \
+                [[float(x) for x in row] for row in correlation]
+        except (TypeError, ValueError):
+            raise ValueError("correlation must be a matrix of numbers")
+    elif merged.get("prices") is not None:
+        reference = merged["prices"]
+        if not isinstance(reference, dict) or not isinstance(reference.get("symbols"), list) \
+                or not reference["symbols"]:
+            raise ValueError("prices must be {symbols, start, end} referencing the price store")
+        try:
+            symbols = [prices.normalize_symbol(symbol) for symbol in reference["symbols"]]
+            # The store versions are part of the parameters, so a re-import changes the hash
+            params["prices"] = {"start": reference.get("start"), "end": reference.get("end"),
+                                "versions": [prices.store.info(symbol)["version"] for symbol in symbols]}
+        except LookupError as e:
+            raise ValueError(str(e))
+        params["symbols"] = symbols
+        rows = len(_closes(params))
+        if rows < 2:
+            raise ValueError("the referenced price range needs at least two common closes")
+        params["block_size"] = _bounded("block_size", merged.get("block_size", 1), 1, rows - 1)
+    else:
+        history = merged.get("history")
+        if not isinstance(history, dict) or not history:
+            raise ValueError("bootstrap needs daily closes: a history per symbol or a price store reference")
+        symbols = [str(symbol) for symbol in history]
+        try:
+            series = [[float(x) for x in history[symbol]] for symbol in history]
+        except (TypeError, ValueError):
+            raise ValueError("history must map symbols to lists of closes")
+        if len({len(s) for s in series}) != 1 or len(series[0]) < 2:
+            raise ValueError("history series must be aligned and have at least two closes")
+        if any(x <= 0 for s in series for x in s):
+            raise ValueError("history closes must be positive")
+        params["history"] = series
+        params["block_size"] = _bounded("block_size", merged.get("block_size", 1), 1, len(series[0]) - 1)
+    if len(symbols) != len(set(symbols)) or not 1 <= len(symbols) <= settings.SIMULATION_MAX_ASSETS:
+        raise ValueError(f"a market has 1 to {settings.SIMULATION_MAX_ASSETS} distinct symbols")
+    params["symbols"] = symbols
+
+    portfolios = []
+    if overrides.get("weights") is not None:
+        portfolios.append({"name": "Your portfolio", "weights": _weights(overrides["weights"], symbols)})
+    for entry in merged.get("portfolios") or (DEFAULT_PORTFOLIOS if "assets" not in merged
+                                              and model == "gbm" else ()):
+        if not isinstance(entry, dict) or "weights" not in entry:
+            raise ValueError("portfolios must be a list of {name, weights}")
+        portfolios.append({"name": str(entry.get("name", "Portfolio")), "weights": _weights(entry["weights"], symbols)})
+    if not portfolios:
+        portfolios.append({"name": "Equal weight", "weights": [1.0 / len(symbols)] * len(symbols)})
+    params["portfolios"] = portfolios
+    return params
+
+
+def params_hash(params: dict) -> str:
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _gbm_factor(params: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Daily log-return drift (assets,) and the Cholesky factor of their covariance."""
+    dt = 1.0 / TRADING_DAYS
+    mu, sigma = np.array(params["mu"]), np.array(params["sigma"])
+    correlation = np.array(params["correlation"])
+    if correlation.shape != (len(mu), len(mu)) or not np.allclose(correlation, correlation.T):
+        raise ValueError("correlation must be a symmetric matrix with a row per asset")
+    # The covariance is D C D (D the daily volatilities), so its factor is D times the
+    # correlation's: a zero-volatility asset (cash) gets no shocks at all. The tiny
+    # ridge lets perfectly correlated assets through the factorization.
+    try:
+        factor = np.linalg.cholesky(correlation + np.eye(len(mu)) * 1e-12)
+    except np.linalg.LinAlgError:
+        raise ValueError("correlation must be positive semi-definite")
+    return (mu - 0.5 * sigma ** 2) * dt, factor * (sigma * np.sqrt(dt))[:, None]
+
+
+def _closes(params: dict) -> np.ndarray:
+    """(days, assets) closes for the bootstrap: embedded in the content or read from the price store."""
+    if "history" in params:
+        return np.array(params["history"]).T
+    reference = params["prices"]
+    closes = prices.store.aligned_closes(params["symbols"], reference["start"], reference["end"])
+    if (closes <= 0).any():
+        raise ValueError("stored closes must be positive")
+    return closes
+
+
+def _log_returns(params: dict, rng: np.random.Generator, paths: int, market) -> np.ndarray:
+    """(paths, days, assets) daily log returns."""
+    days = params["horizon_days"]
+    if params["model"] == "gbm":
+        drift, factor = market
+        shocks = rng.standard_normal((paths * days, len(drift)))
+        # One 2-D product (a single BLAS call) instead of a stack of tiny ones
+        return (shocks @ factor.T + drift).reshape(paths, days, len(drift))
+    returns = market  # (history days, assets)
+    block = params["block_size"]
+    blocks = -(-days // block)
+    starts = rng.integers(0, len(returns), size=(paths, blocks))
+    rows = (starts[:, :, None] + np.arange(block)) % len(returns)  # moving blocks, wrapping at the end
+    return returns[rows.reshape(paths, blocks * block)[:, :days]]
+
+
+def _portfolio_values(log_returns: np.ndarray, weights: np.ndarray, rebalance_every: int) -> np.ndarray:
+    """
+    (paths, days, portfolios) values of 1 invested on day 0, rebalanced back
+    to ``weights`` (assets, portfolios) every ``rebalance_every`` days (0:
+    never). Between rebalances each holding grows with its asset, so a
+    period's value is a product against the weights of the asset growth
+    since the period began; periods chain by the cumulative product of their
+    end values.
+    """
+    paths, days, _ = log_returns.shape
+    period = rebalance_every or days
+    cumulative = np.cumsum(log_returns, axis=1)
+    starts = np.concatenate([np.zeros_like(cumulative[:, :1]), cumulative[:, period - 1::period]], axis=1)
+    period_of_day = np.arange(days) // period
+    growth = np.exp(np.subtract(cumulative, starts[:, period_of_day], out=cumulative), out=cumulative)
+    within = (growth.reshape(-1, growth.shape[2]) @ weights).reshape(paths, days, weights.shape[1])
+    carried = np.concatenate([np.ones((paths, 1, weights.shape[1])),
+                              np.cumprod(within[:, period - 1::period], axis=1)], axis=1)
+    return np.multiply(within, carried[:, period_of_day], out=within)
+
+
+def simulate(params: dict) -> dict:
+    """Run ``params`` (from resolve) and summarize each portfolio's outcomes across the paths."""
+    started = time.perf_counter()
+    days, symbols = params["horizon_days"], params["symbols"]
+    if params["model"] == "gbm":
+        market = _gbm_factor(params)
+    else:
+        market = np.diff(np.log(_closes(params)), axis=0)
+    weights = np.array([p["weights"] for p in params["portfolios"]]).T  # (assets, portfolios)
+    fan_days = np.unique(np.linspace(0, days, min(FAN_POINTS, days + 1)).round().astype(int))
+
+    block_paths = max(1, BLOCK_CELLS // (days * len(symbols)))
+    sizes = [min(block_paths, params["paths"] - start) for start in range(0, params["paths"], block_paths)]
+    seeds = np.random.SeedSequence(params["seed"]).spawn(len(sizes))
+    finals, drawdowns, fans = [], [], []
+    for size, seed in zip(sizes, seeds):
+        values = _portfolio_values(_log_returns(params, np.random.default_rng(seed), size, market), weights,
+                                   params["rebalance_every"])
+        peaks = np.maximum.accumulate(values, axis=1)
+        np.maximum(peaks, 1.0, out=peaks)  # day 0 is worth 1
+        finals.append(values[:, -1])
+        drawdowns.append(1.0 - np.divide(values, peaks, out=peaks).min(axis=1))
+        fans.append(np.concatenate([np.ones((size, 1, weights.shape[1])), values[:, fan_days[1:] - 1]], axis=1))
+    finals, drawdowns, fans = np.concatenate(finals), np.concatenate(drawdowns), np.concatenate(fans)
+
+    initial = params["initial_amount"]
+    final_pct = np.percentile(finals, PERCENTILES, axis=0)  # (percentiles, portfolios)
+    fan_pct = np.percentile(fans, (5, 50, 95), axis=0)  # (3, fan days, portfolios)
+    outcomes = []
+    for i, portfolio in enumerate(params["portfolios"]):
+        outcomes.append({
+            "name": portfolio["name"],
+            "weights": dict(zip(symbols, portfolio["weights"])),
+            "final_value": {f"p{p}": round(float(v) * initial, 2) for p, v in zip(PERCENTILES, final_pct[:, i])},
+            "mean_final_value": round(float(finals[:, i].mean()) * initial, 2),
+            "probability_of_loss": round(float((finals[:, i] < 1.0).mean()), 4),
+            "median_annual_return": round(float(final_pct[2, i] ** (TRADING_DAYS / days) - 1.0), 4),
+            "median_max_drawdown": round(float(np.median(drawdowns[:, i])), 4),
+            "fan": [{"day": int(day), "p5": round(float(lo) * initial, 2), "p50": round(float(mid) * initial, 2),
+                     "p95": round(float(hi) * initial, 2)}
+                    for day, lo, mid, hi in zip(fan_days, fan_pct[0, :, i], fan_pct[1, :, i], fan_pct[2, :, i])],
+        })
+    return {
+        "model": params["model"],
+        "symbols": symbols,
+        "paths": params["paths"],
+        "horizon_days": days,
+        "rebalance_every": params["rebalance_every"],
+        "seed": params["seed"],
+        "initial_amount": initial,
+        "portfolios": outcomes,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 2),
+    }
+
+
+def _cached_run(key: str, params: dict) -> dict:
+    """One caller per key at a time: later ones wait for the first, then find its result cached."""
+    while True:
+        with _inflight_lock:
+            event = _inflight.get(key)
+            if event is None:
+                event = _inflight[key] = threading.Event()
+                break
+        event.wait()
+    try:
+        return results_cache.get(key, lambda: simulate(params))
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        event.set()
+
+
+def run(db: Session, content_id: int, overrides: Optional[dict] = None) -> dict:
+    """
+    Simulate interactive content ``content_id`` with the request's
+    ``overrides`` (see resolve). Raises LookupError if there is no such
+    simulation and ValueError for bad parameters.
+    """
+    content = db.get(models.LessonContent, content_id)
+    if content is None:
+        raise LookupError(f"Content {content_id} not found")
+    data = _content_data(content)
+    db.rollback()  # nothing more to read; don't hold a connection through the simulation
+    params = resolve(data, overrides or {})
+    key = params_hash(params)
+    result = _cached_run(key, params)
+    return {"content_id": content_id, "params_hash": key, **result}
@@ -0,0 +1,151 @@
+"""
+Server-side daily streaks.
+
+A streak is the number of consecutive UTC days with learning activity (lesson
+progress, quiz answers, the daily challenge). ``record_activity`` runs in the
+same transaction as the activity write: the first activity of a day advances
+the streak (or restarts it at 1 after a gap) with one conditional UPDATE, and
+later ones that day match no row. Reading a streak never writes.
+
+A streak that isn't extended by the end of a day is broken. Nobody's request
+notices that, so ``reset_broken_streaks`` zeroes them in one pass over all
+users shortly after UTC midnight: a "streaks.nightly" job (app/jobs.py) that
+schedules its own next run, or ``python update_streaks.py`` from cron.
+"""
+
+import logging
+import time
+from itertools import chain
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, bindparam, case, cast, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import jobs, models
+from .cache_bus import publish
+from .config import settings
+from .database import user_databases
+
+logger = logging.getLogger(__name__)
+
+users_table = models.User.__table__
+
+_advance = (
+    update(models.User)
+    .where(models.User.id == bindparam("user_id"),
+           or_(models.User.last_active_date.is_(None), models.User.last_active_date < bindparam("today")))
+    .values(streak_days=case((models.User.last_active_date == bindparam("yesterday"),
+                              func.coalesce(models.User.streak_days, 0) + 1), else_=1),
+            last_active_date=bindparam("today"))
+    .execution_options(synchronize_session=False)
+)
+
+# Re-checks the date, so activity recorded after the batch read the row wins.
+_reset = (
+    users_table.update()
+    .where(users_table.c.id.in_(bindparam("ids", expanding=True)),
+           or_(users_table.c.last_active_date.is_(None), users_table.c.last_active_date < bindparam("yesterday")))
+    .values(streak_days=0)
+)
+RESET_IDS_PER_STATEMENT = 5000  # well under SQLite's bound parameter limit
+
+EPOCH = date(1970, 1, 1)
+
+
+def _epoch_day(column, dialect: str):
+    """Days since 1970-01-01 as an integer computed by the database (-1 for NULL), so no date objects are built."""
+    if dialect == "postgresql":
+        days = column - literal(EPOCH)
+    else:
+        days = cast(func.julianday(column) - 2440587.5, Integer)
+    return func.coalesce(days, -1)
+
+
+def today() -> date:
+    return datetime.utcnow().date()
+
+
+def record_activity(db: Session, user_id: int, day: Optional[date] = None) -> bool:
+    """
+    Count activity today toward the user's streak, in the caller's transaction
+    (already pinned to the user's shard and the primary). Returns True if the
+    streak changed, i.e. this was the first activity of the day.
+    """
+    day = day or today()
+    result = db.execute(_advance, {"user_id": user_id, "today": day, "yesterday": day - timedelta(days=1)})
+    return result.rowcount > 0
+
+
+def reset_broken_streaks(databases: Iterable[Tuple[object, object]], day: Optional[date] = None,
+                         chunk_size: int = 50000, report: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Zero every streak whose last activity is before yesterday, on each
+    (writer, reader) pair. Users with a streak are read from the reader in
+    id-ordered chunks straight into an integer NumPy array (last activity as a
+    day number); the broken ones in a chunk are reset by id in one short write
+    transaction.
+    """
+    day = day or today()
+    yesterday = day - timedelta(days=1)
+    cutoff = (yesterday - EPOCH).days
+    stats = {"date": day.isoformat(), "with_streak": 0, "reset": 0, "kept": 0, "longest": 0}
+    started = time.perf_counter()
+    for writer, reader in databases:
+        query = (select(users_table.c.id, users_table.c.streak_days,
+                        _epoch_day(users_table.c.last_active_date, reader.dialect.name))
+                 .where(users_table.c.streak_days > 0, users_table.c.id > bindparam("after"))
+                 .order_by(users_table.c.id).limit(chunk_size))
+        after = 0
+        while True:
+            with reader.connect() as conn:
+                rows = conn.execute(query, {"after": after}).all()
+            rows = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)).reshape(-1, 3)
+            if not len(rows):
+                break
+            ids, streaks, last_active = rows.T
+            broken = last_active < cutoff
+            kept = streaks[~broken]
+            broken_ids = ids[broken].tolist()
+            if broken_ids:
+                with writer.begin() as conn:
+                    for start in range(0, len(broken_ids), RESET_IDS_PER_STATEMENT):
+                        stats["reset"] += conn.execute(_reset, {
+                            "ids": broken_ids[start:start + RESET_IDS_PER_STATEMENT], "yesterday": yesterday,
+                        }).rowcount
+            stats["with_streak"] += len(rows)
+            stats["kept"] += len(kept)
+            stats["longest"] = max(stats["longest"], int(kept.max()) if len(kept) else 0)
+            after = int(ids[-1])
+            if report:
+                report(f"{stats['with_streak']:,} streaks checked, {stats['reset']:,} reset")
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if stats["reset"]:
+        publish("leaderboard")
+    return stats
+
+
+def next_run_after(now: Optional[datetime] = None) -> Tuple[date, float]:
+    """The next nightly run: its date and how many seconds from ``now`` it is due."""
+    now = now or datetime.utcnow()
+    due = datetime.combine(now.date(), datetime.min.time()) + timedelta(minutes=settings.STREAK_BATCH_MINUTE)
+    if due <= now:
+        due += timedelta(days=1)
+    return due.date(), (due - now).total_seconds()
+
+
+def schedule_nightly(db: Session):
+    """Enqueue the next nightly run; every worker calls this at startup and the key keeps it to one job."""
+    day, delay = next_run_after()
+    jobs.enqueue(db, "streaks.nightly", {"date": day.isoformat()}, key=f"streaks.nightly:{day.isoformat()}",
+                 delay=delay)
+    db.commit()
+
+
+@jobs.handler("streaks.nightly")
+def nightly(db: Session, payload: dict):
+    # As of now, not payload["date"]: a run that was held up still resets everything due
+    stats = reset_broken_streaks(user_databases(), chunk_size=settings.STREAK_BATCH_SIZE)
+    logger.info("Nightly streaks: %s", stats)
+    schedule_nightly(db)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Award the badges existing users have already earned (see app/achievements.py).
+
+New badges are awarded as users earn them; run this once after upgrading to
+schema version 13, and again whenever a rule is added. Badges already held
+are skipped, so re-running it is harmless:
+
+    python backfill_achievements.py
+    python backfill_achievements.py --shard-urls "$USER_SHARD_URLS"
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import achievements, schema
+from app.config import settings
+from app.database import create_engines, shard_set_from_urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Award badges for progress made before achievements existed")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./finesse.db"))
+    parser.add_argument("--shard-urls", default=os.getenv("USER_SHARD_URLS", ""),
+                        help="comma-separated user shard URLs (see app/sharding.py)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="users per batch")
+    args = parser.parse_args()
+
+    writer, reader = create_engines(args.database_url, tuned=settings.SQLITE_TUNED)
+    shards = shard_set_from_urls([url.strip() for url in args.shard_urls.split(",") if url.strip()])
+    try:
+        schema.ensure_schema(writer)
+        schema.ensure_shards(shards)
+        databases = [(s.writer, s.reader) for s in shards] or [(writer, reader)]
+        stats = achievements.backfill(databases, reader, chunk_size=args.chunk_size,
+                                      report=lambda line: print(f"\r{line}", end="", flush=True))
+        print()
+        awarded = ", ".join(f"{badge} {count:,}" for badge, count in sorted(stats["awarded"].items())) or "none"
+        print(f"{stats['users']:,} users checked in {stats['seconds']:.1f}s; badges awarded: {awarded}")
+    finally:
+        shards.dispose()
+        writer.dispose()
+        reader.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""
+Benchmarks and load-generation tools for the Finesse backend.
+
+Run them from the backend directory, e.g. ``python -m benchmarks.loadtest``.
+"""
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Lesson funnel analytics (app/analytics.py): full scan, incremental refresh, cache hits.
+
+Generates --users users on SQLite, then times:
+
+- full_scan: the first report (streams all of user_progress with yield_per)
+- cached: a report with nothing written since
+- incremental: a report after --writes progress updates through crud
+- sql: the same per-lesson counts and histogram as GROUP BY queries
+  (no median; SQLite has no percentile aggregate), for reference
+
+and checks the incremental report equals a fresh full scan.
+
+Usage (from the backend directory):
+    python -m benchmarks.analytics --users 1000000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Funnel analytics benchmark")
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--lessons", type=int, default=40)
+    parser.add_argument("--mean-started", type=float, default=8.0)
+    parser.add_argument("--writes", type=int, default=1000, help="progress updates before the incremental report")
+    parser.add_argument("--chunk-size", type=int, default=None, help="rows per fetch (default: ANALYTICS_CHUNK_SIZE)")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from sqlalchemy import text
+    from app import analytics, crud
+    from app.config import settings
+    from app.database import create_engines, make_session_factory
+    from benchmarks.common import write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-analytics-")
+    url = f"sqlite:///{os.path.join(workdir, 'analytics.db')}"
+    print(f"Generating {args.users:,} users...")
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--lessons",
+                    str(args.lessons), "--mean-started", str(args.mean_started), "--reset", "--database-url", url],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    chunk_size = args.chunk_size or settings.ANALYTICS_CHUNK_SIZE
+    results = {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        value = fn()
+        results[name] = {"ms": round((time.perf_counter() - start) * 1000.0, 1)}
+        return value
+
+    try:
+        funnel = analytics.Funnel([(writer, reader)], chunk_size=chunk_size)
+        timed("full_scan", funnel.report)
+        rows = funnel.stats["rows_read"]
+        results["full_scan"]["rows"] = rows
+        timed("cached", funnel.report)
+
+        factory = make_session_factory(writer, reader)
+        rng = random.Random(7)
+        db = factory()
+        try:
+            for _ in range(args.writes):
+                crud.update_user_progress(db, rng.randint(1, args.users), rng.randint(1, args.lessons),
+                                          rng.choice((25, 50, 75, 100)))
+        finally:
+            db.close()
+        before = funnel.stats["rows_read"]
+        incremental = timed("incremental", funnel.report)
+        results["incremental"]["rows"] = funnel.stats["rows_read"] - before
+        fresh = analytics.Funnel([(writer, reader)], chunk_size=chunk_size).report()
+        results["incremental_matches_full_scan"] = incremental["lessons"] == fresh["lessons"]
+
+        def sql():
+            with reader.connect() as conn:
+                counts = conn.execute(text("SELECT lesson_id, COUNT(*), SUM(is_completed) FROM user_progress "
+                                           "GROUP BY lesson_id")).all()
+                histogram = conn.execute(text("SELECT lesson_id, MIN(progress_percentage / 10, 10), COUNT(*) "
+                                              "FROM user_progress GROUP BY 1, 2")).all()
+            return counts, histogram
+
+        timed("sql", sql)
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    full = results["full_scan"]
+    print(f"full scan     {full['ms']:10.1f}ms  {rows:,} rows ({rows / full['ms'] * 1000:,.0f} rows/s)")
+    print(f"cached        {results['cached']['ms']:10.1f}ms")
+    print(f"incremental   {results['incremental']['ms']:10.1f}ms  {results['incremental']['rows']:,} rows "
+          f"after {args.writes:,} writes  "
+          f"({'matches' if results['incremental_matches_full_scan'] else 'DIFFERS FROM'} a full scan)")
+    print(f"SQL GROUP BY  {results['sql']['ms']:10.1f}ms  (counts and histogram only)")
+    path = write_results("analytics", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Classroom provisioning: POST /api/users:bulk vs one /api/register per student.
+
+Runs the app in-process against a temp SQLite database that already has
+--existing accounts (some imported rows collide with them), and reports:
+
+- per-row /api/register for a sample (extrapolated to --users)
+- one POST /api/users:bulk with --users rows
+- security.hash_passwords inline vs across --hash-workers processes
+
+Usage (from the backend directory):
+    python -m benchmarks.bulk_users --users 10000
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def make_rows(n: int, existing: int, collide_every: int):
+    rows = []
+    for i in range(n):
+        if existing and i % collide_every == 0:
+            j = i % existing + 1
+            rows.append({"username": f"user{j}", "email": f"user{j}@example.com", "password": "pw"})
+        else:
+            rows.append({"username": f"student{i}", "email": f"student{i}@school.example", "password": f"pw-{i}"})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk user provisioning benchmark")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--existing", type=int, default=1000, help="accounts already in the database")
+    parser.add_argument("--collide-every", type=int, default=20, help="every Nth row reuses an existing account")
+    parser.add_argument("--register-sample", type=int, default=300, help="rows sent through /api/register")
+    parser.add_argument("--hash-workers", type=int, default=4)
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finesse-bulk-")
+    url = f"sqlite:///{os.path.join(workdir, 'bulk.db')}"
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.existing), "--lessons", "5",
+                    "--reset", "--database-url", url], cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    os.environ["DATABASE_URL"] = url
+
+    from fastapi.testclient import TestClient
+    from app import security
+    from app.main import app
+    from benchmarks.common import write_results
+
+    rows = make_rows(args.users, args.existing, args.collide_every)
+    results = {}
+    try:
+        with TestClient(app) as client:
+            sample = [{"username": f"reg{i}", "email": f"reg{i}@school.example", "password": "pw"}
+                      for i in range(args.register_sample)]
+            started = time.perf_counter()
+            for row in sample:
+                client.post("/api/register", json=row)
+            per_row = (time.perf_counter() - started) / len(sample)
+            results["register"] = {"sample": len(sample), "per_row_ms": per_row * 1000.0,
+                                   "extrapolated_s": per_row * args.users}
+            print(f"/api/register: {per_row * 1000:.2f}ms per student -> ~{per_row * args.users:.1f}s "
+                  f"for {args.users:,}")
+
+            started = time.perf_counter()
+            response = client.post("/api/users:bulk", json={"users": rows})
+            elapsed = time.perf_counter() - started
+            body = response.json()
+            results["bulk"] = {"status_code": response.status_code, "elapsed_s": elapsed,
+                               "rows_per_s": args.users / elapsed,
+                               **{k: body.get(k) for k in ("created", "existing", "duplicates", "invalid")}}
+            print(f"/api/users:bulk: {args.users:,} rows in {elapsed:.2f}s ({args.users / elapsed:,.0f} rows/s) "
+                  f"created={body.get('created')} existing={body.get('existing')}")
+
+            started = time.perf_counter()
+            again = client.post("/api/users:bulk", json={"users": rows}).json()
+            results["bulk_rerun"] = {"elapsed_s": time.perf_counter() - started, "created": again.get("created"),
+                                     "existing": again.get("existing")}
+            print(f"re-running the same import: {results['bulk_rerun']['elapsed_s']:.2f}s, "
+                  f"created={again.get('created')} existing={again.get('existing')}")
+
+        passwords = [r["password"] for r in rows]
+        for workers in (0, args.hash_workers):
+            started = time.perf_counter()
+            security.hash_passwords(passwords, workers=workers)
+            elapsed = time.perf_counter() - started
+            results[f"hash_workers_{workers}"] = {"elapsed_s": elapsed}
+            print(f"hash_passwords({len(passwords):,}, workers={workers}): {elapsed * 1000:.0f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("bulk_users", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
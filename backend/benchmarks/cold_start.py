@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Cold-start budget check: import time of ``app.main`` and app startup time.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters, takes
+the best of N runs, and fails (exit code 1) when
+  * the cumulative import time exceeds --import-budget-ms,
+  * a module that must stay lazy (the Gemini SDK, grpc, protobuf, SciPy, pyarrow) is imported, or
+  * running the startup handlers against an up-to-date database exceeds --startup-budget-ms.
+
+Usage (from the backend directory):
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --import-budget-ms 1500 --runs 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.common import write_results
+
+# Heavy dependencies that must only be imported on first use.
+LAZY_MODULES = ("google.generativeai", "grpc", "google.protobuf", "scipy", "pyarrow")
+
+STARTUP_SNIPPET = """
+import asyncio, time
+from app.main import app
+async def start():
+    async with app.router.lifespan_context(app):
+        pass
+asyncio.run(start())  # first start creates the schema
+t = time.perf_counter()
+asyncio.run(start())
+print((time.perf_counter() - t) * 1000.0)
+"""
+
+
+def measure_imports(env):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                          cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    total_us, modules = None, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        modules.add(name)
+        if name == "app.main":
+            total_us = int(cumulative)
+    return total_us / 1000.0, modules
+
+
+def measure_startup(env):
+    proc = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if backend cold start regresses")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget-ms", type=float, default=2000.0)
+    parser.add_argument("--startup-budget-ms", type=float, default=250.0)
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="finesse-coldstart-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'coldstart.db')}")
+
+    import_runs, lazy_violations = [], set()
+    for _ in range(args.runs):
+        ms, modules = measure_imports(env)
+        import_runs.append(ms)
+        lazy_violations |= {m for m in modules for lazy in LAZY_MODULES if m == lazy or m.startswith(lazy + ".")}
+    startup_runs = [measure_startup(env) for _ in range(args.runs)]
+
+    import_ms, startup_ms = min(import_runs), min(startup_runs)
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import app.main took {import_ms:.0f}ms (budget {args.import_budget_ms:.0f}ms)")
+    if lazy_violations:
+        failures.append(f"eagerly imported: {', '.join(sorted(lazy_violations)[:5])}")
+    if startup_ms > args.startup_budget_ms:
+        failures.append(f"startup took {startup_ms:.1f}ms (budget {args.startup_budget_ms:.0f}ms)")
+
+    print(f"import app.main: {import_ms:8.1f} ms (best of {args.runs}, budget {args.import_budget_ms:.0f})")
+    print(f"app startup:     {startup_ms:8.1f} ms (best of {args.runs}, budget {args.startup_budget_ms:.0f})")
+    path = write_results("cold_start", {
+        "config": vars(args),
+        "import_ms": import_runs,
+        "startup_ms": startup_runs,
+        "lazy_violations": sorted(lazy_violations),
+        "passed": not failures,
+    }, args.out)
+    print(f"Results written to {path}")
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
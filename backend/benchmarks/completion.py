@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Lesson completion bitmaps (app/completion.py) vs querying user_progress.
+
+Generates --users users on SQLite, then times:
+
+- per user: "lessons completed" from the bitmap column vs counting user_progress rows
+- all users: per-lesson completion counts and "completed A but not B" over
+  the NumPy matrix vs the equivalent SQL (GROUP BY / NOT EXISTS)
+- loading the matrix itself (paid once per COMPLETION_MATRIX_TTL per worker)
+
+Usage (from the backend directory):
+    python -m benchmarks.completion --users 1000000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def timed(fn, repeat: int):
+    latencies, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Completion bitmap benchmark")
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--lessons", type=int, default=40)
+    parser.add_argument("--mean-started", type=float, default=8.0)
+    parser.add_argument("--lookups", type=int, default=2000, help="per-user lookups timed")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each all-users query")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from sqlalchemy import func, select, text
+    from app import completion, models
+    from app.config import settings
+    from app.database import create_engines
+    from benchmarks.common import summarize_latencies, write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-completion-")
+    url = f"sqlite:///{os.path.join(workdir, 'completion.db')}"
+    print(f"Generating {args.users:,} users...")
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--lessons",
+                    str(args.lessons), "--mean-started", str(args.mean_started), "--reset", "--database-url", url],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    rng = random.Random(3)
+    results = {}
+
+    try:
+        with reader.connect() as conn:
+            lesson_ids = conn.execute(select(models.Lesson.id).order_by(models.Lesson.id)).scalars().all()
+            sample = [rng.randint(1, args.users) for _ in range(args.lookups)]
+            bitmap_query = select(models.User.completed_lessons).where(models.User.id == text(":id"))
+            rows_query = (select(func.count()).select_from(models.UserProgress)
+                          .where(models.UserProgress.user_id == text(":id"), models.UserProgress.is_completed == True))
+            for label, run in (
+                ("bitmap", lambda i: completion.completed_count(conn.execute(bitmap_query, {"id": i}).scalar())),
+                ("user_progress", lambda i: conn.execute(rows_query, {"id": i}).scalar()),
+            ):
+                latencies = []
+                for user_id in sample:
+                    start = time.perf_counter()
+                    run(user_id)
+                    latencies.append((time.perf_counter() - start) * 1000.0)
+                results[f"per_user_{label}"] = summary = summarize_latencies(latencies, sum(latencies) / 1000.0)
+                print(f"lessons completed by one user, {label:<14} p50={summary['p50_ms']:.3f}ms "
+                      f"p99={summary['p99_ms']:.3f}ms")
+
+        load, matrix = timed(lambda: completion.load_matrix([(writer, reader)]), 1)
+        results["matrix_load_ms"] = round(load[0], 1)
+        print(f"matrix load: {load[0]:,.0f}ms for {len(matrix.user_ids):,} users x {matrix.bits.shape[1]} bytes "
+              f"({matrix.bits.nbytes / 1e6:.1f} MB)")
+
+        a, b = lesson_ids[0], lesson_ids[1]
+        counts_sql = text("SELECT lesson_id, COUNT(*) FROM user_progress WHERE is_completed GROUP BY lesson_id")
+        a_not_b_sql = text(
+            "SELECT COUNT(*) FROM user_progress p WHERE p.lesson_id = :a AND p.is_completed AND NOT EXISTS "
+            "(SELECT 1 FROM user_progress q WHERE q.user_id = p.user_id AND q.lesson_id = :b AND q.is_completed)")
+        with reader.connect() as conn:
+            queries = {
+                "lesson_counts": (lambda: completion.lesson_counts(matrix),
+                                  lambda: dict(conn.execute(counts_sql).all())),
+                "a_not_b": (lambda: len(completion.matching_users(matrix, [a], [b])),
+                            lambda: conn.execute(a_not_b_sql, {"a": a, "b": b}).scalar()),
+            }
+            for name, (numpy_fn, sql_fn) in queries.items():
+                numpy_ms, numpy_result = timed(numpy_fn, args.repeat)
+                sql_ms, sql_result = timed(sql_fn, max(1, args.repeat // 2))
+                results[name] = {"matrix_ms": round(min(numpy_ms), 2), "sql_ms": round(min(sql_ms), 2),
+                                 "same_answer": numpy_result == sql_result}
+                print(f"{name:<14} matrix {min(numpy_ms):9.2f}ms   SQL {min(sql_ms):9.2f}ms   "
+                      f"{'same answer' if numpy_result == sql_result else 'ANSWERS DIFFER'}")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("completion", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
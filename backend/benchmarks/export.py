@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Streaming exports (app/export.py, export_data.py): time, throughput, output
+size and peak memory for each format, against loading the table through the
+ORM the way the old ad-hoc export scripts did.
+
+Generates enough users for about --rows user_progress rows (SQLite), then runs
+each export in its own process and reads that process's peak RSS (with
+SQLITE_MMAP_SIZE=0, so mapped database pages don't count as export memory):
+
+- csv, csv.gz, csv.zst, parquet (zstd): export_data.py user_progress
+- orm: db.query(UserProgress).all() then csv.writer, on the first
+  --orm-rows rows only (its memory grows with the row count)
+
+Usage (from the backend directory):
+    python -m benchmarks.export --rows 10000000
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ROWS_PER_USER = 7.4  # user_progress rows per user at generate_dataset's default --mean-started 8
+
+ORM_EXPORT = """
+import csv, sys
+from app import models
+from app.database import create_engines, make_session_factory
+writer, reader = create_engines(sys.argv[1])
+db = make_session_factory(writer, reader)()
+columns = [c.name for c in models.UserProgress.__table__.columns]
+rows = db.query(models.UserProgress).order_by(models.UserProgress.id).limit(int(sys.argv[3])).all()
+with open(sys.argv[2], "w", newline="") as f:
+    out = csv.writer(f)
+    out.writerow(columns)
+    out.writerows([getattr(row, name) for name in columns] for row in rows)
+"""
+
+
+def run(command, env) -> dict:
+    """Run ``command`` to completion; wall time and the child's own peak RSS."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return {"seconds": round(time.perf_counter() - started, 2), "peak_rss_mb": round(usage.ru_maxrss / 1024, 1)}
+
+
+def size_of(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming export benchmark")
+    parser.add_argument("--rows", type=int, default=10000000, help="approximate user_progress rows")
+    parser.add_argument("--orm-rows", type=int, default=1000000, help="rows for the ORM baseline")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from benchmarks.common import write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-export-")
+    url = f"sqlite:///{os.path.join(workdir, 'export.db')}"
+    users = max(1, int(args.rows / ROWS_PER_USER))
+    print(f"Generating {users:,} users (~{args.rows:,} progress rows)...")
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(users), "--reset", "--database-url", url],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    env = dict(os.environ, DATABASE_URL=url, USER_SHARD_URLS="", SQLITE_MMAP_SIZE="0")
+    from sqlalchemy import create_engine, text
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT COUNT(*) FROM user_progress")).scalar()
+    engine.dispose()
+
+    methods = {
+        "csv": ["--compression", "none"],
+        "csv.gz": ["--compression", "gzip"],
+        "csv.zst": ["--compression", "zstd"],
+        "parquet": ["--format", "parquet", "--compression", "zstd"],
+    }
+    results = {}
+    try:
+        for name, options in methods.items():
+            path = os.path.join(workdir, f"user_progress.{name}")
+            result = run([sys.executable, "export_data.py", "user_progress", "--out", path] + options, env)
+            result.update(rows=rows, rows_per_s=round(rows / result["seconds"]), bytes=size_of(path))
+            results[name] = result
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+        orm_rows = min(rows, args.orm_rows)
+        result = run([sys.executable, "-c", ORM_EXPORT, url, os.path.join(workdir, "orm.csv"), str(orm_rows)], env)
+        result.update(rows=orm_rows, rows_per_s=round(orm_rows / result["seconds"]))
+        results["orm"] = result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'method':<10} {'rows':>12} {'seconds':>9} {'rows/s':>10} {'size MB':>9} {'peak RSS MB':>12}")
+    for name, r in results.items():
+        size = f"{r['bytes'] / 1e6:9.1f}" if "bytes" in r else f"{'':>9}"
+        print(f"{name:<10} {r['rows']:>12,} {r['seconds']:>9.1f} {r['rows_per_s']:>10,} {size} {r['peak_rss_mb']:>12,.0f}")
+    path = write_results("export", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Background jobs (app/jobs.py): what enqueueing costs the request, and how
+fast the runner drains the outbox.
+
+Against a temp SQLite database:
+
+- enqueue overhead: --writes XP updates (one commit each) with and without a
+  job enqueued in the same transaction
+- drain: --jobs no-op jobs enqueued up front, then the runner started and
+  timed until the outbox is empty, at each --concurrency
+- commit-to-run latency: one job per commit with the runner already polling,
+  measured from the commit to the handler starting (woken by the commit, not
+  the poll interval)
+
+Usage (from the backend directory):
+    python -m benchmarks.jobs --jobs 5000 --concurrency 1,4,16
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background job queue benchmark")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--writes", type=int, default=2000, help="XP updates per enqueue-overhead run")
+    parser.add_argument("--jobs", type=int, default=5000, help="jobs per drain run")
+    parser.add_argument("--concurrency", default="1,4,16", help="per-type concurrency limits to compare")
+    parser.add_argument("--latency-jobs", type=int, default=300)
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finesse-jobs-")
+    url = f"sqlite:///{os.path.join(workdir, 'jobs.db')}"
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--lessons", "5",
+                    "--reset", "--database-url", url], cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    os.environ["DATABASE_URL"] = url
+    os.environ["JOB_POLL_INTERVAL"] = "1.0"
+
+    from sqlalchemy import delete, func, select
+    from app import crud, jobs, models, schema
+    from app.database import SessionLocal, dispose_engines, engine
+    from benchmarks.common import summarize_latencies, write_results
+
+    schema.ensure_schema(engine)
+    rng = random.Random(7)
+    results = {}
+
+    def xp_writes(enqueue: bool):
+        latencies = []
+        started = time.perf_counter()
+        for i in range(args.writes):
+            user_id = rng.randint(1, args.users)
+            db = SessionLocal()
+            t0 = time.perf_counter()
+            try:
+                if enqueue:
+                    jobs.enqueue(db, "bench.noop", {"user_id": user_id}, key=f"bench:{i}")
+                crud.set_user_xp(db, user_id, rng.randint(0, 50000))
+            finally:
+                db.close()
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+        return summarize_latencies(latencies, time.perf_counter() - started)
+
+    def clear_outbox():
+        with engine.begin() as conn:
+            conn.execute(delete(models.Job))
+
+    def outstanding():
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(models.Job)
+                                .where(models.Job.status.in_([jobs.PENDING, jobs.RUNNING]))).scalar()
+
+    # The runner isn't started yet, so the enqueued jobs just sit in the outbox.
+    for label, enqueue in (("without_job", False), ("with_job", True)):
+        results[f"xp_write_{label}"] = r = xp_writes(enqueue)
+        print(f"XP write {label.replace('_', ' '):<12} p50={r['p50_ms']:6.2f}ms p99={r['p99_ms']:6.2f}ms "
+              f"({r['throughput_rps']:.0f}/s)")
+    clear_outbox()
+
+    async def drain(concurrency: int):
+        jobs.handler("bench.noop", concurrency=concurrency)(lambda db, payload: None)
+        db = SessionLocal()
+        for _ in range(args.jobs):
+            jobs.enqueue(db, "bench.noop", {})
+        db.commit()
+        db.close()
+        started = time.perf_counter()
+        jobs.runner.start()
+        while await asyncio.to_thread(outstanding):
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        await jobs.runner.stop()
+        return elapsed
+
+    results["drain"] = {}
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        elapsed = asyncio.run(drain(concurrency))
+        results["drain"][concurrency] = {"jobs": args.jobs, "seconds": round(elapsed, 3),
+                                         "jobs_per_s": round(args.jobs / elapsed, 1)}
+        print(f"drain {args.jobs} jobs, concurrency {concurrency:>3}: {elapsed:6.2f}s "
+              f"({args.jobs / elapsed:,.0f} jobs/s)")
+        clear_outbox()
+
+    async def commit_to_run():
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def record(db, payload):
+            started[payload["n"]] = time.perf_counter()
+
+        jobs.handler("bench.latency", concurrency=4)(record)
+        jobs.runner.start()
+        committed = {}
+        for n in range(args.latency_jobs):
+            db = SessionLocal()
+            jobs.enqueue(db, "bench.latency", {"n": n})
+            await loop.run_in_executor(None, db.commit)
+            committed[n] = time.perf_counter()
+            db.close()
+            await asyncio.sleep(rng.uniform(0.0, 0.02))
+        while len(started) < args.latency_jobs:
+            await asyncio.sleep(0.05)
+        await jobs.runner.stop()
+        return [(started[n] - committed[n]) * 1000.0 for n in committed]
+
+    latency = summarize_latencies(asyncio.run(commit_to_run()), 1.0)
+    results["commit_to_run"] = {k: latency[k] for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms") if k in latency}
+    print(f"commit -> handler start: p50={latency['p50_ms']:.2f}ms p99={latency['p99_ms']:.2f}ms "
+          f"(poll interval {os.environ['JOB_POLL_INTERVAL']}s)")
+
+    dispose_engines()
+    shutil.rmtree(workdir, ignore_errors=True)
+    path = write_results("jobs", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Row-decode throughput for lesson content and quiz options.
+
+Generates a dataset with generate_dataset.py, then reads every
+lesson_content.content and quiz_questions.options value with:
+
+- legacy:  the old JSONEncodedDict (text column, stdlib json.loads per row)
+- stdlib:  the native JSON type with SQLAlchemy's default (stdlib) codec
+- orjson:  the native JSON type with app.codec (what the app uses)
+
+and times the lesson endpoints' crud functions (get_lessons, get_lesson)
+with the stdlib and orjson engines.
+
+Usage (from the backend directory):
+    python -m benchmarks.json_decode --lessons 2000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+from sqlalchemy import Text, create_engine, select, type_coerce
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.types import TypeDecorator
+
+from app import codec, crud, models
+from benchmarks.common import summarize_latencies, write_results
+
+
+class LegacyJSONEncodedDict(TypeDecorator):
+    """The previous column type: JSON stored as text, decoded with the stdlib."""
+    impl = Text
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return json.loads(value) if value is not None else None
+
+
+COLUMNS = (("lesson_content.content", models.LessonContent.content),
+           ("quiz_questions.options", models.QuizQuestion.options))
+
+
+def decode_rows(engine, column, legacy: bool, repeat: int):
+    expr = type_coerce(column, LegacyJSONEncodedDict) if legacy else column
+    rows, best = 0, None
+    for _ in range(repeat):
+        with engine.connect() as conn:
+            start = time.perf_counter()
+            rows = sum(1 for _ in conn.execute(select(expr)).scalars())
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"rows": rows, "best_s": best, "rows_per_s": rows / best if best else 0.0}
+
+
+def time_endpoints(engine, lessons: int, repeat: int, limit: int):
+    factory = sessionmaker(bind=engine)
+    rng = random.Random(7)
+    listing, detail = [], []
+    for _ in range(repeat):
+        db = factory()
+        try:
+            start = time.perf_counter()
+            crud.get_lessons(db, limit=limit)
+            listing.append((time.perf_counter() - start) * 1000.0)
+        finally:
+            db.close()
+        for _ in range(50):
+            db = factory()
+            try:
+                start = time.perf_counter()
+                crud.get_lesson(db, rng.randint(1, lessons))
+                detail.append((time.perf_counter() - start) * 1000.0)
+            finally:
+                db.close()
+    return {
+        "get_lessons": summarize_latencies(listing, sum(listing) / 1000.0),
+        "get_lesson": summarize_latencies(detail, sum(detail) / 1000.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON column decode throughput: legacy vs native vs orjson")
+    parser.add_argument("--lessons", type=int, default=2000)
+    parser.add_argument("--contents-per-lesson", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is reported)")
+    parser.add_argument("--limit", type=int, default=100, help="page size for get_lessons")
+    parser.add_argument("--database-url", help="database to generate into (default: temp SQLite file)")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finesse-json-")
+    url = args.database_url or f"sqlite:///{os.path.join(workdir, 'json.db')}"
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", "100", "--lessons", str(args.lessons),
+                    "--contents-per-lesson", str(args.contents_per_lesson), "--reset", "--database-url", url],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    stdlib_engine = create_engine(url)
+    orjson_engine = create_engine(url, **codec.ENGINE_KWARGS)
+    results = {"decode": {}, "endpoints": {}}
+    try:
+        for label, column in COLUMNS:
+            runs = {
+                "legacy": decode_rows(stdlib_engine, column, True, args.repeat),
+                "stdlib": decode_rows(stdlib_engine, column, False, args.repeat),
+                "orjson": decode_rows(orjson_engine, column, False, args.repeat),
+            }
+            results["decode"][label] = runs
+            print(f"{label} ({runs['orjson']['rows']} rows)")
+            for name, r in runs.items():
+                speedup = r["rows_per_s"] / runs["legacy"]["rows_per_s"] if runs["legacy"]["rows_per_s"] else 0
+                print(f"  {name:7} {r['rows_per_s']:>12,.0f} rows/s  ({speedup:.2f}x legacy)")
+
+        for name, engine in (("stdlib", stdlib_engine), ("orjson", orjson_engine)):
+            timings = time_endpoints(engine, args.lessons, args.repeat, args.limit)
+            results["endpoints"][name] = timings
+            print(f"{name:7} get_lessons(limit={args.limit}) p50={timings['get_lessons']['p50_ms']:.2f}ms  "
+                  f"get_lesson p50={timings['get_lesson']['p50_ms']:.2f}ms "
+                  f"p99={timings['get_lesson']['p99_ms']:.2f}ms")
+    finally:
+        stdlib_engine.dispose()
+        orjson_engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("json_decode", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
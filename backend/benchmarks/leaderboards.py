@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Cohort leaderboards (app/leaderboards.py): cached sorted boards vs querying
+the group on every poll.
+
+Generates --users users on SQLite and one cohort of each size in --sizes
+(random members), then times, per cohort size:
+
+- sql: one poll the uncached way, the top --limit members plus one member's
+  rank (``WHERE id IN (cohort) ORDER BY xp_points``, and a COUNT of who is ahead)
+- cached: the same page and rank from the worker's board
+- load: building the board (read sorted runs, k-way merge), paid on a miss
+- update: applying one XP change to the board (bus dispatch, bisect out, insort in)
+
+Usage (from the backend directory):
+    python -m benchmarks.leaderboards --users 200000 --sizes 10,100,1000,10000,100000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def timed(fn, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort leaderboard benchmark")
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000", help="comma-separated cohort sizes")
+    parser.add_argument("--limit", type=int, default=10, help="entries per page")
+    parser.add_argument("--polls", type=int, default=200, help="polls timed per size (the SQL side gets fewer)")
+    parser.add_argument("--updates", type=int, default=2000, help="XP changes applied per size")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from sqlalchemy import bindparam, func, select, text
+    from app import leaderboards, models
+    from app.config import settings
+    from app.database import create_engines, make_session_factory
+    from benchmarks.common import summarize_latencies, write_results
+
+    sizes = [int(n) for n in args.sizes.split(",") if n.strip()]
+    if max(sizes) > args.users:
+        sys.exit("--users must be at least the largest cohort size")
+    workdir = tempfile.mkdtemp(prefix="finesse-leaderboards-")
+    url = f"sqlite:///{os.path.join(workdir, 'leaderboards.db')}"
+    print(f"Generating {args.users:,} users...")
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--reset",
+                    "--database-url", url], cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    Session = make_session_factory(writer, reader)
+    rng = random.Random(11)
+    users = models.User.__table__
+    members = models.CohortMember.__table__
+    boards = leaderboards.Boards(maxsize=len(sizes) + 1, ttl=float("inf"))
+    leaderboards.boards = boards
+    results = {}
+
+    xp = func.coalesce(users.c.xp_points, 0)
+    in_cohort = users.c.id.in_(select(members.c.user_id).where(members.c.cohort_id == text(":cohort")))
+    top_sql = select(users.c.id, users.c.username, xp).where(in_cohort).order_by(xp.desc(), users.c.id).limit(
+        args.limit)
+    me = select(xp.label("xp")).where(users.c.id == text(":user")).scalar_subquery()
+    rank_sql = select(func.count() + 1).select_from(users).where(
+        in_cohort, (xp > me) | ((xp == me) & (users.c.id < text(":user"))))
+
+    try:
+        for size in sizes:
+            member_ids = rng.sample(range(1, args.users + 1), size)
+            with Session() as db:
+                cohort_id = leaderboards.create_cohort(db, f"cohort of {size}", member_ids)["id"]
+            row = {}
+            with reader.connect() as conn:
+                def sql_poll():
+                    user = rng.choice(member_ids)
+                    conn.execute(top_sql, {"cohort": cohort_id}).all()
+                    return conn.execute(rank_sql, {"cohort": cohort_id, "user": user}).scalar()
+                sql_ms = timed(sql_poll, max(5, args.polls // 10))
+            row["sql"] = summarize_latencies(sql_ms, sum(sql_ms) / 1000.0)
+
+            with Session() as db:
+                load_ms = timed(lambda: (boards.clear(), leaderboards.cohort_leaderboard(db, cohort_id,
+                                                                                          limit=args.limit)), 3)
+                row["load_ms"] = round(min(load_ms), 2)
+                cached_ms = timed(lambda: leaderboards.cohort_leaderboard(db, cohort_id, limit=args.limit,
+                                                                          user_id=rng.choice(member_ids)), args.polls)
+                row["cached"] = summarize_latencies(cached_ms, sum(cached_ms) / 1000.0)
+
+                update_ms = timed(lambda: leaderboards.xp_changed(rng.choice(member_ids), rng.randint(0, 20000)),
+                                  args.updates)
+                row["update"] = summarize_latencies(update_ms, sum(update_ms) / 1000.0)
+
+                # Writers aren't running here, so apply the same totals to the table and compare
+                board = boards._boards[leaderboards.cohort_key(cohort_id)]
+                set_xp = users.update().where(users.c.id == bindparam("uid")).values(xp_points=bindparam("xp"))
+                with writer.begin() as conn:
+                    conn.execute(set_xp, [{"uid": user_id, "xp": member[0]}
+                                          for user_id, member in board.members.items()])
+                cached_page = leaderboards.cohort_leaderboard(db, cohort_id, limit=args.limit)["entries"]
+                boards.clear()
+                fresh_page = leaderboards.cohort_leaderboard(db, cohort_id, limit=args.limit)["entries"]
+                row["same_page_after_updates"] = cached_page == fresh_page
+            results[str(size)] = row
+            print(f"{size:>8,} members  sql p50={row['sql']['p50_ms']:9.3f}ms  cached p50="
+                  f"{row['cached']['p50_ms']:7.3f}ms  load={row['load_ms']:9.2f}ms  update p50="
+                  f"{row['update']['p50_ms']:7.3f}ms  {'same page' if row['same_page_after_updates'] else 'PAGES DIFFER'}")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("leaderboards", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
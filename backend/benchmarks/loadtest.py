@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Load generator that replays the frontend's traffic mix against the API.
+
+Each virtual learner logs in, mounts the dashboard (lessons + server streak), then
+keeps a leaderboard poller running every 5s while it refocuses the dashboard,
+opens lessons, posts progress, answers quizzes and asks the tutor with think time in between.
+
+By default the ASGI app is driven in-process against a throw-away SQLite
+database with the tutor model replaced by a stub, so no server or API key is
+needed. Pass ``--base-url`` to hit a running server over HTTP instead.
+
+Usage (from the backend directory):
+    python -m benchmarks.loadtest --learners 50 --duration 30
+    python -m benchmarks.loadtest --base-url http://localhost:8000 --learners 200
+    python -m benchmarks.loadtest compare results/loadtest-abc123.json results/loadtest-def456.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.common import summarize_latencies, write_results, git_revision
+
+# Relative weights of the actions a learner takes between think times.
+# Mirrors the frontend: window focus refetches lessons, lesson pages post
+# progress and have quiz answers graded (which awards XP), the tutor page asks questions.
+ACTION_WEIGHTS = {
+    "focus_lessons": 30,
+    "open_lesson": 20,
+    "post_progress": 15,
+    "answer_quiz": 20,
+    "tutor_ask": 5,
+}
+
+LEADERBOARD_POLL_SECONDS = 5.0
+
+TUTOR_QUESTIONS = [
+    "What is diversification?",
+    "How do dividends work?",
+    "What does a P/E ratio tell me?",
+    "Why do stock prices change?",
+]
+
+
+class StubTutorModel:
+    """Stands in for the Gemini model with a fixed latency."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency_s)
+
+        class _Result:
+            text = "Diversification spreads risk across many investments."
+
+        return _Result()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            return None
+        self.latencies[route].append((time.perf_counter() - start) * 1000.0)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+
+async def leaderboard_poller(client, recorder: Recorder, stop_at: float, interval: float):
+    while time.monotonic() < stop_at:
+        await recorder.request(client, "GET /users/leaderboard", "GET", "/api/users/leaderboard", params={"limit": 6})
+        await asyncio.sleep(interval)
+
+
+async def learner(client, recorder: Recorder, credentials, lesson_ids: List[int], stop_at: float,
+                  think_time: float, poll_interval: float, rng: random.Random, skip_tutor: bool = False):
+    username, password = credentials
+    response = await recorder.request(
+        client, "POST /token", "POST", "/api/token",
+        data={"username": username, "password": password, "grant_type": "password"},
+    )
+    if response is None or response.status_code != 200:
+        return
+    user_id = response.json()["id"]
+
+    # Dashboard mount: fetch lessons and read the server-computed streak.
+    await recorder.request(client, "GET /lessons", "GET", "/api/lessons")
+    await recorder.request(client, "GET /users/{id}", "GET", f"/api/users/{user_id}")
+
+    poller = asyncio.create_task(leaderboard_poller(client, recorder, stop_at, poll_interval))
+    actions = [a for a in ACTION_WEIGHTS if not (skip_tutor and a == "tutor_ask")]
+    weights = [ACTION_WEIGHTS[a] for a in actions]
+    questions: Dict[int, List[dict]] = {}  # lesson id -> quiz questions seen when it was opened
+    try:
+        while time.monotonic() < stop_at:
+            await asyncio.sleep(rng.expovariate(1.0 / think_time))
+            action = rng.choices(actions, weights)[0]
+            lesson_id = rng.choice(lesson_ids)
+            if action == "focus_lessons":
+                await recorder.request(client, "GET /lessons", "GET", "/api/lessons")
+                await recorder.request(client, "GET /users/{id}", "GET", f"/api/users/{user_id}")
+            elif action == "open_lesson":
+                response = await recorder.request(client, "GET /lessons/{id}", "GET", f"/api/lessons/{lesson_id}")
+                if response is not None and response.status_code == 200:
+                    questions[lesson_id] = [q for item in response.json()["content_items"]
+                                            for q in item.get("questions", [])]
+            elif action == "post_progress":
+                await recorder.request(
+                    client, "POST /users/{id}/lessons/{id}/progress", "POST",
+                    f"/api/users/{user_id}/lessons/{lesson_id}/progress",
+                    json={"progress_percentage": rng.choice([25, 50, 75, 100])},
+                )
+            elif action == "answer_quiz" and questions.get(lesson_id):
+                question = rng.choice(questions[lesson_id])
+                await recorder.request(
+                    client, "POST /lessons/{id}/quiz/submit", "POST", f"/api/lessons/{lesson_id}/quiz/submit",
+                    json={"user_id": user_id, "answers": [
+                        {"question_id": question["id"], "selected_index": rng.randrange(len(question["options"]))}
+                    ]},
+                )
+            elif action == "tutor_ask":
+                await recorder.request(client, "POST /tutor/ask", "POST", "/api/tutor/ask",
+                                       json={"question": rng.choice(TUTOR_QUESTIONS)})
+    finally:
+        poller.cancel()
+        try:
+            await poller
+        except asyncio.CancelledError:
+            pass
+
+
+def seed_in_process(learners: int, password: str):
+    """Create the schema, a small lesson catalog and the learner accounts."""
+    from app import crud, schemas, schema
+    from app.database import SessionLocal, engine, shards
+
+    schema.ensure_schema(engine)
+    schema.ensure_shards(shards)
+    db = SessionLocal()
+    try:
+        for i in range(5):
+            crud.create_lesson(db, schemas.LessonCreate(
+                title=f"Load test lesson {i + 1}",
+                description="Generated for load testing",
+                order_index=i + 1,
+                content_items=[
+                    schemas.ContentCreate(content_type="text", title="Intro",
+                                          content={"text": "Stocks represent ownership. " * 20}, order_index=1),
+                    schemas.ContentCreate(content_type="quiz", title="Check", order_index=2, content={
+                        "question": "What does a stock represent?",
+                        "options": ["A loan", "Ownership in a company", "A tax", "A bond"],
+                        "correctAnswer": 1, "explanation": "A share is a slice of ownership.",
+                    }),
+                ],
+            ))
+        users = []
+        for i in range(learners):
+            username = f"loadtest{i}"
+            crud.create_user(db, username=username, email=f"{username}@example.com", password=password)
+            users.append((username, password))
+        lesson_ids = [l.id for l in crud.get_lessons(db)]
+        return users, lesson_ids
+    finally:
+        db.close()
+
+
+async def run(args) -> Dict:
+    password = "loadtest-password"
+    rng = random.Random(args.seed)
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30.0)
+        lifespan = None
+        users = [(f"{args.user_prefix}{i}", args.password or password) for i in range(args.learners)]
+        async with client:
+            lessons = (await client.get("/api/lessons")).json()
+        lesson_ids = [l["id"] for l in lessons] or [1]
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30.0)
+    else:
+        from app.main import app
+        from app.routers import tutor as tutor_router
+
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        users, lesson_ids = seed_in_process(args.learners, password)
+        tutor_router._model = StubTutorModel(args.tutor_latency)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest")
+
+    recorder = Recorder()
+    stop_at = time.monotonic() + args.duration
+    started = time.perf_counter()
+    try:
+        async with client:
+            await asyncio.gather(*[
+                learner(client, recorder, creds, lesson_ids, stop_at, args.think_time,
+                        LEADERBOARD_POLL_SECONDS * args.time_scale, random.Random(rng.random()), args.skip_tutor)
+                for creds in users
+            ])
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    elapsed = time.perf_counter() - started
+
+    routes = {route: summarize_latencies(values, elapsed) for route, values in sorted(recorder.latencies.items())}
+    for route, count in recorder.errors.items():
+        routes.setdefault(route, summarize_latencies([], elapsed))["errors"] = count
+    all_latencies = [v for values in recorder.latencies.values() for v in values]
+    return {
+        "config": {
+            "mode": "http" if args.base_url else "in-process",
+            "learners": args.learners,
+            "duration_s": args.duration,
+            "think_time_s": args.think_time,
+            "time_scale": args.time_scale,
+            "tutor_latency_s": args.tutor_latency,
+            "skip_tutor": args.skip_tutor,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total": {**summarize_latencies(all_latencies, elapsed), "errors": sum(recorder.errors.values())},
+        "routes": routes,
+    }
+
+
+def print_report(results: Dict):
+    print(f"{'route':45} {'count':>7} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>5}")
+    rows = list(results["routes"].items()) + [("TOTAL", results["total"])]
+    for route, s in rows:
+        print(f"{route:45} {s['count']:>7} {s['throughput_rps']:>9.1f} {s['p50_ms']:>9.2f} "
+              f"{s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s.get('errors', 0):>5}")
+
+
+def compare(base_path: str, head_path: str):
+    """Print per-route throughput and p95 deltas between two result files."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    print(f"base: {base['environment'].get('commit')}  head: {head['environment'].get('commit')}")
+    print(f"{'route':45} {'rps base':>9} {'rps head':>9} {'p95 base':>9} {'p95 head':>9} {'p95 Δ%':>8}")
+    routes = sorted(set(base["routes"]) | set(head["routes"]))
+    for route in routes + ["TOTAL"]:
+        b = base["total"] if route == "TOTAL" else base["routes"].get(route)
+        h = head["total"] if route == "TOTAL" else head["routes"].get(route)
+        if not b or not h:
+            print(f"{route:45} {'(missing in one run)':>45}")
+            continue
+        delta = (h["p95_ms"] - b["p95_ms"]) / b["p95_ms"] * 100.0 if b["p95_ms"] else 0.0
+        print(f"{route:45} {b['throughput_rps']:>9.1f} {h['throughput_rps']:>9.1f} "
+              f"{b['p95_ms']:>9.2f} {h['p95_ms']:>9.2f} {delta:>+7.1f}%")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Replay the frontend traffic mix against the Finesse API")
+    parser.add_argument("--learners", type=int, default=50, help="concurrent virtual learners")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between learner actions")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="multiplier for the 5s leaderboard poll interval (e.g. 0.1 to compress)")
+    parser.add_argument("--tutor-latency", type=float, default=0.05, help="stub tutor model latency in seconds")
+    parser.add_argument("--skip-tutor", action="store_true",
+                        help="leave tutor asks out of the mix (HTTP mode has no stub model)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="hit a running server instead of the in-process app")
+    parser.add_argument("--user-prefix", default="loadtest", help="username prefix of pre-created accounts (HTTP mode)")
+    parser.add_argument("--password", help="password of pre-created accounts (HTTP mode)")
+    parser.add_argument("--out", help="result JSON path (default: benchmarks/results/loadtest-<commit>.json)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "compare":
+        if len(argv) != 3:
+            print("usage: python -m benchmarks.loadtest compare BASE.json HEAD.json")
+            sys.exit(2)
+        compare(argv[1], argv[2])
+        return
+
+    args = build_parser().parse_args(argv)
+
+    tmpdir = None
+    if not args.base_url:
+        # Must happen before the app (and its settings) are imported.
+        tmpdir = tempfile.mkdtemp(prefix="finesse-loadtest-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'loadtest.db')}"
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    path = write_results(f"loadtest-{git_revision() or 'local'}", results, args.out)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Price history for lesson exercises: memory-mapped store (app/prices.py) vs
+JSON blobs in lesson_content.
+
+Generates --symbols symbols of --years years of daily bars, stores them both
+ways (one interactive content item holding every symbol's OHLCV history as
+JSON, and the price store), then times per request:
+
+- json: load the content item and decode it, then pick a one-year range of
+  closes for --pick symbols (what reading series out of LessonContent costs)
+- store: the same closes from the store (binary search and views, plus the
+  aligned copy of the picked columns)
+- slice: one symbol's one-year range alone, zero-copy
+- weekly / monthly: resampling one symbol's full history
+
+Usage (from the backend directory):
+    python -m benchmarks.prices --symbols 50 --years 20 --pick 3
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def timed(fn, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price history store benchmark")
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--pick", type=int, default=3, help="symbols an exercise reads")
+    parser.add_argument("--requests", type=int, default=50, help="requests timed per case")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    import numpy as np
+
+    from app import codec, grading, models, prices, schema
+    from app.config import settings
+    from app.database import create_engines, make_session_factory
+    from benchmarks.common import summarize_latencies, write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-prices-")
+    url = f"sqlite:///{os.path.join(workdir, 'prices.db')}"
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    Session = make_session_factory(writer, reader)
+    store = prices.PriceStore(os.path.join(workdir, "store"))
+    rng = np.random.default_rng(5)
+    days = np.arange(np.datetime64("2000-01-03"), np.datetime64("2000-01-03") + 366 * args.years)
+    days = days[np.is_busday(days)]
+    symbols = [f"S{i:03d}" for i in range(args.symbols)]
+    results = {"bars_per_symbol": int(len(days))}
+
+    try:
+        schema.ensure_schema(writer)
+        histories, blob = {}, {}
+        for symbol in symbols:
+            close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, len(days))))
+            columns = {"timestamp": days, "open": close * 0.999, "high": close * 1.005, "low": close * 0.995,
+                       "close": close, "volume": rng.integers(1000, 100000, len(days)).astype(float)}
+            histories[symbol] = columns
+            blob[symbol] = {"dates": days.astype(str).tolist(),
+                            **{name: columns[name].tolist() for name in prices.COLUMNS[1:]}}
+        start = time.perf_counter()
+        store.write_many(histories)
+        results["store_write_s"] = round(time.perf_counter() - start, 2)
+        with Session() as db:
+            lesson = models.Lesson(title="Prices benchmark", description="")
+            db.add(lesson)
+            db.flush()
+            content = models.LessonContent(lesson_id=lesson.id, content_type="interactive", title="Prices",
+                                           content={"component": "chart", "data": {"history": blob}})
+            db.add(content)
+            db.commit()
+            content_id = content.id
+        results["json_mb"] = round(len(codec.dumps(blob)) / 1e6, 1)
+
+        first, last = str(days[len(days) // 2]), str(days[len(days) // 2 + 251])
+
+        def from_json():
+            picked = random.sample(symbols, args.pick)
+            with Session() as db:
+                data = grading.decode_json(db.get(models.LessonContent, content_id).content)["data"]["history"]
+            dates = np.array(data[picked[0]]["dates"], dtype="datetime64[D]")
+            lo, hi = np.searchsorted(dates, np.datetime64(first)), np.searchsorted(dates, np.datetime64(last), "right")
+            return np.column_stack([np.array(data[s]["close"][lo:hi]) for s in picked])
+
+        def from_store():
+            return store.aligned_closes(random.sample(symbols, args.pick), first, last)
+
+        assert from_json().shape == from_store().shape
+        print(f"{len(days):,} bars per symbol; {results['json_mb']} MB of JSON in the content item")
+        for name, fn in (
+            ("json", from_json),
+            ("store", from_store),
+            ("slice", lambda: store.series(random.choice(symbols), first, last)),
+            ("weekly", lambda: prices.resample(store.series(random.choice(symbols)), "weekly")),
+            ("monthly", lambda: prices.resample(store.series(random.choice(symbols)), "monthly")),
+        ):
+            latencies = timed(fn, args.requests)
+            results[name] = summarize_latencies(latencies, sum(latencies) / 1000.0)
+            print(f"{name:>8}  p50={results[name]['p50_ms']:9.3f}ms  p95={results[name]['p95_ms']:9.3f}ms")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("prices", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Per-question answer stats (app/question_stats.py): counting in memory with a
+batched flush vs an upsert per answer.
+
+Simulates --answers answers from learners of varying ability over
+--questions questions (submissions of --per-submission answers), then times:
+
+- sync: each submission's counts written to question_stats in its own
+  transaction as it is answered (what counting on the answer path costs)
+- buffered: question_stats.record per submission (the answer path as it is)
+- flush: one question_stats.flush of everything buffered, i.e. the
+  background thread's work for one interval
+
+and checks both ways end with the same counts.
+
+Usage (from the backend directory):
+    python -m benchmarks.question_stats --answers 20000 --questions 200
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def submissions(args, question_ids: list) -> list:
+    """Answer events per simulated submission, as grading records them."""
+    from app import question_stats
+
+    rng = random.Random(7)
+    batches = []
+    for _ in range(args.answers // args.per_submission):
+        ability = rng.random()
+        picked = rng.sample(question_ids, args.per_submission)
+        results = []
+        for question_id in picked:
+            correct = rng.random() < ability
+            results.append({"question_id": question_id, "is_correct": correct,
+                            "selected_index": 0 if correct else rng.randint(1, 3)})
+        times = {question_id: rng.randint(1000, 60000) for question_id in picked}
+        batches.append(question_stats.submission_answers(results, set(picked), times))
+    return batches
+
+
+def totals(engine) -> tuple:
+    from sqlalchemy import func, select
+
+    from app import question_stats
+
+    table = question_stats.stats_table
+    with engine.connect() as conn:
+        return tuple(conn.execute(select(func.sum(table.c.attempts), func.sum(table.c.correct),
+                                         func.sum(table.c.first_attempts))).one())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Question stats benchmark")
+    parser.add_argument("--answers", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--per-submission", type=int, default=5)
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from app import models, question_stats, schema
+    from app.config import settings
+    from app.database import create_engines, make_session_factory
+    from benchmarks.common import summarize_latencies, write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-question-stats-")
+    url = f"sqlite:///{os.path.join(workdir, 'question_stats.db')}"
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    Session = make_session_factory(writer, reader)
+    results = {}
+
+    try:
+        schema.ensure_schema(writer)
+        with Session() as db:
+            lesson = models.Lesson(title="Question stats benchmark", description="")
+            db.add(lesson)
+            db.flush()
+            content = models.LessonContent(lesson_id=lesson.id, content_type="quiz", title="Quiz", content={})
+            db.add(content)
+            db.flush()
+            questions = [models.QuizQuestion(lesson_content_id=content.id, question=f"Q{i}", options=list("ABCD"),
+                                             correct_answer=0, order_index=i) for i in range(args.questions)]
+            db.add_all(questions)
+            db.commit()
+            question_ids = [q.id for q in questions]
+        batches = submissions(args, question_ids)
+        answered = sum(len(batch) for batch in batches)
+
+        latencies = []
+        started = time.perf_counter()
+        for batch in batches:
+            start = time.perf_counter()
+            counters = {}
+            for answer in batch:
+                counters.setdefault(answer.question_id, question_stats.Counter()).add(answer)
+            with writer.begin() as conn:
+                question_stats.apply(conn, counters)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        results["sync"] = summarize_latencies(latencies, time.perf_counter() - started)
+        expected = totals(writer)
+        with writer.begin() as conn:
+            conn.execute(question_stats.stats_table.delete())
+
+        latencies = []
+        started = time.perf_counter()
+        for batch in batches:
+            start = time.perf_counter()
+            question_stats.buffer.record(batch)  # record() minus starting the flusher thread
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        results["buffered"] = summarize_latencies(latencies, time.perf_counter() - started)
+        start = time.perf_counter()
+        rows = question_stats.flush(writer)
+        results["flush_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+        assert totals(writer) == expected, (totals(writer), expected)
+
+        print(f"{answered:,} answers to {args.questions:,} questions in {len(batches):,} submissions")
+        for name in ("sync", "buffered"):
+            print(f"{name:>9}  p50={results[name]['p50_ms']:8.3f}ms  p95={results[name]['p95_ms']:8.3f}ms "
+                  f"per submission")
+        print(f"    flush  {results['flush_ms']:.1f}ms for {rows} rows (once per interval)")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("question_stats", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Read/write splitting with local stand-in replicas.
+
+Generates a dataset into a primary SQLite file and copies it to N "replica"
+files. The copies never receive writes, which makes routing observable: a
+read that sees a fresh write must have gone to the primary. Lag is injected
+through the ReplicaSet's lag probe. Checks:
+
+- reads are spread across replicas (round_robin / least_connections)
+- a session that wrote reads its own write from the primary
+- a lagging replica is ejected and rejoins once it catches up
+- with every replica ejected, reads fall back to the primary
+
+and reports read throughput for primary-only vs replicas per mode.
+Pass Postgres URLs to run against a real primary/replica pair instead.
+
+Usage (from the backend directory):
+    python -m benchmarks.replica_routing --replicas 2 --duration 5
+    python -m benchmarks.replica_routing --database-url postgresql+psycopg2://... \\
+        --replica-url postgresql+psycopg2://...
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+from app import crud
+from app.database import create_engines, create_replica_engine, make_session_factory
+from app.replicas import ReplicaSet, measure_lag
+from benchmarks.common import summarize_latencies, write_results
+
+
+def read_load(factory, primary, users: int, threads: int, duration: float):
+    hits, latencies, stop = Counter(), [], threading.Event()
+
+    def run(seed):
+        n = seed
+        while not stop.is_set():
+            n = (n * 1103515245 + 12345) % 2**31
+            start = time.perf_counter()
+            db = factory()
+            try:
+                crud.get_user(db, n % users + 1)
+                crud.get_leaderboard(db, limit=10)
+                hits[db.info.get("replica", primary)] += 1
+            finally:
+                db.close()
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    workers = [threading.Thread(target=run, args=(i + 1,)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    time.sleep(duration)
+    stop.set()
+    for w in workers:
+        w.join()
+    return hits, summarize_latencies(latencies, time.perf_counter() - started)
+
+
+def check(label, ok, failures):
+    print(f"  [{'ok' if ok else 'FAIL'}] {label}")
+    if not ok:
+        failures.append(label)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replica routing checks and read throughput")
+    parser.add_argument("--replicas", type=int, default=2, help="SQLite stand-in replicas to create")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--database-url", help="primary URL (default: temp SQLite file)")
+    parser.add_argument("--replica-url", action="append", default=[], help="replica URL (repeatable)")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finesse-replicas-")
+    primary_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'primary.db')}"
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--reset",
+                    "--database-url", primary_url], cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    replica_urls = list(args.replica_url)
+    if not replica_urls:
+        for i in range(args.replicas):
+            path = os.path.join(workdir, f"replica{i + 1}.db")
+            shutil.copyfile(os.path.join(workdir, "primary.db"), path)
+            replica_urls.append(f"sqlite:///{path}")
+
+    primary, primary_reader = create_engines(primary_url)
+    replica_engines = [create_replica_engine(url) for url in replica_urls]
+    injected = {e: 0.0 for e in replica_engines}
+    failures, results = [], {}
+
+    def probe(engine):
+        return measure_lag(engine) + injected[engine]
+
+    def after_next_check(factory):
+        # Ejection happens on the first probe after check_interval; reads in
+        # flight until then may still use the old state.
+        time.sleep(0.3)
+        read_load(factory, primary, args.users, 1, 0.1)
+
+    try:
+        _, baseline = read_load(make_session_factory(primary, primary_reader), primary_reader, args.users,
+                                args.threads, args.duration)
+        results["primary_only"] = baseline
+        print(f"primary only: {baseline['throughput_rps']:.0f} reads/s  p99={baseline['p99_ms']:.2f}ms")
+
+        for mode in ("round_robin", "least_connections"):
+            replicas = ReplicaSet(replica_engines, mode=mode, max_lag=5.0, check_interval=0.2, lag_probe=probe)
+            factory = make_session_factory(primary, replicas)
+            hits, summary = read_load(factory, primary, args.users, args.threads, args.duration)
+            results[mode] = summary
+            share = ", ".join(f"{hits[e] * 100 / max(sum(hits.values()), 1):.0f}%" for e in replica_engines)
+            print(f"{mode}: {summary['throughput_rps']:.0f} reads/s  p99={summary['p99_ms']:.2f}ms  "
+                  f"replica share: {share}  primary: {hits[primary]}")
+            check(f"{mode}: every replica served reads, primary served none",
+                  all(hits[e] for e in replica_engines) and not hits[primary], failures)
+
+        replicas = ReplicaSet(replica_engines, max_lag=5.0, check_interval=0.2, lag_probe=probe)
+        factory = make_session_factory(primary, replicas)
+
+        db = factory()
+        try:
+            marker = 987654
+            crud.set_user_xp(db, 1, marker)
+            own = crud.get_user(db, 1).xp_points
+        finally:
+            db.close()
+        check("a session that wrote reads its own write from the primary", own == marker, failures)
+        if not args.replica_url:
+            db = factory()
+            try:
+                stale = crud.get_user(db, 1).xp_points
+            finally:
+                db.close()
+            check("a fresh read-only session goes to a replica (stand-ins never see the write)",
+                  stale != marker, failures)
+
+        injected[replica_engines[0]] = 30.0
+        after_next_check(factory)
+        hits, _ = read_load(factory, primary, args.users, args.threads, 1.0)
+        check("a replica lagging 30s is ejected", not hits[replica_engines[0]], failures)
+        injected[replica_engines[0]] = 0.0
+        after_next_check(factory)
+        hits, _ = read_load(factory, primary, args.users, args.threads, 1.0)
+        check("it rejoins once it catches up", hits[replica_engines[0]] > 0, failures)
+
+        for e in replica_engines:
+            injected[e] = 30.0
+        after_next_check(factory)
+        hits, _ = read_load(factory, primary, args.users, args.threads, 1.0)
+        check("with every replica ejected, reads fall back to the primary",
+              hits[primary] > 0 and not any(hits[e] for e in replica_engines), failures)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("replica_routing", {
+        "config": {"replicas": len(replica_urls), "threads": args.threads, "duration": args.duration,
+                   "dialect": primary.dialect.name},
+        "results": results, "failures": failures,
+    }, args.out)
+    print(f"Results written to {path}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tutor context retrieval: index build time, lookup latency and prompt size.
+
+Generates a catalog with generate_dataset.py, builds app.retrieval's index
+from it, then for random learner questions reports:
+
+- lookup latency of RetrievalIndex.top (target: well under 1ms)
+- context size in estimated tokens: the whole lesson (what the client used
+  to send) vs the retrieved chunks under TUTOR_CONTEXT_TOKENS
+
+Usage (from the backend directory):
+    python -m benchmarks.retrieval --lessons 2000 --queries 5000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+import numpy as np
+
+from app import retrieval
+from app.config import settings
+from app.database import create_engines, make_session_factory
+from generate_dataset import VOCABULARY
+from benchmarks.common import summarize_latencies, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tutor retrieval benchmark")
+    parser.add_argument("--lessons", type=int, default=2000)
+    parser.add_argument("--contents-per-lesson", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--chunks", type=int, default=settings.TUTOR_CONTEXT_CHUNKS)
+    parser.add_argument("--token-budget", type=int, default=settings.TUTOR_CONTEXT_TOKENS)
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finesse-retrieval-")
+    url = f"sqlite:///{os.path.join(workdir, 'retrieval.db')}"
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", "100", "--lessons", str(args.lessons),
+                    "--contents-per-lesson", str(args.contents_per_lesson), "--reset", "--database-url", url],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    writer, reader = create_engines(url)
+    db = make_session_factory(writer, reader)()
+    try:
+        started = time.perf_counter()
+        chunks = retrieval.load_chunks(db)
+        load_s = time.perf_counter() - started
+        started = time.perf_counter()
+        index = retrieval.RetrievalIndex(chunks)
+        build_s = time.perf_counter() - started
+    finally:
+        db.close()
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    lesson_tokens = defaultdict(int)
+    for chunk in chunks:
+        lesson_tokens[chunk.lesson_id] += chunk.tokens
+    print(f"index: {len(chunks):,} chunks, {len(index.vocabulary):,} terms, {index.weights.nnz:,} weights "
+          f"(load {load_s:.2f}s, build {build_s:.2f}s)")
+
+    rng = random.Random(7)
+    lesson_ids = sorted(lesson_tokens)
+    latencies, full, retrieved, empty = [], [], [], 0
+    for _ in range(args.queries):
+        lesson_id = rng.choice(lesson_ids)
+        question = "What does " + " ".join(rng.sample(VOCABULARY, rng.randint(2, 5))) + " mean?"
+        start = time.perf_counter()
+        picked = index.top(question, args.chunks, args.token_budget, lesson_id)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        full.append(lesson_tokens[lesson_id])
+        retrieved.append(sum(c.tokens for c in picked))
+        empty += not picked
+    lookup = summarize_latencies(latencies, sum(latencies) / 1000.0)
+    context = {
+        "whole_lesson_tokens_mean": float(np.mean(full)),
+        "retrieved_tokens_mean": float(np.mean(retrieved)),
+        "retrieved_tokens_max": int(np.max(retrieved)),
+        "reduction": float(np.mean(full) / max(np.mean(retrieved), 1.0)),
+        "no_context": empty,
+    }
+    print(f"lookup: p50={lookup['p50_ms'] * 1000:.0f}us p99={lookup['p99_ms'] * 1000:.0f}us "
+          f"max={lookup['max_ms'] * 1000:.0f}us")
+    print(f"context: whole lesson ~{context['whole_lesson_tokens_mean']:.0f} tokens, retrieved "
+          f"~{context['retrieved_tokens_mean']:.0f} (max {context['retrieved_tokens_max']}, "
+          f"budget {args.token_budget}) -> {context['reduction']:.1f}x smaller")
+
+    path = write_results("retrieval", {
+        "config": vars(args),
+        "results": {"chunks": len(chunks), "terms": len(index.vocabulary), "load_s": load_s, "build_s": build_s,
+                    "lookup": lookup, "context": context},
+    }, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Spaced-repetition review queue (app/reviews.py): due-queue latency as users
+accumulate cards, with and without ix_review_cards_user_due (user_id, due_at).
+
+Builds a SQLite database (catalog from generate_dataset.py, then review_cards
+filled directly) with --per-size users at each card count in --cards, their
+due dates spread over the past month and the next year. Then times, per card
+count:
+
+- due: GET /api/reviews/due's queue query (the --limit most overdue cards)
+  and its next-due MIN, first through the index, then with only the primary
+  key (user_id, question_id) left, which finds the user's cards but has to
+  sort them all
+- answer: POST /api/reviews/answer's single upsert on an existing card
+
+Usage (from the backend directory):
+    python -m benchmarks.reviews --cards 100,1000,10000,50000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Review queue benchmark")
+    parser.add_argument("--cards", default="100,1000,10000,50000", help="comma-separated cards per user")
+    parser.add_argument("--per-size", type=int, default=3, help="users at each card count")
+    parser.add_argument("--limit", type=int, default=20, help="cards per due-queue request")
+    parser.add_argument("--lookups", type=int, default=300, help="requests timed per card count and variant")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from sqlalchemy import func, select, text
+    from app import reviews
+    from app.config import settings
+    from app.database import create_engines
+    from benchmarks.common import summarize_latencies, write_results
+
+    sizes = [int(n) for n in args.cards.split(",") if n.strip()]
+    workdir = tempfile.mkdtemp(prefix="finesse-reviews-")
+    url = f"sqlite:///{os.path.join(workdir, 'reviews.db')}"
+    users = len(sizes) * args.per_size
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(users), "--reset", "--database-url", url],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    rng = random.Random(5)
+    now = reviews._epoch(datetime.utcnow())
+    owners = {size: [i * args.per_size + k + 1 for k in range(args.per_size)] for i, size in enumerate(sizes)}
+    cards = reviews.cards
+
+    print(f"Filling review_cards ({sum(sizes) * args.per_size:,} cards)...")
+    with writer.begin() as conn:
+        for size, user_ids in owners.items():
+            for user_id in user_ids:
+                conn.execute(cards.insert(), [
+                    {"user_id": user_id, "question_id": question_id, "ease": 2.5, "interval_days": 6,
+                     "repetitions": 2, "lapses": 0, "reviews": 2, "last_reviewed_at": None,
+                     "due_at": now + rng.randint(-30 * reviews.DAY, 365 * reviews.DAY)}
+                    for question_id in range(1, size + 1)])
+        conn.execute(text("ANALYZE"))
+
+    user = text(":user_id")
+    due_query = (select(cards).where(cards.c.user_id == user, cards.c.due_at <= now)
+                 .order_by(cards.c.due_at).limit(args.limit))
+    next_query = select(func.min(cards.c.due_at)).where(cards.c.user_id == user, cards.c.due_at > now)
+    upsert = reviews._upserts["sqlite", False]
+    results = {}
+
+    def time_due(variant):
+        with reader.connect() as conn:
+            for size, user_ids in owners.items():
+                latencies = []
+                for _ in range(args.lookups):
+                    params = {"user_id": rng.choice(user_ids)}
+                    start = time.perf_counter()
+                    conn.execute(due_query, params).all()
+                    conn.execute(next_query, params).scalar()
+                    latencies.append((time.perf_counter() - start) * 1000.0)
+                summary = summarize_latencies(latencies, sum(latencies) / 1000.0)
+                results.setdefault(str(size), {})[f"due_{variant}"] = summary
+                print(f"{size:>8,} cards  due ({variant:<11}) p50={summary['p50_ms']:8.3f}ms "
+                      f"p99={summary['p99_ms']:8.3f}ms")
+            plan = " / ".join(row[-1] for row in conn.execute(text(
+                f"EXPLAIN QUERY PLAN SELECT * FROM review_cards WHERE user_id = 1 AND due_at <= {now} "
+                f"ORDER BY due_at LIMIT {args.limit}")))
+        print(f"  plan ({variant}): {plan}")
+        results[f"plan_{variant}"] = plan
+
+    try:
+        time_due("index")
+
+        for size, user_ids in owners.items():
+            latencies = []
+            for _ in range(args.lookups):
+                row = reviews._first_review(rng.choice(user_ids), rng.randint(1, size), rng.randint(0, 5),
+                                            datetime.utcnow())
+                start = time.perf_counter()
+                with writer.begin() as conn:
+                    conn.execute(upsert, row)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+            summary = summarize_latencies(latencies, sum(latencies) / 1000.0)
+            results[str(size)]["answer_upsert"] = summary
+            print(f"{size:>8,} cards  answer upsert      p50={summary['p50_ms']:8.3f}ms "
+                  f"p99={summary['p99_ms']:8.3f}ms")
+
+        with writer.begin() as conn:
+            conn.execute(text("DROP INDEX ix_review_cards_user_due"))
+        reader.dispose()  # pooled connections keep statements prepared against the index
+        time_due("primary_key")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("reviews", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Full-text search over a large catalog.
+
+Generates lessons with generate_dataset.py (10,000 lessons x 10 items is a
+100k-content-item corpus), which fills search_documents, then measures:
+
+- query latency per query shape (common term, rare term, multi-term,
+  prefix-as-you-type) through app.search, with p50/p95/p99
+- incremental indexing: creating a lesson through crud.create_lesson with
+  and without the index update
+
+Usage (from the backend directory):
+    python -m benchmarks.search --lessons 10000 --contents-per-lesson 10
+    python -m benchmarks.search --database-url postgresql+psycopg2://... --lessons 10000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+from sqlalchemy import func, select
+
+from app import crud, models, schemas, search
+from app.database import create_engines, make_session_factory
+from generate_dataset import VOCABULARY
+from benchmarks.common import summarize_latencies, write_results
+
+QUERY_SHAPES = {
+    "common term": lambda rng: rng.choice(VOCABULARY),
+    "two terms": lambda rng: " ".join(rng.sample(VOCABULARY, 2)),
+    "three terms": lambda rng: " ".join(rng.sample(VOCABULARY, 3)),
+    "prefix": lambda rng: rng.choice([w for w in VOCABULARY if len(w) > 4])[:3],
+    "rare term": lambda rng: f"lesson {rng.randint(1, 10000)}",
+}
+
+
+def time_queries(factory, shape, make_query, queries: int, limit: int):
+    rng = random.Random(42)
+    latencies, hits = [], 0
+    started = time.perf_counter()
+    for _ in range(queries):
+        q = make_query(rng)
+        db = factory()
+        try:
+            start = time.perf_counter()
+            hits += len(search.search(db, q, limit=limit))
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        finally:
+            db.close()
+    summary = summarize_latencies(latencies, time.perf_counter() - started)
+    summary["mean_hits"] = hits / max(queries, 1)
+    return summary
+
+
+def time_lesson_writes(factory, count: int, indexed: bool):
+    original = search.index_lessons
+    if not indexed:
+        search.index_lessons = lambda conn, lesson_ids: 0
+    latencies = []
+    try:
+        for i in range(count):
+            lesson = schemas.LessonCreate(
+                title=f"Benchmark lesson {i}", description="Dividend growth and compound returns",
+                content_items=[schemas.ContentCreate(content_type="text", title=f"Part {j}",
+                                                     content={"text": "Index funds track a benchmark. " * 20},
+                                                     order_index=j) for j in range(10)],
+            )
+            db = factory()
+            try:
+                start = time.perf_counter()
+                crud.create_lesson(db, lesson)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+            finally:
+                db.close()
+    finally:
+        search.index_lessons = original
+    return summarize_latencies(latencies, sum(latencies) / 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search benchmark")
+    parser.add_argument("--lessons", type=int, default=10000)
+    parser.add_argument("--contents-per-lesson", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=300, help="queries per shape")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=50, help="lessons created per indexing mode")
+    parser.add_argument("--database-url", help="database to generate into (default: temp SQLite file)")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finesse-search-")
+    url = args.database_url or f"sqlite:///{os.path.join(workdir, 'search.db')}"
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", "100", "--lessons", str(args.lessons),
+                    "--contents-per-lesson", str(args.contents_per_lesson), "--reset", "--database-url", url],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    generate_s = time.perf_counter() - started
+
+    writer, reader = create_engines(url)
+    factory = make_session_factory(writer, reader)
+    results = {"queries": {}}
+    try:
+        with reader.connect() as conn:
+            documents = conn.execute(select(func.count()).select_from(models.SearchDocument)).scalar()
+            contents = conn.execute(select(func.count()).select_from(models.LessonContent)).scalar()
+        started = time.perf_counter()
+        search.reindex_all(writer)
+        rebuild_s = time.perf_counter() - started
+        results["corpus"] = {"content_items": contents, "documents": documents,
+                             "generate_s": generate_s, "full_rebuild_s": rebuild_s}
+        print(f"corpus: {contents:,} content items, {documents:,} documents "
+              f"(full rebuild {rebuild_s:.1f}s, {documents / rebuild_s:,.0f} docs/s)")
+
+        print(f"{'query':14} {'qps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'hits':>6}")
+        for shape, make_query in QUERY_SHAPES.items():
+            r = time_queries(factory, shape, make_query, args.queries, args.limit)
+            results["queries"][shape] = r
+            print(f"{shape:14} {r['throughput_rps']:>8.0f} {r['p50_ms']:>6.2f}ms {r['p95_ms']:>6.2f}ms "
+                  f"{r['p99_ms']:>6.2f}ms {r['mean_hits']:>6.1f}")
+
+        plain = time_lesson_writes(factory, args.writes, indexed=False)
+        indexed = time_lesson_writes(factory, args.writes, indexed=True)
+        results["lesson_writes"] = {"without_index": plain, "with_index": indexed}
+        print(f"create_lesson (10 items): p50 {plain['p50_ms']:.2f}ms without index, "
+              f"{indexed['p50_ms']:.2f}ms with incremental indexing")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("search", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
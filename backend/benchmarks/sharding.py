@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+User sharding: write throughput by shard count, and the cost of the
+scatter-gather leaderboard.
+
+Generates one dataset with generate_dataset.py, then for each entry of
+--shards copies it and moves the users onto that many SQLite shard files
+with reshard.py ("0" = unsharded, today's layout). Each configuration runs
+--workers app processes x --threads request threads doing learner writes
+(lesson progress, XP) for random users for --duration seconds. On SQLite
+every file has one writer at a time, so extra shards pay off once there are
+cores (or slow fsyncs) to overlap the writes; on a single CPU there is
+nothing to overlap and the shard counts should come out about even. Leaderboard latency (k-way merge
+of per-shard top-N when sharded) is measured first, on identical data.
+
+Usage (from the backend directory):
+    python -m benchmarks.sharding --users 20000 --shards 0,1,2,4 --workers 8 --threads 4
+    python -m benchmarks.sharding --synchronous FULL   # durable commits (fsync per write)
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def open_factory(catalog_url: str, shard_urls):
+    from app.config import settings
+    from app.database import create_engines, make_session_factory, shard_set_from_urls
+
+    writer, reader = create_engines(catalog_url, tuned=settings.SQLITE_TUNED)
+    shards = shard_set_from_urls(shard_urls)
+    return make_session_factory(writer, reader, shards), [writer, reader], shards
+
+
+def write_worker(task):
+    """One app worker process: ``threads`` request threads sharing its engines."""
+    catalog_url, shard_urls, users, lesson_ids, start_at, duration, threads, seed = task
+    from app import crud
+
+    factory, engines, shards = open_factory(catalog_url, shard_urls)
+    per_thread = [[] for _ in range(threads)]
+
+    def run(index: int):
+        rng = random.Random(seed * 1000 + index)
+        while time.time() < start_at + duration:
+            user_id = rng.randint(1, users)
+            db = factory()
+            start = time.perf_counter()
+            try:
+                if rng.random() < 0.7:
+                    crud.update_user_progress(db, user_id, rng.choice(lesson_ids), rng.randint(0, 100))
+                else:
+                    crud.set_user_xp(db, user_id, rng.randint(0, 50000))
+            finally:
+                db.close()
+            per_thread[index].append((time.perf_counter() - start) * 1000.0)
+
+    # Every worker writes in the same wall-clock window, after all have imported the app.
+    time.sleep(max(start_at - time.time(), 0.0))
+    try:
+        pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    finally:
+        for engine in engines:
+            engine.dispose()
+        shards.dispose()
+    return [ms for latencies in per_thread for ms in latencies]
+
+
+def leaderboard_latency(catalog_url: str, shard_urls, calls: int):
+    from app import crud
+
+    factory, engines, shards = open_factory(catalog_url, shard_urls)
+    latencies, top = [], None
+    try:
+        for _ in range(calls):
+            db = factory()
+            start = time.perf_counter()
+            try:
+                top = [(u.id, u.xp_points) for u in crud.get_leaderboard(db, limit=10)]
+            finally:
+                db.close()
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    finally:
+        for engine in engines:
+            engine.dispose()
+        shards.dispose()
+    return latencies, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description="User sharding benchmark")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--lessons", type=int, default=20)
+    parser.add_argument("--shards", default="0,1,2,4", help="shard counts to compare (0 = unsharded)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="app worker processes (default: one per CPU, like start_server.py)")
+    parser.add_argument("--threads", type=int, default=4, help="request threads per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of writes per configuration")
+    parser.add_argument("--leaderboard-calls", type=int, default=300)
+    parser.add_argument("--synchronous", default=None, help="SQLITE_SYNCHRONOUS for the run (e.g. FULL)")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+    if args.synchronous:
+        os.environ["SQLITE_SYNCHRONOUS"] = args.synchronous
+
+    from benchmarks.common import summarize_latencies, write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-shards-")
+    base = os.path.join(workdir, "base.db")
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--lessons",
+                    str(args.lessons), "--reset", "--database-url", f"sqlite:///{base}"],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    import sqlite3
+    with sqlite3.connect(base) as conn:
+        lesson_ids = [row[0] for row in conn.execute("SELECT id FROM lessons")]
+
+    results = {}
+    try:
+        for count in [int(c) for c in args.shards.split(",")]:
+            label = f"shards_{count}" if count else "unsharded"
+            run_dir = os.path.join(workdir, label)
+            os.makedirs(run_dir)
+            catalog = os.path.join(run_dir, "catalog.db")
+            shutil.copy(base, catalog)
+            catalog_url = f"sqlite:///{catalog}"
+            shard_urls = [f"sqlite:///{os.path.join(run_dir, f'users-{i}.db')}" for i in range(count)]
+            if shard_urls:
+                subprocess.run([sys.executable, "reshard.py", "--database-url", catalog_url,
+                                "--to", ",".join(shard_urls)], cwd=BACKEND_DIR, check=True,
+                               stdout=subprocess.DEVNULL)
+
+            # Before any writes, so every layout must return the same top 10.
+            board, top = leaderboard_latency(catalog_url, shard_urls, args.leaderboard_calls)
+            board = summarize_latencies(board, sum(board) / 1000.0)
+
+            # Worker processes import app.database, which reads DATABASE_URL at import.
+            os.environ["DATABASE_URL"] = catalog_url
+            start_at = time.time() + 2.0 + 0.5 * args.workers
+            tasks = [(catalog_url, shard_urls, args.users, lesson_ids, start_at, args.duration, args.threads, seed)
+                     for seed in range(args.workers)]
+            with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+                per_worker = pool.map(write_worker, tasks)
+            writes = summarize_latencies([ms for worker in per_worker for ms in worker], args.duration)
+            results[label] = {"shards": count, "writes": writes, "leaderboard": board, "top": top}
+            print(f"{label:<10} writes: {writes['throughput_rps']:7.0f}/s p50={writes['p50_ms']:6.2f}ms "
+                  f"p99={writes['p99_ms']:7.2f}ms | leaderboard p50={board['p50_ms']:.2f}ms "
+                  f"p99={board['p99_ms']:.2f}ms")
+
+        tops = {repr(r["top"]) for r in results.values()}
+        print("leaderboard: same top 10 in every layout" if len(tops) == 1 else "leaderboard: layouts DISAGREE")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("sharding", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
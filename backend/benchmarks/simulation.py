@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Interactive market simulations (app/simulation.py): vectorized paths vs a
+per-path loop, and cached vs fresh runs.
+
+For each path count in --paths, over --days trading days of the default
+three-asset market with the default portfolios plus one of the learner's:
+
+- loop: the same run simulated one path (and one day) at a time in Python,
+  timed on --loop-paths paths and scaled up to the path count
+- vectorized: simulation.simulate, all paths of a block as one array
+- cached: simulation.run for a content item whose result is already cached
+  (a repeated lesson view)
+
+Usage (from the backend directory):
+    python -m benchmarks.simulation --paths 100,1000,10000 --days 252,2520
+"""
+
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def loop_simulate(params: dict, paths: int) -> list:
+    """Final values of each portfolio, one path and one day at a time (the baseline)."""
+    import random
+
+    from app import simulation
+
+    drift, factor = simulation._gbm_factor(params)
+    drift, factor = drift.tolist(), factor.tolist()
+    rng = random.Random(params["seed"])
+    assets = len(drift)
+    finals = []
+    for _ in range(paths):
+        holdings = [list(p["weights"]) for p in params["portfolios"]]
+        for day in range(params["horizon_days"]):
+            shocks = [rng.gauss(0.0, 1.0) for _ in range(assets)]
+            growth = [math.exp(drift[i] + sum(factor[i][j] * shocks[j] for j in range(i + 1)))
+                      for i in range(assets)]
+            for k, held in enumerate(holdings):
+                held[:] = [h * g for h, g in zip(held, growth)]
+                if params["rebalance_every"] and (day + 1) % params["rebalance_every"] == 0:
+                    total = sum(held)
+                    held[:] = [w * total for w in params["portfolios"][k]["weights"]]
+        finals.append([sum(held) for held in holdings])
+    return finals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Market simulation benchmark")
+    parser.add_argument("--paths", default="100,1000,10000", help="comma-separated path counts")
+    parser.add_argument("--days", default="252,2520", help="comma-separated horizons in trading days")
+    parser.add_argument("--rebalance-every", type=int, default=21)
+    parser.add_argument("--loop-paths", type=int, default=20, help="paths the per-path loop is timed on")
+    parser.add_argument("--polls", type=int, default=200, help="cached requests timed per case")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from app import models, schema, simulation
+    from app.config import settings
+    from app.database import create_engines, make_session_factory
+    from benchmarks.common import summarize_latencies, write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-simulation-")
+    url = f"sqlite:///{os.path.join(workdir, 'simulation.db')}"
+    writer, reader = create_engines(url, tuned=settings.SQLITE_TUNED)
+    Session = make_session_factory(writer, reader)
+    weights = {"STOCKS": 0.5, "BONDS": 0.3, "CASH": 0.2}
+    results = {}
+
+    try:
+        schema.ensure_schema(writer)
+        with Session() as db:
+            lesson = models.Lesson(title="Simulation benchmark", description="")
+            db.add(lesson)
+            db.flush()
+            content = models.LessonContent(lesson_id=lesson.id, content_type="interactive", title="Simulator",
+                                           content={"component": simulation.COMPONENT, "data": {}})
+            db.add(content)
+            db.commit()
+            content_id = content.id
+
+        for days in [int(n) for n in args.days.split(",") if n.strip()]:
+            for paths in [int(n) for n in args.paths.split(",") if n.strip()]:
+                overrides = {"weights": weights, "paths": paths, "horizon_days": days,
+                             "rebalance_every": args.rebalance_every}
+                params = simulation.resolve({}, overrides)
+                row = {}
+                start = time.perf_counter()
+                loop_simulate(params, min(args.loop_paths, paths))
+                row["loop_ms"] = round((time.perf_counter() - start) * 1000.0 * paths / min(args.loop_paths, paths), 1)
+                start = time.perf_counter()
+                simulation.simulate(params)
+                row["vectorized_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+                row["speedup"] = round(row["loop_ms"] / max(row["vectorized_ms"], 1e-3), 1)
+
+                with Session() as db:
+                    simulation.run(db, content_id, overrides)  # fills the cache
+                    latencies = []
+                    started = time.perf_counter()
+                    for _ in range(args.polls):
+                        start = time.perf_counter()
+                        simulation.run(db, content_id, overrides)
+                        latencies.append((time.perf_counter() - start) * 1000.0)
+                    row["cached"] = summarize_latencies(latencies, time.perf_counter() - started)
+                results[f"{paths}x{days}"] = row
+                print(f"{paths:>7,} paths x {days:>5,} days  loop~{row['loop_ms']:11.1f}ms  vectorized="
+                      f"{row['vectorized_ms']:9.1f}ms  ({row['speedup']:6.1f}x)  "
+                      f"cached p50={row['cached']['p50_ms']:.3f}ms")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("simulation", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
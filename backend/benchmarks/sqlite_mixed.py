@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Mixed read/write load on SQLite: the plain engine vs the tuned profile.
+
+Generates a dataset with generate_dataset.py, copies it once per
+configuration, then runs several worker processes (like gunicorn workers),
+each with reader threads (lesson list, lesson detail, leaderboard) and
+writer threads (XP and progress updates) going through the crud functions.
+Reports throughput, p50/p99 latency and errors ("database is locked") for:
+
+- default: one engine with check_same_thread=False only (the previous setup)
+- tuned:   WAL + pragmas, one writer connection per process, reader pool
+
+Usage (from the backend directory):
+    python -m benchmarks.sqlite_mixed --users 20000 --duration 15
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+from benchmarks.common import summarize_latencies, write_results
+
+
+def reader(session_factory, crud, lessons: int, users: int, stop, out, seed: int):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        op = rng.random()
+        start = time.perf_counter()
+        db = session_factory()
+        try:
+            if op < 0.45:
+                crud.get_lessons(db, limit=100)
+            elif op < 0.8:
+                crud.get_lesson(db, rng.randint(1, lessons))
+            elif op < 0.9:
+                crud.get_user(db, rng.randint(1, users))
+            else:
+                crud.get_leaderboard(db, limit=10)
+            out["read"].append((time.perf_counter() - start) * 1000.0)
+        except Exception as e:
+            out["errors"].append(f"read: {e.__class__.__name__}: {str(e).splitlines()[0]}")
+        finally:
+            db.close()
+
+
+def writer(session_factory, crud, lessons: int, users: int, stop, out, seed: int, think: float):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        user_id = rng.randint(1, users)
+        start = time.perf_counter()
+        db = session_factory()
+        try:
+            if rng.random() < 0.5:
+                crud.set_user_xp(db, user_id, rng.randint(0, 50000))
+            else:
+                crud.update_user_progress(db, user_id, rng.randint(1, lessons), rng.choice((25, 50, 75, 100)))
+            out["write"].append((time.perf_counter() - start) * 1000.0)
+        except Exception as e:
+            db.rollback()
+            out["errors"].append(f"write: {e.__class__.__name__}: {str(e).splitlines()[0]}")
+        finally:
+            db.close()
+        time.sleep(think)
+
+
+def worker_process(url, tuned, args, seed, queue):
+    from app import crud
+    from app.database import create_engines, make_session_factory
+
+    writer_engine, reader_engine = create_engines(url, tuned=tuned)
+    factory = make_session_factory(writer_engine, reader_engine)
+    out = {"read": [], "write": [], "errors": []}
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(factory, crud, args.lessons, args.users, stop, out, seed + i))
+               for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(factory, crud, args.lessons, args.users, stop, out,
+                                                      seed + 100 + i, args.write_think))
+                for i in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    queue.put(out)
+
+
+def run_config(name, path, tuned, args):
+    url = f"sqlite:///{path}"
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=worker_process, args=(url, tuned, args, 1000 * i, queue))
+             for i in range(args.processes)]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+    reads = [x for r in results for x in r["read"]]
+    writes = [x for r in results for x in r["write"]]
+    errors = [x for r in results for x in r["errors"]]
+    distinct = sorted(set(errors))
+    return {
+        "config": name,
+        "reads": summarize_latencies(reads, elapsed),
+        "writes": summarize_latencies(writes, elapsed),
+        "errors": len(errors),
+        "error_kinds": distinct[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write benchmark: default vs tuned SQLite")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--lessons", type=int, default=40)
+    parser.add_argument("--processes", type=int, default=2, help="worker processes (like gunicorn workers)")
+    parser.add_argument("--readers", type=int, default=8, help="reader threads per process")
+    parser.add_argument("--writers", type=int, default=4, help="writer threads per process")
+    parser.add_argument("--write-think", type=float, default=0.005, help="seconds between a writer's requests")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--only", choices=["default", "tuned"], help="run a single configuration")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finesse-sqlite-")
+    source = os.path.join(workdir, "source.db")
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--lessons", str(args.lessons),
+                    "--reset", "--database-url", f"sqlite:///{source}"],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    results = []
+    try:
+        for name, tuned in (("default", False), ("tuned", True)):
+            if args.only and args.only != name:
+                continue
+            path = os.path.join(workdir, f"{name}.db")
+            shutil.copyfile(source, path)
+            conn = sqlite3.connect(path)
+            conn.execute("PRAGMA journal_mode=DELETE")  # journal mode persists in the file
+            conn.close()
+            print(f"Running {name} for {args.duration:.0f}s ...")
+            results.append(run_config(name, path, tuned, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'config':8} {'reads/s':>9} {'read p50':>9} {'read p99':>9} {'writes/s':>9} "
+          f"{'write p50':>10} {'write p99':>10} {'errors':>7}")
+    for r in results:
+        reads, writes = r["reads"], r["writes"]
+        print(f"{r['config']:8} {reads['throughput_rps']:>9.1f} {reads['p50_ms']:>7.2f}ms {reads['p99_ms']:>7.2f}ms "
+              f"{writes['throughput_rps']:>9.1f} {writes['p50_ms']:>8.2f}ms {writes['p99_ms']:>8.2f}ms "
+              f"{r['errors']:>7}")
+        for kind in r["error_kinds"]:
+            print(f"         {kind}")
+    path = write_results("sqlite_mixed", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
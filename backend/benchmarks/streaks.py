@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Nightly streak reset (app/streaks.py) at scale.
+
+Generates --users users (about 1 in 6 with a streak last extended before
+yesterday), then on a fresh copy of the database for each method resets the
+broken streaks while a background thread keeps doing XP writes, and reports
+how long the reset took and how long it stalled those writes:
+
+- batch: streaks.reset_broken_streaks (NumPy over id-ordered chunks, one
+  executemany UPDATE per chunk)
+- single_update: one set-based UPDATE over the whole table
+- per_user: load each user with a streak through the ORM and fix it in
+  Python, committing per chunk (timed on --per-user-sample users, extrapolated)
+
+Usage (from the backend directory):
+    python -m benchmarks.streaks --users 1000000
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("CACHE_BUS_BACKEND", "memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nightly streak reset benchmark")
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=None, help="users per batch (default: STREAK_BATCH_SIZE)")
+    parser.add_argument("--per-user-sample", type=int, default=20000, help="users timed for the per_user method")
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    from sqlalchemy import func, or_, select, update
+    from app import crud, models, streaks
+    from app.config import settings
+    from app.database import create_engines, make_session_factory
+    from benchmarks.common import summarize_latencies, write_results
+
+    workdir = tempfile.mkdtemp(prefix="finesse-streaks-")
+    base = os.path.join(workdir, "base.db")
+    print(f"Generating {args.users:,} users...")
+    subprocess.run([sys.executable, "generate_dataset.py", "--users", str(args.users), "--lessons", "5",
+                    "--mean-started", "1", "--as-of", "today", "--reset", "--database-url", f"sqlite:///{base}"],
+                   cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    today = streaks.today()
+    yesterday = today - timedelta(days=1)
+    User = models.User
+    broken = or_(User.last_active_date.is_(None), User.last_active_date < yesterday)
+
+    def single_update(writer, reader):
+        with writer.begin() as conn:
+            conn.execute(update(User).where(User.streak_days > 0, broken).values(streak_days=0))
+
+    def per_user(writer, reader, factory):
+        # The straightforward ORM version, on a sample: time per user with a streak
+        db = factory()
+        checked = 0
+        try:
+            after = 0
+            while checked < args.per_user_sample:
+                users = (db.query(User).filter(User.streak_days > 0, User.id > after)
+                         .order_by(User.id).limit(min(5000, args.per_user_sample - checked)).all())
+                if not users:
+                    break
+                for user in users:
+                    if user.last_active_date is None or user.last_active_date < yesterday:
+                        user.streak_days = 0
+                db.commit()
+                checked += len(users)
+                after = users[-1].id
+        finally:
+            db.close()
+        return checked
+
+    results = {}
+    try:
+        for method in ("batch", "single_update", "per_user"):
+            path = os.path.join(workdir, f"{method}.db")
+            shutil.copy(base, path)
+            writer, reader = create_engines(f"sqlite:///{path}", tuned=settings.SQLITE_TUNED)
+            factory = make_session_factory(writer, reader)
+            with reader.connect() as conn:
+                with_streak = conn.execute(select(func.count()).where(User.streak_days > 0)).scalar()
+
+            # XP writes alongside the reset, as the live app would be doing
+            stop, write_latencies = threading.Event(), []
+
+            def write_loop():
+                i = 0
+                while not stop.is_set():
+                    db = factory()
+                    start = time.perf_counter()
+                    try:
+                        crud.set_user_xp(db, i % args.users + 1, i)
+                    finally:
+                        db.close()
+                    write_latencies.append((time.perf_counter() - start) * 1000.0)
+                    i += 7919
+                    time.sleep(0.002)
+
+            thread = threading.Thread(target=write_loop)
+            thread.start()
+            time.sleep(0.5)
+            started = time.perf_counter()
+            if method == "batch":
+                stats = streaks.reset_broken_streaks([(writer, reader)], today,
+                                                     chunk_size=args.chunk_size or settings.STREAK_BATCH_SIZE)
+            elif method == "single_update":
+                single_update(writer, reader)
+            else:
+                checked = per_user(writer, reader, factory)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            thread.join()
+            if method == "per_user":
+                elapsed = elapsed * with_streak / max(checked, 1)
+
+            with reader.connect() as conn:
+                remaining = conn.execute(select(func.count()).where(User.streak_days > 0, broken)).scalar()
+            writes = summarize_latencies(write_latencies, elapsed)
+            results[method] = {"seconds": round(elapsed, 2), "with_streak": with_streak,
+                               "users_per_s": round(with_streak / elapsed), "remaining_broken": remaining,
+                               "concurrent_writes": writes}
+            if method == "batch":
+                results[method]["stats"] = stats
+            note = " (extrapolated)" if method == "per_user" else ""
+            print(f"{method:<14} {elapsed:7.2f}s{note}  {with_streak / elapsed:>11,.0f} users/s  "
+                  f"concurrent XP writes p99={writes['p99_ms']:8.2f}ms max={writes['max_ms']:8.2f}ms")
+            writer.dispose()
+            reader.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_results("streaks", {"config": vars(args), "results": results}, args.out)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Measure throughput scaling of the prod server profile from 1 to N workers.
+
+For each worker count a fresh ``start_server.py --profile prod`` process is
+started on localhost against a seeded temporary SQLite database, driven with
+the load-test traffic mix (tutor excluded, no think time) and shut down with
+SIGTERM so the graceful drain path is exercised too.
+
+Usage (from the backend directory):
+    python -m benchmarks.worker_scaling --max-workers 8 --duration 20
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from benchmarks.common import write_results
+from benchmarks import loadtest
+
+
+def worker_counts(max_workers: int):
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def wait_until_healthy(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become healthy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prod-profile throughput vs worker count")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--learners", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--out", help="result JSON path")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="finesse-scaling-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'scaling.db')}")
+    os.environ.update(env)
+    loadtest.seed_in_process(args.learners, "loadtest-password")
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    runs = []
+    for workers in worker_counts(args.max_workers):
+        proc = subprocess.Popen(
+            [sys.executable, "start_server.py", "--profile", "prod", "--host", "127.0.0.1",
+             "--port", str(args.port), "--workers", str(workers)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_healthy(base_url)
+            load_args = loadtest.build_parser().parse_args([
+                "--base-url", base_url, "--learners", str(args.learners), "--duration", str(args.duration),
+                "--think-time", "0.001", "--time-scale", "0.1", "--skip-tutor",
+            ])
+            result = asyncio.run(loadtest.run(load_args))
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+        total = result["total"]
+        runs.append({"workers": workers, "total": total, "routes": result["routes"]})
+        print(f"workers={workers:>3}  {total['throughput_rps']:>9.1f} req/s  "
+              f"p50={total['p50_ms']:.2f}ms  p99={total['p99_ms']:.2f}ms  errors={total['errors']}")
+
+    base_rps = runs[0]["total"]["throughput_rps"] or 1.0
+    for run in runs:
+        run["speedup"] = round(run["total"]["throughput_rps"] / base_rps, 2)
+    path = write_results("worker_scaling", {"config": vars(args), "runs": runs}, args.out)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
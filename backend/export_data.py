@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Export users or user_progress for BI (same streaming path as GET /api/admin/export/{table}).
+
+CSV goes to one file, Parquet to a directory of part files (--rows-per-file
+rows each). Progress is checkpointed to <out>.checkpoint after every chunk
+(CSV) or part (Parquet); after an interruption, run the same command with
+--resume to continue from there instead of starting over.
+
+    python export_data.py user_progress --compression zstd
+    python export_data.py users --format parquet --since 2024-01-01 --active
+    python export_data.py user_progress --compression gzip --resume
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import export, schema
+from app.config import settings
+from app.database import create_engines, shard_set_from_urls
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class Checkpoint:
+    """Where an export got to, saved atomically next to the output."""
+
+    def __init__(self, path: str, options: dict):
+        self.path = path
+        self.options = options
+        self.state = {"rows": 0, "after": None, "offset": 0, "parts": 0}
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            saved = json.load(f)
+        if saved["options"] != self.options:
+            sys.exit(f"{self.path} is from an export with different options: {saved['options']}")
+        self.state = saved["state"]
+        return True
+
+    def save(self, **state):
+        self.state.update(state)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"options": self.options, "state": self.state}, f)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def export_csv(chunks, args, checkpoint: Checkpoint, resumed: bool, report):
+    with open(args.out, "r+b" if resumed else "wb") as f:
+        if resumed:
+            # Drop whatever was written after the last checkpoint; pieces are self-contained
+            f.truncate(checkpoint.state["offset"])
+            f.seek(checkpoint.state["offset"])
+        else:
+            f.write(export.compress(export.csv_bytes([], export.TABLES[args.table].columns), args.compression))
+        for rows in chunks:
+            f.write(export.compress(export.csv_bytes(rows), args.compression))
+            f.flush()
+            os.fsync(f.fileno())
+            checkpoint.save(rows=checkpoint.state["rows"] + len(rows), offset=f.tell(),
+                            after=export.cursor_of(args.table, rows[-1]))
+            report(checkpoint.state["rows"])
+
+
+def export_parquet(chunks, args, checkpoint: Checkpoint, resumed: bool, report):
+    import pyarrow.parquet
+
+    os.makedirs(args.out, exist_ok=True)
+    if not resumed and any(name.endswith(".parquet") for name in os.listdir(args.out)):
+        sys.exit(f"{args.out} already has part files; use an empty directory or --resume")
+    for name in os.listdir(args.out):
+        if name.endswith(".tmp"):
+            os.remove(os.path.join(args.out, name))
+    schema_ = export.arrow_schema(args.table)
+    compression = None if args.compression == "none" else args.compression
+    writer, part_path, part_rows, last = None, None, 0, None
+
+    def close_part():
+        nonlocal writer
+        writer.close()
+        os.replace(part_path + ".tmp", part_path)
+        writer = None
+        checkpoint.save(rows=checkpoint.state["rows"] + part_rows, parts=checkpoint.state["parts"] + 1,
+                        after=export.cursor_of(args.table, last))
+        report(checkpoint.state["rows"])
+
+    for rows in chunks:
+        if writer is None:
+            part_path = os.path.join(args.out, f"part-{checkpoint.state['parts']:05d}.parquet")
+            writer = pyarrow.parquet.ParquetWriter(part_path + ".tmp", schema_, compression=compression)
+            part_rows = 0
+        writer.write_batch(export.record_batch(rows, schema_))
+        part_rows += len(rows)
+        last = rows[-1]
+        if part_rows >= args.rows_per_file:
+            close_part()
+    if writer is not None:
+        close_part()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a user-data table to CSV or Parquet")
+    parser.add_argument("table", choices=sorted(export.TABLES))
+    parser.add_argument("--out", help="output file (CSV) or directory (Parquet); default: named after the table")
+    parser.add_argument("--format", choices=export.FORMATS, default="csv")
+    parser.add_argument("--compression", choices=export.COMPRESSIONS, default="none")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="rows with created_at (users) / updated_at (user_progress) at or after this")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="... and before this")
+    activity = parser.add_mutually_exclusive_group()
+    activity.add_argument("--active", dest="active", action="store_const", const=True,
+                          help="only active users' rows")
+    activity.add_argument("--inactive", dest="active", action="store_const", const=False,
+                          help="only inactive users' rows")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export of the same options")
+    parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--rows-per-file", type=int, default=1000000, help="rows per Parquet part file")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./finesse.db"))
+    parser.add_argument("--shard-urls", default=os.getenv("USER_SHARD_URLS", ""),
+                        help="comma-separated user shard URLs (see app/sharding.py)")
+    args = parser.parse_args()
+    try:
+        export.check_options(args.table, args.format, args.compression)
+    except export.ExportError as exc:
+        sys.exit(str(exc))
+    if args.out is None:
+        args.out = export.file_name(args.table, args.format, args.compression)
+
+    options = {name: str(getattr(args, name)) for name in ("table", "format", "compression", "since", "until",
+                                                           "active")}
+    checkpoint = Checkpoint(args.out.rstrip("/") + ".checkpoint", options)
+    resumed = args.resume and checkpoint.load()
+    if resumed:
+        print(f"Resuming after {checkpoint.state['rows']:,} rows")
+    elif args.resume:
+        print("No checkpoint found; starting from the beginning")
+
+    writer, reader = create_engines(args.database_url, tuned=settings.SQLITE_TUNED)
+    shards = shard_set_from_urls([url.strip() for url in args.shard_urls.split(",") if url.strip()])
+    started = time.perf_counter()
+    rows_before = checkpoint.state["rows"]
+    try:
+        schema.ensure_schema(writer)
+        schema.ensure_shards(shards)
+        databases = [(s.writer, s.reader) for s in shards] or [(writer, reader)]
+        after = checkpoint.state["after"]
+        chunks = export.iter_chunks(databases, args.table, chunk_size=args.chunk_size, since=args.since,
+                                    until=args.until, active=args.active, after=tuple(after) if after else None)
+
+        def report(rows):
+            print(f"\r{rows:,} rows exported", end="", flush=True)
+
+        if args.format == "parquet":
+            export_parquet(chunks, args, checkpoint, resumed, report)
+        else:
+            export_csv(chunks, args, checkpoint, resumed, report)
+        print()
+    finally:
+        shards.dispose()
+        writer.dispose()
+        reader.dispose()
+
+    rows = checkpoint.state["rows"] - rows_before
+    elapsed = time.perf_counter() - started
+    checkpoint.remove()
+    peak = f", peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB" if resource else ""
+    print(f"{rows:,} rows to {args.out} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s{peak})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Load price history from CSV files into the price store (see app/prices.py).
+
+Each file has a header row with a date (or timestamp) column and open, high,
+low, close and volume columns (volume may be missing; open, high and low
+default to the close). Rows are grouped by a ``symbol`` column, or all go to
+--symbol. Importing a symbol again replaces its history:
+
+    python import_prices.py spy.csv --symbol SPY
+    python import_prices.py daily-bars.csv etfs.csv --store /srv/finesse/prices
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import prices
+from app.config import settings
+
+DATE_COLUMNS = ("date", "timestamp", "datetime", "time")
+
+
+def read_bars(path: str, symbol, histories: dict, errors: list) -> int:
+    """Add the file's bars to ``histories`` (symbol -> column -> values); returns rows read."""
+    rows = 0
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            rows += 1
+            try:
+                name = prices.normalize_symbol(symbol or row.get("symbol", ""))
+                when = next((row[c] for c in DATE_COLUMNS if row.get(c)), None)
+                if when is None:
+                    raise ValueError("no date")
+                close = float(row["close"])
+                bar = {
+                    "timestamp": np.datetime64(when, "s"),
+                    "open": float(row.get("open") or close),
+                    "high": float(row.get("high") or close),
+                    "low": float(row.get("low") or close),
+                    "close": close,
+                    "volume": float(row.get("volume") or 0),
+                }
+            except (KeyError, ValueError) as e:
+                errors.append(f"{path}:{line}: {e}")
+                continue
+            for column, value in bar.items():
+                histories[name][column].append(value)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import OHLCV price history from CSV")
+    parser.add_argument("csv", nargs="+", help="CSV files with a header row")
+    parser.add_argument("--symbol", help="symbol for every row (otherwise read from a symbol column)")
+    parser.add_argument("--store", default=settings.PRICE_STORE_DIR, help="price store directory")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    histories = defaultdict(lambda: defaultdict(list))
+    errors = []
+    rows = sum(read_bars(path, args.symbol, histories, errors) for path in args.csv)
+    store = prices.PriceStore(args.store)
+    try:
+        entries = store.write_many({symbol: dict(columns) for symbol, columns in histories.items()})
+    except ValueError as e:
+        sys.exit(f"Import failed: {e}")
+    for entry in entries:
+        print(f"  {entry['symbol']}: {entry['rows']:,} bars, {entry['first']} to {entry['last']}")
+    print(f"{rows:,} rows in {time.perf_counter() - started:.1f}s: {len(entries)} symbols written to {args.store}, "
+          f"{len(errors)} rows skipped")
+    for error in errors[:20]:
+        print(f"  {error}")
+    if len(errors) > 20:
+        print(f"  ... and {len(errors) - 20} more")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Create student accounts from a CSV file (columns: username, email, password).
+
+Goes through the same code as POST /api/users:bulk (app/provisioning.py):
+batched inserts that let the unique indexes reject existing accounts, one
+result per row. Re-running the same file is safe; existing rows are
+reported as "exists".
+
+    python import_users_csv.py class-7b.csv
+    python import_users_csv.py class-7b.csv --default-password changeme --report results.csv
+    python import_users_csv.py big.csv --batch-size 2000 --hash-workers 4
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import provisioning, schema
+from app.config import settings
+from app.database import create_engines, make_session_factory, shard_set_from_urls
+
+
+def read_rows(path: str, default_password):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = []
+        for row in csv.DictReader(f):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            if not row.get("password") and default_password:
+                row["password"] = default_password
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-create accounts from a CSV file")
+    parser.add_argument("csv", help="CSV with a header row: username,email[,password]")
+    parser.add_argument("--default-password", help="password for rows without one")
+    parser.add_argument("--batch-size", type=int, default=settings.USER_IMPORT_BATCH_SIZE)
+    parser.add_argument("--hash-workers", type=int, default=settings.PASSWORD_HASH_WORKERS,
+                        help="processes for password hashing (0 = inline)")
+    parser.add_argument("--report", help="write per-row results to this CSV")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./finesse.db"))
+    parser.add_argument("--shard-urls", default=os.getenv("USER_SHARD_URLS", ""),
+                        help="comma-separated user shard URLs (see app/sharding.py)")
+    args = parser.parse_args()
+
+    rows = read_rows(args.csv, args.default_password)
+    writer, reader = create_engines(args.database_url, tuned=settings.SQLITE_TUNED)
+    shards = shard_set_from_urls([url.strip() for url in args.shard_urls.split(",") if url.strip()])
+    schema.ensure_schema(writer)
+    schema.ensure_shards(shards)
+    db = make_session_factory(writer, reader, shards)()
+    started = time.perf_counter()
+    try:
+        results = provisioning.provision_users(db, rows, batch_size=args.batch_size, hash_workers=args.hash_workers)
+    finally:
+        db.close()
+        writer.dispose()
+        reader.dispose()
+        shards.dispose()
+    elapsed = time.perf_counter() - started
+
+    counts = Counter(r["status"] for r in results)
+    print(f"{len(rows)} rows in {elapsed:.1f}s: {counts['created']} created, {counts['exists']} already existed, "
+          f"{counts['duplicate']} duplicates in file, {counts['invalid']} invalid")
+    for r in results:
+        if r["status"] in ("invalid", "duplicate"):
+            print(f"  row {r['index'] + 2}: {r['status']}: {r['detail']}")
+    if args.report:
+        with open(args.report, "w", newline="") as f:
+            out = csv.DictWriter(f, fieldnames=["index", "username", "status", "id", "detail"])
+            out.writeheader()
+            out.writerows(results)
+        print(f"Results written to {args.report}")
+    sys.exit(1 if counts["invalid"] else 0)
+
+
+if __name__ == "__main__":
+    main()
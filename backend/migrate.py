@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Online schema migrations (see app/migrations).
+
+    python migrate.py status
+    python migrate.py upgrade                  # apply/resume everything up to head
+    python migrate.py upgrade --target 2 --batch-size 2000 --pause 0.1
+    python migrate.py stamp 1                  # mark an existing database as being at a version
+
+Upgrades never drop data and are safe to run while the previous release is
+serving traffic; interrupt them at any time and re-run to resume. With
+USER_SHARD_URLS (or --shard-urls) set, status and upgrade also cover every
+user shard, which runs each migration's SHARD_STEPS.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, inspect
+
+from app import migrations, schema
+from app.database import create_shard
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finesse schema migrations")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./finesse.db"))
+    parser.add_argument("--shard-urls", default=os.getenv("USER_SHARD_URLS", ""),
+                        help="comma-separated user shard URLs (see app/sharding.py)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="show applied and pending migrations")
+    up = sub.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("--target", type=int, default=None, help=f"version to stop at (default: head = {migrations.HEAD})")
+    up.add_argument("--batch-size", type=int, default=None, help="starting rows per backfill batch")
+    up.add_argument("--pause", type=float, default=None, help="seconds to sleep between backfill batches")
+    st = sub.add_parser("stamp", help="record a version without running migrations")
+    st.add_argument("version", type=int)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    shard_urls = [url.strip() for url in args.shard_urls.split(",") if url.strip()]
+    shards = [create_shard(i, url) for i, url in enumerate(shard_urls)]
+    for shard in shards:
+        schema.create_shard_schema(shard)
+    targets = [("database", engine, None)] + [(f"shard {s.index}", s.writer, s) for s in shards]
+    if args.command == "status":
+        for label, target, shard in targets:
+            if shards:
+                print(f"{label}:")
+            for row in migrations.status(target, shard=shard is not None):
+                print(f"{row['version']:>4}  {row['status']:<28} {row['description']}")
+    elif args.command == "upgrade":
+        for label, target, shard in targets:
+            if not inspect(target).has_table("users"):
+                # Brand-new database: nothing to migrate, create the current schema.
+                schema.ensure_schema(target, shard=shard is not None)
+                print(f"Created new {label} schema at version {migrations.HEAD}")
+                continue
+            version = migrations.upgrade(target, target=args.target, batch_size=args.batch_size,
+                                         pause_seconds=args.pause, shard=shard is not None)
+            print(f"{label.capitalize()} is at version {version}")
+    elif args.command == "stamp":
+        for label, target, shard in targets:
+            migrations.stamp(target, args.version, shard=shard is not None)
+        print(f"Stamped version {args.version}")
+
+
+if __name__ == "__main__":
+    main()
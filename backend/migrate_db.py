@@ -1,32 +1,30 @@
 #!/usr/bin/env python3
 """
-Database migration script to recreate tables with correct schema
+Database migration script: bring the schema up to date without losing data.
+
+Kept for existing deploy instructions; equivalent to `python migrate.py upgrade`.
 """
 
 import os
-from sqlalchemy import create_engine
-from app.database import Base
-from app.models import User, Lesson, LessonContent, QuizQuestion, UserProgress
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, inspect
+from app import migrations, schema
 
 # Get database URL from config
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./finesse.db")
 
 def migrate_database():
-    """Drop and recreate all tables with current schema"""
+    """Apply pending migrations (creates the schema on a new database)"""
     print("Starting database migration...")
-    
-    # Create engine
     engine = create_engine(DATABASE_URL)
-    
-    # Drop all tables
-    print("Dropping existing tables...")
-    Base.metadata.drop_all(bind=engine)
-    
-    # Create all tables with current schema
-    print("Creating tables with updated schema...")
-    Base.metadata.create_all(bind=engine)
-    
-    print("Database migration completed successfully!")
+    if not inspect(engine).has_table("users"):
+        schema.ensure_schema(engine)
+    else:
+        migrations.upgrade(engine)
+    print(f"Database migration completed successfully (version {migrations.HEAD})!")
 
 if __name__ == "__main__":
     migrate_database()
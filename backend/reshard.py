@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Move user data onto a new set of user shards (see app/sharding.py).
+
+Copies users and their user_progress, quiz_attempts, review_cards and
+user_badges rows from the current location (the shards in USER_SHARD_URLS,
+or DATABASE_URL itself when unsharded) to empty target shards, placing each
+user by hash of their id, and fills the catalog's user_directory. Run it with the app stopped, then
+point USER_SHARD_URLS at the targets and start the app.
+
+    # unsharded -> 4 SQLite shards
+    python reshard.py --to sqlite:///./users-0.db,sqlite:///./users-1.db,sqlite:///./users-2.db,sqlite:///./users-3.db
+    # 2 -> 4 Postgres schemas
+    python reshard.py --from "$USER_SHARD_URLS" --to "postgresql+psycopg2://.../finesse#users_0,..."
+
+User ids are kept; progress and attempt rows get new ids on their shard.
+The sources are only read: drop their user tables once the app runs on the
+new shards. An interrupted run leaves partial targets; empty them (or use
+fresh ones) and run again.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import models, schema
+from app.config import settings
+from app.database import create_engines, shard_set_from_urls
+from app.sharding import SHARDED_TABLES
+
+USERS = models.User.__table__
+# Child tables, keyed by user_id; their own ids are per shard.
+CHILDREN = [models.UserProgress.__table__, models.QuizAttempt.__table__, models.ReviewCard.__table__,
+            models.UserBadge.__table__]
+
+
+def split_urls(value: str):
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+
+def count_rows(engine, table) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+def copy_source(source, targets, catalog, batch_size: int, report) -> int:
+    """Copy one source database's users (in id order, a batch at a time) and their rows."""
+    directory_insert = postgres_insert if catalog.dialect.name == "postgresql" else sqlite_insert
+    directory = models.UserDirectory.__table__
+    after_id, copied = 0, 0
+    while True:
+        with source.connect() as conn:
+            users = [dict(r) for r in conn.execute(
+                select(USERS).where(USERS.c.id > after_id).order_by(USERS.c.id).limit(batch_size)).mappings()]
+            if not users:
+                return copied
+            first_id, last_id = users[0]["id"], users[-1]["id"]
+            children = {
+                table: [{k: v for k, v in r.items() if k != "id"} for r in conn.execute(
+                    select(table).where(table.c.user_id.between(first_id, last_id))).mappings()]
+                for table in CHILDREN
+            }
+        for shard, rows in targets.group(users).items():
+            ids = {r["id"] for r in rows}
+            with shard.writer.begin() as conn:
+                conn.execute(USERS.insert(), rows)
+                for table, child_rows in children.items():
+                    mine = [r for r in child_rows if r["user_id"] in ids]
+                    if mine:
+                        conn.execute(table.insert(), mine)
+        with catalog.begin() as conn:
+            conn.execute(directory_insert(directory).on_conflict_do_nothing(), [
+                {"id": u["id"], "username": u["username"], "email": u["email"], "created_at": u["created_at"]}
+                for u in users])
+        after_id = last_id
+        copied += len(users)
+        report(copied)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy user data onto a new set of user shards (offline)")
+    parser.add_argument("--to", required=True, help="comma-separated URLs of the new (empty) shards")
+    parser.add_argument("--from", dest="source", default=os.getenv("USER_SHARD_URLS", ""),
+                        help="comma-separated URLs of the current shards (default: USER_SHARD_URLS; "
+                             "unset means the users still live in --database-url)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./finesse.db"),
+                        help="the catalog database (holds user_directory)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="users per copy batch")
+    args = parser.parse_args()
+
+    target_urls, source_urls = split_urls(args.to), split_urls(args.source)
+    if set(target_urls) & set(source_urls + [args.database_url]):
+        sys.exit("Target shards must be new databases, not the current ones")
+
+    catalog, catalog_reader = create_engines(args.database_url, tuned=settings.SQLITE_TUNED)
+    schema.ensure_schema(catalog)
+    targets = shard_set_from_urls(target_urls)
+    schema.ensure_shards(targets)
+    sources = shard_set_from_urls(source_urls)
+    source_engines = [s.reader for s in sources] or [catalog_reader]
+    try:
+        for shard in targets:
+            if count_rows(shard.writer, USERS):
+                sys.exit(f"Target shard {shard.index} already has users; use empty databases")
+
+        started = time.perf_counter()
+        total = 0
+        for number, source in enumerate(source_engines, 1):
+            label = f"source {number}/{len(source_engines)}"
+            total += copy_source(source, targets, catalog, args.batch_size,
+                                 lambda n: print(f"\r{label}: {n:,} users copied", end="", flush=True))
+            print()
+        if catalog.dialect.name == "postgresql":
+            # Ids were inserted explicitly; new registrations continue after the highest one.
+            with catalog.begin() as conn:
+                conn.execute(text("SELECT setval(pg_get_serial_sequence('user_directory', 'id'), "
+                                  "COALESCE((SELECT MAX(id) FROM user_directory), 1))"))
+
+        mismatched = False
+        for table in [USERS] + CHILDREN:
+            before = sum(count_rows(engine, table) for engine in source_engines)
+            after = [count_rows(shard.writer, table) for shard in targets]
+            mismatched |= before != sum(after)
+            print(f"{table.name:<15} {before:>12,} -> {' + '.join(f'{n:,}' for n in after)}"
+                  + ("" if before == sum(after) else "  MISMATCH"))
+        print(f"{total:,} users moved onto {len(targets)} shards in {time.perf_counter() - started:.1f}s")
+        if mismatched:
+            sys.exit(1)
+        print(f"Now set USER_SHARD_URLS={','.join(target_urls)} and start the app.")
+        if not source_urls:
+            print(f"The old {', '.join(SHARDED_TABLES)} tables in the catalog are no longer read.")
+    finally:
+        targets.dispose()
+        sources.dispose()
+        catalog.dispose()
+        catalog_reader.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
-import json
 import os
 from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.database import Base
-from app.models import Lesson, LessonContent, QuizQuestion
+from app import schema, search
+from app.models import Lesson, LessonContent, QuizQuestion, SearchDocument
 
 # Get database URL from environment or use default
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./finesse.db")
@@ -12,8 +11,8 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./finesse.db")
 # Create database session
 engine = create_engine(DATABASE_URL)
 
-# Ensure all tables are created
-Base.metadata.create_all(bind=engine)
+# Create (or verify) the schema at the current version
+schema.ensure_schema(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 db = SessionLocal()
@@ -40,7 +39,7 @@ def create_lesson(lesson_data):
             lesson_id=lesson.id,
             content_type=content_item['type'],
             title=content_item['title'],
-            content=json.dumps(content_item.get('content', {})),
+            content=content_item.get('content', {}),
             order_index=content_item.get('order_index', 0)
         )
         db.add(content)
@@ -53,13 +52,15 @@ def create_lesson(lesson_data):
             quiz_question = QuizQuestion(
                 lesson_content_id=content.id,
                 question=question['question'],
-                options=json.dumps(question['options']),
+                options=question['options'],
                 correct_answer=question['correctAnswer'],
                 explanation=question.get('explanation', ''),
                 order_index=0
             )
             db.add(quiz_question)
     
+    db.flush()
+    search.index_lessons(db, [lesson.id])
     db.commit()
     return lesson
 
@@ -69,6 +70,7 @@ def seed_database():
     try:
         # Clear existing data (for development)
         print("Clearing existing data...")
+        db.query(SearchDocument).delete()
         db.query(QuizQuestion).delete()
         db.query(LessonContent).delete()
         db.query(Lesson).delete()
@@ -398,6 +400,32 @@ def seed_database():
                     "correctAnswer": 1,
                     "explanation": "Low correlation means assets move independently, so when one falls, others may rise or remain stable, reducing overall portfolio risk.",
                     "order_index": 6
+                },
+                {
+                    "id": "4-7",
+                    "type": "interactive",
+                    "title": "What If You Had Diversified?",
+                    "content": {
+                        "component": "portfolio_simulator",
+                        "data": {
+                            "model": "gbm",
+                            "assets": [
+                                {"symbol": "US_STOCKS", "mu": 0.07, "sigma": 0.18},
+                                {"symbol": "INTL_STOCKS", "mu": 0.06, "sigma": 0.20},
+                                {"symbol": "BONDS", "mu": 0.03, "sigma": 0.06}
+                            ],
+                            "correlation": [[1.0, 0.7, 0.1], [0.7, 1.0, 0.1], [0.1, 0.1, 1.0]],
+                            "portfolios": [
+                                {"name": "All US stocks", "weights": {"US_STOCKS": 1}},
+                                {"name": "Diversified", "weights": {"US_STOCKS": 0.4, "INTL_STOCKS": 0.2, "BONDS": 0.4}}
+                            ],
+                            "paths": 2000,
+                            "horizon_days": 2520,
+                            "rebalance_every": 63,
+                            "initial_amount": 10000
+                        }
+                    },
+                    "order_index": 7
                 }
             ]
         },
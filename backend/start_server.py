@@ -1,28 +1,45 @@
 #!/usr/bin/env python3
 """
-Simple script to start the FastAPI server
+Start the FastAPI server.
+
+    python start_server.py                      # dev: single process with auto-reload
+    python start_server.py --profile prod       # prod: one uvloop/httptools worker per CPU
+    python start_server.py --profile prod --workers 4 --host 0.0.0.0
+
+The default profile comes from SERVER_PROFILE and the prod worker count from
+WEB_CONCURRENCY (falling back to the CPU count).
 """
-import uvicorn
+import argparse
 import sys
 import os
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from app.config import settings
+from app import server
+
 if __name__ == "__main__":
-    print("Starting Finesse Backend Server...")
-    print("Server will be available at: http://localhost:8000")
-    print("API documentation at: http://localhost:8000/docs")
+    parser = argparse.ArgumentParser(description="Start the Finesse backend")
+    parser.add_argument("--profile", choices=["dev", "prod"], default=settings.SERVER_PROFILE)
+    parser.add_argument("--host", default=None, help="default: 127.0.0.1 (dev), 0.0.0.0 (prod)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None, help="prod only; default: WEB_CONCURRENCY or CPU count")
+    args = parser.parse_args()
+
+    host = args.host or ("127.0.0.1" if args.profile == "dev" else "0.0.0.0")
+    print(f"Starting Finesse Backend Server ({args.profile} profile)...")
+    print(f"Server will be available at: http://{host}:{args.port}")
+    print(f"API documentation at: http://{host}:{args.port}/docs")
     print("Press Ctrl+C to stop the server")
-    
+
     try:
-        uvicorn.run(
-            "app.main:app",
-            host="127.0.0.1",
-            port=8000,
-            reload=True,
-            log_level="info"
-        )
+        if args.profile == "prod":
+            workers = args.workers or server.default_worker_count()
+            print(f"Workers: {workers}")
+            server.run_prod(host, args.port, workers)
+        else:
+            server.run_dev(host, args.port)
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except Exception as e:
@@ -3,17 +3,16 @@
 Test script to verify database and API functionality
 """
 
-import json
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.database import Base
+from app import schema
 from app.models import Lesson, LessonContent, QuizQuestion
 from app.crud import get_lesson, get_lessons
 
 # Create database session
 DATABASE_URL = "sqlite:///./finesse.db"
 engine = create_engine(DATABASE_URL)
-Base.metadata.create_all(bind=engine)
+schema.ensure_schema(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def test_database():
@@ -77,7 +76,7 @@ def seed_simple_lesson():
             lesson_id=lesson.id,
             content_type="text",
             title="Introduction",
-            content=json.dumps({"text": "Welcome to this lesson!"}),
+            content={"text": "Welcome to this lesson!"},
             order_index=1
         )
         db.add(content1)
@@ -86,12 +85,12 @@ def seed_simple_lesson():
             lesson_id=lesson.id,
             content_type="quiz",
             title="Quick Quiz",
-            content=json.dumps({
+            content={
                 "question": "What is 2+2?",
                 "options": ["3", "4", "5", "6"],
                 "correctAnswer": 1,
                 "explanation": "2+2 equals 4"
-            }),
+            },
             order_index=2
         )
         db.add(content2)
@@ -0,0 +1,71 @@
+"""
+Shared fixtures.
+
+The app reads its settings at import, so the environment is fixed here
+first: a throw-away SQLite catalog, no shards or replicas, the in-process
+cache bus and no background job runner. Tests that need their own database
+use the ``engines``/``Session``/``db`` fixtures (a fresh file per test);
+``client`` runs the whole app against the throw-away catalog and empties it
+afterwards.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_WORKDIR = tempfile.mkdtemp(prefix="finesse-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_WORKDIR, 'catalog.db')}"
+os.environ["PRICE_STORE_DIR"] = os.path.join(_WORKDIR, "price_store")
+os.environ["CACHE_BUS_BACKEND"] = "memory"
+os.environ["JOBS_ENABLED"] = "false"
+for name in ("USER_SHARD_URLS", "DATABASE_REPLICA_URLS", "AUTO_MIGRATE"):
+    os.environ.pop(name, None)
+
+import pytest
+from sqlalchemy import delete
+
+from app import models, schema
+from app.config import settings
+from app.database import create_engines, make_session_factory
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """(writer, reader) on a new SQLite file at the current schema version."""
+    writer, reader = create_engines(f"sqlite:///{tmp_path / 'test.db'}", tuned=settings.SQLITE_TUNED)
+    schema.ensure_schema(writer)
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+@pytest.fixture
+def Session(engines):
+    return make_session_factory(*engines)
+
+
+@pytest.fixture
+def db(Session):
+    with Session() as session:
+        yield session
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from app import database
+    from app.cache_bus import get_bus
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+    with database.engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            if table.name != models.SchemaVersion.__tablename__:
+                conn.execute(delete(table))
+    bus = get_bus()
+    bus.dispatch_all(bus.next_version())  # drop every worker cache filled from the old rows
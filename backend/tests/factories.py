@@ -0,0 +1,25 @@
+"""Small builders for catalog and user rows shared by the tests."""
+
+from app import crud, schemas
+
+
+def quiz_item(question: str, options, correct: int, order_index: int = 0) -> schemas.ContentCreate:
+    return schemas.ContentCreate(content_type="quiz", title=question, order_index=order_index, content={
+        "question": question, "options": list(options), "correctAnswer": correct, "explanation": "Because."})
+
+
+def make_lesson(db, title: str = "Stocks", questions: int = 3, xp_reward: int = 100, order_index: int = 1):
+    """A lesson with an intro and ``questions`` quiz items whose answer is always option 1."""
+    items = [schemas.ContentCreate(content_type="text", title="Intro", content={"text": "Shares are ownership."},
+                                   order_index=0)]
+    items += [quiz_item(f"{title} question {i + 1}?", ["No", "Yes", "Maybe"], 1, order_index=i + 1)
+              for i in range(questions)]
+    lesson = crud.create_lesson(db, schemas.LessonCreate(title=title, description=f"About {title.lower()}",
+                                                         xp_reward=xp_reward, order_index=order_index,
+                                                         content_items=items))
+    question_ids = [q.id for item in lesson.content_items for q in item.quiz_questions]
+    return lesson, question_ids
+
+
+def make_user(db, username: str = "ada"):
+    return crud.create_user(db, username, f"{username}@example.com", "secret")
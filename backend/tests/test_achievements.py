@@ -0,0 +1,73 @@
+from sqlalchemy import event
+
+from app import achievements, crud
+from app.achievements import LESSON_COMPLETED, STREAK_EXTENDED, XP_CHANGED
+
+from .factories import make_user
+
+
+def set_user(db, user_id: int, **values):
+    user = crud.get_user(db, user_id)
+    for name, value in values.items():
+        setattr(user, name, value)
+    db.commit()
+
+
+def badges(db, user_id: int):
+    return [badge["badge"] for badge in achievements.user_badges(db, user_id)]
+
+
+def test_rules_are_indexed_by_the_event_that_can_satisfy_them():
+    assert {rule.metric for rule in achievements.RULES_BY_EVENT[XP_CHANGED]} == {"xp_points", "rank"}
+    assert sum(len(rules) for rules in achievements.RULES_BY_EVENT.values()) == len(achievements.RULES)
+    assert set(achievements.METRICS) >= {rule.metric for rule in achievements.RULES}
+
+
+def test_record_awards_each_badge_once(db):
+    user_id = make_user(db).id
+    set_user(db, user_id, streak_days=7)
+    assert achievements.record(db, user_id, STREAK_EXTENDED) == ["streak_3", "streak_7"]
+    db.commit()
+    assert achievements.record(db, user_id, STREAK_EXTENDED) == []
+    assert badges(db, user_id) == ["streak_3", "streak_7"]
+
+
+def test_only_the_events_rules_are_evaluated(db):
+    user_id = make_user(db).id
+    set_user(db, user_id, streak_days=30)
+    # A high streak doesn't count on an XP change; the facts passed in aren't read again.
+    assert achievements.record(db, user_id, XP_CHANGED, xp_points=1500, rank=50) == ["xp_1000"]
+    assert achievements.record(db, user_id, LESSON_COMPLETED, lessons_completed=5) == ["first_lesson", "lessons_5"]
+
+
+def test_rank_counts_users_ahead(db):
+    ids = [make_user(db, f"learner{i}").id for i in range(12)]
+    for i, user_id in enumerate(ids):
+        set_user(db, user_id, xp_points=100 * (i + 1))
+    assert achievements.metric(db, ids[-1], "rank", {}) == 1
+    assert achievements.metric(db, ids[0], "rank", {}) == 12
+    assert achievements.record(db, ids[2], XP_CHANGED) == ["top_10"]  # rank 10
+    assert achievements.record(db, ids[1], XP_CHANGED) == []  # rank 11
+    zero = make_user(db, "newcomer").id
+    assert achievements.metric(db, zero, "rank", {}) is None
+
+
+def test_backfill_awards_what_record_would_and_is_idempotent(db, engines):
+    veteran, newcomer = make_user(db, "veteran").id, make_user(db, "newcomer").id
+    set_user(db, veteran, xp_points=12000, streak_days=8)
+    stats = achievements.backfill([engines], engines[0], chunk_size=1)
+    assert stats["users"] == 2
+    assert sorted(stats["awarded"]) == ["streak_3", "streak_7", "top_10", "xp_1000", "xp_10000"]
+    assert badges(db, newcomer) == []
+    assert achievements.backfill([engines], engines[0])["awarded"] == {}
+
+
+def test_top_xp_ignores_users_without_xp(db, engines, monkeypatch):
+    for name, xp in (("ada", None), ("bob", 300), ("cy", None), ("dee", 100), ("eve", 200)):
+        set_user(db, make_user(db, name).id, xp_points=xp)
+    monkeypatch.setattr(achievements, "RANK_SCAN_LIMIT", 2)
+    statements = []
+    event.listen(engines[1], "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert achievements._top_xp([engines]).tolist() == [300, 200]
+    # SQLite puts NULLs last in a DESC order anyway; Postgres would put them first.
+    assert "ORDER BY coalesce(users.xp_points, ?) DESC" in statements[-1]
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app import analytics
+
+T0 = datetime(2024, 3, 1, 9, 0)
+
+
+def progress(user_id, lesson_id, percentage, minutes=None, updated=T0):
+    completed = minutes is not None
+    return {"user_id": user_id, "lesson_id": lesson_id, "progress_percentage": percentage,
+            "is_completed": completed, "started_at": T0,
+            "completed_at": T0 + timedelta(minutes=minutes) if completed else None, "updated_at": updated}
+
+
+def insert(writer, rows):
+    with writer.begin() as conn:
+        conn.execute(analytics.progress_table.insert(), rows)
+
+
+def by_lesson(report):
+    return {row["lesson_id"]: {k: v for k, v in row.items() if k != "lesson_id"} for row in report["lessons"]}
+
+
+def test_full_scan_counts(engines):
+    insert(engines[0], [progress(1, 1, 100, 10), progress(2, 1, 45), progress(3, 1, 100, 20), progress(1, 2, 5)])
+    report = by_lesson(analytics.Funnel([engines], chunk_size=2).report())
+    assert report[1]["started"] == 3 and report[1]["completed"] == 2
+    assert report[1]["completion_rate"] == 0.6667
+    assert report[1]["median_seconds_to_complete"] == 900.0
+    assert report[1]["progress_histogram"] == [0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 2]
+    assert report[2]["progress_histogram"][0] == 1 and report[2]["median_seconds_to_complete"] is None
+
+
+def test_incremental_refresh_matches_a_full_scan(engines):
+    writer, reader = engines
+    day_before = T0 - timedelta(days=1)
+    insert(writer, [progress(1, 1, 100, 10, day_before), progress(2, 1, 45, updated=day_before),
+                    progress(3, 1, 100, 20, day_before), progress(1, 2, 5)])
+    funnel = analytics.Funnel([engines], chunk_size=2, watermark_lag=0)
+    funnel.report()
+
+    later = T0 + timedelta(hours=1)
+    with writer.begin() as conn:
+        table = analytics.progress_table
+        conn.execute(table.update().where(table.c.user_id == 2).values(
+            progress_percentage=100, is_completed=True, completed_at=T0 + timedelta(minutes=2), updated_at=later))
+    insert(writer, [progress(2, 2, 70, updated=later)])
+    rows_before = funnel.stats["rows_read"]
+    incremental = funnel.report()
+
+    assert funnel.stats["incremental_refreshes"] == 1
+    # The two changed rows, plus the one at the old watermark (inclusive; the lag is 0).
+    assert funnel.stats["rows_read"] - rows_before == 3
+    lessons = by_lesson(incremental)
+    assert lessons[1]["progress_histogram"] == [0] * 10 + [3]  # the 45% row moved, not doubled
+    assert lessons[1]["median_seconds_to_complete"] == 600.0
+    assert lessons[2]["started"] == 2
+    assert lessons == by_lesson(analytics.Funnel([engines]).report())
+
+    assert funnel.report() is incremental
+    assert funnel.stats["cache_hits"] == 1
+
+
+def test_lesson_funnel_orders_lessons_and_counts_drop_off(engines):
+    insert(engines[0], [progress(1, 1, 100, 10), progress(2, 1, 100, 10), progress(3, 1, 30), progress(1, 2, 50)])
+    report = analytics.Funnel([engines]).report()
+    lessons = [SimpleNamespace(id=1, title="Basics"), SimpleNamespace(id=2, title="Stocks"),
+               SimpleNamespace(id=3, title="Bonds")]
+    steps = analytics.lesson_funnel(report, lessons)["lessons"]
+    assert [(s["started"], s["completed"], s["abandoned"], s["not_continued"]) for s in steps] == [
+        (3, 2, 1, None), (1, 0, 1, 1), (0, 0, 0, 0)]
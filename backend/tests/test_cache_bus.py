@@ -0,0 +1,80 @@
+from app import cache_bus
+from app.cache_bus import InProcessBus, VersionedCache
+
+
+class Loader:
+    def __init__(self, value="v"):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"{self.value}{self.calls}"
+
+
+def test_hit_until_the_key_or_namespace_is_invalidated():
+    bus = InProcessBus()
+    cache = VersionedCache("ns", bus=bus)
+    load = Loader()
+    assert cache.get(1, load) == "v1"
+    assert cache.get(1, load) == "v1"
+    bus.publish("ns", 2)  # another key
+    assert cache.get(1, load) == "v1"
+    bus.publish("ns", 1)
+    assert cache.get(1, load) == "v2"
+    bus.publish("ns")
+    assert cache.get(1, load) == "v3"
+    bus.publish("other")
+    assert cache.get(1, load) == "v3"
+
+
+def test_late_or_duplicate_messages_never_lower_the_floor():
+    bus = InProcessBus()
+    cache = VersionedCache("ns", bus=bus)
+    load = Loader()
+    assert cache.get("k", load) == "v1"
+    old = bus.next_version()
+    bus.publish("ns", "k")
+    assert cache.get("k", load) == "v2"
+    bus.dispatch("ns", "k", old)  # delivered after the newer message
+    assert cache.get("k", load) == "v2"
+    assert cache._floor("k") > old
+
+
+def test_a_load_that_raced_a_write_is_not_cached():
+    bus = InProcessBus()
+    cache = VersionedCache("ns", bus=bus)
+    calls = []
+
+    def racing():
+        calls.append(1)
+        if len(calls) == 1:
+            bus.publish("ns", "k")  # the row changed while it was being read
+        return len(calls)
+
+    assert cache.get("k", racing) == 1
+    assert cache.get("k", racing) == 2
+    assert cache.get("k", racing) == 2
+
+
+def test_lru_bound():
+    cache = VersionedCache("ns", bus=InProcessBus(), maxsize=2)
+    load = Loader()
+    cache.get("a", load)
+    cache.get("b", load)
+    cache.get("a", load)  # a is now the most recent
+    cache.get("c", load)
+    assert set(cache._entries) == {"a", "c"}
+
+
+def test_caches_follow_a_replacement_process_bus():
+    cache = VersionedCache("ns")
+    load = Loader()
+    cache.get("k", load)
+    for _ in range(5):
+        cache_bus.publish("ns", "other")  # floors well above a fresh bus's first versions
+    cache_bus.close_bus()
+    cache_bus.publish("ns", "k")  # on the new bus, whose versions start over
+    assert cache.get("k", load) == "v2"
+    cache_bus.publish("ns", "k")
+    assert cache.get("k", load) == "v3"
@@ -0,0 +1,47 @@
+import time
+
+import numpy as np
+
+from app import completion
+from app.completion import CompletionMatrix
+
+
+def bitmap_of(*lesson_ids):
+    bitmap = None
+    for lesson_id in lesson_ids:
+        bitmap = completion.with_lesson(bitmap, lesson_id)
+    return bitmap
+
+
+def test_bitmaps_round_trip():
+    assert bitmap_of() is None and completion.completed_count(None) == 0
+    bitmap = bitmap_of(0, 7, 8, 70)
+    assert bitmap == bytes([0b10000001, 0b00000001]) + bytes(6) + bytes([0b01000000])
+    assert completion.lesson_ids(bitmap) == [0, 7, 8, 70]
+    assert [completion.has_lesson(bitmap, i) for i in (0, 1, 7, 8, 70, 71, 800)] == \
+        [True, False, True, True, True, False, False]
+    # Clearing the highest lesson drops the trailing zero bytes; clearing the last one gives NULL.
+    assert completion.with_lesson(bitmap, 70, completed=False) == bytes([0b10000001, 0b00000001])
+    assert completion.with_lesson(bitmap_of(3), 3, completed=False) is None
+
+
+def test_completed_count_matches_the_set_bits():
+    rng = np.random.default_rng(7)
+    for _ in range(50):
+        lessons = sorted(set(rng.integers(0, 200, size=rng.integers(1, 40)).tolist()))
+        bitmap = bitmap_of(*lessons)
+        assert completion.completed_count(bitmap) == len(lessons) == len(completion.lesson_ids(bitmap))
+    assert completion.completed_count(b"\xff" * 32) == 256
+    assert completion.completed_count(b"") == 0
+
+
+def test_matrix_counts_and_queries():
+    bitmaps = [bitmap_of(1, 2), bitmap_of(2), bitmap_of(1, 9), bitmap_of(9)]
+    width = max(len(b) for b in bitmaps)
+    bits = np.array([list(b.ljust(width, b"\0")) for b in bitmaps], dtype=np.uint8)
+    matrix = CompletionMatrix(np.array([10, 11, 12, 13]), bits, users_total=6, loaded_at=time.time())
+    assert completion.lesson_counts(matrix) == {1: 2, 2: 2, 9: 2}
+    assert completion.matching_users(matrix, completed=[1]).tolist() == [10, 12]
+    assert completion.matching_users(matrix, completed=[2], not_completed=[1]).tolist() == [11]
+    assert completion.matching_users(matrix, completed=[40]).tolist() == []
+    assert completion.matching_users(matrix, not_completed=[40]).tolist() == [10, 11, 12, 13]
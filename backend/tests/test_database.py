@@ -0,0 +1,51 @@
+from app import crud, schemas
+from app.replicas import ReplicaSet
+from app.database import make_session_factory
+
+
+def lesson_create(**overrides):
+    fields = dict(title="Stocks", description="What a share is", order_index=1, content_items=[
+        schemas.ContentCreate(content_type="text", title="Intro", content={"text": "Shares are ownership."},
+                              order_index=1),
+        schemas.ContentCreate(content_type="quiz", title="Check", order_index=2, content={
+            "question": "What is a share?", "options": ["A loan", "Ownership"], "correctAnswer": 1}),
+    ])
+    fields.update(overrides)
+    return schemas.LessonCreate(**fields)
+
+
+def test_writes_release_the_writer_connection_at_commit(engines, db):
+    writer, _ = engines
+    user = crud.create_user(db, "ada", "ada@example.com", "secret")
+    assert user.id and user.username == "ada"
+    assert writer.pool.checkedout() == 0
+
+    progress = crud.update_user_progress(db, user.id, 1, 50)
+    assert (progress.progress_percentage, progress.is_completed) == (50, False)
+    assert writer.pool.checkedout() == 0
+
+    assert crud.record_user_activity(db, user.id).streak_days == 1
+    assert writer.pool.checkedout() == 0
+
+    lesson = crud.create_lesson(db, lesson_create())
+    assert [item.title for item in lesson.content_items] == ["Intro", "Check"]
+    assert writer.pool.checkedout() == 0
+
+
+def test_other_sessions_can_write_while_a_request_reads_after_its_commit(engines, Session):
+    writer, _ = engines
+    with Session() as request:
+        user = crud.create_user(request, "ada", "ada@example.com", "secret")
+        crud.record_user_activity(request, user.id)
+        with Session() as other:  # would wait SQLITE_WRITER_TIMEOUT for the only writer connection
+            crud.set_user_xp(other, user.id, 40)
+        assert crud.get_user(request, user.id) is not None
+
+
+def test_a_session_reading_replicas_stays_on_the_primary_after_commit(engines):
+    writer, reader = engines
+    Session = make_session_factory(writer, ReplicaSet([reader]))
+    with Session() as db:
+        user = crud.create_user(db, "ada", "ada@example.com", "secret")
+        assert db.info.get("use_primary")  # replicas may not have the new row yet
+        assert crud.get_user(db, user.id).username == "ada"
@@ -0,0 +1,65 @@
+import csv
+import gzip
+import io
+from datetime import datetime, timedelta
+
+import pyarrow
+import pyarrow.parquet
+import pytest
+
+from app import export
+
+T0 = datetime(2024, 3, 1, 9, 0)
+
+
+@pytest.fixture
+def databases(engines):
+    with engines[0].begin() as conn:
+        conn.execute(export.progress_table.insert(), [
+            {"user_id": user_id, "lesson_id": lesson_id, "progress_percentage": 100, "is_completed": True,
+             "started_at": T0, "completed_at": T0 + timedelta(minutes=5), "updated_at": T0}
+            for user_id in (3, 1, 2) for lesson_id in (1, 2)])
+    return [engines]
+
+
+def rows_of(databases, **options):
+    return [row for rows in export.iter_chunks(databases, "user_progress", chunk_size=4, **options) for row in rows]
+
+
+def test_rows_come_in_user_order_and_resume_after_a_cursor(databases):
+    rows = rows_of(databases)
+    assert [(row[1], row[0]) for row in rows] == sorted((row[1], row[0]) for row in rows)
+    after = export.cursor_of("user_progress", rows[2])
+    assert rows_of(databases, after=after) == rows[3:]
+
+
+def test_compressed_csv_chunks_concatenate(databases):
+    def unzstd(data):
+        return pyarrow.input_stream(pyarrow.py_buffer(data), compression="zstd").read()
+
+    for compression, decompress in (("gzip", gzip.decompress), ("zstd", unzstd)):
+        stream = b"".join(export.csv_stream(export.iter_chunks(databases, "user_progress", chunk_size=4),
+                                            "user_progress", compression))
+        table = list(csv.reader(io.StringIO(decompress(stream).decode())))
+        assert table[0] == list(export.TABLES["user_progress"].columns)
+        assert len(table) == 7
+        assert table[1][5].startswith(str(T0))  # the database's own text
+
+
+def test_parquet_stream_is_one_file_with_typed_columns(databases):
+    data = b"".join(export.parquet_stream(export.iter_chunks(databases, "user_progress", chunk_size=4),
+                                          "user_progress", "zstd"))
+    parquet = pyarrow.parquet.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.num_rows == 6
+    assert table.schema.field("started_at").type == pyarrow.timestamp("us")
+    assert table.column("started_at")[0].as_py() == T0
+
+
+def test_unknown_options_are_rejected():
+    with pytest.raises(export.ExportError):
+        export.check_options("users", "xlsx", "none")
+    with pytest.raises(export.ExportError):
+        export.check_options("quiz_attempts", "csv", "none")
+    assert export.check_options("users", "parquet", "zstd") is export.TABLES["users"]
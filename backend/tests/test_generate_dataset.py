@@ -0,0 +1,105 @@
+from sqlalchemy import create_engine, text
+
+import generate_dataset
+from app.sharding import shard_index
+
+
+QUERIES = {
+    # Not hashed_password: the one shared password is hashed with a fresh salt per run
+    "users": "SELECT id, username, email, xp_points, streak_days, last_active_date, created_at FROM users",
+    "user_progress": "SELECT * FROM user_progress",
+    "lessons": "SELECT * FROM lessons",
+    "quiz_questions": "SELECT * FROM quiz_questions",
+}
+
+
+def dump(url: str) -> dict:
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            return {table: conn.execute(text(f"{sql} ORDER BY id")).all() for table, sql in QUERIES.items()}
+    finally:
+        engine.dispose()
+
+
+def generate(url: str, *extra: str):
+    args = generate_dataset.build_parser().parse_args(
+        ["--users", "200", "--lessons", "4", "--chunk-size", "64", "--database-url", url, *extra])
+    generate_dataset.generate(args)
+
+
+def test_same_seed_gives_the_same_dataset(tmp_path):
+    first, second = f"sqlite:///{tmp_path / 'a.db'}", f"sqlite:///{tmp_path / 'b.db'}"
+    generate(first)
+    generate(second)
+    assert dump(first) == dump(second)
+    assert len(dump(first)["users"]) == 200
+
+
+def test_activity_is_relative_to_as_of(tmp_path):
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+    generate(url, "--as-of", "2025-06-30")
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        latest = conn.execute(text("SELECT MAX(last_active_date) FROM users")).scalar()
+        inactive = conn.execute(text("SELECT COUNT(*) FROM users WHERE streak_days = 0 "
+                                     "AND last_active_date IS NOT NULL")).scalar()
+    engine.dispose()
+    assert str(latest) == "2025-06-30"
+    assert inactive == 0
+
+
+def test_as_of_defaults_to_a_fixed_day():
+    assert generate_dataset.build_parser().parse_args([]).as_of == generate_dataset.DEFAULT_AS_OF
+    assert generate_dataset.parse_day("2024-03-01").isoformat() == "2024-03-01"
+
+
+def test_sharded_users_land_on_their_shard(tmp_path):
+    catalog = f"sqlite:///{tmp_path / 'catalog.db'}"
+    shard_urls = [f"sqlite:///{tmp_path / f'users-{i}.db'}" for i in range(2)]
+    generate(catalog, "--shard-urls", ",".join(shard_urls))
+    generate(catalog, "--shard-urls", ",".join(shard_urls), "--reset")
+
+    engine = create_engine(catalog)
+    with engine.connect() as conn:
+        directory = conn.execute(text("SELECT id, username FROM user_directory ORDER BY id")).all()
+        assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 0
+    engine.dispose()
+    assert [user_id for user_id, _ in directory] == list(range(1, 201))
+
+    plain = f"sqlite:///{tmp_path / 'plain.db'}"
+    generate(plain)
+    unsharded = dump(plain)
+    users, progress = [], []
+    for index, url in enumerate(shard_urls):
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            mine = conn.execute(text(f"{QUERIES['users']} ORDER BY id")).all()
+            rows = conn.execute(text("SELECT user_id, lesson_id, progress_percentage, is_completed FROM user_progress"
+                                     " ORDER BY user_id, lesson_id")).all()
+            bitmaps = conn.execute(text("SELECT COUNT(*) FROM users WHERE completed_lessons IS NOT NULL")).scalar()
+        engine.dispose()
+        assert mine and all(shard_index(row.id, 2) == index for row in mine)
+        assert all(shard_index(row.user_id, 2) == index for row in rows)
+        assert bitmaps == len({row.user_id for row in rows if row.is_completed})
+        users += mine
+        progress += rows
+    # The same users and progress as unsharded, just spread over the shards.
+    assert sorted(users) == unsharded["users"]
+    assert sorted(progress) == sorted((r.user_id, r.lesson_id, r.progress_percentage, r.is_completed)
+                                      for r in unsharded["user_progress"])
+
+
+def test_reset_clears_cohorts_with_the_rest_of_the_catalog(tmp_path):
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+    generate(url)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO cohorts (id, name) VALUES (1, '7B')"))
+        conn.execute(text("INSERT INTO cohort_members (cohort_id, user_id) VALUES (1, 1)"))
+    generate(url, "--reset")
+    with engine.connect() as conn:
+        assert [conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                for table in ("cohorts", "cohort_members")] == [0, 0]
+        assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 200
+    engine.dispose()
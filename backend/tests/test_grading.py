@@ -0,0 +1,90 @@
+import pytest
+
+from app import crud, grading
+
+from .factories import make_lesson, make_user
+
+
+def answer(question_id: int, selected_index: int = 1, **extra) -> dict:
+    return {"question_id": question_id, "selected_index": selected_index, **extra}
+
+
+def test_first_correct_answers_award_the_lesson_reward_split_per_question(db):
+    lesson, questions = make_lesson(db, questions=3, xp_reward=100)
+    user = make_user(db)
+    summary = grading.grade_submission(db, lesson.id, user.id, [answer(questions[0]), answer(questions[1], 0)])
+    assert (summary["correct"], summary["total"]) == (1, 2)
+    assert [r["xp_awarded"] for r in summary["results"]] == [34, 0]  # the first question takes the remainder
+    assert summary["xp_awarded"] == 34
+    assert summary["xp_points"] == 34
+    assert crud.get_user(db, user.id).xp_points == 34
+
+
+def test_a_whole_quiz_pays_the_full_reward(db):
+    lesson, questions = make_lesson(db, questions=3, xp_reward=100)
+    user = make_user(db)
+    summary = grading.grade_submission(db, lesson.id, user.id, [answer(q) for q in reversed(questions)])
+    assert [r["xp_awarded"] for r in summary["results"]] == [33, 33, 34]
+    assert summary["xp_points"] == 100
+
+
+def test_a_question_pays_out_once(db):
+    lesson, questions = make_lesson(db, questions=2, xp_reward=50)
+    user = make_user(db)
+    first = grading.grade_submission(db, lesson.id, user.id, [answer(questions[0]), answer(questions[0])])
+    assert [r["xp_awarded"] for r in first["results"]] == [25, 0]  # repeated in one batch
+    again = grading.grade_submission(db, lesson.id, user.id, [answer(questions[0]), answer(questions[1])])
+    assert [r["xp_awarded"] for r in again["results"]] == [0, 25]
+    assert again["xp_points"] == 50
+
+
+def test_wrong_first_then_right_still_pays(db):
+    lesson, questions = make_lesson(db, questions=1, xp_reward=30)
+    user = make_user(db)
+    assert grading.grade_submission(db, lesson.id, user.id, [answer(questions[0], 2)])["xp_awarded"] == 0
+    assert grading.grade_submission(db, lesson.id, user.id, [answer(questions[0])])["xp_awarded"] == 30
+
+
+def test_awards_add_to_xp_set_elsewhere(db):
+    lesson, questions = make_lesson(db, questions=1, xp_reward=30)
+    user = make_user(db)
+    crud.set_user_xp(db, user.id, 500)
+    assert grading.grade_submission(db, lesson.id, user.id, [answer(questions[0])])["xp_points"] == 530
+
+
+def test_anonymous_answers_are_graded_without_xp(db):
+    lesson, questions = make_lesson(db)
+    summary = grading.grade_submission(db, lesson.id, None, [answer(questions[0])])
+    assert summary["results"][0]["is_correct"]
+    assert (summary["xp_awarded"], summary["xp_points"]) == (0, None)
+
+
+def test_rejects_foreign_questions_and_bad_indexes(db):
+    lesson, questions = make_lesson(db, title="Stocks")
+    other, other_questions = make_lesson(db, title="Bonds", order_index=2)
+    user = make_user(db)
+    with pytest.raises(grading.GradingError):
+        grading.grade_submission(db, lesson.id, user.id, [answer(other_questions[0])])
+    with pytest.raises(grading.GradingError):
+        grading.grade_submission(db, lesson.id, user.id, [answer(questions[0], 3)])
+    with pytest.raises(LookupError):
+        grading.grade_submission(db, 999, user.id, [answer(questions[0])])
+    with pytest.raises(LookupError):
+        grading.grade_submission(db, lesson.id, 999, [answer(questions[0])])
+    assert crud.get_user(db, user.id).xp_points == 0
+
+
+def test_quiz_submit_is_the_only_xp_write(client):
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        lesson, questions = make_lesson(db, questions=2, xp_reward=40)
+        lesson_id, user_id = lesson.id, make_user(db).id
+    response = client.post(f"/api/lessons/{lesson_id}/quiz/submit", json={
+        "user_id": user_id, "answers": [answer(questions[0], time_ms=1200), answer(questions[1])]})
+    assert response.status_code == 200, response.text
+    assert response.json()["xp_points"] == 40
+    assert client.get(f"/api/users/{user_id}").json()["xp_points"] == 40
+    # No endpoint sets XP directly
+    assert client.post(f"/api/users/{user_id}/xp", json={"xp_points": 10**6}).status_code in (404, 405)
+    assert client.get(f"/api/users/{user_id}").json()["xp_points"] == 40
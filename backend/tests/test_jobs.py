@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app import achievements, crud, grading, jobs, models
+from app.cache_bus import get_bus
+from app.config import settings
+from app.jobs import DONE, FAILED, PENDING, RUNNING, JobRunner, Outbox
+from app.leaderboards import XP_NAMESPACE
+
+from .factories import make_lesson, make_user
+
+jobs_table = models.Job.__table__
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Register test handlers without leaving them behind."""
+    monkeypatch.setattr(jobs, "_handlers", dict(jobs._handlers))
+    return jobs.handler
+
+
+@pytest.fixture
+def make_runner(engines, Session):
+    writer, reader = engines
+
+    def make(**options):
+        return JobRunner([Outbox("catalog", writer, reader)], Session, **options)
+    return make
+
+
+@pytest.fixture
+def published():
+    messages = []
+    for namespace in (XP_NAMESPACE, "leaderboard"):
+        get_bus().subscribe(namespace, lambda namespace, key, version: messages.append((namespace, key)))
+    return messages
+
+
+def job_rows(db):
+    db.rollback()
+    return db.execute(select(jobs_table).order_by(jobs_table.c.id)).all()
+
+
+def expire_leases_and_delays(db):
+    past = datetime.utcnow() - timedelta(seconds=1)
+    db.execute(update(jobs_table).values(run_after=past).where(jobs_table.c.status == PENDING))
+    db.execute(update(jobs_table).values(locked_until=past).where(jobs_table.c.status == RUNNING))
+    db.commit()
+
+
+def test_an_idempotency_key_is_enqueued_once_and_only_with_its_transaction(db):
+    jobs.enqueue(db, "test.echo", {"n": 1}, key="k")
+    jobs.enqueue(db, "test.echo", {"n": 2}, key="k")  # same transaction: skipped
+    jobs.enqueue(db, "test.echo", {"n": 3})
+    jobs.enqueue(db, "test.echo", {"n": 4})  # no key: never deduplicated
+    db.commit()
+    assert [row.payload for row in job_rows(db)] == [{"n": 1}, {"n": 3}, {"n": 4}]
+
+    jobs.enqueue(db, "test.echo", {"n": 5}, key="k")  # still held by the first job
+    jobs.enqueue(db, "test.echo", {"n": 6}, key="other")
+    db.rollback()
+    assert [row.payload for row in job_rows(db)] == [{"n": 1}, {"n": 3}, {"n": 4}]
+
+    jobs.enqueue(db, "test.echo", {"n": 7}, key="other")  # the rolled-back key is free
+    db.commit()
+    assert [row.idempotency_key for row in job_rows(db)] == ["k", None, None, "other"]
+
+
+def test_an_expired_lease_redelivers_the_job(db, handlers, make_runner):
+    handlers("test.echo")(lambda db, payload: None)
+    jobs.enqueue(db, "test.echo", {"n": 1})
+    db.commit()
+    first, second = make_runner(lease_seconds=60), make_runner(lease_seconds=60)
+
+    (outbox, job), = first.claim({"test.echo": 5})
+    assert job.attempts == 1 and job_rows(db)[0].status == RUNNING
+    assert second.claim({"test.echo": 5}) == []  # leased to the first worker
+    assert second.run_due() == 0
+
+    expire_leases_and_delays(db)  # the first worker died mid-job
+    (_, again), = second.claim({"test.echo": 5})
+    assert (again.id, again.attempts) == (job.id, 2)
+    second._record_done(outbox, again)
+    row = job_rows(db)[0]
+    assert (row.status, row.locked_until) == (DONE, None) and row.finished_at is not None
+    assert first.claim({"test.echo": 5}) == []
+
+
+def test_backoff_doubles_up_to_the_cap_with_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 2.0)
+    monkeypatch.setattr(settings, "JOB_RETRY_MAX_SECONDS", 60.0)
+    monkeypatch.setattr(jobs.random, "uniform", lambda low, high: high)
+    assert [jobs.backoff_seconds(attempt) for attempt in range(1, 8)] == [2, 4, 8, 16, 32, 60, 60]
+    monkeypatch.undo()
+    delays = [jobs.backoff_seconds(3) for _ in range(200)]
+    assert all(0.5 * 8 <= delay <= 8 for delay in delays) and len(set(delays)) > 1
+
+
+def test_a_failing_job_is_retried_later_then_marked_failed(db, handlers, make_runner, monkeypatch):
+    monkeypatch.setattr(jobs.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 30.0)
+    calls = []
+
+    def flaky(db, payload):
+        calls.append(payload)
+        raise RuntimeError("broker down")
+
+    handlers("test.flaky", max_attempts=3)(flaky)
+    jobs.enqueue(db, "test.flaky", {"n": 1})
+    db.commit()
+    runner = make_runner()
+
+    for attempt, delay in ((1, 30), (2, 60)):
+        started = datetime.utcnow()
+        assert runner.run_due() == 1
+        row = job_rows(db)[0]
+        assert (row.status, row.attempts, row.last_error) == (PENDING, attempt, "RuntimeError: broker down")
+        retry_at = row.run_after - timedelta(seconds=delay)
+        assert started - timedelta(seconds=1) <= retry_at <= datetime.utcnow()
+        assert runner.run_due() == 0  # not due yet
+        expire_leases_and_delays(db)
+
+    assert runner.run_due() == 1
+    row = job_rows(db)[0]
+    assert (row.status, row.attempts) == (FAILED, 3) and row.finished_at is not None
+    assert len(calls) == 3
+    assert (runner.retried["test.flaky"], runner.failed["test.flaky"], runner.done["test.flaky"]) == (2, 1, 0)
+    expire_leases_and_delays(db)
+    assert runner.run_due() == 0  # failed jobs stay put for inspection
+    assert runner.metrics()["totals"]["failed"] == 1
+
+
+def test_claims_respect_each_types_concurrency(db, handlers, make_runner):
+    handlers("test.slow", concurrency=2)(lambda db, payload: None)
+    handlers("test.fast", concurrency=5)(lambda db, payload: None)
+    for n in range(4):
+        jobs.enqueue(db, "test.slow", {"n": n})
+        jobs.enqueue(db, "test.fast", {"n": n})
+    db.commit()
+    runner = make_runner()
+    claimed = runner.claim({"test.slow": 2, "test.fast": 3})
+    assert sorted(job.job_type for _, job in claimed) == ["test.fast"] * 3 + ["test.slow"] * 2
+    runner.in_flight.update(["test.slow", "test.slow"])
+    assert "test.slow" not in runner.free_slots() and runner.free_slots()["test.fast"] == 5
+
+
+def test_the_runner_never_exceeds_a_types_concurrency(db, handlers, make_runner):
+    lock, running, peak, finished = threading.Lock(), [0], [0], []
+
+    def slow(db, payload):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        finished.append(payload["n"])
+
+    handlers("test.slow", concurrency=2)(slow)
+    for n in range(8):
+        jobs.enqueue(db, "test.slow", {"n": n})
+    db.commit()
+    runner = make_runner(poll_interval=0.01)
+
+    async def run():
+        runner.start()
+        deadline = time.monotonic() + 10
+        while len(finished) < 8 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(run())
+    assert sorted(finished) == list(range(8)) and peak[0] == 2
+    assert {row.status for row in job_rows(db)} == {DONE} and runner.done["test.slow"] == 8
+
+
+def test_grading_commits_its_side_effects_as_jobs(db, make_runner, published):
+    user = make_user(db)
+    lesson, question_ids = make_lesson(db, questions=2, xp_reward=1000)
+    published.clear()
+    summary = grading.grade_submission(db, lesson.id, user.id,
+                                       [{"question_id": q, "selected_index": 1} for q in question_ids])
+    assert summary["xp_points"] == 1000 and "badges" not in summary
+    assert sorted(row.job_type for row in job_rows(db)) == ["achievements.record", "cache.publish",
+                                                            "leaderboards.xp_changed"]
+    assert achievements.user_badges(db, user.id) == [] and published == []
+
+    assert make_runner().run_due() == 3
+    assert {badge["badge"] for badge in achievements.user_badges(db, user.id)} >= {"perfect_quiz", "xp_1000"}
+    assert sorted(published) == [("leaderboard", None), (XP_NAMESPACE, f"{user.id}:1000")]
+
+
+def test_grading_that_fails_enqueues_nothing(db):
+    user = make_user(db)
+    lesson, question_ids = make_lesson(db, questions=1)
+    with pytest.raises(grading.GradingError):
+        grading.grade_submission(db, lesson.id, user.id, [{"question_id": question_ids[0], "selected_index": 9}])
+    assert job_rows(db) == []
+
+
+def test_a_late_xp_job_publishes_the_current_total(db, make_runner, published):
+    user_id = make_user(db).id
+    published.clear()
+    crud.set_user_xp(db, user_id, 1200)
+    crud.set_user_xp(db, user_id, 40)
+    assert published == []
+    assert make_runner().run_due() == 6
+    # Both moves carry the total at run time, so the board can't end on the stale 1200.
+    assert [key for namespace, key in published if namespace == XP_NAMESPACE] == [f"{user_id}:40"] * 2
+    # Badges are judged on the total each change reached (the only user ranks first either way)
+    assert [badge["badge"] for badge in achievements.user_badges(db, user_id)] == ["top_10", "xp_1000"]
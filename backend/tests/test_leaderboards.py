@@ -0,0 +1,110 @@
+import pytest
+
+from app import cache_bus, crud, leaderboards
+from app.cache_bus import InProcessBus
+from app.leaderboards import XP_NAMESPACE, Board, Boards
+
+from .factories import make_user
+
+ROWS = [(1, "ada", 300), (2, "bo", 200), (3, "cy", 200), (4, "di", 50)]
+
+
+def ranking(board: Board):
+    return [(entry["user_id"], entry["xp_points"]) for entry in board.entries(10)]
+
+
+def test_board_moves_keep_rank_order():
+    board = Board("cohort:1", "Class", ROWS, version=1)
+    assert ranking(board) == [(1, 300), (2, 200), (3, 200), (4, 50)]  # ties by user id
+    board.move(4, 250, version=2)
+    assert ranking(board) == [(1, 300), (4, 250), (2, 200), (3, 200)]
+    assert board.rank(4) == 2 and board.rank(3) == 4
+    board.move(1, 100, version=3)
+    assert ranking(board) == [(4, 250), (2, 200), (3, 200), (1, 100)]
+    assert board.entries(2, offset=1)[0] == {"rank": 2, "user_id": 2, "username": "bo", "xp_points": 200}
+
+
+def test_board_ignores_late_moves_and_strangers():
+    board = Board("cohort:1", "Class", ROWS, version=5)
+    board.move(4, 999, version=5)  # not newer than the load
+    board.move(9, 999, version=6)  # not a member
+    board.move(2, 10, version=7)
+    board.move(2, 400, version=6)  # arrived after version 7
+    assert ranking(board) == [(1, 300), (3, 200), (4, 50), (2, 10)]
+    assert board.rank(9) is None
+
+
+class Loader:
+    def __init__(self, rows=ROWS, during=None):
+        self.rows, self.during, self.calls = rows, during, 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.during:
+            self.during()
+        return "Class", list(self.rows)
+
+
+def test_boards_follow_xp_messages_and_reload_on_membership_changes():
+    bus = InProcessBus()
+    boards = Boards(maxsize=10, ttl=3600, bus=bus)
+    load = Loader()
+    assert boards.view("cohort:1", load, ranking)[0] == (1, 300)
+    bus.publish(XP_NAMESPACE, "3:500")
+    assert boards.view("cohort:1", load, ranking)[0] == (3, 500)
+    assert load.calls == 1
+    bus.publish(leaderboards.MEMBERS_NAMESPACE, "cohort:1")
+    assert boards.view("cohort:1", load, ranking)[0] == (1, 300)
+    assert load.calls == 2
+
+
+def test_xp_messages_during_a_load_are_replayed():
+    bus = InProcessBus()
+    boards = Boards(maxsize=10, ttl=3600, bus=bus)
+    assert boards.view("cohort:1", Loader(during=lambda: bus.publish(XP_NAMESPACE, "4:900")), ranking)[0] == (4, 900)
+    # A membership change during the load: served once, not cached.
+    load = Loader(during=lambda: bus.publish(leaderboards.MEMBERS_NAMESPACE, "cohort:2"))
+    boards.view("cohort:2", load, ranking)
+    boards.view("cohort:2", load, ranking)
+    assert load.calls == 2
+
+
+def test_a_replacement_bus_drops_cached_boards(monkeypatch):
+    monkeypatch.setattr(cache_bus, "_bus", InProcessBus())
+    boards = Boards(maxsize=10, ttl=3600)
+    load = Loader()
+    boards.view("cohort:1", load, ranking)
+    monkeypatch.setattr(cache_bus, "_bus", InProcessBus())
+    boards.view("cohort:1", load, ranking)
+    assert load.calls == 2
+    cache_bus.publish(XP_NAMESPACE, "2:1000")  # versions restart at 1 on the new bus
+    assert boards.view("cohort:1", load, ranking)[0] == (2, 1000)
+
+
+@pytest.fixture
+def boards(monkeypatch):
+    boards = Boards(maxsize=10, ttl=3600)
+    monkeypatch.setattr(leaderboards, "boards", boards)
+    return boards
+
+
+def test_cohort_and_friends_boards(db, boards):
+    ada, bo, cy = (make_user(db, name).id for name in ("ada", "bo", "cy"))
+    for user_id, xp in ((ada, 10), (bo, 30), (cy, 20)):
+        crud.get_user(db, user_id).xp_points = xp
+    db.commit()
+    cohort = leaderboards.create_cohort(db, "Class", [ada, bo])
+    page = leaderboards.cohort_leaderboard(db, cohort["id"], user_id=ada)
+    assert [e["username"] for e in page["entries"]] == ["bo", "ada"] and page["user_rank"] == 2
+
+    leaderboards.xp_changed(ada, 40)
+    assert leaderboards.cohort_leaderboard(db, cohort["id"], user_id=ada)["user_rank"] == 1
+    leaderboards.add_members(db, cohort["id"], [cy])
+    assert leaderboards.cohort_leaderboard(db, cohort["id"])["members"] == 3
+    with pytest.raises(LookupError):
+        leaderboards.add_members(db, cohort["id"], [999])
+
+    leaderboards.follow(db, cy, bo)
+    friends = leaderboards.friends_leaderboard(db, cy)
+    assert [e["username"] for e in friends["entries"]] == ["bo", "cy"]
+    assert leaderboards.friends_leaderboard(db, 999) is None
@@ -0,0 +1,43 @@
+import asyncio
+
+import httpx
+
+from benchmarks.common import percentile, summarize_latencies
+from benchmarks.loadtest import Recorder
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_latencies():
+    summary = summarize_latencies([3.0, 1.0, 2.0, 4.0], elapsed_s=2.0)
+    assert summary["count"] == 4
+    assert summary["throughput_rps"] == 2.0
+    assert summary["mean_ms"] == 2.5
+    assert summary["p50_ms"] == 2.0
+    assert summary["max_ms"] == 4.0
+    assert summarize_latencies([], 0.0)["throughput_rps"] == 0.0
+
+
+def test_recorder_counts_error_responses_and_failures():
+    def handler(request):
+        if request.url.path == "/down":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(404 if request.url.path == "/missing" else 200)
+
+    async def scenario(recorder):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            for path in ("/ok", "/ok", "/missing", "/down"):
+                await recorder.request(client, path, "GET", path)
+
+    recorder = Recorder()
+    asyncio.run(scenario(recorder))
+    assert len(recorder.latencies["/ok"]) == 2
+    assert recorder.errors == {"/missing": 1, "/down": 1}
+    assert "/down" not in recorder.latencies  # a failed request has no latency
@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app import migrations, models, schema
+from app.migrations import Migration, ops
+
+
+class Interrupted(Exception):
+    pass
+
+
+class CountingStep(ops.Step):
+    def __init__(self, fail_times: int = 0):
+        self.runs = 0
+        self.fail_times = fail_times
+
+    def run(self, ctx):
+        self.runs += 1
+        if self.runs <= self.fail_times:
+            raise Interrupted()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0)"))
+        conn.execute(text("INSERT INTO items (id) VALUES " + ", ".join(f"({i})" for i in range(1, 101))))
+    yield engine
+    engine.dispose()
+
+
+def use_migrations(monkeypatch, *step_lists):
+    fakes = [Migration(SimpleNamespace(VERSION=i, DESCRIPTION=f"fake {i}", STEPS=steps))
+             for i, steps in enumerate(step_lists, 1)]
+    monkeypatch.setattr(migrations, "MIGRATIONS", fakes)
+
+
+def test_an_interrupted_migration_resumes_at_the_failed_step(engine, monkeypatch):
+    first, flaky, last = CountingStep(), CountingStep(fail_times=1), CountingStep()
+    use_migrations(monkeypatch, [first, flaky, last])
+    with pytest.raises(Interrupted):
+        migrations.upgrade(engine, target=1, reporter=None)
+    assert migrations.status(engine)[0]["status"] == "in progress (1/3 steps)"
+    assert schema.current_version(engine) is None
+
+    migrations.upgrade(engine, target=1, reporter=None)
+    assert (first.runs, flaky.runs, last.runs) == (1, 2, 1)
+    assert migrations.status(engine)[0]["status"] == "applied"
+    assert schema.current_version(engine) == 1
+
+
+def test_an_interrupted_backfill_resumes_from_its_checkpoint(engine, monkeypatch):
+    # Not idempotent on purpose: a batch applied twice would show up as hits == 2.
+    # A zero time target keeps the batch size at 10 (it only shrinks above 100).
+    backfill = ops.Backfill("items", "hits = hits + 1", batch_size=10, target_batch_seconds=0, pause_seconds=0.001)
+    use_migrations(monkeypatch, [backfill])
+    batches = []
+
+    def crash_after_three(seconds):
+        batches.append(seconds)
+        if len(batches) == 3:
+            raise Interrupted()
+
+    monkeypatch.setattr(ops.time, "sleep", crash_after_three)
+    with pytest.raises(Interrupted):
+        migrations.upgrade(engine, target=1, reporter=None)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM items WHERE hits = 1")).scalar() == 30
+        assert conn.execute(text("SELECT position FROM migration_checkpoints")).scalar() == 30
+
+    monkeypatch.setattr(ops.time, "sleep", lambda seconds: None)
+    migrations.upgrade(engine, target=1, reporter=None)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT MIN(hits), MAX(hits) FROM items")).one() == (1, 1)
+        assert conn.execute(text("SELECT COUNT(*) FROM migration_checkpoints")).scalar() == 0
+
+
+def test_applied_migrations_are_not_rerun(engine, monkeypatch):
+    step = CountingStep()
+    use_migrations(monkeypatch, [step], [CountingStep()])
+    migrations.upgrade(engine, target=1, reporter=None)
+    migrations.upgrade(engine, target=2, reporter=None)
+    assert step.runs == 1
+    assert [row["status"] for row in migrations.status(engine)] == ["applied", "applied"]
+    assert schema.current_version(engine) == 2
+
+
+def test_steps_are_idempotent(engine):
+    ctx = migrations.MigrationContext(engine, version=1, step=0, reporter=None)
+    migrations.ensure_bookkeeping(engine)
+    for _ in range(2):
+        ops.AddColumn("items", models.Column("note", models.String)).run(ctx)
+        ops.CreateIndex("ix_items_hits", "items", ["hits"]).run(ctx)
+    assert ctx.has_column("items", "note")
+    assert "ix_items_hits" in {index["name"] for index in inspect(engine).get_indexes("items")}
+
+
+def test_upgrade_from_the_previous_release(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'previous.db'}")
+    head = migrations.HEAD
+    newest = migrations.MIGRATIONS[-1]
+    created = {step.table.name for step in newest.steps if isinstance(step, ops.CreateTable)}
+    models.Base.metadata.create_all(engine, tables=[t for t in models.Base.metadata.sorted_tables
+                                                   if t.name not in created])
+    migrations.stamp(engine, head - 1)
+    with pytest.raises(RuntimeError):
+        schema.ensure_schema(engine)  # behind: the app refuses to start
+
+    migrations.upgrade(engine, reporter=None)
+    assert schema.current_version(engine) == head
+    assert created <= set(inspect(engine).get_table_names())
+    schema.ensure_schema(engine)
+    engine.dispose()
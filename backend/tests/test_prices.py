@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+import pytest
+
+from app import prices
+from app.prices import PriceStore
+
+
+def bars(timestamps, closes=None, volume=100.0):
+    """Columns for write(): open = close - 1, high = close + 1, low = close - 2."""
+    closes = np.arange(1.0, len(timestamps) + 1) if closes is None else np.asarray(closes, dtype=float)
+    return {"timestamp": np.array(timestamps, dtype="datetime64[s]"), "open": closes - 1, "high": closes + 1,
+            "low": closes - 2, "close": closes, "volume": np.full(len(timestamps), volume)}
+
+
+def weekdays(start, count):
+    days = np.busday_offset(np.datetime64(start, "D"), np.arange(count), roll="forward")
+    return days.astype("datetime64[s]")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / "prices"))
+
+
+def test_an_import_swaps_the_index_and_readers_remap_the_new_version(store):
+    reader = PriceStore(store.root)  # another worker on the same files
+    assert reader.symbols() == [] and store.index() == {}
+    entry = store.write("spy", bars(weekdays("2024-01-01", 5)))
+    assert entry == {"symbol": "SPY", "rows": 5, "first": "2024-01-01T00:00:00", "last": "2024-01-05T00:00:00",
+                     "version": entry["version"]}
+    old = reader.series("SPY")
+    assert old.close.tolist() == [1, 2, 3, 4, 5] and reader.series("SPY").close is old.close  # mapped once
+
+    store.write_many({"SPY": bars(weekdays("2024-01-01", 3), [10, 20, 30]), "qqq": bars(weekdays("2024-01-01", 2))})
+    assert reader.symbols() == ["QQQ", "SPY"]
+    assert reader.info("spy")["version"] > entry["version"]
+    assert reader.series("SPY").close.tolist() == [10, 20, 30]
+    assert old.close.tolist() == [1, 2, 3, 4, 5]  # the old mapping stays readable after its files are removed
+    assert os.listdir(os.path.join(store.root, "SPY")) == [str(reader.info("SPY")["version"])]
+
+
+def test_writes_sort_and_keep_the_last_bar_of_a_repeated_timestamp(store):
+    timestamps = ["2024-01-03", "2024-01-01", "2024-01-02", "2024-01-01", "2024-01-03T00:00:00"]
+    store.write("SPY", bars(timestamps, [30, 10, 20, 11, 31]))
+    series = store.series("SPY")
+    assert series.timestamp.astype(str).tolist() == ["2024-01-01T00:00:00", "2024-01-02T00:00:00",
+                                                     "2024-01-03T00:00:00"]
+    assert series.close.tolist() == [11, 20, 31] and series.open.tolist() == [10, 19, 30]
+    assert store.info("SPY")["rows"] == 3
+
+
+@pytest.mark.parametrize("symbol, columns, message", [
+    ("SPY", {"timestamp": ["2024-01-01"], "close": [1.0]}, "missing columns"),
+    ("SPY", dict(bars(["2024-01-01", "2024-01-02"]), close=[1.0]), "the same length"),
+    ("SPY", bars([]), "non-empty"),
+    ("SPY", bars(["NaT"]), "missing timestamps"),
+    ("BAD SYMBOL", bars(["2024-01-01"]), "Invalid symbol"),
+])
+def test_bad_histories_are_rejected_before_anything_is_written(store, symbol, columns, message):
+    with pytest.raises(ValueError) as error:
+        store.write(symbol, columns)
+    assert message in str(error.value)
+    assert store.index() == {}
+
+
+def test_date_ranges_are_inclusive_zero_copy_views(store):
+    intraday = np.array(["2024-01-01T09:30", "2024-01-01T16:00", "2024-01-02T09:30", "2024-01-02T16:00",
+                         "2024-01-03T09:30"], dtype="datetime64[s]")
+    store.write("SPY", bars(intraday))
+    full = store.series("SPY")
+    assert isinstance(full.close, np.memmap) and not full.close.flags.writeable
+
+    day = store.series("SPY", "2024-01-02", "2024-01-02")
+    assert day.close.tolist() == [3, 4]  # a date end includes its whole day
+    assert all(np.shares_memory(part, whole) for part, whole in zip(day[1:], full[1:]))
+    assert store.series("SPY", "2024-01-01T16:00", np.datetime64("2024-01-02T09:30")).close.tolist() == [2, 3]
+    assert store.series("SPY", start="2024-01-03").close.tolist() == [5]
+    assert store.series("SPY", end="2023-12-31").close.tolist() == []
+    assert store.series("SPY", None, None) is full
+    with pytest.raises(LookupError):
+        store.series("QQQ")
+
+
+def test_weekly_bars_start_on_monday(store):
+    # Sunday 2024-01-07 belongs to the week of Monday 2024-01-01; Monday the 8th starts a new one.
+    days = ["2024-01-03", "2024-01-05", "2024-01-07", "2024-01-08", "2024-01-12", "2024-01-15"]
+    store.write("SPY", bars(days, [5, 8, 6, 7, 9, 4]))
+    weekly = prices.resample(store.series("SPY"), "weekly")
+    assert weekly.timestamp.astype("datetime64[D]").astype(str).tolist() == ["2024-01-01", "2024-01-08",
+                                                                             "2024-01-15"]
+    assert np.is_busday(weekly.timestamp.astype("datetime64[D]"), weekmask="Mon").all()
+    assert weekly.open.tolist() == [4, 6, 3]  # first open
+    assert weekly.high.tolist() == [9, 10, 5]  # highest high
+    assert weekly.low.tolist() == [3, 5, 2]  # lowest low
+    assert weekly.close.tolist() == [6, 9, 4]  # last close
+    assert weekly.volume.tolist() == [300, 200, 100]
+
+
+def test_monthly_bars_and_daily_pass_through(store):
+    days = np.concatenate([weekdays("2024-01-29", 5), weekdays("2024-02-28", 3)])  # Jan 29 to Mar 1
+    store.write("SPY", bars(days, [1, 2, 3, 4, 5, 6, 7, 8]))
+    monthly = prices.resample(store.series("SPY"), "monthly")
+    assert monthly.timestamp.astype("datetime64[D]").astype(str).tolist() == ["2024-01-01", "2024-02-01",
+                                                                              "2024-03-01"]
+    assert (monthly.open.tolist(), monthly.close.tolist()) == ([0, 3, 7], [3, 7, 8])
+    assert (monthly.high.tolist(), monthly.low.tolist()) == ([4, 8, 9], [-1, 2, 6])
+    assert monthly.volume.tolist() == [300, 400, 100]
+
+    series = store.series("SPY")
+    assert prices.resample(series, "daily") is series  # already daily bars: the store's views
+    with pytest.raises(ValueError):
+        prices.resample(series, "hourly")
+
+
+def test_aligned_closes_keep_only_the_common_days(store):
+    store.write_many({
+        "AAA": bars(["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-05"], [1, 2, 3, 5]),
+        "BBB": bars(["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"], [20, 30, 40, 50]),
+        "CCC": bars(["2024-01-01", "2024-01-03", "2024-01-05"], [100, 300, 500]),
+    })
+    assert store.aligned_closes(["AAA", "BBB"]).tolist() == [[2, 20], [3, 30], [5, 50]]
+    assert store.aligned_closes(["BBB", "CCC", "AAA"]).tolist() == [[30, 300, 3], [50, 500, 5]]
+    assert store.aligned_closes(["AAA", "CCC"], "2024-01-02", "2024-01-03").tolist() == [[3, 300]]
+    assert store.aligned_closes(["AAA", "BBB"], end="2024-01-01").shape == (0, 2)
+
+
+def test_prices_endpoint(client):
+    prices.store.write("SPY", bars(["2024-01-01", "2024-01-02", "2024-01-08"], [1, 2, 3]))
+    assert [s["symbol"] for s in client.get("/api/prices").json()] == ["SPY"]
+    body = client.get("/api/prices/spy", params={"interval": "weekly", "end": "2024-01-08"}).json()
+    assert body["timestamps"] == ["2024-01-01T00:00:00", "2024-01-08T00:00:00"] and body["close"] == [2, 3]
+    assert client.get("/api/prices/SPY", params={"start": "2024-01-02"}).json()["close"] == [2, 3]
+    assert client.get("/api/prices/QQQ").status_code == 404
+    assert client.get("/api/prices/bad symbol").status_code == 400
+    assert client.get("/api/prices/SPY", params={"interval": "hourly"}).status_code == 422
@@ -0,0 +1,145 @@
+import csv
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+
+from app import models, provisioning, schema, security
+from app.database import make_session_factory, shard_set_from_urls
+from .conftest import BACKEND_DIR
+from .factories import make_user
+
+
+def account(name, email=None, password="secret"):
+    return {"username": name, "email": email or f"{name}@example.com", "password": password}
+
+
+def statuses(results):
+    return [(r["username"], r["status"]) for r in results]
+
+
+def test_rows_get_one_result_each_in_order(db):
+    make_user(db, "ada")
+    rows = [account("bob"), account("ada", "ada@other.org"), account("cy", "ada@example.com"),
+            account("bob", "bob2@example.com"), account("dee", "bob@example.com"), account("eve", "no-at-sign"),
+            {"username": "fay"}, account("  ")]
+    results = provisioning.provision_users(db, rows)
+    assert [r["index"] for r in results] == list(range(len(rows)))
+    assert statuses(results) == [("bob", "created"), ("ada", "exists"), ("cy", "exists"), ("bob", "duplicate"),
+                                 ("dee", "duplicate"), ("eve", "invalid"), ("fay", "invalid"), ("  ", "invalid")]
+    assert results[1]["detail"] == "Username already registered"
+    assert results[2]["detail"] == "Email already registered"
+    assert results[3]["detail"] == results[4]["detail"] == "Repeats an earlier row"
+    assert "Field required" in results[6]["detail"]
+
+    bob = db.get(models.User, results[0]["id"])
+    assert (bob.username, bob.xp_points, bob.streak_days) == ("bob", 0, 0)
+    assert security.verify_password("secret", bob.hashed_password)
+    assert db.scalar(select(func.count()).select_from(models.User)) == 2
+
+
+def test_a_batch_with_existing_accounts_still_creates_the_rest(db):
+    make_user(db, "ada")
+    rows = [account(name) for name in ("ada", "bob", "cy", "dee", "eve")]
+    results = provisioning.provision_users(db, rows, batch_size=2)
+    assert statuses(results) == [("ada", "exists"), ("bob", "created"), ("cy", "created"), ("dee", "created"),
+                                 ("eve", "created")]
+    assert len({r["id"] for r in results[1:]}) == 4
+
+    # Re-running the same rows is safe: everything already exists.
+    again = provisioning.provision_users(db, rows, batch_size=2)
+    assert {r["status"] for r in again} == {"exists"}
+    assert db.scalar(select(func.count()).select_from(models.User)) == 5
+
+
+def test_a_failing_batch_loses_only_itself(db, monkeypatch):
+    execute, inserts = db.execute, []
+
+    def fail_third_insert(statement, *args, **kwargs):
+        if getattr(statement, "is_insert", False):
+            inserts.append(statement)
+            if len(inserts) == 3:
+                raise OperationalError("INSERT", {}, Exception("disk I/O error"))
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db, "execute", fail_third_insert)
+    with pytest.raises(OperationalError):
+        provisioning.provision_users(db, [account(f"u{i}") for i in range(6)], batch_size=2)
+    db.rollback()
+    monkeypatch.undo()
+    names = db.scalars(select(models.User.username).order_by(models.User.id)).all()
+    assert names == ["u0", "u1", "u2", "u3"]
+
+
+def test_sharded_accounts_are_checked_against_the_directory(engines, tmp_path):
+    shards = shard_set_from_urls([f"sqlite:///{tmp_path / f'users-{i}.db'}" for i in range(2)])
+    schema.ensure_shards(shards)
+    try:
+        with make_session_factory(*engines, shards=shards)() as db:
+            first = provisioning.provision_users(db, [account("ada"), account("bob")])
+            results = provisioning.provision_users(db, [account("cy", "ada@example.com"), account("dee")])
+            assert statuses(results) == [("cy", "exists"), ("dee", "created")]
+            assert results[0]["detail"] == "Email already registered"
+            ids = [r["id"] for r in first + results if r["id"]]
+            assert sorted(ids) == [1, 2, 3]
+        stored = []
+        for shard in shards:
+            with shard.reader.connect() as conn:
+                stored += conn.execute(select(models.User.username)).scalars().all()
+        assert sorted(stored) == ["ada", "bob", "dee"]
+    finally:
+        shards.dispose()
+
+
+def test_bulk_endpoint_counts_each_status(client):
+    client.post("/api/users/", json=account("ada"))
+    response = client.post("/api/users:bulk", json={"users": [
+        account("ada"), account("bob"), account("bob", "b2@example.com"), account("cy", "bad")]})
+    assert response.status_code == 200
+    body = response.json()
+    assert {k: body[k] for k in ("created", "existing", "duplicates", "invalid")} == \
+        {"created": 1, "existing": 1, "duplicates": 1, "invalid": 1}
+    assert [r["status"] for r in body["results"]] == ["exists", "created", "duplicate", "invalid"]
+    assert client.post("/api/users:bulk", json={"users": []}).status_code == 422
+
+
+def test_create_user_endpoints_pass_the_fields_crud_expects(client):
+    response = client.post("/api/users/", json=account("ada"))
+    assert response.status_code == 200
+    assert response.json()["username"] == "ada"
+    assert client.post("/api/users/", json=account("ada", "other@example.com")).status_code == 400
+
+    registered = client.post("/api/register", json=account("bob"))
+    assert registered.status_code == 200 and registered.json()["access_token"]
+    assert client.post("/api/register", json=account("cy", "bob@example.com")).status_code == 400
+
+
+def test_csv_import_reports_each_row(tmp_path):
+    source, report = tmp_path / "class.csv", tmp_path / "results.csv"
+    source.write_text("Username,Email,Password\nada,ada@example.com,\nbob,bob@example.com,hunter2\n"
+                      "ada,ada2@example.com,x\ncy,not-an-email,x\n", encoding="utf-8")
+    url = f"sqlite:///{tmp_path / 'import.db'}"
+    command = [sys.executable, "import_users_csv.py", str(source), "--default-password", "changeme",
+               "--database-url", url, "--shard-urls", "", "--report", str(report)]
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=dict(os.environ), capture_output=True, text=True)
+    assert result.returncode == 1, result.stderr  # a row was invalid
+    assert "4 rows" in result.stdout and "2 created" in result.stdout
+    assert "row 4: duplicate" in result.stdout and "row 5: invalid" in result.stdout
+    with open(report, newline="") as f:
+        assert [(r["username"], r["status"]) for r in csv.DictReader(f)] == \
+            [("ada", "created"), ("bob", "created"), ("ada", "duplicate"), ("cy", "invalid")]
+
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            hashed = conn.execute(select(models.User.hashed_password).where(models.User.username == "ada")).scalar()
+        assert security.verify_password("changeme", hashed)
+    finally:
+        engine.dispose()
+
+    rerun = subprocess.run(command[:2] + [str(source), "--database-url", url, "--shard-urls", ""],
+                           cwd=BACKEND_DIR, env=dict(os.environ), capture_output=True, text=True)
+    assert "0 created, 2 already existed" in rerun.stdout  # without the default, row 4 is the first "ada"
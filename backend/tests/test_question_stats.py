@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app import question_stats
+from app.question_stats import Answer, Buffer, Counter
+
+from .factories import make_lesson
+
+
+def results(*correct):
+    return [{"question_id": i + 1, "selected_index": 1 if ok else 0, "is_correct": ok} for i, ok in enumerate(correct)]
+
+
+def test_submission_answers_mark_first_tries_and_rest_scores():
+    answers = question_stats.submission_answers(results(True, False, True, True) + results(True),
+                                                first_tries={1, 2, 3}, times={1: 900})
+    assert [a.first_try for a in answers] == [True, True, True, False, False]  # 4 is old, 1 repeated
+    assert answers[0].time_ms == 900 and answers[1].time_ms is None
+    assert answers[0].rest_score == 0.75 and answers[1].rest_score == 1.0  # 3 of the other 4 vs 4 of 4
+
+
+def test_counter_adds_merges_and_round_trips():
+    a, b = Counter(), Counter()
+    a.add(Answer(1, 2, False, True, 400, 0.5))
+    b.add(Answer(1, 0, True, False, 60000))
+    a.merge(b)
+    assert (a.attempts, a.correct, a.first_attempts, a.first_correct) == (2, 1, 1, 0)
+    assert a.option_counts == [1, 0, 1]
+    assert sum(a.time_buckets) == 2
+    assert Counter.from_row(a.row()).row() == a.row()
+
+
+def test_point_biserial_matches_the_correlation():
+    rng = np.random.default_rng(3)
+    rest = rng.random(200)
+    correct = rng.random(200) < rest  # learners doing well overall tend to get it right
+    counter = Counter()
+    for x, y in zip(correct, rest):
+        counter.add(Answer(1, 0, bool(x), True, None, float(y)))
+    assert question_stats.point_biserial(counter) == pytest.approx(np.corrcoef(correct, rest)[0, 1])
+
+
+def test_flushes_add_up_and_skip_deleted_questions(db, engines, monkeypatch):
+    monkeypatch.setattr(question_stats, "buffer", Buffer())
+    _, (q1, q2) = make_lesson(db, questions=2)
+    for _ in range(2):
+        question_stats.buffer.record([Answer(q1, 1, True, True, 1000, 0.0), Answer(q2, 0, False, True, 1000, 1.0),
+                                      Answer(999, 0, False, True)])
+        assert question_stats.flush(engines[0]) == 2
+    assert question_stats.flush(engines[0]) == 0
+    table = question_stats.stats_table
+    rows = dict(db.execute(select(table.c.question_id, table.c.attempts)).all())
+    assert rows == {q1: 2, q2: 2}
+
+    hardest = question_stats.ranking(db)
+    assert [r["question_id"] for r in hardest] == [q2, q1]
+    assert hardest[0]["difficulty"] == 0.0 and "too_hard" in hardest[0]["flags"]
+    assert "distractor_beats_answer" in hardest[0]["flags"]
+    assert hardest[1]["median_time_ms"] == pytest.approx(1000, rel=0.2)  # within a bucket of the truth
+
+
+def test_a_failed_flush_keeps_the_counts(monkeypatch):
+    monkeypatch.setattr(question_stats, "buffer", Buffer())
+    question_stats.buffer.record([Answer(1, 0, True, True)])
+
+    class Broken:
+        def begin(self):
+            raise RuntimeError("database down")
+
+    with pytest.raises(RuntimeError):
+        question_stats.flush(Broken())
+    question_stats.buffer.record([Answer(1, 0, True, True)])
+    assert question_stats.buffer.drain()[1].attempts == 2
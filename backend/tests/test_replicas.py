@@ -0,0 +1,106 @@
+import pytest
+from sqlalchemy import create_engine, select
+
+from app import crud, models
+from app.database import make_session_factory
+from app.replicas import ReplicaSet
+
+
+class Lag:
+    """A stand-in lag probe: seconds per engine, or an exception to raise."""
+
+    def __init__(self, engines):
+        self.values = {engine: 0.0 for engine in engines}
+
+    def __call__(self, engine):
+        value = self.values[engine]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+@pytest.fixture
+def stand_ins(tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path / f'replica-{i}.db'}") for i in range(3)]
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+
+def test_round_robin_over_healthy_replicas(stand_ins):
+    replicas = ReplicaSet(stand_ins, check_interval=0, lag_probe=Lag(stand_ins))
+    assert [replicas.pick() for _ in range(6)] == stand_ins * 2
+
+
+def test_lagging_or_failing_replicas_are_ejected_and_readmitted(stand_ins):
+    lag = Lag(stand_ins)
+    replicas = ReplicaSet(stand_ins, max_lag=5.0, check_interval=0, lag_probe=lag)
+    lag.values[stand_ins[0]] = 12.0
+    lag.values[stand_ins[1]] = ConnectionError("refused")
+    assert {replicas.pick() for _ in range(4)} == {stand_ins[2]}
+    status = replicas.status()
+    assert [s["healthy"] for s in status] == [False, False, True]
+    assert "lag 12.0s" in status[0]["error"] and "ConnectionError" in status[1]["error"]
+
+    lag.values[stand_ins[0]] = 1.0
+    assert {replicas.pick() for _ in range(4)} == {stand_ins[0], stand_ins[2]}
+    assert replicas.status()[0]["error"] is None
+
+
+def test_pick_falls_back_to_the_primary_when_every_replica_is_out(stand_ins):
+    lag = Lag(stand_ins)
+    replicas = ReplicaSet(stand_ins, max_lag=1.0, check_interval=0, lag_probe=lag)
+    for engine in stand_ins:
+        lag.values[engine] = 30.0
+    assert replicas.pick() is None
+    assert ReplicaSet([]).pick() is None
+
+
+def test_checks_are_rate_limited(stand_ins):
+    calls = []
+    replicas = ReplicaSet(stand_ins[:1], check_interval=3600,
+                          lag_probe=lambda engine: calls.append(engine) or 99.0)
+    for _ in range(5):
+        replicas.pick()
+    assert len(calls) == 1  # and until the next check, the ejected replica stays out
+    assert replicas.pick() is None
+
+
+def test_least_connections_prefers_the_idlest_replica(stand_ins):
+    replicas = ReplicaSet(stand_ins, mode="least_connections", check_interval=0, lag_probe=Lag(stand_ins))
+    busy = [stand_ins[0].connect(), stand_ins[0].connect(), stand_ins[1].connect()]
+    try:
+        assert replicas.pick() is stand_ins[2]
+        held = stand_ins[2].connect()
+        held2 = stand_ins[2].connect()
+        assert replicas.pick() is stand_ins[1]
+        held.close()
+        held2.close()
+    finally:
+        for conn in busy:
+            conn.close()
+    assert [s["in_use"] for s in replicas.status()] == [0, 0, 0]
+    with pytest.raises(ValueError):
+        ReplicaSet(stand_ins, mode="random")
+
+
+def test_writes_pin_the_session_to_the_primary_even_with_release_on_commit_off(engines):
+    writer, reader = engines
+    replicas = ReplicaSet([reader], check_interval=0, lag_probe=lambda engine: 0.0)
+    Session = make_session_factory(writer, replicas, release_on_commit=False)
+    with Session() as db:
+        assert db.get_bind(clause=select(models.User)) is reader
+    with Session() as db:
+        crud.create_user(db, "ada", "ada@example.com", "secret")
+        db.commit()
+        assert db.info["use_primary"]
+        assert db.get_bind(clause=select(models.User)) is writer  # replicas may lag the commit
+
+
+def test_release_on_commit_returns_reads_to_the_readers(engines):
+    writer, reader = engines
+    Session = make_session_factory(writer, ReplicaSet([reader], check_interval=0, lag_probe=lambda e: 0.0),
+                                   release_on_commit=True)
+    with Session() as db:
+        crud.create_user(db, "ada", "ada@example.com", "secret")
+        assert db.get_bind(clause=select(models.User)) is reader
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+from app import retrieval
+from app.retrieval import Chunk, RetrievalIndex
+from benchmarks.cold_start import LAZY_MODULES
+
+from .conftest import BACKEND_DIR
+
+
+def chunk(lesson_id: int, text: str) -> Chunk:
+    return Chunk(lesson_id, None, f"Lesson {lesson_id}", text, retrieval.estimate_tokens(text))
+
+
+CHUNKS = [
+    chunk(1, "A dividend is a share of company profit paid to shareholders in cash."),
+    chunk(1, "Stocks represent ownership in a company."),
+    chunk(2, "Bonds are loans to governments or companies that pay interest."),
+    chunk(2, "Diversification spreads risk across many assets so one loss hurts less."),
+]
+
+
+def test_ranks_chunks_by_their_terms():
+    index = RetrievalIndex(CHUNKS)
+    assert [c.text for c in index.top("what is a dividend?", k=1, token_budget=1000)] == [CHUNKS[0].text]
+    assert index.top("how does diversification reduce risk", k=2, token_budget=1000)[0] == CHUNKS[3]
+    assert index.top("quantum chromodynamics", k=3, token_budget=1000) == []
+
+
+def test_lesson_boost_and_token_budget():
+    index = RetrievalIndex(CHUNKS)
+    plain, boosted = index.scores("company loans"), index.scores("company loans", lesson_id=2)
+    in_lesson = index.lesson_ids == 2
+    assert (boosted[in_lesson] == plain[in_lesson] * retrieval.LESSON_BOOST).all()
+    assert (boosted[~in_lesson] == plain[~in_lesson]).all()
+    assert index.top("company", k=3, token_budget=CHUNKS[1].tokens) == [CHUNKS[1]]
+
+
+def test_split_text_packs_paragraphs_within_the_word_limit():
+    text = "one two three\n\nfour five\n\n" + " ".join(["x"] * 7)
+    assert retrieval.split_text(text, words=5) == ["one two three four five", "x x x x x", "x x"]
+
+
+def test_heavy_dependencies_stay_out_of_app_start():
+    modules = ", ".join(repr(m) for m in LAZY_MODULES)
+    code = (f"import sys, app.main; print(sorted(m for m in sys.modules for lazy in ({modules},) "
+            f"if m == lazy or m.startswith(lazy + '.')))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=dict(os.environ),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
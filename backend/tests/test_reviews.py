@@ -0,0 +1,89 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import reviews
+
+from .factories import make_lesson, make_user
+
+NOW = datetime(2024, 4, 1, 8, 0)
+
+
+class Card:
+    """SM-2 as the upsert is meant to compute it, one answer at a time."""
+
+    def __init__(self):
+        self.ease, self.interval, self.repetitions, self.lapses, self.reviews = reviews.INITIAL_EASE, 0, 0, 0, 0
+
+    def answer(self, quality: int, at: datetime):
+        if quality >= 3:
+            if self.repetitions == 0:
+                self.interval = 1
+            elif self.repetitions == 1:
+                self.interval = 6
+            else:
+                self.interval = math.floor(self.interval * self.ease + 0.5)
+            self.ease = max(reviews.MIN_EASE, self.ease + reviews.ease_change(quality))
+            self.repetitions += 1
+        else:
+            self.interval, self.repetitions = 1, 0
+            self.lapses += 1
+        self.reviews += 1
+        return self.ease, self.interval, self.repetitions, self.lapses, self.reviews, \
+            reviews._epoch(at) + self.interval * reviews.DAY
+
+
+def stored(db, user_id: int, question_id: int):
+    c = reviews.cards.c
+    return db.execute(select(c.ease, c.interval_days, c.repetitions, c.lapses, c.reviews, c.due_at)
+                      .where(c.user_id == user_id, c.question_id == question_id)).one()
+
+
+def test_upsert_follows_sm2(db):
+    expected = Card()
+    at = NOW
+    for quality in (5, 4, 3, 5, 1, 4, 4, 0, 2, 5, 5, 5, 5):
+        reviews.record_reviews(db, 1, [(10, quality)], now=at)
+        db.commit()
+        ease, interval, *rest = stored(db, 1, 10)
+        want = expected.answer(quality, at)
+        assert ease == pytest.approx(want[0])
+        assert (interval, *rest) == want[1:], quality
+        at += timedelta(days=interval)
+
+
+def test_ease_never_drops_below_the_floor(db):
+    for day in range(10):  # each 3 takes 0.14 off
+        reviews.record_reviews(db, 1, [(10, 3)], now=NOW + timedelta(days=day))
+    db.commit()
+    assert stored(db, 1, 10).ease == reviews.MIN_EASE
+
+
+def test_a_batch_counts_each_question_once_last_answer_wins(db):
+    reviews.record_reviews(db, 1, [(10, 5), (11, 4), (10, 1)], now=NOW)
+    db.commit()
+    assert stored(db, 1, 10)[2:5] == (0, 1, 1)  # failed: no repetitions, one lapse, one review
+    assert stored(db, 1, 11).repetitions == 1
+
+
+def test_quality_is_clamped_to_the_answers_side():
+    assert reviews.quality_for(True) == reviews.CORRECT_QUALITY
+    assert reviews.quality_for(True, 1) == 3
+    assert reviews.quality_for(False, 5) == 2
+    assert reviews.quality_for(False) == reviews.WRONG_QUALITY
+
+
+def test_answer_then_due_queue(db):
+    lesson, questions = make_lesson(db, questions=2)
+    user_id = make_user(db).id
+    first = reviews.answer(db, user_id, questions[0], selected_index=1)
+    assert first["is_correct"] and first["card"]["interval_days"] == 1
+    wrong = reviews.answer(db, user_id, questions[1], selected_index=0)
+    assert not wrong["is_correct"] and wrong["card"]["lapses"] == 1
+
+    assert reviews.due_cards(db, user_id)["due"] == []
+    due = reviews.due_cards(db, user_id, now=datetime.utcnow() + timedelta(days=2))["due"]
+    assert [card["question_id"] for card in due] == questions  # most overdue first
+    assert due[0]["lesson_id"] == lesson.id and due[0]["options"] == ["No", "Yes", "Maybe"]
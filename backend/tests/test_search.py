@@ -0,0 +1,106 @@
+import migrate_db
+import pytest
+from sqlalchemy import create_engine, select, text, update
+
+from app import crud, models, schemas, search
+from app.database import make_session_factory
+
+
+def lesson_create(title="Stocks", description="What a share is", text_body="Shares are ownership.",
+                  explanation="A share is a slice of a company."):
+    return schemas.LessonCreate(title=title, description=description, order_index=1, content_items=[
+        schemas.ContentCreate(content_type="text", title="Intro", content={"text": text_body}, order_index=1),
+        schemas.ContentCreate(content_type="quiz", title="Check", order_index=2, content={
+            "question": "What is a share?", "options": ["A loan", "Ownership"], "correctAnswer": 1,
+            "explanation": explanation}),
+    ])
+
+
+def hits(db, q):
+    return [(hit["lesson_title"], hit["kind"]) for hit in search.search(db, q)]
+
+
+def assert_index_consistent(db):
+    # Fails if search_fts has drifted from search_documents (what the triggers maintain).
+    db.execute(text("INSERT INTO search_fts(search_fts, rank) VALUES ('integrity-check', 1)"))
+
+
+def test_new_lessons_are_indexed_with_their_content_and_quizzes(db):
+    crud.create_lesson(db, lesson_create(explanation="Dividends are paid from profits."))
+    assert hits(db, "stocks") == [("Stocks", "lesson")]
+    assert sorted(hits(db, "ownership")) == [("Stocks", "quiz"), ("Stocks", "text")]
+    assert hits(db, "dividends") == [("Stocks", "quiz")]
+    assert hits(db, "correctAnswer") == []
+    assert_index_consistent(db)
+
+
+def test_rewrites_and_deletes_keep_the_index_current(db):
+    lesson = crud.create_lesson(db, lesson_create())
+    intro, quiz = lesson.content_items
+    db.execute(update(models.LessonContent).where(models.LessonContent.id == intro.id)
+               .values(content={"text": "Bonds are loans."}))
+    db.execute(update(models.QuizQuestion).where(models.QuizQuestion.lesson_content_id == quiz.id)
+               .values(explanation="Coupons are interest."))
+    search.index_lessons(db, [lesson.id])
+    db.commit()
+    assert hits(db, "bonds") == [("Stocks", "text")]
+    assert hits(db, "coupons") == [("Stocks", "quiz")]
+    assert hits(db, "slice") == []
+    assert_index_consistent(db)
+
+    # An UPDATE of a document row goes through the update trigger...
+    db.execute(update(models.SearchDocument).where(models.SearchDocument.kind == "lesson")
+               .values(title="Equities"))
+    db.commit()
+    assert hits(db, "equities") == [("Stocks", "lesson")]
+    assert hits(db, "stocks") == []
+    assert_index_consistent(db)
+
+    # ...and deactivating a lesson drops its rows through the delete trigger.
+    db.execute(update(models.Lesson).where(models.Lesson.id == lesson.id).values(is_active=False))
+    search.index_lessons(db, [lesson.id])
+    db.commit()
+    assert hits(db, "bonds") == [] and hits(db, "equities") == []
+    assert db.scalar(select(models.SearchDocument.id)) is None
+    assert_index_consistent(db)
+
+
+def test_title_hits_rank_first_and_snippets_are_highlighted_and_escaped(db):
+    crud.create_lesson(db, lesson_create(title="Budgeting basics", description="Plan <your> money"))
+    crud.create_lesson(db, lesson_create(title="Saving", description="Stick to a budget every month"))
+    results = search.search(db, "budget")
+    assert [r["lesson_title"] for r in results] == ["Budgeting basics", "Saving"]
+    assert results[0]["score"] > results[1]["score"]
+    assert "<mark>budget</mark>" in results[1]["snippet"]
+    assert "&lt;your&gt;" in search.search(db, "plan")[0]["snippet"]
+    assert len(search.search(db, "budget", limit=1, skip=1)) == 1
+
+
+def test_the_last_term_is_a_prefix(db):
+    crud.create_lesson(db, lesson_create(title="Diversification"))
+    assert hits(db, "divers") == [("Diversification", "lesson")]
+    assert hits(db, "divers stock") == []
+
+
+@pytest.mark.parametrize("q", ['"share', 'share"', "own*", "*", "NEAR(share ownership)", "share NEAR ownership",
+                               "AND", "OR share", "NOT", "share -ownership", "title:share", "^share", "(share",
+                               "'", "%", "ünïcödé"])
+def test_query_syntax_is_never_passed_to_fts5(client, q):
+    client.post("/api/lessons", json=lesson_create().model_dump())
+    response = client.get("/api/search", params={"q": q})
+    assert response.status_code == 200, response.text
+    assert response.json()["query"] == q
+
+
+def test_migrate_db_creates_a_searchable_database(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    monkeypatch.setattr(migrate_db, "DATABASE_URL", url)
+    migrate_db.migrate_database()
+    migrate_db.migrate_database()  # already current: a no-op
+    engine = create_engine(url)
+    try:
+        with make_session_factory(engine, engine)() as db:
+            crud.create_lesson(db, lesson_create())
+            assert hits(db, "stocks") == [("Stocks", "lesson")]
+    finally:
+        engine.dispose()
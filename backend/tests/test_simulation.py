@@ -0,0 +1,198 @@
+import json
+import math
+import threading
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from app import simulation
+
+
+def gbm(**data):
+    return {"assets": [{"symbol": "CASH", "mu": 0.05, "sigma": 0.0}], "paths": 5, "horizon_days": 252, **data}
+
+
+class FixedStarts:
+    """A generator whose bootstrap block starts are chosen by the test."""
+
+    def __init__(self, starts):
+        self.starts = np.array(starts)
+
+    def integers(self, low, high, size):
+        assert low == 0 and self.starts.max() < high
+        return self.starts.reshape(size)
+
+
+def test_gbm_without_volatility_grows_at_exactly_the_drift():
+    result = simulation.simulate(simulation.resolve(gbm(), {}))
+    (cash,) = result["portfolios"]
+    expected = round(10000 * math.exp(0.05), 2)
+    assert set(cash["final_value"].values()) == {expected} and cash["mean_final_value"] == expected
+    assert cash["probability_of_loss"] == 0 and cash["median_max_drawdown"] == 0
+    assert cash["median_annual_return"] == round(math.exp(0.05) - 1, 4)
+    assert (cash["fan"][0]["p50"], cash["fan"][-1]["p50"]) == (10000, expected)
+
+
+def test_zero_volatility_assets_get_no_shocks_next_to_volatile_ones():
+    params = simulation.resolve({"assets": [{"symbol": "CASH", "mu": 0.02, "sigma": 0.0},
+                                            {"symbol": "STOCKS", "mu": 0.07, "sigma": 0.2}],
+                                 "correlation": [[1, 0.5], [0.5, 1]], "horizon_days": 10}, {})
+    drift, factor = simulation._gbm_factor(params)
+    returns = simulation._log_returns(params, np.random.default_rng(1), 50, (drift, factor))
+    assert returns.shape == (50, 10, 2)
+    assert (returns[:, :, 0] == drift[0]).all() and returns[:, :, 1].std() > 0
+    np.testing.assert_allclose(factor @ factor.T, [[0, 0], [0, 0.04 / 252]], atol=1e-15)
+
+
+def test_buy_and_hold_lets_weights_drift_and_rebalancing_resets_them():
+    # Asset A doubles every day, B stays flat; half in each.
+    log_returns = np.array([[[math.log(2), 0.0]] * 4])
+    weights = np.array([[0.5], [0.5]])
+    hold = simulation._portfolio_values(log_returns.copy(), weights, 0)[0, :, 0]
+    daily = simulation._portfolio_values(log_returns.copy(), weights, 1)[0, :, 0]
+    every_other = simulation._portfolio_values(log_returns.copy(), weights, 2)[0, :, 0]
+    np.testing.assert_allclose(hold, [1.5, 2.5, 4.5, 8.5])
+    np.testing.assert_allclose(daily, [1.5, 2.25, 3.375, 5.0625])
+    np.testing.assert_allclose(every_other, [1.5, 2.5, 3.75, 6.25])
+
+
+def test_bootstrap_blocks_wrap_around_the_history_and_keep_whole_days():
+    history = np.arange(5.0)[:, None] * [1.0, 10.0]  # day d's returns are (d, 10d)
+    params = {"model": "bootstrap", "horizon_days": 7, "block_size": 3}
+    returns = simulation._log_returns(params, FixedStarts([[3, 4, 0]]), 1, history)
+    assert returns[0, :, 0].tolist() == [3, 4, 0, 4, 0, 1, 0]
+    assert (returns[0, :, 1] == 10 * returns[0, :, 0]).all()
+
+
+def test_bootstrap_runs_on_embedded_history():
+    history = {"A": [100, 101, 99, 102, 104, 103], "B": [50, 50.5, 50.2, 50.9, 51, 51.4]}
+    params = simulation.resolve({"model": "bootstrap", "history": history, "block_size": 2,
+                                 "portfolios": [{"name": "A only", "weights": {"A": 1}}]},
+                                {"paths": 20, "horizon_days": 30, "weights": {"A": 1, "B": 1}})
+    result = simulation.simulate(params)
+    assert [p["name"] for p in result["portfolios"]] == ["Your portfolio", "A only"]
+    assert result["portfolios"][0]["weights"] == {"A": 0.5, "B": 0.5}
+    assert result == {**simulation.simulate(params), "elapsed_ms": result["elapsed_ms"]}
+
+
+def test_weights_are_normalized_so_equal_portfolios_hash_equal():
+    params = simulation.resolve({}, {"weights": {"STOCKS": 3, "BONDS": 1}})
+    assert params["symbols"] == ["STOCKS", "BONDS", "CASH"]
+    assert [p["name"] for p in params["portfolios"]] == ["Your portfolio", "All stocks", "60/40"]
+    assert params["portfolios"][0]["weights"] == [0.75, 0.25, 0.0]
+    assert simulation.params_hash(params) == \
+        simulation.params_hash(simulation.resolve({}, {"weights": {"STOCKS": 6, "BONDS": 2}}))
+    assert simulation.params_hash(params) != \
+        simulation.params_hash(simulation.resolve({}, {"weights": {"STOCKS": 6, "BONDS": 2}, "seed": 1}))
+    assert simulation.resolve(gbm(), {})["portfolios"] == [{"name": "Equal weight", "weights": [1.0]}]
+
+
+@pytest.mark.parametrize("data, overrides, message", [
+    ({"model": "garch"}, {}, "model must be one of"),
+    ({}, {"paths": 0}, "paths must be an integer"),
+    ({}, {"paths": 2.5}, "paths must be an integer"),
+    ({"paths": True}, {}, "paths must be an integer"),
+    ({"paths": "10"}, {}, "paths must be an integer"),
+    ({"paths": float("inf")}, {}, "paths must be an integer"),
+    ({"horizon_days": float("-inf")}, {}, "horizon_days must be an integer"),
+    ({"seed": float("nan")}, {}, "seed must be an integer"),
+    ({}, {"horizon_days": 10 ** 9}, "horizon_days must be an integer"),
+    ({}, {"initial_amount": 0}, "initial_amount must be a positive number"),
+    ({"initial_amount": float("inf")}, {}, "initial_amount must be a positive number"),
+    ({}, {"weights": {"GOLD": 1}}, "Unknown symbols ['GOLD']"),
+    ({}, {"weights": {"STOCKS": -1, "BONDS": 2}}, "weights must be non-negative"),
+    ({}, {"weights": {"STOCKS": 0}}, "weights must be non-negative"),
+    ({}, {"weights": {"STOCKS": float("nan")}}, "weights must be non-negative"),
+    ({"assets": [{"symbol": "A", "mu": 0.1}]}, {}, "assets must be a list"),
+    ({"assets": [{"symbol": "A", "mu": 0.1, "sigma": -0.1}]}, {}, "sigma finite and non-negative"),
+    ({"assets": [{"symbol": "A", "mu": 0.1, "sigma": 0.1}] * 2}, {}, "distinct symbols"),
+    ({"correlation": [["x"]]}, {}, "correlation must be a matrix"),
+    ({"portfolios": ["60/40"]}, {}, "portfolios must be a list"),
+    ({"model": "bootstrap"}, {}, "bootstrap needs daily closes"),
+    ({"model": "bootstrap", "history": {"A": [1, 2], "B": [1, 2, 3]}}, {}, "must be aligned"),
+    ({"model": "bootstrap", "history": {"A": [1, 0, 2]}}, {}, "must be positive"),
+    ({"model": "bootstrap", "history": {"A": [1, 2, 3]}, "block_size": 3}, {}, "block_size must be an integer"),
+    ({"model": "bootstrap", "prices": {"symbols": []}}, {}, "prices must be {symbols, start, end}"),
+])
+def test_resolve_rejects_bad_parameters(data, overrides, message):
+    with pytest.raises(ValueError) as error:
+        simulation.resolve(data, overrides)
+    assert message in str(error.value)
+
+
+def test_a_correlation_that_isnt_a_valid_matrix_is_rejected_when_run():
+    for correlation in ([[1, 0.5], [0.2, 1]], [[1, 2], [2, 1]], [[1]]):
+        params = simulation.resolve({"assets": list(simulation.DEFAULT_ASSETS[:2]), "correlation": correlation}, {})
+        with pytest.raises(ValueError):
+            simulation.simulate(params)
+
+
+def test_cached_runs_simulate_once_per_parameters(monkeypatch):
+    calls, entered, release = [], threading.Event(), threading.Event()
+
+    def slow_simulate(params):
+        calls.append(params["seed"])
+        entered.set()
+        release.wait(5)
+        return {"seed": params["seed"]}
+
+    monkeypatch.setattr(simulation, "simulate", slow_simulate)
+    key, results = uuid.uuid4().hex, []
+    threads = [threading.Thread(target=lambda: results.append(simulation._cached_run(key, {"seed": 1})))
+               for _ in range(4)]
+    threads[0].start()
+    assert entered.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)  # the others are now waiting on the first run, not starting their own
+    assert calls == [1] and key in simulation._inflight
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [{"seed": 1}] * 4 and calls == [1]
+    assert key not in simulation._inflight
+
+    assert simulation._cached_run(key, {"seed": 1}) == {"seed": 1} and calls == [1]
+    assert simulation._cached_run(uuid.uuid4().hex, {"seed": 2}) == {"seed": 2} and calls == [1, 2]
+
+
+def test_a_failed_run_lets_the_next_caller_retry(monkeypatch):
+    outcomes = [RuntimeError("out of memory"), {"ok": True}]
+
+    def flaky(params):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(simulation, "simulate", flaky)
+    key = uuid.uuid4().hex
+    with pytest.raises(RuntimeError):
+        simulation._cached_run(key, {})
+    assert key not in simulation._inflight
+    assert simulation._cached_run(key, {}) == {"ok": True}
+
+
+def test_simulate_endpoint(client):
+    lesson = client.post("/api/lessons", json={"title": "Risk", "description": "Portfolios", "order_index": 1,
+                                               "content_items": [{"content_type": "interactive", "title": "Sim",
+                                                                  "order_index": 1, "content": {
+                                                                      "component": "portfolio_simulator",
+                                                                      "data": gbm()}}]}).json()
+    content_id = lesson["content_items"][0]["id"]
+    first = client.post(f"/api/interactive/{content_id}/simulate", json={"seed": 3})
+    assert first.status_code == 200
+    again = client.post(f"/api/interactive/{content_id}/simulate", json={"seed": 3})
+    assert again.json() == first.json()  # served from the cache, elapsed_ms and all
+    assert client.post(f"/api/interactive/{content_id}/simulate", json={"paths": 0}).status_code == 400
+    assert client.post("/api/interactive/999999/simulate", json={}).status_code == 404
+
+    # Content saved as an encoded JSON string is decoded with json.loads, which accepts Infinity
+    document = json.dumps({"component": "portfolio_simulator", "data": gbm(paths=float("inf"))})
+    lesson = client.post("/api/lessons", json={"title": "Broken", "description": "Infinite paths", "order_index": 2,
+                                               "content_items": [{"content_type": "interactive", "title": "Sim",
+                                                                  "order_index": 1, "content": document}]}).json()
+    response = client.post(f"/api/interactive/{lesson['content_items'][0]['id']}/simulate", json={})
+    assert response.status_code == 400 and "paths" in response.json()["detail"]
@@ -0,0 +1,70 @@
+from datetime import date, datetime, timedelta
+
+from app import crud, streaks
+
+from .factories import make_user
+
+DAY = date(2024, 5, 10)
+
+
+def streak(db, user_id: int):
+    db.expire_all()
+    user = crud.get_user(db, user_id)
+    return user.streak_days, user.last_active_date
+
+
+def test_first_activity_of_a_day_advances_the_streak(db):
+    user_id = make_user(db).id
+    assert streaks.record_activity(db, user_id, DAY)
+    assert not streaks.record_activity(db, user_id, DAY)  # later activity the same day
+    assert streaks.record_activity(db, user_id, DAY + timedelta(days=1))
+    db.commit()
+    assert streak(db, user_id) == (2, DAY + timedelta(days=1))
+
+
+def test_a_gap_restarts_the_streak_at_one(db):
+    user_id = make_user(db).id
+    for offset in range(3):
+        streaks.record_activity(db, user_id, DAY + timedelta(days=offset))
+    streaks.record_activity(db, user_id, DAY + timedelta(days=5))
+    db.commit()
+    assert streak(db, user_id) == (1, DAY + timedelta(days=5))
+
+
+def set_streaks(db, rows):
+    ids = []
+    for i, (days, last_active) in enumerate(rows):
+        user = make_user(db, f"learner{i}")
+        user.streak_days, user.last_active_date = days, last_active
+        ids.append(user.id)
+    db.commit()
+    return ids
+
+
+def test_nightly_reset_zeroes_only_broken_streaks(db, engines):
+    yesterday, older = DAY - timedelta(days=1), DAY - timedelta(days=2)
+    ids = set_streaks(db, [(4, DAY), (7, yesterday), (3, older), (9, older - timedelta(days=30)), (2, None),
+                           (0, older)])
+    # A small chunk size spreads the users over several read/reset rounds.
+    stats = streaks.reset_broken_streaks([engines], day=DAY, chunk_size=2)
+    assert (stats["with_streak"], stats["reset"], stats["kept"], stats["longest"]) == (5, 3, 2, 7)
+    assert [streak(db, user_id)[0] for user_id in ids] == [4, 7, 0, 0, 0, 0]
+    # Nothing left to reset the same day.
+    assert streaks.reset_broken_streaks([engines], day=DAY)["reset"] == 0
+
+
+def test_activity_after_the_reset_restarts_the_streak(db, engines):
+    (user_id,) = set_streaks(db, [(5, DAY - timedelta(days=3))])
+    streaks.reset_broken_streaks([engines], day=DAY)
+    streaks.record_activity(db, user_id, DAY)
+    db.commit()
+    assert streak(db, user_id) == (1, DAY)
+
+
+def test_next_run_is_just_after_utc_midnight():
+    minute = streaks.settings.STREAK_BATCH_MINUTE
+    day, delay = streaks.next_run_after(datetime(2024, 5, 10, 12, 0))
+    assert day == date(2024, 5, 11)
+    assert delay == 12 * 3600 + minute * 60
+    day, delay = streaks.next_run_after(datetime(2024, 5, 10, 0, 0))
+    assert (day, delay) == (date(2024, 5, 10), minute * 60)
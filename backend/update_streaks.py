@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Reset broken daily streaks (see app/streaks.py).
+
+The app runs this itself shortly after UTC midnight as the "streaks.nightly"
+background job; run it by hand (or from cron with JOBS_ENABLED=false) to
+catch up or to reset as of another day:
+
+    python update_streaks.py
+    python update_streaks.py --date 2024-06-02 --shard-urls "$USER_SHARD_URLS"
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import schema, streaks
+from app.config import settings
+from app.database import create_engines, shard_set_from_urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reset streaks not extended yesterday")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./finesse.db"))
+    parser.add_argument("--shard-urls", default=os.getenv("USER_SHARD_URLS", ""),
+                        help="comma-separated user shard URLs (see app/sharding.py)")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="UTC day to reset as of (default: today); streaks last extended before "
+                             "the day before it are reset")
+    parser.add_argument("--chunk-size", type=int, default=settings.STREAK_BATCH_SIZE, help="users per batch")
+    args = parser.parse_args()
+
+    writer, reader = create_engines(args.database_url, tuned=settings.SQLITE_TUNED)
+    shards = shard_set_from_urls([url.strip() for url in args.shard_urls.split(",") if url.strip()])
+    try:
+        schema.ensure_schema(writer)
+        schema.ensure_shards(shards)
+        databases = [(s.writer, s.reader) for s in shards] or [(writer, reader)]
+        stats = streaks.reset_broken_streaks(databases, args.date, chunk_size=args.chunk_size,
+                                             report=lambda line: print(f"\r{line}", end="", flush=True))
+        print()
+        print(f"{stats['reset']:,} of {stats['with_streak']:,} streaks reset as of {stats['date']} "
+              f"({stats['kept']:,} kept, longest {stats['longest']} days) in {stats['seconds']:.1f}s")
+    finally:
+        shards.dispose()
+        writer.dispose()
+        reader.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import React, { useEffect, useMemo, useState } from 'react';
 import TopBar from '../components/TopBar';
 import lessonService from '../services/lessonService';
+import { usersApi } from '../services/api';
+import { useAuth } from '../contexts/AuthContext';
 import { Lesson, LessonContent, QuizContent } from '../types/lessons';
 import '../styles/DailyChallenge.css';
 import { Keys, getItemInt, setItemInt, getItem, setItem, fullyQualifiedKey } from '../utils/userStorage';
@@ -32,6 +34,7 @@ interface DailyState {
 }
 
 const DailyChallengePage: React.FC = () => {
+  const { user } = useAuth();
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -181,6 +184,14 @@ const DailyChallengePage: React.FC = () => {
     };
     setItem(Keys.dailyChallengeState, JSON.stringify(state));
 
+    // Answering counts toward the streak (right or wrong); the server returns the new value
+    if (user?.id) {
+      usersApi.recordActivity(user.id).then((serverUser) => {
+        setItemInt(Keys.currentStreak, serverUser.streak_days);
+        setStreak(serverUser.streak_days);
+      }).catch(() => {});
+    }
+
     if (isCorrect) {
       const current = getPointsFromStorage();
       const updated = current + 100;
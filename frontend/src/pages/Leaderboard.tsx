@@ -3,7 +3,6 @@ import TopBar from '../components/TopBar';
 import { usersApi } from '../services/api';
 import { Keys, getItemInt, fullyQualifiedKey } from '../utils/userStorage';
 import '../styles/Dashboard.css';
-import { useAuth } from '../contexts/AuthContext';
 
 interface LeaderboardUser {
   id: number;
@@ -19,7 +18,6 @@ const Leaderboard: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   const [score, setScore] = useState<number>(0);
   const [streak, setStreak] = useState<number>(0);
-  const { user } = useAuth();
 
   const fetchLeaderboard = async () => {
     try {
@@ -42,13 +40,6 @@ const Leaderboard: React.FC = () => {
       setStreak(getItemInt(Keys.currentStreak, 0));
     };
     updateStats();
-    // Also push current streak to backend so leaderboard reflects latest immediately
-    try {
-      const s = getItemInt(Keys.currentStreak, 0);
-      if (user?.id) {
-        usersApi.setUserStreak(user.id, s).catch(() => {});
-      }
-    } catch {}
     const onFocus = () => updateStats();
     window.addEventListener('focus', onFocus);
     const keyXP = fullyQualifiedKey(Keys.userXP);
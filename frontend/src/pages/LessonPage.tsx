@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import lessonService from '../services/lessonService';
-import { Lesson, LessonContent, QuizContent } from '../types/lessons';
+import { Lesson, LessonContent, QuizContent, QuizAnswerResult } from '../types/lessons';
 import LoadingSpinner from '../components/LoadingSpinner';
 import TopBar from '../components/TopBar';
 import '../styles/LessonPage.css';
@@ -28,6 +28,8 @@ const LessonPage: React.FC = () => {
   const [isLastStep, setIsLastStep] = useState<boolean>(false);
   const [hasAnswered, setHasAnswered] = useState<boolean>(false);
   const [isCorrect, setIsCorrect] = useState<boolean>(false);
+  // Server grading results per step (answer keys are never sent to the client)
+  const [gradedAnswers, setGradedAnswers] = useState<{ [step: number]: QuizAnswerResult }>({});
   
   // User data - in a real app, these would come from auth context
   const userId = 1;
@@ -139,15 +141,14 @@ const LessonPage: React.FC = () => {
       const hasAnswer = userAnswers[currentStep] !== undefined;
       setHasAnswered(hasAnswer);
       
-      // If it's a quiz, check if the answer is correct
+      // If it's a quiz, use the server's grading for this step
       if (content.content_type === 'quiz' && hasAnswer) {
-        const quizContent = content as QuizContent;
-        setIsCorrect(userAnswers[currentStep] === quizContent.correct_answer);
+        setIsCorrect(gradedAnswers[currentStep]?.is_correct === true);
       } else {
         setIsCorrect(false);
       }
     }
-  }, [currentStep, lesson, userAnswers]);
+  }, [currentStep, lesson, userAnswers, gradedAnswers]);
 
   const handleAnswerSelect = async (stepIndex: number, answerIndex: number) => {
     // Store the current progress before updating answers
@@ -161,10 +162,28 @@ const LessonPage: React.FC = () => {
     setUserAnswers(newAnswers);
     setHasAnswered(true);
     
-    // If it's a quiz, check if the answer is correct
+    // If it's a quiz, have the server grade the answer
     if (currentContent?.content_type === 'quiz' && lesson) {
       const quizContent = currentContent as QuizContent;
-      const isAnswerCorrect = answerIndex === quizContent.correct_answer;
+      let isAnswerCorrect = false;
+      try {
+        if (quizContent.question_id === undefined) {
+          throw new Error('Quiz question has no id');
+        }
+        const graded = await lessonService.submitQuizAnswer(Number(id), quizContent.question_id, answerIndex);
+        setGradedAnswers(prev => ({ ...prev, [stepIndex]: graded }));
+        isAnswerCorrect = graded.is_correct;
+      } catch (error) {
+        console.error('Error grading answer:', error);
+        // Let the learner answer again
+        setUserAnswers(prev => {
+          const next = { ...prev };
+          delete next[stepIndex];
+          return next;
+        });
+        setHasAnswered(false);
+        return;
+      }
       setIsCorrect(isAnswerCorrect);
       
       // If the answer is incorrect, reset progress to the initial step
@@ -273,6 +292,7 @@ const LessonPage: React.FC = () => {
       // Reset all states
       setCurrentStep(0);
       setUserAnswers({});
+      setGradedAnswers({});
       setHasAnswered(false);
       setShowFeedback(false);
       setIsCompleted(false);
@@ -415,7 +435,7 @@ const LessonPage: React.FC = () => {
                       userAnswers[currentStep] === index ? 'selected' : ''
                     } ${
                       showFeedback
-                        ? index === quizContent.correct_answer
+                        ? index === gradedAnswers[currentStep]?.correct_index
                           ? 'correct'
                           : userAnswers[currentStep] === index
                           ? 'incorrect'
@@ -432,7 +452,7 @@ const LessonPage: React.FC = () => {
               {showFeedback && (
                 <div className={`feedback ${isCorrect ? 'correct' : 'incorrect'}`}>
                   <h3>{isCorrect ? 'Correct!' : 'Incorrect'}</h3>
-                  <p>{quizContent.explanation}</p>
+                  <p>{gradedAnswers[currentStep]?.explanation}</p>
                 </div>
               )}
             </div>
@@ -5,7 +5,7 @@ import lessonService from '../services/lessonService';
 import TopBar from '../components/TopBar';
 import { usersApi } from '../services/api';
 import '../styles/Dashboard.css';
-import { Keys, getItemInt, setItemInt, getItemJSON, setItemJSON, getItem, setItem, fullyQualifiedKey } from '../utils/userStorage';
+import { Keys, getItemInt, setItemInt, getItem, fullyQualifiedKey } from '../utils/userStorage';
 
 interface Lesson {
   id: number;
@@ -32,81 +32,20 @@ const Dashboard: React.FC = () => {
   const { logout, user } = useAuth();
   const navigate = useNavigate();
 
-  // Function to update the streak
-  const updateStreak = () => {
-    const today = new Date().toDateString();
-    const lastActive = getItem(Keys.lastActiveDate);
-    const currentStreak = getItemInt(Keys.currentStreak, 0);
-    
-    if (lastActive === today) {
-      // User already active today, no update needed
-      return currentStreak;
-    }
-    
-    const yesterday = new Date();
-    yesterday.setDate(yesterday.getDate() - 1);
-    
-    let newStreak = currentStreak;
-    
-    if (!lastActive || new Date(lastActive).getTime() < yesterday.setHours(0, 0, 0, 0)) {
-      // Reset streak if more than one day has passed
-      newStreak = 1;
-    } else {
-      // Increment streak if active yesterday
-      newStreak += 1;
-    }
-    
-    // Update storage
-    setItem(Keys.lastActiveDate, today);
-    setItemInt(Keys.currentStreak, newStreak);
-
-    // Sync updated streak to backend (non-blocking)
+  // XP (awarded when quizzes are graded) and streaks (from lesson, quiz and
+  // daily challenge activity) are computed by the server; the values are
+  // cached locally for the other pages' TopBar.
+  const refreshUser = async () => {
+    if (!user?.id) return;
     try {
-      if (user?.id && newStreak !== currentStreak) {
-        usersApi.setUserStreak(user.id, newStreak).catch(() => {});
-      }
+      const serverUser = await usersApi.getUser(user.id);
+      setItemInt(Keys.userXP, serverUser.xp_points ?? 0);
+      setScore(serverUser.xp_points ?? 0);
+      setItemInt(Keys.currentStreak, serverUser.streak_days);
+      setStreak(serverUser.streak_days);
     } catch {
-      // ignore
-    }
-    
-    return newStreak;
-  };
-
-  // Check for completed lessons and update XP
-  const checkAndUpdateXP = (lessons: Lesson[]) => {
-    const savedXP = getItemInt(Keys.userXP, 0);
-    const completedLessons = getItemJSON<Record<string, boolean>>(Keys.completedLessons, {});
-    
-    let totalXP = savedXP;
-    let xpEarned = 0;
-    
-    // Check each lesson for completion
-    lessons.forEach(lesson => {
-      if (lesson.progress === 100 && !completedLessons[lesson.id]) {
-        // Mark lesson as completed and add XP
-        completedLessons[lesson.id] = true;
-        xpEarned += lesson.xp_reward;
-      }
-    });
-    
-    // Update XP if any lessons were completed
-    if (xpEarned > 0) {
-      totalXP += xpEarned;
-      setItemInt(Keys.userXP, totalXP);
-      setItemJSON(Keys.completedLessons, completedLessons);
-      setScore(totalXP);
-
-      // Sync updated XP to backend for leaderboard (non-blocking)
-      try {
-        if (user?.id) {
-          usersApi.setUserXP(user.id, totalXP).catch(() => {});
-        }
-      } catch {
-        // ignore
-      }
+      // keep showing the cached values
     }
-    
-    return totalXP;
   };
 
   // Fetch lessons from the lesson service
@@ -114,12 +53,6 @@ const Dashboard: React.FC = () => {
     try {
       // Get all lessons from the lesson service
       let allLessons = await lessonService.getLessons();
-      
-      // Update XP based on completed lessons
-      const currentXP = checkAndUpdateXP(allLessons);
-      
-      // Update state with all available lessons and XP
-      setScore(currentXP);
       setLessons(allLessons);
       return allLessons;
     } catch (error) {
@@ -130,19 +63,10 @@ const Dashboard: React.FC = () => {
 
   // Initial data fetch and setup
   useEffect(() => {
-    // Initialize or update streak
-    const currentStreak = updateStreak();
-    setStreak(currentStreak);
-    // Ensure backend has our latest streak even if updateStreak didn't change it
-    try {
-      if (user?.id) {
-        usersApi.setUserStreak(user.id, currentStreak).catch(() => {});
-      }
-    } catch {}
-    
-    // Initialize XP from localStorage if it exists
-    const savedXP = getItemInt(Keys.userXP, 0);
-    setScore(savedXP);
+    // Show the cached XP and streak right away, then the server's
+    setScore(getItemInt(Keys.userXP, 0));
+    setStreak(getItemInt(Keys.currentStreak, 0));
+    refreshUser();
     
     // Initial data fetch
     fetchLessons();
@@ -150,6 +74,7 @@ const Dashboard: React.FC = () => {
     // Set up focus listener to refresh data when returning to the dashboard
     const handleFocus = () => {
       fetchLessons();
+      refreshUser();
       refreshDailyAttempt();
     };
 
@@ -200,11 +125,6 @@ const Dashboard: React.FC = () => {
       } else if (e.key === keyStreak) {
         const current = getItemInt(Keys.currentStreak, 0);
         setStreak(current);
-        try {
-          if (user?.id) {
-            usersApi.setUserStreak(user.id, current).catch(() => {});
-          }
-        } catch {}
       } else if (e.key === keyDaily) {
         refreshDailyAttempt();
       } else if (e.key === 'user') {
@@ -1,4 +1,19 @@
 import axios from 'axios';
+import {
+  Achievement,
+  CohortLeaderboard,
+  DueReviews,
+  FriendsLeaderboard,
+  PriceInterval,
+  PriceSeries,
+  PriceSymbol,
+  QuizSubmissionResult,
+  ReviewAnswerResult,
+  SearchResponse,
+  SimulationRequest,
+  SimulationResult,
+  UserBadge,
+} from '../types/lessons';
 
 const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:8000/api';
 
@@ -23,17 +38,21 @@ const handleApiError = (error: any) => {
 
 // Tutor API
 export const tutorApi = {
-  ask: async (question: string, context?: string) => {
+  // The server retrieves context from the catalog; pass the current lesson to favour it.
+  ask: async (question: string, context?: string, lessonId?: number) => {
     try {
-      const response = await axios.post(`${API_BASE_URL}/tutor/ask`, { question, context });
-      return response.data as { answer: string };
+      const response = await axios.post(`${API_BASE_URL}/tutor/ask`, { question, context, lesson_id: lessonId });
+      return response.data as {
+        answer: string;
+        sources?: { lesson_id: number; content_id?: number | null; title: string }[];
+      };
     } catch (error) {
       return handleApiError(error);
     }
   }
 };
 
-// Users API (leaderboard and XP sync)
+// Users API (leaderboard and profile)
 export const usersApi = {
   getLeaderboard: async (limit: number = 10) => {
     try {
@@ -43,24 +62,83 @@ export const usersApi = {
       return handleApiError(error);
     }
   },
-  setUserXP: async (userId: number, xp_points: number) => {
+  getUser: async (userId: number) => {
     try {
-      const response = await axios.post(`${API_BASE_URL}/users/${userId}/xp`, { xp_points });
+      const response = await axios.get(`${API_BASE_URL}/users/${userId}`);
       return response.data;
     } catch (error) {
       return handleApiError(error);
     }
   },
-  setUserStreak: async (userId: number, streak_days: number) => {
+  // Streaks are computed by the server; lessons and quizzes count on their own,
+  // the daily challenge (answered client-side) is recorded here.
+  recordActivity: async (userId: number) => {
     try {
-      const response = await axios.post(`${API_BASE_URL}/users/${userId}/streak`, { streak_days });
+      const response = await axios.post(`${API_BASE_URL}/users/${userId}/activity`);
       return response.data;
     } catch (error) {
       return handleApiError(error);
     }
+  },
+  follow: async (userId: number, followeeId: number) => {
+    try {
+      await axios.put(`${API_BASE_URL}/users/${userId}/following/${followeeId}`);
+    } catch (error) {
+      return handleApiError(error);
+    }
+  },
+  unfollow: async (userId: number, followeeId: number) => {
+    try {
+      await axios.delete(`${API_BASE_URL}/users/${userId}/following/${followeeId}`);
+    } catch (error) {
+      return handleApiError(error);
+    }
+  },
+  // The user and everyone they follow
+  getFriendsLeaderboard: async (userId: number, limit: number = 10) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/users/${userId}/friends/leaderboard`, { params: { limit } });
+      return response.data as FriendsLeaderboard;
+    } catch (error) {
+      return handleApiError(error);
+    }
+  },
+  getBadges: async (userId: number) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/users/${userId}/badges`);
+      return response.data as UserBadge[];
+    } catch (error) {
+      return handleApiError(error);
+    }
   }
 };
 
+// Achievements API (every badge that can be earned)
+export const achievementsApi = {
+  list: async () => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/achievements`);
+      return response.data as Achievement[];
+    } catch (error) {
+      return handleApiError(error);
+    }
+  },
+};
+
+// Cohorts API (classroom leaderboards)
+export const cohortsApi = {
+  getLeaderboard: async (cohortId: number, limit: number = 10, userId?: number) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/cohorts/${cohortId}/leaderboard`, {
+        params: { limit, user_id: userId },
+      });
+      return response.data as CohortLeaderboard;
+    } catch (error) {
+      return handleApiError(error);
+    }
+  },
+};
+
 // Auth API
 export const authApi = {
   login: async (username: string, password: string) => {
@@ -119,6 +197,103 @@ export const lessonsApi = {
       throw handleApiError(error);
     }
   },
+
+  submitQuiz: async (
+    lessonId: number,
+    answers: { question_id: number; selected_index: number; time_ms?: number }[],
+    userId?: number
+  ) => {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/lessons/${lessonId}/quiz/submit`, {
+        user_id: userId,
+        answers,
+      });
+      return response.data as QuizSubmissionResult;
+    } catch (error) {
+      console.error('Error in submitQuiz:', error);
+      throw handleApiError(error);
+    }
+  },
+};
+
+// Search API
+export const searchApi = {
+  search: async (query: string, limit = 20) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/search`, { params: { q: query, limit } });
+      return response.data as SearchResponse;
+    } catch (error) {
+      console.error('Error in search:', error);
+      throw handleApiError(error);
+    }
+  },
+};
+
+// Spaced-repetition reviews of quiz questions
+export const reviewsApi = {
+  getDue: async (userId: number, limit = 20) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/reviews/due`, { params: { user_id: userId, limit } });
+      return response.data as DueReviews;
+    } catch (error) {
+      console.error('Error in getDue:', error);
+      throw handleApiError(error);
+    }
+  },
+
+  answer: async (userId: number, questionId: number, selectedIndex: number, quality?: number, timeMs?: number) => {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/reviews/answer`, {
+        user_id: userId,
+        question_id: questionId,
+        selected_index: selectedIndex,
+        quality,
+        time_ms: timeMs,
+      });
+      return response.data as ReviewAnswerResult;
+    } catch (error) {
+      console.error('Error in answer:', error);
+      throw handleApiError(error);
+    }
+  },
+};
+
+// Interactive content: market simulations for portfolio exercises
+export const interactiveApi = {
+  simulate: async (contentId: number, request: SimulationRequest = {}) => {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/interactive/${contentId}/simulate`, request);
+      return response.data as SimulationResult;
+    } catch (error) {
+      console.error('Error in simulate:', error);
+      throw handleApiError(error);
+    }
+  },
+};
+
+// Price history for charts in interactive exercises
+export const pricesApi = {
+  listSymbols: async () => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/prices`);
+      return response.data as PriceSymbol[];
+    } catch (error) {
+      console.error('Error in listSymbols:', error);
+      throw handleApiError(error);
+    }
+  },
+
+  getSeries: async (symbol: string, start?: string, end?: string, interval: PriceInterval = 'daily') => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/prices/${encodeURIComponent(symbol)}`, {
+        params: { start, end, interval },
+      });
+      return response.data as PriceSeries;
+    } catch (error) {
+      console.error('Error in getSeries:', error);
+      throw handleApiError(error);
+    }
+  },
 };
 
 // User Progress API
@@ -157,4 +332,10 @@ export default {
   progress: progressApi,
   users: usersApi,
   tutor: tutorApi,
+  search: searchApi,
+  reviews: reviewsApi,
+  cohorts: cohortsApi,
+  achievements: achievementsApi,
+  interactive: interactiveApi,
+  prices: pricesApi,
 };
@@ -1,5 +1,5 @@
-import { Lesson, LessonContent, QuizContent } from '../types/lessons';
-import { Keys, getItemJSON, setItemJSON, getItem, getCurrentUser } from '../utils/userStorage';
+import { Lesson, LessonContent, QuizContent, QuizAnswerResult } from '../types/lessons';
+import { Keys, getItemJSON, setItemJSON, setItemInt, getItem, getCurrentUser } from '../utils/userStorage';
 import { progressApi, lessonsApi } from './api';
 
 // Mock lesson data with content
@@ -467,8 +467,9 @@ const getLessons = async (): Promise<Lesson[]> => {
 const getLessonById = async (id: number): Promise<Lesson | null> => {
   const lesson = await lessonsApi.getLesson(id);
 
-  // Normalize quiz content: backend provides quiz details inside `content` JSON.
-  // The UI expects quiz fields at the top level of the content item.
+  // Normalize quiz content: backend provides the question (without its answer)
+  // in `questions`, older content inside `content` JSON. The UI expects quiz
+  // fields at the top level of the content item.
   const normalizedItems = (lesson?.content_items || []).map((item: any) => {
     if (item?.content_type === 'quiz') {
       const raw = item?.content;
@@ -478,13 +479,12 @@ const getLessonById = async (id: number): Promise<Lesson | null> => {
       } else if (raw && typeof raw === 'object') {
         obj = raw;
       }
+      const question = Array.isArray(item?.questions) && item.questions.length > 0 ? item.questions[0] : null;
       return {
         ...item,
-        question: obj?.question ?? '',
-        options: Array.isArray(obj?.options) ? obj.options : [],
-        correct_answer: typeof obj?.correct_answer === 'number' ? obj.correct_answer : (typeof obj?.correctAnswer === 'number' ? obj.correctAnswer : 0),
-        correctAnswer: typeof obj?.correctAnswer === 'number' ? obj.correctAnswer : (typeof obj?.correct_answer === 'number' ? obj.correct_answer : 0),
-        explanation: obj?.explanation ?? ''
+        question: question?.question ?? obj?.question ?? '',
+        options: Array.isArray(question?.options) ? question.options : (Array.isArray(obj?.options) ? obj.options : []),
+        question_id: question?.id,
       };
     }
     return item;
@@ -534,6 +534,25 @@ const updateLessonProgress = async (
   }
 };
 
+// Grade a quiz answer on the server (records the attempt and awards XP when logged in)
+const submitQuizAnswer = async (
+  lessonId: number,
+  questionId: number,
+  selectedIndex: number
+): Promise<QuizAnswerResult> => {
+  const user = getCurrentUser();
+  const result = await lessonsApi.submitQuiz(
+    lessonId,
+    [{ question_id: questionId, selected_index: selectedIndex }],
+    user?.id
+  );
+  if (typeof result.xp_points === 'number') {
+    // The server's total after this answer; it is the only XP writer
+    setItemInt(Keys.userXP, result.xp_points);
+  }
+  return result.results[0];
+};
+
 // Mark a lesson as complete
 const completeLesson = async (lessonId: number): Promise<void> => {
   return updateLessonProgress(lessonId, 100);
@@ -562,6 +581,7 @@ export default {
   getLessons,
   getLessonById,
   updateLessonProgress,
+  submitQuizAnswer,
   completeLesson,
   getUserProgress,
   resetProgress
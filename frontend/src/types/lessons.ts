@@ -19,9 +19,29 @@ export interface QuizContent extends BaseContent {
   content_type: 'quiz';
   question: string;
   options: string[];
-  correctAnswer: number;
-  correct_answer: number; // Backend uses snake_case
-  explanation: string;
+  question_id?: number; // graded server-side via POST /lessons/{id}/quiz/submit
+  // Only present in local mock data; the API never sends answer keys
+  correctAnswer?: number;
+  correct_answer?: number;
+  explanation?: string;
+}
+
+export interface QuizAnswerResult {
+  question_id: number;
+  selected_index: number;
+  is_correct: boolean;
+  correct_index: number;
+  explanation?: string | null;
+  xp_awarded: number;
+}
+
+export interface QuizSubmissionResult {
+  lesson_id: number;
+  correct: number;
+  total: number;
+  xp_awarded: number;
+  xp_points?: number | null;
+  results: QuizAnswerResult[];
 }
 
 export interface VideoContent extends BaseContent {
@@ -81,3 +101,144 @@ export interface UserProgress {
   completionPercentage: number;
   totalXP: number;
 }
+
+export interface SearchHit {
+  lesson_id: number;
+  lesson_title: string;
+  content_id?: number | null;
+  kind: string;
+  title: string;
+  snippet: string; // HTML-escaped by the server, matches wrapped in <mark>
+  score: number;
+}
+
+export interface SearchResponse {
+  query: string;
+  results: SearchHit[];
+}
+
+export interface ReviewCard {
+  question_id: number;
+  ease: number;
+  interval_days: number;
+  repetitions: number;
+  lapses: number;
+  reviews: number;
+  due_at: string;
+}
+
+export interface DueReview extends ReviewCard {
+  lesson_id: number;
+  question: string;
+  options: string[];
+}
+
+export interface DueReviews {
+  user_id: number;
+  due: DueReview[];
+  next_due_at?: string | null;
+}
+
+export interface ReviewAnswerResult {
+  question_id: number;
+  is_correct: boolean;
+  correct_index: number;
+  explanation?: string | null;
+  quality: number; // SM-2 grade, 0-5
+  card: ReviewCard;
+}
+
+export interface LeaderboardEntry {
+  rank: number;
+  user_id: number;
+  username?: string | null;
+  xp_points: number;
+}
+
+export interface GroupLeaderboard {
+  members: number;
+  user_rank?: number | null;
+  entries: LeaderboardEntry[];
+}
+
+export interface CohortLeaderboard extends GroupLeaderboard {
+  cohort_id: number;
+  name: string;
+}
+
+export interface FriendsLeaderboard extends GroupLeaderboard {
+  user_id: number;
+}
+
+export interface Achievement {
+  badge: string;
+  title: string;
+  description: string;
+}
+
+export interface UserBadge extends Achievement {
+  awarded_at: string;
+}
+
+export interface SimulationRequest {
+  weights?: Record<string, number>; // the learner's portfolio, symbol -> weight
+  model?: 'gbm' | 'bootstrap';
+  paths?: number;
+  horizon_days?: number;
+  rebalance_every?: number; // trading days; 0 = buy and hold
+  initial_amount?: number;
+  seed?: number;
+  block_size?: number;
+}
+
+export interface FanPoint {
+  day: number;
+  p5: number;
+  p50: number;
+  p95: number;
+}
+
+export interface PortfolioOutcome {
+  name: string;
+  weights: Record<string, number>;
+  final_value: Record<string, number>; // p5, p25, p50, p75, p95
+  mean_final_value: number;
+  probability_of_loss: number;
+  median_annual_return: number;
+  median_max_drawdown: number;
+  fan: FanPoint[];
+}
+
+export interface SimulationResult {
+  content_id: number;
+  params_hash: string;
+  model: string;
+  symbols: string[];
+  paths: number;
+  horizon_days: number;
+  rebalance_every: number;
+  seed: number;
+  initial_amount: number;
+  portfolios: PortfolioOutcome[];
+  elapsed_ms: number;
+}
+
+export type PriceInterval = 'daily' | 'weekly' | 'monthly';
+
+export interface PriceSymbol {
+  symbol: string;
+  rows: number;
+  first: string;
+  last: string;
+}
+
+export interface PriceSeries {
+  symbol: string;
+  interval: PriceInterval;
+  timestamps: string[]; // ISO 8601, a period's start when resampled
+  open: number[];
+  high: number[];
+  low: number[];
+  close: number[];
+  volume: number[];
+}